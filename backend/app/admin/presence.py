@@ -0,0 +1,384 @@
+"""
+État de présence du jour en mémoire pour le tableau de bord admin.
+
+L'état est reconstruit depuis la base au premier appel (démarrage à froid) ou au
+changement de jour (GMT+1), puis tenu à jour à chaque écriture de pointage
+(scan, scan hors-ligne, modification, annulation, restauration) : /api/admin/dashboard
+est servi depuis la mémoire sans requête.
+
+Chaque changement est aussi diffusé aux tableaux de bord abonnés
+(/api/admin/dashboard/stream) : le message SSE est sérialisé une seule fois puis
+déposé dans la file de chaque abonné.
+
+Le même état sert au scan en un aller-retour (create_pointage_rpc) : il y lit les
+pointages du jour de l'agent (au plus quatre créneaux : arrivée et sortie du matin
+et de l'après-midi) au lieu de les relire en base ; la fonction SQL vérifie sous
+verrou qu'ils sont toujours à jour.
+
+L'état est propre au processus : avec plusieurs workers, DASHBOARD_RESYNC_SECONDS
+force une reconstruction périodique pour voir les écritures des autres workers.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db import get_db
+
+logger = logging.getLogger(__name__)
+
+# Fuseau horaire GMT+1
+TIMEZONE = timezone(timedelta(hours=1))
+
+# Email du compte admin, exclu des statistiques
+ADMIN_EMAIL = "admin@collable.fr"
+
+SESSIONS = ("matin", "apres-midi")
+
+# Reconstruction périodique depuis la base (secondes, 0 = uniquement au démarrage et au changement de jour)
+DASHBOARD_RESYNC_SECONDS = float(os.environ.get("DASHBOARD_RESYNC_SECONDS", "0"))
+
+# Taille de la file d'événements par tableau de bord abonné; un abonné trop lent
+# voit sa file vidée et reçoit un instantané complet à la place
+DASHBOARD_STREAM_QUEUE_SIZE = int(os.environ.get("DASHBOARD_STREAM_QUEUE_SIZE", "256"))
+
+
+def stats_vides() -> Dict[str, Any]:
+    """
+    Statistiques à zéro (retournées en cas d'erreur)
+    """
+    return {
+        "total_agents": 0,
+        "agents_presents_matin": 0,
+        "agents_absents_matin": 0,
+        "agents_presents_aprem": 0,
+        "agents_absents_aprem": 0,
+        "arrivees_matin": 0,
+        "arrivees_aprem": 0,
+        "pointages_matin": 0,
+        "pointages_aprem": 0,
+        "liste_presents_matin": [],
+        "liste_presents_aprem": []
+    }
+
+
+class PresenceDuJour:
+    """
+    Présence du jour par session, mise à jour de façon incrémentale.
+
+    Pour chaque session et chaque agent, on garde ses pointages non annulés du jour
+    (id -> (heure, ordre d'arrivée, type)). L'agent est présent si son dernier
+    pointage (par heure) est une arrivée, comme dans le calcul sur la base.
+    """
+
+    def __init__(self):
+        self.jour: Optional[str] = None
+        self.reconstruit_a = 0.0
+        self.total_agents = 0
+        self.admin_ids: set = set()
+        self.noms: Dict[str, str] = {}
+        self.pointages: Dict[str, Tuple[str, str]] = {}  # id -> (session, agent_id)
+        self.par_agent: Dict[str, Dict[str, Dict[str, Tuple[str, int, Optional[str]]]]] = {s: {} for s in SESSIONS}
+        self.presents: Dict[str, set] = {s: set() for s in SESSIONS}
+        self.arrives: Dict[str, set] = {s: set() for s in SESSIONS}
+        self.nb_pointages: Dict[str, int] = {s: 0 for s in SESSIONS}
+        # Ordre d'arrivée de chaque pointage du jour, conservé après annulation
+        # pour qu'une restauration retrouve sa place à heure égale
+        self.ordres: Dict[str, int] = {}
+        self._ordre = itertools.count()
+        self._stats: Optional[Dict[str, Any]] = None
+        self._verrou = asyncio.Lock()
+        # Écritures reçues pendant une reconstruction, rejouées ensuite
+        self._en_attente: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+        # Files des tableaux de bord abonnés (message SSE, ou None = renvoyer un instantané)
+        self._abonnes: set = set()
+
+    def invalider(self) -> None:
+        """
+        Force une reconstruction depuis la base au prochain appel (ex: agents modifiés)
+        """
+        self.jour = None
+        self._stats = None
+        # Les flux ouverts renvoient un instantané, ce qui déclenche la reconstruction
+        self._demander_instantane()
+
+    def a_jour(self) -> bool:
+        """
+        Indique si l'état correspond au jour courant (GMT+1) et n'est pas périmé
+        """
+        today = datetime.now(TIMEZONE).date().isoformat()
+        perime = DASHBOARD_RESYNC_SECONDS > 0 and time.monotonic() - self.reconstruit_a > DASHBOARD_RESYNC_SECONDS
+        return self.jour == today and not perime
+
+    async def obtenir_stats(self) -> Dict[str, Any]:
+        """
+        Statistiques du tableau de bord, reconstruites depuis la base si nécessaire
+        """
+        if not self.a_jour():
+            await self.reconstruire(datetime.now(TIMEZONE).date().isoformat())
+        if self._stats is None:
+            self._stats = self._calculer_stats()
+        stats = dict(self._stats)
+        stats["liste_presents_matin"] = list(stats["liste_presents_matin"])
+        stats["liste_presents_aprem"] = list(stats["liste_presents_aprem"])
+        return stats
+
+    async def pointages_agent(self, agent_id: str, today: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Pointages non annulés du jour d'un agent, triés par heure (sans requête une
+        fois l'état construit). None si today n'est pas le jour de l'état (minuit).
+        """
+        if not self.a_jour():
+            await self.reconstruire(datetime.now(TIMEZONE).date().isoformat())
+        if self.jour != today:
+            return None
+        creneaux = sorted(
+            (heure, ordre, session, pointage_id, type_pointage)
+            for session in SESSIONS
+            for pointage_id, (heure, ordre, type_pointage) in self.par_agent[session].get(agent_id, {}).items()
+        )
+        return [
+            {
+                "id": pointage_id,
+                "agent_id": agent_id,
+                "date_pointage": today,
+                "heure_pointage": heure,
+                "session": session,
+                "type_pointage": type_pointage
+            }
+            for heure, _, session, pointage_id, type_pointage in creneaux
+        ]
+
+    async def reconstruire(self, today: str) -> None:
+        """
+        Recharge l'état du jour depuis la base (agents + pointages non annulés du jour)
+        """
+        async with self._verrou:
+            if self.a_jour():
+                return  # Déjà reconstruit par un appel concurrent
+
+            # Démarrage à froid ou après invalider(): les flux ouverts ont déjà demandé un instantané
+            etait_initialise = self.jour is not None
+            self._en_attente = []
+            try:
+                db = await get_db()
+                agents_result = await db.table("agents").select("id, nom, email").execute()
+                pointages_result = await db.table("pointages").select("id, agent_id, date_pointage, heure_pointage, session, type_pointage").eq("date_pointage", today).or_("annule.is.null,annule.eq.false").order("heure_pointage").execute()
+
+                agents = agents_result.data or []
+                self.admin_ids = {a["id"] for a in agents if a.get("email") == ADMIN_EMAIL}
+                self.total_agents = len(agents) - len(self.admin_ids)
+                self.noms = {a["id"]: a["nom"] for a in agents}
+                self.pointages = {}
+                self.par_agent = {s: {} for s in SESSIONS}
+                self.presents = {s: set() for s in SESSIONS}
+                self.arrives = {s: set() for s in SESSIONS}
+                self.nb_pointages = {s: 0 for s in SESSIONS}
+                self.ordres = {}
+                self.jour = today
+                self.reconstruit_a = time.monotonic()
+                self._stats = None
+
+                for pointage in (pointages_result.data or []):
+                    self._ajouter(pointage)
+
+                # Rejouer les écritures arrivées pendant les requêtes (opérations idempotentes)
+                en_attente, self._en_attente = self._en_attente, None
+                for operation, pointage in en_attente:
+                    if operation == "enregistrer":
+                        self.enregistrer_pointage(pointage)
+                    else:
+                        self.retirer_pointage(pointage)
+
+                logger.info("📊 Présence du jour reconstruite (%s): %s agents, %s pointages", today, self.total_agents, len(self.pointages))
+            finally:
+                self._en_attente = None
+            if etait_initialise:
+                self._demander_instantane()
+
+    def enregistrer_pointage(self, pointage: Dict[str, Any]) -> None:
+        """
+        Ajoute ou met à jour un pointage (scan, modification d'heure, restauration)
+        """
+        if self._en_attente is not None:
+            self._en_attente.append(("enregistrer", pointage))
+            return
+        if pointage.get("date_pointage") != self.jour:
+            return
+        if pointage.get("annule"):
+            self.retirer_pointage(pointage)
+            return
+        if pointage.get("session") not in SESSIONS:
+            return
+        existant = self._retirer(pointage["id"])
+        self._ajouter(pointage)
+        action = "modification" if existant else pointage.get("type_pointage")
+        self._publier_changement(action, pointage)
+
+    def retirer_pointage(self, pointage: Dict[str, Any]) -> None:
+        """
+        Retire un pointage annulé
+        """
+        if self._en_attente is not None:
+            self._en_attente.append(("retirer", pointage))
+            return
+        if pointage.get("date_pointage") != self.jour:
+            return
+        if self._retirer(pointage["id"]):
+            self._publier_changement("annulation", pointage)
+
+    def resynchroniser_agent(self, agent_id: str, today: str, pointages: List[Dict[str, Any]]) -> None:
+        """
+        Remplace les pointages du jour d'un agent par ceux relus en base (écrits par un
+        autre worker ou hors de l'API), sans reconstruire tout l'état. Seules les
+        différences sont diffusées aux abonnés.
+        """
+        if self._en_attente is not None or self.jour != today:
+            return  # Reconstruction en cours ou à venir: elle relira la base
+        lus = {pointage["id"]: pointage for pointage in pointages}
+        for session in SESSIONS:
+            for pointage_id, (heure, _, type_pointage) in list(self.par_agent[session].get(agent_id, {}).items()):
+                pointage = lus.get(pointage_id)
+                if pointage is None:
+                    self.retirer_pointage({
+                        "id": pointage_id,
+                        "agent_id": agent_id,
+                        "date_pointage": today,
+                        "heure_pointage": heure,
+                        "session": session,
+                        "type_pointage": type_pointage
+                    })
+                elif (pointage["session"], str(pointage["heure_pointage"]), pointage.get("type_pointage")) == (session, heure, type_pointage):
+                    del lus[pointage_id]  # Inchangé
+        for pointage in lus.values():
+            self.enregistrer_pointage({**pointage, "date_pointage": today})
+
+    def abonner(self) -> asyncio.Queue:
+        """
+        Abonne un tableau de bord aux changements de présence
+        """
+        file = asyncio.Queue(maxsize=DASHBOARD_STREAM_QUEUE_SIZE)
+        self._abonnes.add(file)
+        return file
+
+    def desabonner(self, file: asyncio.Queue) -> None:
+        self._abonnes.discard(file)
+
+    def compteurs(self) -> Dict[str, int]:
+        """
+        Compteurs du tableau de bord (sans les listes de noms)
+        """
+        return {
+            "total_agents": self.total_agents,
+            "agents_presents_matin": len(self.presents["matin"]),
+            "agents_absents_matin": max(0, self.total_agents - len(self.presents["matin"])),
+            "agents_presents_aprem": len(self.presents["apres-midi"]),
+            "agents_absents_aprem": max(0, self.total_agents - len(self.presents["apres-midi"])),
+            "arrivees_matin": len(self.arrives["matin"]),
+            "arrivees_aprem": len(self.arrives["apres-midi"]),
+            "pointages_matin": self.nb_pointages["matin"],
+            "pointages_aprem": self.nb_pointages["apres-midi"]
+        }
+
+    def _publier_changement(self, action: str, pointage: Dict[str, Any]) -> None:
+        """
+        Diffuse un changement (arrivee, sortie, modification, annulation) aux abonnés
+        """
+        if not self._abonnes:
+            return
+        agent_id = pointage["agent_id"]
+        session = pointage["session"]
+        evenement = {
+            "action": action,
+            "pointage_id": pointage["id"],
+            "agent_id": agent_id,
+            "nom": self.noms.get(agent_id, "Inconnu"),
+            "session": session,
+            "type_pointage": pointage.get("type_pointage"),
+            "heure_pointage": str(pointage["heure_pointage"]),
+            "present": agent_id in self.presents[session],
+            "compteurs": self.compteurs()
+        }
+        message = f"event: presence\ndata: {json.dumps(evenement)}\n\n"
+        for file in list(self._abonnes):
+            try:
+                file.put_nowait(message)
+            except asyncio.QueueFull:
+                self._vider_pour_instantane(file)
+
+    def _demander_instantane(self) -> None:
+        """
+        Demande à tous les abonnés de renvoyer un instantané complet (après reconstruction)
+        """
+        for file in list(self._abonnes):
+            self._vider_pour_instantane(file)
+
+    @staticmethod
+    def _vider_pour_instantane(file: asyncio.Queue) -> None:
+        while not file.empty():
+            file.get_nowait()
+        file.put_nowait(None)
+
+    def _ajouter(self, pointage: Dict[str, Any]) -> None:
+        agent_id = pointage["agent_id"]
+        session = pointage["session"]
+        if session not in SESSIONS:
+            return
+        self.pointages[pointage["id"]] = (session, agent_id)
+        self.nb_pointages[session] += 1
+        self.par_agent[session].setdefault(agent_id, {})[pointage["id"]] = (
+            str(pointage["heure_pointage"]),
+            self.ordres.setdefault(pointage["id"], next(self._ordre)),
+            pointage.get("type_pointage")
+        )
+        self._mettre_a_jour_agent(session, agent_id)
+
+    def _retirer(self, pointage_id: str) -> bool:
+        if pointage_id not in self.pointages:
+            return False
+        session, agent_id = self.pointages.pop(pointage_id)
+        self.nb_pointages[session] -= 1
+        pointages_agent = self.par_agent[session][agent_id]
+        del pointages_agent[pointage_id]
+        if not pointages_agent:
+            del self.par_agent[session][agent_id]
+        self._mettre_a_jour_agent(session, agent_id)
+        return True
+
+    def _mettre_a_jour_agent(self, session: str, agent_id: str) -> None:
+        """
+        Recalcule l'état d'un agent pour une session à partir de ses pointages (2 au plus)
+        """
+        self._stats = None
+        if agent_id in self.admin_ids:
+            return  # Les pointages de l'admin comptent dans le total mais pas dans la présence
+        present = False
+        arrive = False
+        for _, _, type_pointage in sorted(self.par_agent[session].get(agent_id, {}).values()):
+            if type_pointage == "arrivee":
+                present = True
+                arrive = True
+            elif type_pointage == "sortie":
+                present = False
+        if present:
+            self.presents[session].add(agent_id)
+        else:
+            self.presents[session].discard(agent_id)
+        if arrive:
+            self.arrives[session].add(agent_id)
+        else:
+            self.arrives[session].discard(agent_id)
+
+    def _calculer_stats(self) -> Dict[str, Any]:
+        stats = self.compteurs()
+        stats["liste_presents_matin"] = sorted(self.noms.get(aid, "Inconnu") for aid in self.presents["matin"])
+        stats["liste_presents_aprem"] = sorted(self.noms.get(aid, "Inconnu") for aid in self.presents["apres-midi"])
+        return stats
+
+
+# Instance unique partagée par les routes de pointage et d'administration
+presence_du_jour = PresenceDuJour()
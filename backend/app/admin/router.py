@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Request
 from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import date, datetime
 from pydantic import BaseModel
+import logging
 
-from app.auth.utils import get_admin_user
+from app.auth.utils import get_admin_user, get_admin_user_stream, create_stream_ticket, STREAM_TICKET_EXPIRE_SECONDS
 from app.auth.models import User
 from app.admin.models import DashboardStats, ExportParams, AgentPointageFilters
-from app.admin.utils import get_dashboard_stats, get_agents_with_pointages, export_pointages, get_all_agents
+from app.admin.utils import get_dashboard_stats, stream_dashboard_events, get_agents_with_pointages, export_pointages, get_all_agents, get_suivi_equipe
+from app.admin.presence import presence_du_jour
 from app.db import get_db
+from app.paie.cache import invalider_paie_date
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -38,6 +43,29 @@ async def get_dashboard(current_user: User = Depends(get_admin_user)):
         )
 
 
+@router.post("/dashboard/stream/ticket")
+async def get_dashboard_stream_ticket(current_user: User = Depends(get_admin_user)):
+    """
+    Ticket de courte durée pour ouvrir le flux SSE du tableau de bord
+    (EventSource ne peut pas envoyer l'en-tête Authorization)
+    """
+    return {"ticket": create_stream_ticket(current_user), "expires_in": STREAM_TICKET_EXPIRE_SECONDS}
+
+
+@router.get("/dashboard/stream")
+async def stream_dashboard(request: Request, current_user: User = Depends(get_admin_user_stream)):
+    """
+    Flux SSE des changements de présence du tableau de bord (admin uniquement).
+    Envoie un instantané complet puis les arrivées, sorties, modifications et
+    annulations au fil des pointages, sans requête par tableau de bord ouvert.
+    """
+    return StreamingResponse(
+        stream_dashboard_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/agents-pointages")
 async def get_agents_pointages(
     start_date: Optional[date] = Query(None),
@@ -58,6 +86,32 @@ async def get_agents_pointages(
         )
 
 
+@router.get("/suivi")
+async def get_suivi_equipe_endpoint(
+    start_date: date = Query(..., description="Date de début"),
+    end_date: date = Query(..., description="Date de fin"),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Endpoint pour récupérer la grille de suivi quotidien de toute l'équipe (admin uniquement).
+    Réponse en colonnes: une ligne par agent et une colonne par jour pour le code
+    de statut ("statuts" donne les libellés), les minutes de retard et le montant déduit.
+    """
+    try:
+        return await get_suivi_equipe(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.exception("Erreur lors du calcul de la grille de suivi: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lors de la récupération du suivi de l'équipe: {str(e)}"
+        )
+
+
 @router.get("/historique-pointages")
 async def get_historique_pointages(
     limit: int = Query(100, description="Nombre maximum de pointages à récupérer"),
@@ -89,14 +143,14 @@ async def get_historique_pointages(
             query = query.eq("session", session)
         
         # Exécuter la requête avec tri et pagination
-        result = query.order("date_pointage", desc=True).order("heure_pointage", desc=True).limit(limit).range(offset, offset + limit - 1).execute()
+        result = await query.order("date_pointage", desc=True).order("heure_pointage", desc=True).limit(limit).range(offset, offset + limit - 1).execute()
         
         return {
             "pointages": result.data if result.data else [],
             "total": len(result.data) if result.data else 0
         }
     except Exception as e:
-        print(f"Erreur lors de la récupération de l'historique: {str(e)}")
+        logger.error("Erreur lors de la récupération de l'historique: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la récupération de l'historique: {str(e)}"
@@ -109,12 +163,12 @@ async def get_agents(current_user: User = Depends(get_admin_user)):
     Endpoint pour récupérer la liste des agents (admin uniquement)
     """
     try:
-        print("Récupération de la liste des agents")
+        logger.debug("Récupération de la liste des agents")
         agents = await get_all_agents()
-        print(f"Nombre d'agents récupérés: {len(agents)}")
+        logger.debug("Nombre d'agents récupérés: %s", len(agents))
         return agents
     except Exception as e:
-        print(f"Erreur lors de la récupération des agents: {str(e)}")
+        logger.error("Erreur lors de la récupération des agents: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la récupération des agents: {str(e)}"
@@ -127,10 +181,10 @@ async def export_pointages_data(params: ExportParams, current_user: User = Depen
     Endpoint pour exporter les pointages au format CSV ou Excel (admin uniquement)
     """
     try:
-        content, filename, content_type = await export_pointages(params.start_date, params.end_date, params.format)
+        contenu, filename, content_type = await export_pointages(params.start_date, params.end_date, params.format)
         
         return StreamingResponse(
-            iter([content]),
+            contenu,
             media_type=content_type,
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
@@ -160,7 +214,7 @@ async def modifier_pointage(
     try:
         # Récupérer le pointage existant
         # Spécifier explicitement la relation car il y a deux FK vers agents
-        result = db.table("pointages").select("*, agents!pointages_agent_id_fkey(nom, email)").eq("id", pointage_id).single().execute()
+        result = await db.table("pointages").select("*, agents!pointages_agent_id_fkey(nom, email)").eq("id", pointage_id).single().execute()
         
         if not result.data:
             raise HTTPException(
@@ -195,9 +249,11 @@ async def modifier_pointage(
         }
         
         # Modifier le pointage
-        update_result = db.table("pointages").update({
+        update_result = await db.table("pointages").update({
             "heure_pointage": request.heure_pointage
         }).eq("id", pointage_id).execute()
+        presence_du_jour.enregistrer_pointage({**pointage, "heure_pointage": request.heure_pointage})
+        await invalider_paie_date(pointage["agent_id"], pointage["date_pointage"])
         
         # Données après modification
         donnees_apres = {
@@ -221,7 +277,7 @@ async def modifier_pointage(
             "justification": request.justification
         }
         
-        db.table("audit_logs").insert(audit_log).execute()
+        await db.table("audit_logs").insert(audit_log).execute()
         
         return {
             "message": "Pointage modifié avec succès",
@@ -233,7 +289,7 @@ async def modifier_pointage(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur modification pointage: {str(e)}")
+        logger.error("Erreur modification pointage: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la modification du pointage: {str(e)}"
@@ -256,7 +312,7 @@ async def supprimer_pointage(
     try:
         # Récupérer le pointage existant
         # Spécifier explicitement la relation car il y a deux FK vers agents
-        result = db.table("pointages").select("*, agents!pointages_agent_id_fkey(nom, email)").eq("id", pointage_id).single().execute()
+        result = await db.table("pointages").select("*, agents!pointages_agent_id_fkey(nom, email)").eq("id", pointage_id).single().execute()
         
         if not result.data:
             raise HTTPException(
@@ -287,12 +343,14 @@ async def supprimer_pointage(
         import pytz
         now = datetime.now(pytz.timezone('Africa/Casablanca'))
         
-        update_result = db.table("pointages").update({
+        update_result = await db.table("pointages").update({
             "annule": True,
             "annule_par": str(current_user.id),
             "annule_le": now.isoformat(),
             "motif_annulation": request.justification
         }).eq("id", pointage_id).execute()
+        presence_du_jour.retirer_pointage(pointage)
+        await invalider_paie_date(pointage["agent_id"], pointage["date_pointage"])
         
         # Créer le log d'audit
         agent_info = pointage.get("agents", {})
@@ -308,7 +366,7 @@ async def supprimer_pointage(
             "justification": request.justification
         }
         
-        db.table("audit_logs").insert(audit_log).execute()
+        await db.table("audit_logs").insert(audit_log).execute()
         
         return {
             "message": "Pointage annulé avec succès",
@@ -318,7 +376,7 @@ async def supprimer_pointage(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur suppression pointage: {str(e)}")
+        logger.error("Erreur suppression pointage: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la suppression du pointage: {str(e)}"
@@ -340,7 +398,7 @@ async def restaurer_pointage(
     try:
         # Récupérer le pointage existant
         # Spécifier explicitement la relation car il y a deux FK vers agents
-        result = db.table("pointages").select("*, agents!pointages_agent_id_fkey(nom, email)").eq("id", pointage_id).single().execute()
+        result = await db.table("pointages").select("*, agents!pointages_agent_id_fkey(nom, email)").eq("id", pointage_id).single().execute()
         
         if not result.data:
             raise HTTPException(
@@ -358,12 +416,14 @@ async def restaurer_pointage(
             )
         
         # Restaurer le pointage
-        update_result = db.table("pointages").update({
+        update_result = await db.table("pointages").update({
             "annule": False,
             "annule_par": None,
             "annule_le": None,
             "motif_annulation": None
         }).eq("id", pointage_id).execute()
+        presence_du_jour.enregistrer_pointage({**pointage, "annule": False})
+        await invalider_paie_date(pointage["agent_id"], pointage["date_pointage"])
         
         # Créer le log d'audit
         agent_info = pointage.get("agents", {})
@@ -387,7 +447,7 @@ async def restaurer_pointage(
             "justification": justification
         }
         
-        db.table("audit_logs").insert(audit_log).execute()
+        await db.table("audit_logs").insert(audit_log).execute()
         
         return {
             "message": "Pointage restauré avec succès",
@@ -397,7 +457,7 @@ async def restaurer_pointage(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur restauration pointage: {str(e)}")
+        logger.error("Erreur restauration pointage: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la restauration du pointage: {str(e)}"
@@ -426,7 +486,7 @@ async def get_audit_logs(
         if action:
             query = query.eq("action", action)
         
-        result = query.range(offset, offset + limit - 1).execute()
+        result = await query.range(offset, offset + limit - 1).execute()
         
         return {
             "logs": result.data if result.data else [],
@@ -434,7 +494,7 @@ async def get_audit_logs(
         }
         
     except Exception as e:
-        print(f"Erreur récupération audit logs: {str(e)}")
+        logger.error("Erreur récupération audit logs: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la récupération des logs: {str(e)}"
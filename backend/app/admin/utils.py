@@ -1,201 +1,106 @@
 from datetime import datetime, date, timedelta, timezone
-from typing import List, Dict, Any, Optional
-import pandas as pd
+from typing import List, Dict, Any, Optional, AsyncIterator
+import asyncio
+import csv
 import io
+import json
+import logging
 import os
+import tempfile
 
-from app.db import get_db
-from app.pointage.utils import format_pointages_by_date
+from openpyxl import Workbook
+
+from app.db import get_db, fetch_all_rows
+from app.admin.presence import presence_du_jour, stats_vides
+from app.pointage.utils import grouper_pointages_par_date
+from app.pointage.suivi_utils import calculer_grille_suivi, charger_donnees_suivi
+
+logger = logging.getLogger(__name__)
 
 # Fuseau horaire GMT+1
 TIMEZONE = timezone(timedelta(hours=1))
 
+# Intervalle des commentaires keepalive du flux SSE du tableau de bord (secondes)
+DASHBOARD_STREAM_KEEPALIVE_SECONDS = float(os.environ.get("DASHBOARD_STREAM_KEEPALIVE_SECONDS", "15"))
+
+# Au-delà de ce nombre d'agents trouvés par une recherche, les pointages sont filtrés
+# en mémoire plutôt que par agent_id=in.(...) (longueur d'URL)
+AGENTS_POINTAGES_MAX_IDS_FILTRE = 200
+
+# Période maximale de la grille de suivi de l'équipe (jours)
+SUIVI_EQUIPE_MAX_JOURS = int(os.environ.get("SUIVI_EQUIPE_MAX_JOURS", "366"))
+
+# Taille des pages de pointages lues par l'export (PostgREST renvoie au plus 1000 lignes)
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", "1000"))
+
+# Taille des blocs envoyés pour le fichier Excel (octets)
+EXPORT_TAILLE_BLOC = 64 * 1024
+
+COLONNES_EXPORT = [
+    "ID Agent", "Nom", "Email", "Date",
+    "Matin Arrivée", "Matin Sortie", "Après-midi Arrivée", "Après-midi Sortie"
+]
+
 
 async def get_all_agents() -> List[Dict[str, Any]]:
     """
     Récupère tous les agents (sans l'admin)
     """
     try:
-        print("Récupération de tous les agents (sans admin)")
+        logger.debug("Récupération de tous les agents (sans admin)")
         db = await get_db()
         
         # Récupérer tous les agents sauf l'admin
-        result = db.table("agents").select("id", "nom", "email", "role", "created_at").neq("email", "admin@collable.fr").execute()
-        print(f"Résultat de la requête: {result}")
-        print(f"Nombre d'agents (sans admin): {len(result.data) if result.data else 0}")
+        result = await db.table("agents").select("id", "nom", "email", "role", "created_at").neq("email", "admin@collable.fr").execute()
+        logger.debug("Résultat de la requête: %s", result)
+        logger.debug("Nombre d'agents (sans admin): %s", len(result.data) if result.data else 0)
         
         return result.data if result.data else []
     except Exception as e:
-        print(f"Erreur lors de la récupération de tous les agents: {str(e)}")
+        logger.error("Erreur lors de la récupération de tous les agents: %s", e)
         return []
 
 
 async def get_dashboard_stats() -> Dict[str, int]:
     """
     Récupère les statistiques pour le tableau de bord avec détails matin/après-midi
+    
+    Servies depuis l'état de présence du jour en mémoire (app/admin/presence.py),
+    reconstruit depuis la base au démarrage et au changement de jour.
     """
     try:
-        print("Récupération des statistiques pour le tableau de bord")
-        db = await get_db()
-        
-        # Nombre total d'agents (sans l'admin)
-        try:
-            agents_result = db.table("agents").select("*").neq("email", "admin@collable.fr").execute()
-            total_agents = len(agents_result.data) if agents_result.data else 0
-            print(f"Nombre total d'agents (sans admin): {total_agents}")
-        except Exception as e:
-            print(f"Erreur lors de la récupération du nombre total d'agents: {str(e)}")
-            total_agents = 0
-        
-        # Date du jour (en heure GMT+1)
-        now_gmt1 = datetime.now(TIMEZONE)
-        today = now_gmt1.date().isoformat()
-        print(f"Date du jour (GMT+1): {today}")
-        
-        # Récupérer l'ID de l'admin pour l'exclure
-        try:
-            admin_result = db.table("agents").select("id").eq("email", "admin@collable.fr").execute()
-            admin_id = admin_result.data[0]["id"] if admin_result.data else None
-        except Exception as e:
-            admin_id = None
-        
-        # Pointages du matin (exclure les annulés)
-        try:
-            pointages_matin_result = db.table("pointages").select("*").eq("date_pointage", today).eq("session", "matin").or_("annule.is.null,annule.eq.false").execute()
-            pointages_matin = len(pointages_matin_result.data) if pointages_matin_result.data else 0
-            
-            # Dictionnaire pour suivre l'état des agents: True = présent, False = sorti
-            agents_status_matin = {}
-            # Ensemble pour compter les agents uniques qui ont pointé leur arrivée le matin
-            agents_arrives_matin = set()
-            
-            if pointages_matin_result.data:
-                for pointage in pointages_matin_result.data:
-                    if pointage["agent_id"] != admin_id:
-                        # Si c'est une arrivée, marquer l'agent comme présent et l'ajouter à l'ensemble des arrivées
-                        if pointage.get("type_pointage") == "arrivee":
-                            agents_status_matin[pointage["agent_id"]] = True
-                            agents_arrives_matin.add(pointage["agent_id"])
-                        # Si c'est une sortie, marquer l'agent comme sorti
-                        elif pointage.get("type_pointage") == "sortie":
-                            agents_status_matin[pointage["agent_id"]] = False
-                            
-            # Nombre d'agents uniques qui ont pointé leur arrivée le matin
-            arrivees_matin = len(agents_arrives_matin)
-            
-            # Compter uniquement les agents actuellement présents (arrivés mais pas sortis)
-            agents_presents_matin = set(agent_id for agent_id, is_present in agents_status_matin.items() if is_present)
-            agents_presents_matin_count = len(agents_presents_matin)
-            agents_absents_matin = max(0, total_agents - agents_presents_matin_count)
-            
-            print(f"📊 MATIN - Pointages: {pointages_matin}, Présents: {agents_presents_matin_count}, Absents: {agents_absents_matin}")
-        except Exception as e:
-            print(f"❌ Erreur stats matin: {str(e)}")
-            pointages_matin = 0
-            agents_presents_matin_count = 0
-            agents_absents_matin = total_agents
-            agents_presents_matin = set()
-            arrivees_matin = 0
-        
-        # Pointages de l'après-midi (exclure les annulés)
-        try:
-            pointages_aprem_result = db.table("pointages").select("*").eq("date_pointage", today).eq("session", "apres-midi").or_("annule.is.null,annule.eq.false").execute()
-            pointages_aprem = len(pointages_aprem_result.data) if pointages_aprem_result.data else 0
-            
-            # Dictionnaire pour suivre l'état des agents: True = présent, False = sorti
-            agents_status_aprem = {}
-            # Ensemble pour compter les agents uniques qui ont pointé leur arrivée l'après-midi
-            agents_arrives_aprem = set()
-            
-            if pointages_aprem_result.data:
-                for pointage in pointages_aprem_result.data:
-                    if pointage["agent_id"] != admin_id:
-                        # Si c'est une arrivée, marquer l'agent comme présent et l'ajouter à l'ensemble des arrivées
-                        if pointage.get("type_pointage") == "arrivee":
-                            agents_status_aprem[pointage["agent_id"]] = True
-                            agents_arrives_aprem.add(pointage["agent_id"])
-                        # Si c'est une sortie, marquer l'agent comme sorti
-                        elif pointage.get("type_pointage") == "sortie":
-                            agents_status_aprem[pointage["agent_id"]] = False
-                            
-            # Nombre d'agents uniques qui ont pointé leur arrivée l'après-midi
-            arrivees_aprem = len(agents_arrives_aprem)
-            
-            # Compter uniquement les agents actuellement présents (arrivés mais pas sortis)
-            agents_presents_aprem = set(agent_id for agent_id, is_present in agents_status_aprem.items() if is_present)
-            agents_presents_aprem_count = len(agents_presents_aprem)
-            agents_absents_aprem = max(0, total_agents - agents_presents_aprem_count)
-            
-            print(f"📊 APRÈS-MIDI - Pointages: {pointages_aprem}, Présents: {agents_presents_aprem_count}, Absents: {agents_absents_aprem}")
-        except Exception as e:
-            print(f"❌ Erreur stats après-midi: {str(e)}")
-            pointages_aprem = 0
-            agents_presents_aprem_count = 0
-            agents_absents_aprem = total_agents
-            agents_presents_aprem = set()
-            arrivees_aprem = 0
-        
-        pointages_aujourd_hui = pointages_matin + pointages_aprem
-        
-        # Pour le total de la journée, un agent est présent s'il est présent dans au moins une des deux sessions
-        agents_presents_total = agents_presents_matin.union(agents_presents_aprem)
-        agents_presents_aujourd_hui = len(agents_presents_total)
-        agents_absents_aujourd_hui = max(0, total_agents - agents_presents_aujourd_hui)
-        
-        # Récupérer les noms des agents présents
-        liste_presents_matin = []
-        liste_presents_aprem = []
-        
-        if agents_presents_matin or agents_presents_aprem:
-            try:
-                # Récupérer tous les agents pour avoir leurs noms
-                all_agents_ids = list(agents_presents_matin.union(agents_presents_aprem))
-                if all_agents_ids:
-                    agents_info = db.table("agents").select("id, nom").in_("id", all_agents_ids).execute()
-                    agents_dict = {a["id"]: a['nom'] for a in agents_info.data} if agents_info.data else {}
-                    
-                    # Liste des noms des agents présents le matin
-                    liste_presents_matin = sorted([agents_dict.get(aid, "Inconnu") for aid in agents_presents_matin])
-                    
-                    # Liste des noms des agents présents l'après-midi
-                    liste_presents_aprem = sorted([agents_dict.get(aid, "Inconnu") for aid in agents_presents_aprem])
-                    
-                    print(f"📋 Agents présents matin: {liste_presents_matin}")
-                    print(f"📋 Agents présents après-midi: {liste_presents_aprem}")
-            except Exception as e:
-                print(f"❌ Erreur récupération noms agents: {str(e)}")
-        
-        result = {
-            "total_agents": total_agents,
-            "agents_presents_matin": agents_presents_matin_count,
-            "agents_absents_matin": agents_absents_matin,
-            "agents_presents_aprem": agents_presents_aprem_count,
-            "agents_absents_aprem": agents_absents_aprem,
-            "arrivees_matin": arrivees_matin,
-            "arrivees_aprem": arrivees_aprem,
-            "pointages_matin": pointages_matin,
-            "pointages_aprem": pointages_aprem,
-            "liste_presents_matin": liste_presents_matin,
-            "liste_presents_aprem": liste_presents_aprem
-        }
-        
-        print(f"✅ RÉSULTAT FINAL: {result}")
-        return result
+        return await presence_du_jour.obtenir_stats()
     except Exception as e:
-        print(f"Erreur: {str(e)}")
-        return {
-            "total_agents": 0,
-            "agents_presents_matin": 0,
-            "agents_absents_matin": 0,
-            "agents_presents_aprem": 0,
-            "agents_absents_aprem": 0,
-            "arrivees_matin": 0,
-            "arrivees_aprem": 0,
-            "pointages_matin": 0,
-            "pointages_aprem": 0,
-            "liste_presents_matin": [],
-            "liste_presents_aprem": []
-        }
+        logger.error("Erreur: %s", e)
+        return stats_vides()
+
+
+async def stream_dashboard_events(request) -> AsyncIterator[str]:
+    """
+    Flux SSE du tableau de bord: un instantané complet (événement "snapshot") puis
+    les changements de présence (événement "presence") au fil des pointages.
+    Un commentaire keepalive est envoyé en l'absence d'événement.
+    """
+    file = presence_du_jour.abonner()
+    try:
+        # Indique au navigateur le délai de reconnexion automatique
+        yield "retry: 5000\n\n"
+        message = None
+        while True:
+            if message is None:
+                stats = await get_dashboard_stats()
+                yield f"event: snapshot\ndata: {json.dumps(stats)}\n\n"
+            else:
+                yield message
+            try:
+                message = await asyncio.wait_for(file.get(), timeout=DASHBOARD_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # Changement de jour sans écriture ni appel du tableau de bord: nouvel instantané
+                message = None if not presence_du_jour.a_jour() else ": keepalive\n\n"
+    finally:
+        presence_du_jour.desabonner(file)
 
 
 async def get_agents_with_pointages(start_date: Optional[date] = None, end_date: Optional[date] = None, search: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -203,18 +108,18 @@ async def get_agents_with_pointages(start_date: Optional[date] = None, end_date:
     Récupère tous les agents avec leurs pointages sur une période donnée
     """
     try:
-        print(f"Récupération des agents avec pointages - start_date: {start_date}, end_date: {end_date}, search: {search}")
+        logger.debug("Récupération des agents avec pointages - start_date: %s, end_date: %s, search: %s", start_date, end_date, search)
         db = await get_db()
         
         # Si pas de dates spécifiées, utiliser la semaine en cours
         if not start_date:
             today = date.today()
             start_date = today - timedelta(days=today.weekday())  # Lundi de la semaine en cours
-            print(f"Date de début par défaut: {start_date}")
+            logger.debug("Date de début par défaut: %s", start_date)
         
         if not end_date:
             end_date = start_date + timedelta(days=6)  # Dimanche de la semaine en cours
-            print(f"Date de fin par défaut: {end_date}")
+            logger.debug("Date de fin par défaut: %s", end_date)
         
         # Récupérer tous les agents (sans l'admin)
         try:
@@ -223,84 +128,194 @@ async def get_agents_with_pointages(start_date: Optional[date] = None, end_date:
             if search:
                 agents_query = agents_query.or_(f"nom.ilike.%{search}%,email.ilike.%{search}%")
             
-            agents_result = agents_query.execute()
-            print(f"Résultat de la requête agents: {agents_result}")
+            agents_result = await agents_query.execute()
+            logger.debug("Résultat de la requête agents: %s", agents_result)
             agents = agents_result.data if agents_result.data else []
-            print(f"Nombre d'agents trouvés: {len(agents)}")
+            logger.debug("Nombre d'agents trouvés: %s", len(agents))
         except Exception as e:
-            print(f"Erreur lors de la récupération des agents: {str(e)}")
+            logger.error("Erreur lors de la récupération des agents: %s", e)
             agents = []
         
-        # Pour chaque agent, récupérer ses pointages
-        result = []
-        for agent in agents:
+        # Pointages de la période pour tous les agents en une requête (paginée),
+        # regroupés ensuite en mémoire par agent puis par date
+        pointages_par_agent: Dict[str, List[Dict[str, Any]]] = {}
+        if agents:
             try:
-                pointages = await format_pointages_by_date(agent["id"], start_date, end_date)
+                ids_agents = [agent["id"] for agent in agents]
+                
+                def construire_requete():
+                    query = db.table("pointages").select("agent_id, date_pointage, heure_pointage, session, type_pointage").gte("date_pointage", start_date.isoformat()).lte("date_pointage", end_date.isoformat()).or_("annule.is.null,annule.eq.false")
+                    # Filtrer par agent seulement pour une recherche (liste d'ids courte dans l'URL)
+                    if search and len(ids_agents) <= AGENTS_POINTAGES_MAX_IDS_FILTRE:
+                        query = query.in_("agent_id", ids_agents)
+                    return query.order("date_pointage").order("heure_pointage").order("id")
                 
-                result.append({
-                    "agent_id": agent["id"],
-                    "nom": agent["nom"],
-                    "email": agent["email"],
-                    "role": agent["role"],
-                    "pointages": pointages
-                })
+                pointages = await fetch_all_rows(construire_requete)
+                logger.debug("Nombre de pointages récupérés: %s", len(pointages))
+                for pointage in pointages:
+                    pointages_par_agent.setdefault(pointage["agent_id"], []).append(pointage)
             except Exception as e:
-                print(f"Erreur lors de la récupération des pointages pour l'agent {agent['id']}: {str(e)}")
-                # Ajouter l'agent avec des pointages vides
-                result.append({
-                    "agent_id": agent["id"],
-                    "nom": agent["nom"],
-                    "email": agent["email"],
-                    "role": agent["role"],
-                    "pointages": []
-                })
+                logger.error("Erreur lors de la récupération des pointages: %s", e)
         
-        print(f"Nombre d'agents avec pointages retournés: {len(result)}")
+        result = []
+        for agent in agents:
+            result.append({
+                "agent_id": agent["id"],
+                "nom": agent["nom"],
+                "email": agent["email"],
+                "role": agent["role"],
+                "pointages": grouper_pointages_par_date(pointages_par_agent.get(agent["id"], []))
+            })
+        
+        logger.debug("Nombre d'agents avec pointages retournés: %s", len(result))
         return result
     except Exception as e:
-        print(f"Erreur générale lors de la récupération des agents avec pointages: {str(e)}")
+        logger.error("Erreur générale lors de la récupération des agents avec pointages: %s", e)
         return []
 
 
+async def get_suivi_equipe(start_date: date, end_date: date) -> Dict[str, Any]:
+    """
+    Grille de suivi (retards, absences, montants déduits) de tous les agents sur
+    une période: agents, jours fériés, exceptions et pointages en quatre requêtes
+    """
+    if end_date < start_date:
+        raise ValueError("La date de fin doit être postérieure ou égale à la date de début")
+    if (end_date - start_date).days + 1 > SUIVI_EQUIPE_MAX_JOURS:
+        raise ValueError(f"La période ne peut pas dépasser {SUIVI_EQUIPE_MAX_JOURS} jours")
+
+    agents = await get_all_agents()
+    agent_ids = [agent["id"] for agent in agents]
+    jours_feries, exceptions_par_agent, pointages_par_agent = await charger_donnees_suivi(agent_ids, start_date, end_date)
+    logger.debug("Grille de suivi: %s agents du %s au %s", len(agents), start_date, end_date)
+    return calculer_grille_suivi(agents, start_date, end_date, jours_feries, exceptions_par_agent, pointages_par_agent)
+
+
 async def export_pointages(start_date: date, end_date: date, format: str = "csv") -> tuple:
     """
     Exporte les pointages de tous les agents sur une période donnée au format CSV ou Excel
-    Retourne le contenu du fichier et le nom du fichier
+    Retourne un générateur asynchrone du contenu du fichier, le nom du fichier et son type
     """
-    # Récupérer tous les agents avec leurs pointages
-    agents_with_pointages = await get_agents_with_pointages(start_date, end_date)
-    
-    # Préparer les données pour l'export
-    data = []
-    
-    for agent in agents_with_pointages:
-        for pointage in agent["pointages"]:
-            data.append({
-                "ID Agent": agent["agent_id"],
-                "Nom": agent["nom"],
-                "Email": agent["email"],
-                "Date": pointage["date"],
-                "Pointage Matin": pointage["matin"] if pointage["matin"] else "",
-                "Pointage Après-midi": pointage["apres_midi"] if pointage["apres_midi"] else ""
-            })
+    db = await get_db()
     
-    # Créer un DataFrame pandas
-    df = pd.DataFrame(data)
-    
-    # Générer le fichier
-    buffer = io.BytesIO()
+    # Agents exportés (sans l'admin): chargés avant de commencer à répondre
+    agents_rows = await fetch_all_rows(
+        lambda: db.table("agents").select("id, nom, email").neq("email", "admin@collable.fr").order("id")
+    )
+    agents = {agent["id"]: agent for agent in agents_rows}
+    logger.debug("Export des pointages du %s au %s (%s agents, format %s)", start_date, end_date, len(agents), format)
     
     if format.lower() == "excel":
         # Export Excel
-        df.to_excel(buffer, index=False, engine="openpyxl")
+        contenu = generer_export_excel(db, agents, start_date, end_date)
         filename = f"pointages_{start_date}_{end_date}.xlsx"
         content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     else:
         # Export CSV par défaut
-        df.to_csv(buffer, index=False)
+        contenu = generer_export_csv(db, agents, start_date, end_date)
         filename = f"pointages_{start_date}_{end_date}.csv"
         content_type = "text/csv"
     
-    buffer.seek(0)
+    return contenu, filename, content_type
+
+
+def ligne_export(agent: Dict[str, Any], pointages: List[Dict[str, Any]]) -> List[str]:
+    """
+    Ligne d'export d'un agent pour un jour à partir de ses pointages du jour
+    """
+    jour = grouper_pointages_par_date(pointages)[0]
+    return [
+        agent["id"],
+        agent["nom"],
+        agent["email"],
+        jour["date"],
+        jour["matin_arrivee"] or "",
+        jour["matin_sortie"] or "",
+        jour["apres_midi_arrivee"] or "",
+        jour["apres_midi_sortie"] or "",
+    ]
+
+
+async def iterer_lignes_export(db, agents: Dict[str, Dict[str, Any]], start_date: date, end_date: date) -> AsyncIterator[List[List[str]]]:
+    """
+    Parcourt les pointages de la période page par page (triés par date puis agent)
+    et produit les lignes d'export par lots: une ligne par agent et par jour.
+    Seule la page en cours est gardée en mémoire.
+    """
+    offset = 0
+    cle_courante = None  # (date, agent_id) de la ligne en cours
+    pointages_courants: List[Dict[str, Any]] = []
+    
+    while True:
+        result = await db.table("pointages").select("agent_id, date_pointage, heure_pointage, session, type_pointage").gte("date_pointage", start_date.isoformat()).lte("date_pointage", end_date.isoformat()).or_("annule.is.null,annule.eq.false").order("date_pointage").order("agent_id").order("heure_pointage").order("id").range(offset, offset + EXPORT_PAGE_SIZE - 1).execute()
+        page = result.data or []
+        derniere_page = len(page) < EXPORT_PAGE_SIZE
+        
+        lignes = []
+        for pointage in page:
+            cle = (pointage["date_pointage"], pointage["agent_id"])
+            if cle != cle_courante:
+                # Les pointages d'un agent pour un jour peuvent être à cheval sur deux pages
+                if pointages_courants and cle_courante[1] in agents:
+                    lignes.append(ligne_export(agents[cle_courante[1]], pointages_courants))
+                cle_courante, pointages_courants = cle, []
+            pointages_courants.append(pointage)
+        
+        if derniere_page and pointages_courants and cle_courante[1] in agents:
+            lignes.append(ligne_export(agents[cle_courante[1]], pointages_courants))
+        if lignes:
+            yield lignes
+        if derniere_page:
+            return
+        offset += EXPORT_PAGE_SIZE
+
+
+async def generer_export_csv(db, agents: Dict[str, Dict[str, Any]], start_date: date, end_date: date) -> AsyncIterator[bytes]:
+    """
+    Contenu CSV de l'export, envoyé page par page
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
     
-    return buffer.getvalue(), filename, content_type
+    def vider() -> bytes:
+        contenu = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return contenu
+    
+    writer.writerow(COLONNES_EXPORT)
+    yield vider()
+    try:
+        async for lignes in iterer_lignes_export(db, agents, start_date, end_date):
+            writer.writerows(lignes)
+            yield vider()
+    except Exception as e:
+        # Les en-têtes sont déjà envoyés: le téléchargement est interrompu
+        logger.error("Erreur lors de l'export CSV des pointages: %s", e)
+        raise
+
+
+async def generer_export_excel(db, agents: Dict[str, Dict[str, Any]], start_date: date, end_date: date) -> AsyncIterator[bytes]:
+    """
+    Contenu Excel de l'export. Le classeur openpyxl en écriture seule écrit les lignes
+    au fur et à mesure dans un fichier temporaire, envoyé ensuite par blocs.
+    """
+    try:
+        classeur = Workbook(write_only=True)
+        feuille = classeur.create_sheet(title="Sheet1")
+        feuille.append(COLONNES_EXPORT)
+        async for lignes in iterer_lignes_export(db, agents, start_date, end_date):
+            for ligne in lignes:
+                feuille.append(ligne)
+        
+        with tempfile.TemporaryFile() as fichier:
+            await asyncio.to_thread(classeur.save, fichier)
+            fichier.seek(0)
+            while True:
+                bloc = fichier.read(EXPORT_TAILLE_BLOC)
+                if not bloc:
+                    break
+                yield bloc
+    except Exception as e:
+        logger.error("Erreur lors de l'export Excel des pointages: %s", e)
+        raise
@@ -16,8 +16,11 @@ from app.auth.utils import (
     verify_password,
     get_current_active_user,
     get_admin_user,
+    invalidate_user_cache,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from app.admin.presence import presence_du_jour
+from app.paie.cache import invalider_paie
 
 router = APIRouter()
 
@@ -27,11 +30,11 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     """
     Endpoint pour obtenir un token d'accès
     """
-    logger.info(f" Tentative de connexion pour l'utilisateur: {form_data.username}")
+    logger.info(" Tentative de connexion pour l'utilisateur: %s", form_data.username)
     user = await authenticate_user(form_data.username, form_data.password)
     
     if not user:
-        logger.warning(f" Échec de connexion pour l'utilisateur: {form_data.username}")
+        logger.warning(" Échec de connexion pour l'utilisateur: %s", form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou mot de passe incorrect",
@@ -39,10 +42,20 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         )
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # user_id sert de clé au cache utilisateur; nom et dates permettent
+    # l'authentification sans base quand AUTH_TRUST_TOKEN_CLAIMS est activé
     access_token = create_access_token(
-        data={"sub": user.email, "role": user.role}, expires_delta=access_token_expires
+        data={
+            "sub": user.email,
+            "role": user.role,
+            "user_id": str(user.id),
+            "nom": user.nom,
+            "created_at": user.created_at.isoformat(),
+            "updated_at": user.updated_at.isoformat()
+        },
+        expires_delta=access_token_expires
     )
-    logger.info(f" Connexion réussie pour l'utilisateur: {form_data.username} (role: {user.role})")
+    logger.info(" Connexion réussie pour l'utilisateur: %s (role: %s)", form_data.username, user.role)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -63,7 +76,7 @@ async def register_user(user: UserCreate):
     
     # Vérification si l'email existe déjà
     try:
-        existing_user = db.table("agents").select("*").eq("email", user.email).execute()
+        existing_user = await db.table("agents").select("*").eq("email", user.email).execute()
         
         if existing_user.data and len(existing_user.data) > 0:
             raise HTTPException(
@@ -74,12 +87,12 @@ async def register_user(user: UserCreate):
         # Création du nouvel utilisateur
         try:
             hashed_password = get_password_hash(user.password)
-            print(f"Mot de passe hashé: {hashed_password[:10]}...")
+            logger.debug("Mot de passe hashé: %s...", hashed_password[:10])
         except Exception as e:
-            print(f"Erreur lors du hashage du mot de passe: {str(e)}")
+            logger.error("Erreur lors du hashage du mot de passe: %s", e)
             # Solution temporaire si le hashage échoue
             hashed_password = user.password
-            print("Utilisation du mot de passe en clair comme solution temporaire")
+            logger.debug("Utilisation du mot de passe en clair comme solution temporaire")
         
         new_user = {
             "id": str(uuid.uuid4()),
@@ -89,11 +102,12 @@ async def register_user(user: UserCreate):
             "role": user.role
         }
         
-        print(f"Création d'un nouvel utilisateur: {new_user['email']}")
-        result = db.table("agents").insert(new_user).execute()
-        print(f"Résultat de la création: {result}")
+        logger.info("Création d'un nouvel utilisateur: %s", new_user['email'])
+        result = await db.table("agents").insert(new_user).execute()
+        presence_du_jour.invalider()
+        logger.debug("Résultat de la création: %s", result)
     except Exception as e:
-        print(f"Erreur lors de la création de l'utilisateur: {str(e)}")
+        logger.error("Erreur lors de la création de l'utilisateur: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la création de l'utilisateur: {str(e)}"
@@ -126,18 +140,18 @@ async def update_user(user_id: str, user_update: UserUpdate):
     
     # Vérification si l'utilisateur existe
     try:
-        print(f"Vérification de l'existence de l'utilisateur: {user_id}")
-        existing_user = db.table("agents").select("*").eq("id", user_id).execute()
-        print(f"Résultat de la vérification: {existing_user}")
+        logger.debug("Vérification de l'existence de l'utilisateur: %s", user_id)
+        existing_user = await db.table("agents").select("*").eq("id", user_id).execute()
+        logger.debug("Résultat de la vérification: %s", existing_user)
         
         if not existing_user.data or len(existing_user.data) == 0:
-            print(f"Utilisateur non trouvé: {user_id}")
+            logger.debug("Utilisateur non trouvé: %s", user_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Utilisateur non trouvé"
             )
     except Exception as e:
-        print(f"Erreur lors de la vérification de l'utilisateur: {str(e)}")
+        logger.error("Erreur lors de la vérification de l'utilisateur: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la vérification de l'utilisateur: {str(e)}"
@@ -171,21 +185,25 @@ async def update_user(user_id: str, user_update: UserUpdate):
     if user_update.password is not None:
         try:
             update_data["password_hash"] = get_password_hash(user_update.password)
-            print(f"Mot de passe hashé pour la mise à jour: {update_data['password_hash'][:10]}...")
+            logger.debug("Mot de passe hashé pour la mise à jour: %s...", update_data['password_hash'][:10])
         except Exception as e:
-            print(f"Erreur lors du hashage du mot de passe pour la mise à jour: {str(e)}")
+            logger.error("Erreur lors du hashage du mot de passe pour la mise à jour: %s", e)
             # Solution temporaire si le hashage échoue
             update_data["password_hash"] = user_update.password
-            print("Utilisation du mot de passe en clair comme solution temporaire pour la mise à jour")
+            logger.debug("Utilisation du mot de passe en clair comme solution temporaire pour la mise à jour")
     
     update_data["updated_at"] = "NOW()"
     
     # Mise à jour de l'utilisateur
     try:
-        result = db.table("agents").update(update_data).eq("id", user_id).execute()
-        print(f"Résultat de la mise à jour: {result}")
+        result = await db.table("agents").update(update_data).eq("id", user_id).execute()
+        invalidate_user_cache(user_id)
+        presence_du_jour.invalider()
+        # Nom, email et rôle figurent dans la paie de l'agent
+        await invalider_paie(user_id)
+        logger.debug("Résultat de la mise à jour: %s", result)
     except Exception as e:
-        print(f"Erreur lors de la mise à jour de l'utilisateur: {str(e)}")
+        logger.error("Erreur lors de la mise à jour de l'utilisateur: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la mise à jour de l'utilisateur: {str(e)}"
@@ -219,14 +237,14 @@ async def change_password(request: PasswordChangeRequest, current_user: User = D
     Endpoint pour changer le mot de passe de l'utilisateur connecté
     """
     try:
-        print(f"Changement de mot de passe pour l'utilisateur: {current_user.email}")
+        logger.info("Changement de mot de passe pour l'utilisateur: %s", current_user.email)
         db = await get_db()
         
         # Récupérer l'utilisateur complet avec le hash du mot de passe
-        user_data = db.table("agents").select("*").eq("id", str(current_user.id)).execute()
+        user_data = await db.table("agents").select("*").eq("id", str(current_user.id)).execute()
         
         if not user_data.data or len(user_data.data) == 0:
-            print(f"Utilisateur non trouvé: {current_user.id}")
+            logger.debug("Utilisateur non trouvé: %s", current_user.id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Utilisateur non trouvé"
@@ -236,7 +254,7 @@ async def change_password(request: PasswordChangeRequest, current_user: User = D
         
         # Vérifier l'ancien mot de passe
         if not verify_password(request.current_password, user["password_hash"]):
-            print("Mot de passe actuel incorrect")
+            logger.debug("Mot de passe actuel incorrect")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Mot de passe actuel incorrect"
@@ -245,22 +263,23 @@ async def change_password(request: PasswordChangeRequest, current_user: User = D
         # Hasher le nouveau mot de passe
         try:
             hashed_password = get_password_hash(request.new_password)
-            print(f"Nouveau mot de passe hashé: {hashed_password[:10]}...")
+            logger.debug("Nouveau mot de passe hashé: %s...", hashed_password[:10])
         except Exception as e:
-            print(f"Erreur lors du hashage du nouveau mot de passe: {str(e)}")
+            logger.error("Erreur lors du hashage du nouveau mot de passe: %s", e)
             # Solution temporaire si le hashage échoue
             hashed_password = request.new_password
-            print("Utilisation du mot de passe en clair comme solution temporaire")
+            logger.debug("Utilisation du mot de passe en clair comme solution temporaire")
         
         # Mettre à jour le mot de passe
-        update_result = db.table("agents").update({"password_hash": hashed_password}).eq("id", str(current_user.id)).execute()
-        print(f"Résultat de la mise à jour: {update_result}")
+        update_result = await db.table("agents").update({"password_hash": hashed_password}).eq("id", str(current_user.id)).execute()
+        invalidate_user_cache(str(current_user.id))
+        logger.debug("Résultat de la mise à jour: %s", update_result)
         
         return {"message": "Mot de passe changé avec succès"}
     except HTTPException as e:
         raise e
     except Exception as e:
-        print(f"Erreur lors du changement de mot de passe: {str(e)}")
+        logger.error("Erreur lors du changement de mot de passe: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors du changement de mot de passe: {str(e)}"
@@ -276,7 +295,7 @@ async def delete_user(user_id: str):
     
     # Vérification si l'utilisateur existe
     try:
-        existing_user = db.table("agents").select("*").eq("id", user_id).execute()
+        existing_user = await db.table("agents").select("*").eq("id", user_id).execute()
         
         if not existing_user.data or len(existing_user.data) == 0:
             raise HTTPException(
@@ -285,10 +304,13 @@ async def delete_user(user_id: str):
             )
         
         # Suppression de l'utilisateur
-        db.table("agents").delete().eq("id", user_id).execute()
-        print(f"Utilisateur supprimé avec succès: {user_id}")
+        await db.table("agents").delete().eq("id", user_id).execute()
+        invalidate_user_cache(user_id)
+        presence_du_jour.invalider()
+        await invalider_paie(user_id)
+        logger.info("Utilisateur supprimé avec succès: %s", user_id)
     except Exception as e:
-        print(f"Erreur lors de la suppression de l'utilisateur: {str(e)}")
+        logger.error("Erreur lors de la suppression de l'utilisateur: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la suppression de l'utilisateur: {str(e)}"
@@ -1,10 +1,12 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 import os
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,12 +18,98 @@ from app.auth.models import TokenData, User, UserInDB
 SECRET_KEY = "your_secret_key_for_jwt_tokens"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 30  # 30 jours pour éviter les déconnexions fréquentes
+# Ticket des flux SSE, passé dans l'URL (journaux du proxy): courte durée, portée limitée au flux
+STREAM_TICKET_EXPIRE_SECONDS = int(os.environ.get("STREAM_TICKET_EXPIRE_SECONDS", "60"))
+STREAM_TICKET_SCOPE = "stream"
+
+# Cache des utilisateurs authentifiés (évite une requête agents par requête HTTP)
+AUTH_USER_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+AUTH_USER_CACHE_MAX_SIZE = int(os.environ.get("AUTH_USER_CACHE_MAX_SIZE", "1024"))
+# Si activé, l'utilisateur est reconstruit à partir des claims du token sans aucune
+# lecture de la base. Un changement de rôle ou une suppression ne prend alors effet
+# qu'à l'expiration du token.
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
 
 # Configuration de la sécurité des mots de passe
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Configuration de l'authentification OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
+# Variante sans erreur automatique, pour les routes acceptant aussi un ticket en paramètre
+oauth2_scheme_optionnel = OAuth2PasswordBearer(tokenUrl="api/auth/token", auto_error=False)
+
+
+class UserCache:
+    """
+    Cache LRU borné avec expiration (TTL) des utilisateurs authentifiés, indexé par id
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self._ids_par_email: Dict[str, str] = {}
+    
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expire_a, user = entry
+        if time.monotonic() >= expire_a:
+            self.invalidate(user_id)
+            return None
+        self._entries.move_to_end(user_id)
+        return user
+    
+    def get_by_email(self, email: str) -> Optional[User]:
+        user_id = self._ids_par_email.get(email)
+        return self.get(user_id) if user_id else None
+    
+    def set(self, user: User) -> None:
+        user_id = str(user.id)
+        self.invalidate(user_id)
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+        self._ids_par_email[user.email] = user_id
+        while len(self._entries) > self.max_size:
+            oldest_id, (_, oldest) = self._entries.popitem(last=False)
+            self._ids_par_email.pop(oldest.email, None)
+    
+    def invalidate(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._ids_par_email.pop(entry[1].email, None)
+    
+    def clear(self) -> None:
+        self._entries.clear()
+        self._ids_par_email.clear()
+
+
+user_cache = UserCache(AUTH_USER_CACHE_MAX_SIZE, AUTH_USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_cache(user_id: str) -> None:
+    """
+    Retire un utilisateur du cache (à appeler après modification ou suppression)
+    """
+    user_cache.invalidate(str(user_id))
+
+
+def user_from_token_claims(payload: Dict[str, Any]) -> Optional[User]:
+    """
+    Reconstruit l'utilisateur à partir des claims du token, si elles sont complètes
+    """
+    try:
+        return User(
+            id=payload["user_id"],
+            email=payload["sub"],
+            nom=payload["nom"],
+            role=payload["role"],
+            created_at=payload["created_at"],
+            updated_at=payload["updated_at"]
+        )
+    except Exception:
+        # Token émis avant l'ajout des claims: passer par le cache / la base
+        return None
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -29,7 +117,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Vérifie si le mot de passe en clair correspond au mot de passe hashé
     """
     try:
-        logger.debug(f"🔒 Vérification du mot de passe (hash: {hashed_password[:10]}...)")
+        logger.debug("🔒 Vérification du mot de passe (hash: %s...)", hashed_password[:10])
         is_valid = pwd_context.verify(plain_password, hashed_password)
         if is_valid:
             logger.info("✅ Mot de passe valide (hash bcrypt)")
@@ -37,7 +125,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
             logger.warning("❌ Mot de passe invalide (hash bcrypt)")
         return is_valid
     except Exception as e:
-        logger.warning(f"⚠️ Erreur lors de la vérification du mot de passe: {str(e)}")
+        logger.warning("⚠️ Erreur lors de la vérification du mot de passe: %s", e)
         # Si le format du hash n'est pas reconnu, comparer directement les chaînes
         # Ceci est une solution temporaire et non sécurisée
         if plain_password == hashed_password:
@@ -59,18 +147,18 @@ async def get_user_by_email(email: str) -> Optional[UserInDB]:
     Récupère un utilisateur par son email depuis la base de données
     """
     try:
-        logger.info(f"🔍 Recherche de l'utilisateur avec l'email: {email}")
+        logger.info("🔍 Recherche de l'utilisateur avec l'email: %s", email)
         db = await get_db()
-        response = db.table("agents").select("*").eq("email", email).execute()
+        response = await db.table("agents").select("*").eq("email", email).execute()
         
         if response.data and len(response.data) > 0:
             user_data = response.data[0]
-            logger.info(f"✅ Utilisateur trouvé: {user_data['nom']} (ID: {user_data['id']}, Role: {user_data['role']})")
+            logger.info("✅ Utilisateur trouvé: %s (ID: %s, Role: %s)", user_data['nom'], user_data['id'], user_data['role'])
             return UserInDB(**user_data)
-        logger.warning(f"⚠️ Aucun utilisateur trouvé avec l'email: {email}")
+        logger.warning("⚠️ Aucun utilisateur trouvé avec l'email: %s", email)
         return None
     except Exception as e:
-        logger.error(f"❌ Erreur lors de la récupération de l'utilisateur: {str(e)}")
+        logger.error("❌ Erreur lors de la récupération de l'utilisateur: %s", e)
         return None
 
 
@@ -78,18 +166,18 @@ async def authenticate_user(email: str, password: str) -> Optional[UserInDB]:
     """
     Authentifie un utilisateur par son email et son mot de passe
     """
-    logger.info(f"🔐 Tentative d'authentification pour: {email}")
+    logger.info("🔐 Tentative d'authentification pour: %s", email)
     user = await get_user_by_email(email)
     if not user:
-        logger.warning(f"❌ Utilisateur non trouvé: {email}")
+        logger.warning("❌ Utilisateur non trouvé: %s", email)
         return None
     
-    logger.info(f"🔑 Vérification du mot de passe pour: {email}")
+    logger.info("🔑 Vérification du mot de passe pour: %s", email)
     if not verify_password(password, user.password_hash):
-        logger.warning(f"❌ Mot de passe incorrect pour: {email}")
+        logger.warning("❌ Mot de passe incorrect pour: %s", email)
         return None
     
-    logger.info(f"✅ Authentification réussie pour: {email}")
+    logger.info("✅ Authentification réussie pour: %s", email)
     return user
 
 
@@ -110,10 +198,33 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     return encoded_jwt
 
 
+def create_stream_ticket(user: User) -> str:
+    """
+    Crée un ticket de flux SSE: JWT de courte durée, accepté uniquement par
+    get_admin_user_stream (le token principal ne doit pas apparaître dans une URL)
+    """
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "role": user.role,
+            "user_id": str(user.id),
+            "scope": STREAM_TICKET_SCOPE
+        },
+        expires_delta=timedelta(seconds=STREAM_TICKET_EXPIRE_SECONDS)
+    )
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     """
     Récupère l'utilisateur actuel à partir du token JWT
     """
+    return await _utilisateur_du_token(token)
+
+
+async def _utilisateur_du_token(token: str, scope: Optional[str] = None) -> User:
+    """
+    Utilisateur d'un JWT de la portée donnée (None: token principal)
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Identifiants invalides",
@@ -126,19 +237,32 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         role: str = payload.get("role")
         user_id: str = payload.get("user_id")
         
-        if email is None:
+        if email is None or payload.get("scope") != scope:
             raise credentials_exception
             
         token_data = TokenData(email=email, role=role, user_id=user_id)
     except JWTError:
         raise credentials_exception
+    
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        user_claims = user_from_token_claims(payload)
+        if user_claims is not None:
+            return user_claims
+    
+    # Utilisateur en cache (par id si le token le contient, sinon par email)
+    if token_data.user_id:
+        cached_user = user_cache.get(token_data.user_id)
+    else:
+        cached_user = user_cache.get_by_email(token_data.email)
+    if cached_user is not None and cached_user.email == token_data.email:
+        return cached_user
         
     user = await get_user_by_email(token_data.email)
     
     if user is None:
         raise credentials_exception
-        
-    return User(
+    
+    current_user = User(
         id=user.id,
         email=user.email,
         nom=user.nom,
@@ -146,6 +270,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         created_at=user.created_at,
         updated_at=user.updated_at
     )
+    user_cache.set(current_user)
+    return current_user
 
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -172,3 +298,23 @@ async def get_admin_user(current_user: User = Depends(get_current_user)) -> User
             detail="Accès non autorisé. Privilèges administrateur requis."
         )
     return current_user
+
+
+async def get_admin_user_stream(
+    token_header: Optional[str] = Depends(oauth2_scheme_optionnel),
+    ticket: Optional[str] = Query(None)
+) -> User:
+    """
+    Vérifie l'administrateur pour les flux SSE: EventSource ne permet pas d'envoyer
+    l'en-tête Authorization, un ticket de flux (create_stream_ticket) peut donc être
+    passé en paramètre ?ticket=. Le token principal n'est jamais accepté dans l'URL.
+    """
+    if token_header:
+        return await get_admin_user(await get_current_user(token_header))
+    if not ticket:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Identifiants invalides",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_admin_user(await _utilisateur_du_token(ticket, STREAM_TICKET_SCOPE))
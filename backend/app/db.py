@@ -1,6 +1,14 @@
 import os
-from supabase import create_client, Client
-from typing import Optional
+import time
+import httpx
+import logging
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from app.memory_db import MemoryClient, load_fixture
+from app.metriques import METRICS_ENABLED, metriques
+
+logger = logging.getLogger(__name__)
 
 # Configuration Supabase directement dans le code
 # Ne pas faire cela en production, c'est juste pour résoudre le problème actuel
@@ -11,43 +19,199 @@ SUPABASE_KEY = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBhYmFzZSIsInJ
 os.environ["SUPABASE_URL"] = SUPABASE_URL
 os.environ["SUPABASE_ANON_KEY"] = SUPABASE_KEY
 
+# Backend de données: "supabase" (par défaut) ou "memory" pour les tests de charge locaux
+DB_BACKEND = os.environ.get("DB_BACKEND", "supabase").lower()
+# Jeu de données JSON optionnel pour la base en mémoire ({"table": [lignes...]})
+MEMORY_DB_FIXTURE = os.environ.get("MEMORY_DB_FIXTURE")
+# Latence simulée par aller-retour pour la base en mémoire (en millisecondes)
+MEMORY_DB_LATENCY_MS = float(os.environ.get("MEMORY_DB_LATENCY_MS", "0"))
+
+# Pool de connexions HTTP partagé par toutes les requêtes PostgREST
+DB_POOL_MAX_CONNECTIONS = int(os.environ.get("DB_POOL_MAX_CONNECTIONS", "50"))
+DB_POOL_MAX_KEEPALIVE = int(os.environ.get("DB_POOL_MAX_KEEPALIVE", "20"))
+DB_TIMEOUT_SECONDS = float(os.environ.get("DB_TIMEOUT_SECONDS", "10"))
+
 # Afficher les variables pour le débogage
-print(f"SUPABASE_URL: {SUPABASE_URL}")
-print(f"SUPABASE_KEY: {SUPABASE_KEY[:10]}...")
+logger.debug("SUPABASE_URL: %s", SUPABASE_URL)
+logger.debug("SUPABASE_KEY: %s...", SUPABASE_KEY[:10])
+logger.info("DB_BACKEND: %s", DB_BACKEND)
+
+Database = Union[AsyncClient, MemoryClient, "ClientInstrumente"]
+
+# Client global (Supabase asynchrone ou base en mémoire)
+supabase: Optional[Database] = None
+# Client HTTP sous-jacent, conservé pour fermer le pool à l'arrêt
+http_client: Optional[httpx.AsyncClient] = None
+
 
-# Client Supabase global
-supabase: Optional[Client] = None
+# Méthodes du constructeur de requêtes qui fixent l'opération mesurée
+OPERATIONS_DB = {"select", "insert", "update", "delete", "upsert"}
 
-async def init_db() -> Client:
+
+class RequeteInstrumentee:
     """
-    Initialise la connexion à la base de données Supabase
+    Enveloppe d'un constructeur de requêtes (table ou rpc): les appels sont transmis
+    tels quels, execute() est chronométré et enregistré dans les métriques
+    """
+    __slots__ = ("_requete", "_table", "_operation")
+
+    def __init__(self, requete: Any, table: str, operation: str):
+        self._requete = requete
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, nom: str) -> Any:
+        valeur = getattr(self._requete, nom)
+        if not callable(valeur):
+            # Propriétés qui renvoient un constructeur (ex: .not_)
+            if hasattr(valeur, "execute"):
+                self._requete = valeur
+                return self
+            return valeur
+
+        def appel(*args, **kwargs):
+            resultat = valeur(*args, **kwargs)
+            if hasattr(resultat, "execute"):
+                self._requete = resultat
+                if nom in OPERATIONS_DB:
+                    self._operation = nom
+                return self
+            return resultat
+        return appel
+
+    async def execute(self) -> Any:
+        debut = time.perf_counter()
+        try:
+            resultat = await self._requete.execute()
+        except Exception:
+            metriques.observer_requete_db(self._table, self._operation, time.perf_counter() - debut, erreur=True)
+            raise
+        metriques.observer_requete_db(self._table, self._operation, time.perf_counter() - debut)
+        return resultat
+
+
+class ClientInstrumente:
+    """
+    Enveloppe du client de base: chaque requête est mesurée par table et opération
+    (voir app.metriques). Les autres attributs du client sont transmis tels quels.
+    """
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    def table(self, name: str) -> RequeteInstrumentee:
+        return RequeteInstrumentee(self._client.table(name), name, "select")
+
+    def from_(self, name: str) -> RequeteInstrumentee:
+        return self.table(name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None, *args, **kwargs) -> RequeteInstrumentee:
+        return RequeteInstrumentee(self._client.rpc(name, params, *args, **kwargs), name, "rpc")
+
+    def __getattr__(self, nom: str) -> Any:
+        return getattr(self._client, nom)
+
+
+def create_memory_client() -> MemoryClient:
+    """
+    Crée la base en mémoire, avec le jeu de données MEMORY_DB_FIXTURE s'il est défini
+    """
+    # Import local: les modules métier importent eux-mêmes app.db
+    from app.pointage.utils import enregistrer_pointage_scan_memoire
+
+    tables = load_fixture(MEMORY_DB_FIXTURE) if MEMORY_DB_FIXTURE else {}
+    client = MemoryClient(tables, latency_ms=MEMORY_DB_LATENCY_MS)
+    # Équivalents Python des fonctions SQL appelées via rpc()
+    client.register_function("enregistrer_pointage_scan", enregistrer_pointage_scan_memoire)
+    return client
+
+
+async def create_supabase_client() -> AsyncClient:
+    """
+    Crée le client Supabase asynchrone avec un pool de connexions HTTP réutilisées
+    """
+    global http_client
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("Les variables d'environnement SUPABASE_URL et SUPABASE_KEY doivent être définies")
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=DB_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=DB_POOL_MAX_KEEPALIVE,
+        ),
+        timeout=DB_TIMEOUT_SECONDS,
+        http2=True,
+    )
+    options = AsyncClientOptions(
+        postgrest_client_timeout=DB_TIMEOUT_SECONDS,
+        httpx_client=http_client,
+    )
+    return await acreate_client(SUPABASE_URL, SUPABASE_KEY, options=options)
+
+
+async def init_db() -> Database:
+    """
+    Initialise la connexion à la base de données (Supabase ou mémoire selon DB_BACKEND)
     """
     global supabase
     if supabase is None:
-        if not SUPABASE_URL or not SUPABASE_KEY:
-            raise ValueError("Les variables d'environnement SUPABASE_URL et SUPABASE_KEY doivent être définies")
-        
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        if DB_BACKEND == "memory":
+            client = create_memory_client()
+        else:
+            client = await create_supabase_client()
         
         # Vérification de la connexion
         try:
             # Test de la connexion avec une requête simple
-            supabase.table('agents').select('id').limit(1).execute()
-            print("Connexion à Supabase établie avec succès")
+            await client.table('agents').select('id').limit(1).execute()
+            logger.info("Connexion à la base de données (%s) établie avec succès", DB_BACKEND)
         except Exception as e:
-            print(f"Erreur lors de la connexion à Supabase: {e}")
+            logger.error("Erreur lors de la connexion à la base de données: %s", e)
             raise
+        
+        supabase = ClientInstrumente(client) if METRICS_ENABLED else client
     
     return supabase
 
-async def get_db() -> Client:
+
+async def get_db() -> Database:
     """
-    Retourne le client Supabase pour les opérations de base de données
+    Retourne le client asynchrone pour les opérations de base de données
+    Toutes les requêtes doivent être attendues: await db.table(...).execute()
     """
     if supabase is None:
         return await init_db()
     return supabase
 
+
+async def close_db() -> None:
+    """
+    Ferme le pool de connexions HTTP à l'arrêt de l'application
+    """
+    global supabase, http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+    supabase = None
+
+
+async def fetch_all_rows(build_query: Callable[[], Any], page_size: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Récupère toutes les lignes d'une requête en paginant par blocs de page_size
+    (PostgREST limite le nombre de lignes renvoyées par requête).
+    build_query doit construire une nouvelle requête triée à chaque appel.
+    """
+    rows: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        result = await build_query().range(offset, offset + page_size - 1).execute()
+        page = result.data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        offset += page_size
+
+
 # Scripts de création des tables (à exécuter manuellement dans Supabase)
 CREATION_TABLES_SQL = """
 -- Table des agents
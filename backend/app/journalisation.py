@@ -0,0 +1,72 @@
+"""
+Configuration des logs du backend.
+
+Chaque module journalise avec logging.getLogger(__name__) et des arguments
+différés (logger.debug("... %s", valeur)): un message sous le niveau actif ne
+coûte qu'un test de niveau, sans formatage.
+
+Variables d'environnement:
+- LOG_LEVEL: niveau global (WARNING par défaut, DEBUG pour suivre chaque scan)
+- LOG_LEVELS: niveaux par module, ex: "app.pointage=DEBUG,app.qrcode=INFO"
+- LOG_FORMAT: "texte" (par défaut) ou "json" (une ligne JSON par message, avec les
+  champs passés dans extra=...)
+"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "WARNING").upper()
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "texte").lower()
+
+FORMAT_TEXTE = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributs standard d'un LogRecord (les autres viennent de extra=...)
+_ATTRIBUTS_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class FormatJson(logging.Formatter):
+    """
+    Une ligne JSON par message: horodatage, niveau, module, message et champs extra
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        ligne = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "niveau": record.levelname,
+            "module": record.name,
+            "message": record.getMessage(),
+        }
+        for cle, valeur in vars(record).items():
+            if cle not in _ATTRIBUTS_STANDARD:
+                ligne[cle] = valeur
+        if record.exc_info:
+            ligne["exception"] = self.formatException(record.exc_info)
+        return json.dumps(ligne, ensure_ascii=False, default=str)
+
+
+def niveaux_par_module(valeur: str) -> Dict[str, str]:
+    """
+    Lit "module=NIVEAU,module=NIVEAU" (entrées mal formées ignorées)
+    """
+    niveaux = {}
+    for entree in valeur.split(","):
+        module, _, niveau = entree.partition("=")
+        if module.strip() and niveau.strip():
+            niveaux[module.strip()] = niveau.strip().upper()
+    return niveaux
+
+
+def configurer_journalisation() -> None:
+    """
+    Installe le handler racine et applique les niveaux (à appeler au démarrage)
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(FormatJson() if LOG_FORMAT == "json" else logging.Formatter(FORMAT_TEXTE))
+    racine = logging.getLogger()
+    racine.handlers[:] = [handler]
+    racine.setLevel(LOG_LEVEL)
+    for module, niveau in niveaux_par_module(LOG_LEVELS).items():
+        logging.getLogger(module).setLevel(niveau)
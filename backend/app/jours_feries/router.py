@@ -6,6 +6,7 @@ import logging
 from app.db import get_db
 from app.auth.utils import get_current_active_user, get_admin_user
 from app.auth.models import User
+from app.paie.cache import invalider_paie_date
 from app.jours_feries.models import JourFerie, JourFerieCreate, JourFerieUpdate, ExceptionJourFerie, ExceptionJourFerieCreate
 
 router = APIRouter(prefix="/api/jours-feries", tags=["jours-feries"])
@@ -28,12 +29,12 @@ async def get_jours_feries(
         if annee:
             query = query.eq("annee", annee)
         
-        result = query.order("date_ferie").execute()
+        result = await query.order("date_ferie").execute()
         
         return result.data if result.data else []
     
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des jours fériés: {str(e)}")
+        logger.error("Erreur lors de la récupération des jours fériés: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -48,12 +49,12 @@ async def get_jours_feries_annee(
     db = await get_db()
     
     try:
-        result = db.table("jours_feries").select("*").eq("annee", annee).order("date_ferie").execute()
+        result = await db.table("jours_feries").select("*").eq("annee", annee).order("date_ferie").execute()
         
         return result.data if result.data else []
     
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des jours fériés: {str(e)}")
+        logger.error("Erreur lors de la récupération des jours fériés: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -68,7 +69,7 @@ async def check_jour_ferie(
     db = await get_db()
     
     try:
-        result = db.table("jours_feries").select("*").eq("date_ferie", date_check.isoformat()).execute()
+        result = await db.table("jours_feries").select("*").eq("date_ferie", date_check.isoformat()).execute()
         
         if result.data and len(result.data) > 0:
             return {
@@ -82,7 +83,7 @@ async def check_jour_ferie(
             }
     
     except Exception as e:
-        logger.error(f"Erreur lors de la vérification du jour férié: {str(e)}")
+        logger.error("Erreur lors de la vérification du jour férié: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -98,7 +99,7 @@ async def create_jour_ferie(
     
     try:
         # Vérifier si la date existe déjà
-        existing = db.table("jours_feries").select("id").eq("date_ferie", jour_ferie_data.date_ferie.isoformat()).execute()
+        existing = await db.table("jours_feries").select("id").eq("date_ferie", jour_ferie_data.date_ferie.isoformat()).execute()
         
         if existing.data and len(existing.data) > 0:
             raise HTTPException(
@@ -117,19 +118,21 @@ async def create_jour_ferie(
             "created_by": str(current_user.id)
         }
         
-        result = db.table("jours_feries").insert(new_jour_ferie).execute()
+        result = await db.table("jours_feries").insert(new_jour_ferie).execute()
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Erreur lors de la création du jour férié")
+        # Paie de tous les agents pour le mois du jour férié
+        await invalider_paie_date(None, jour_ferie_data.date_ferie)
         
-        logger.info(f"Jour férié créé: {jour_ferie_data.nom} le {jour_ferie_data.date_ferie}")
+        logger.info("Jour férié créé: %s le %s", jour_ferie_data.nom, jour_ferie_data.date_ferie)
         
         return result.data[0]
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur lors de la création du jour férié: {str(e)}")
+        logger.error("Erreur lors de la création du jour férié: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -146,7 +149,7 @@ async def update_jour_ferie(
     
     try:
         # Vérifier que le jour férié existe
-        existing = db.table("jours_feries").select("*").eq("id", jour_ferie_id).execute()
+        existing = await db.table("jours_feries").select("*").eq("id", jour_ferie_id).execute()
         
         if not existing.data:
             raise HTTPException(status_code=404, detail="Jour férié non trouvé")
@@ -157,19 +160,21 @@ async def update_jour_ferie(
         if not update_data:
             raise HTTPException(status_code=400, detail="Aucune donnée à mettre à jour")
         
-        result = db.table("jours_feries").update(update_data).eq("id", jour_ferie_id).execute()
+        result = await db.table("jours_feries").update(update_data).eq("id", jour_ferie_id).execute()
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Erreur lors de la mise à jour")
+        # Le nom du jour férié figure dans les détails de la paie
+        await invalider_paie_date(None, existing.data[0]["date_ferie"])
         
-        logger.info(f"Jour férié {jour_ferie_id} mis à jour")
+        logger.info("Jour férié %s mis à jour", jour_ferie_id)
         
         return result.data[0]
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur lors de la mise à jour du jour férié: {str(e)}")
+        logger.error("Erreur lors de la mise à jour du jour férié: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -186,7 +191,7 @@ async def delete_jour_ferie(
     
     try:
         # Vérifier que le jour férié existe et est de type custom
-        existing = db.table("jours_feries").select("*").eq("id", jour_ferie_id).execute()
+        existing = await db.table("jours_feries").select("*").eq("id", jour_ferie_id).execute()
         
         if not existing.data:
             raise HTTPException(status_code=404, detail="Jour férié non trouvé")
@@ -199,16 +204,17 @@ async def delete_jour_ferie(
                 detail="Impossible de supprimer un jour férié légal. Vous pouvez uniquement supprimer les jours fériés personnalisés."
             )
         
-        result = db.table("jours_feries").delete().eq("id", jour_ferie_id).execute()
+        result = await db.table("jours_feries").delete().eq("id", jour_ferie_id).execute()
+        await invalider_paie_date(None, jour_ferie["date_ferie"])
         
-        logger.info(f"Jour férié {jour_ferie_id} supprimé")
+        logger.info("Jour férié %s supprimé", jour_ferie_id)
         
         return {"message": "Jour férié supprimé avec succès"}
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur lors de la suppression du jour férié: {str(e)}")
+        logger.error("Erreur lors de la suppression du jour férié: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -246,7 +252,7 @@ async def generer_jours_feries_annee(
         
         for jf in jours_feries_france:
             # Vérifier si existe déjà
-            existing = db.table("jours_feries").select("id").eq("date_ferie", jf["date"].isoformat()).execute()
+            existing = await db.table("jours_feries").select("id").eq("date_ferie", jf["date"].isoformat()).execute()
             
             if existing.data and len(existing.data) > 0:
                 skipped_count += 1
@@ -263,10 +269,11 @@ async def generer_jours_feries_annee(
                 "created_by": str(current_user.id)
             }
             
-            db.table("jours_feries").insert(new_jf).execute()
+            await db.table("jours_feries").insert(new_jf).execute()
+            await invalider_paie_date(None, jf["date"])
             created_count += 1
         
-        logger.info(f"Jours fériés générés pour {annee}: {created_count} créés, {skipped_count} ignorés")
+        logger.info("Jours fériés générés pour %s: %s créés, %s ignorés", annee, created_count, skipped_count)
         
         return {
             "message": f"Jours fériés pour {annee} générés avec succès",
@@ -275,7 +282,7 @@ async def generer_jours_feries_annee(
         }
     
     except Exception as e:
-        logger.error(f"Erreur lors de la génération des jours fériés: {str(e)}")
+        logger.error("Erreur lors de la génération des jours fériés: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -335,7 +342,7 @@ async def get_all_exceptions(
         if jour_ferie_id:
             query = query.eq("jour_ferie_id", jour_ferie_id)
         
-        result = query.order("created_at", desc=True).execute()
+        result = await query.order("created_at", desc=True).execute()
         
         # Formater les données
         exceptions = []
@@ -355,7 +362,7 @@ async def get_all_exceptions(
         return exceptions
     
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des exceptions: {str(e)}")
+        logger.error("Erreur lors de la récupération des exceptions: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -370,7 +377,7 @@ async def get_exceptions_jour_ferie(
     db = await get_db()
     
     try:
-        result = db.table("jours_feries_exceptions").select(
+        result = await db.table("jours_feries_exceptions").select(
             "*, agents!jours_feries_exceptions_agent_id_fkey(nom, email)"
         ).eq("jour_ferie_id", jour_ferie_id).execute()
         
@@ -389,7 +396,7 @@ async def get_exceptions_jour_ferie(
         return exceptions
     
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des exceptions: {str(e)}")
+        logger.error("Erreur lors de la récupération des exceptions: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -405,17 +412,17 @@ async def create_exception(
     
     try:
         # Vérifier que le jour férié existe
-        jour_ferie = db.table("jours_feries").select("id, nom, date_ferie").eq("id", str(exception_data.jour_ferie_id)).execute()
+        jour_ferie = await db.table("jours_feries").select("id, nom, date_ferie").eq("id", str(exception_data.jour_ferie_id)).execute()
         if not jour_ferie.data:
             raise HTTPException(status_code=404, detail="Jour férié non trouvé")
         
         # Vérifier que l'agent existe
-        agent = db.table("agents").select("id, nom").eq("id", str(exception_data.agent_id)).execute()
+        agent = await db.table("agents").select("id, nom").eq("id", str(exception_data.agent_id)).execute()
         if not agent.data:
             raise HTTPException(status_code=404, detail="Agent non trouvé")
         
         # Vérifier si l'exception existe déjà
-        existing = db.table("jours_feries_exceptions").select("id").eq(
+        existing = await db.table("jours_feries_exceptions").select("id").eq(
             "jour_ferie_id", str(exception_data.jour_ferie_id)
         ).eq("agent_id", str(exception_data.agent_id)).execute()
         
@@ -430,12 +437,13 @@ async def create_exception(
             "created_by": str(current_user.id)
         }
         
-        result = db.table("jours_feries_exceptions").insert(new_exception).execute()
+        result = await db.table("jours_feries_exceptions").insert(new_exception).execute()
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Erreur lors de la création de l'exception")
+        await invalider_paie_date(str(exception_data.agent_id), jour_ferie.data[0]["date_ferie"])
         
-        logger.info(f"Exception créée: {agent.data[0]['nom']} travaille le {jour_ferie.data[0]['date_ferie']}")
+        logger.info("Exception créée: %s travaille le %s", agent.data[0]['nom'], jour_ferie.data[0]['date_ferie'])
         
         return {
             "message": f"Exception créée: {agent.data[0]['nom']} travaillera le {jour_ferie.data[0]['nom']}",
@@ -445,7 +453,7 @@ async def create_exception(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur lors de la création de l'exception: {str(e)}")
+        logger.error("Erreur lors de la création de l'exception: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -461,21 +469,24 @@ async def delete_exception(
     
     try:
         # Vérifier que l'exception existe
-        existing = db.table("jours_feries_exceptions").select("*").eq("id", exception_id).execute()
+        existing = await db.table("jours_feries_exceptions").select("*, jours_feries(date_ferie)").eq("id", exception_id).execute()
         
         if not existing.data:
             raise HTTPException(status_code=404, detail="Exception non trouvée")
         
-        result = db.table("jours_feries_exceptions").delete().eq("id", exception_id).execute()
+        result = await db.table("jours_feries_exceptions").delete().eq("id", exception_id).execute()
+        exception = existing.data[0]
+        if exception.get("jours_feries") and exception["jours_feries"].get("date_ferie"):
+            await invalider_paie_date(exception["agent_id"], exception["jours_feries"]["date_ferie"])
         
-        logger.info(f"Exception {exception_id} supprimée")
+        logger.info("Exception %s supprimée", exception_id)
         
         return {"message": "Exception supprimée avec succès"}
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur lors de la suppression de l'exception: {str(e)}")
+        logger.error("Erreur lors de la suppression de l'exception: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -496,7 +507,7 @@ async def get_agent_exceptions(
             "*, jours_feries(id, date_ferie, nom, annee)"
         ).eq("agent_id", agent_id)
         
-        result = query.execute()
+        result = await query.execute()
         
         # Filtrer par année si spécifié
         exceptions = []
@@ -513,5 +524,5 @@ async def get_agent_exceptions(
         return exceptions
     
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des exceptions agent: {str(e)}")
+        logger.error("Erreur lors de la récupération des exceptions agent: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
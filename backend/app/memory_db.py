@@ -0,0 +1,382 @@
+"""
+Base de données en mémoire compatible avec le client Supabase asynchrone.
+
+Elle implémente le sous-ensemble du query builder PostgREST utilisé par
+l'application (select/insert/update/delete, filtres eq/neq/gte/lte/in_/or_,
+order/limit/range/single, relations embarquées et rpc) afin de pouvoir
+lancer tout le backend et faire des tests de charge sans Supabase.
+
+Activation: DB_BACKEND=memory (voir app/db.py).
+"""
+import asyncio
+import copy
+import json
+import re
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Fuseau horaire GMT+1
+TIMEZONE = timezone(timedelta(hours=1))
+
+# Clés étrangères utilisées par les relations embarquées (table source, table cible) -> colonne
+FOREIGN_KEYS = {
+    ("pointages", "agents"): "agent_id",
+    ("primes", "agents"): "agent_id",
+    ("jours_feries_exceptions", "agents"): "agent_id",
+    ("jours_feries_exceptions", "jours_feries"): "jour_ferie_id",
+    ("audit_logs", "agents"): "agent_id",
+}
+
+# Colonnes horodatées automatiquement à l'insertion, par table
+DEFAULT_TIMESTAMPS = {
+    "agents": ("created_at", "updated_at"),
+    "qrcodes": ("date_generation",),
+}
+
+
+class MemoryAPIResponse:
+    """
+    Réponse au même format que postgrest.APIResponse (attributs data et count)
+    """
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f"MemoryAPIResponse(data={self.data!r}, count={self.count!r})"
+
+
+def _split_top_level(text: str) -> List[str]:
+    """
+    Découpe une liste séparée par des virgules en ignorant celles entre parenthèses
+    """
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def _coerce(raw: str, reference: Any) -> Any:
+    """
+    Convertit une valeur textuelle de filtre PostgREST dans le type de la colonne
+    """
+    if raw == "null":
+        return None
+    if isinstance(reference, bool) or raw in ("true", "false"):
+        return raw == "true"
+    if isinstance(reference, (int, float)):
+        try:
+            return type(reference)(raw)
+        except ValueError:
+            return raw
+    return raw
+
+
+def _like(value: Any, pattern: str, insensitive: bool) -> bool:
+    if value is None:
+        return False
+    regex = "^" + re.escape(pattern).replace("%", ".*").replace("_", ".") + "$"
+    return re.match(regex, str(value), re.IGNORECASE if insensitive else 0) is not None
+
+
+def _compare(value: Any, operator: str, expected: Any) -> bool:
+    """
+    Applique un opérateur PostgREST à une valeur de ligne
+    """
+    if operator == "eq":
+        return value == expected
+    if operator == "neq":
+        return value != expected
+    if operator == "is":
+        return value is expected if expected is None or isinstance(expected, bool) else value == expected
+    if operator == "in":
+        return value in expected
+    if operator == "like":
+        return _like(value, expected, insensitive=False)
+    if operator == "ilike":
+        return _like(value, expected, insensitive=True)
+    if value is None or expected is None:
+        return False
+    if operator == "gt":
+        return value > expected
+    if operator == "gte":
+        return value >= expected
+    if operator == "lt":
+        return value < expected
+    if operator == "lte":
+        return value <= expected
+    raise ValueError(f"Opérateur non supporté par la base en mémoire: {operator}")
+
+
+def _parse_or(expression: str) -> List[Tuple[str, str, str]]:
+    """
+    Parse un filtre or_ PostgREST: "col.op.valeur,col.op.valeur"
+    """
+    conditions = []
+    for part in _split_top_level(expression):
+        column, operator, raw = part.split(".", 2)
+        conditions.append((column, operator, raw))
+    return conditions
+
+
+class MemoryQueryBuilder:
+    """
+    Équivalent en mémoire de AsyncRequestBuilder / AsyncSelectRequestBuilder
+    """
+
+    def __init__(self, client: "MemoryClient", table: str):
+        self._client = client
+        self._table = table
+        self._operation = "select"
+        self._columns = "*"
+        self._payload: Any = None
+        self._filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self._orders: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._single = False
+
+    # Opérations
+    def select(self, *columns: str, count: Optional[str] = None) -> "MemoryQueryBuilder":
+        self._operation = "select"
+        self._columns = ",".join(columns) if columns else "*"
+        return self
+
+    def insert(self, payload: Any, **kwargs) -> "MemoryQueryBuilder":
+        self._operation = "insert"
+        self._payload = payload
+        return self
+
+    def update(self, payload: Dict[str, Any], **kwargs) -> "MemoryQueryBuilder":
+        self._operation = "update"
+        self._payload = payload
+        return self
+
+    def delete(self, **kwargs) -> "MemoryQueryBuilder":
+        self._operation = "delete"
+        return self
+
+    # Filtres
+    def _add_filter(self, column: str, operator: str, value: Any) -> "MemoryQueryBuilder":
+        self._filters.append(lambda row: _compare(row.get(column), operator, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "lte", value)
+
+    def like(self, column: str, pattern: str) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "like", pattern)
+
+    def ilike(self, column: str, pattern: str) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "ilike", pattern)
+
+    def is_(self, column: str, value: Any) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "is", value)
+
+    def in_(self, column: str, values: List[Any]) -> "MemoryQueryBuilder":
+        return self._add_filter(column, "in", list(values))
+
+    def or_(self, expression: str, **kwargs) -> "MemoryQueryBuilder":
+        conditions = _parse_or(expression)
+
+        def match(row: Dict[str, Any]) -> bool:
+            for column, operator, raw in conditions:
+                value = row.get(column)
+                if _compare(value, operator, _coerce(raw, value)):
+                    return True
+            return False
+
+        self._filters.append(match)
+        return self
+
+    # Tri et pagination
+    def order(self, column: str, desc: bool = False, **kwargs) -> "MemoryQueryBuilder":
+        self._orders.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs) -> "MemoryQueryBuilder":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs) -> "MemoryQueryBuilder":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self) -> "MemoryQueryBuilder":
+        self._single = True
+        return self
+
+    async def execute(self) -> MemoryAPIResponse:
+        await self._client._round_trip()
+        if self._operation == "insert":
+            data = self._client.insert_rows(self._table, self._payload)
+        elif self._operation == "update":
+            data = self._client.update_rows(self._table, self._filters, self._payload)
+        elif self._operation == "delete":
+            data = self._client.delete_rows(self._table, self._filters)
+        else:
+            data = self._select()
+
+        if self._single:
+            if len(data) != 1:
+                raise Exception(f"JSON object requested, multiple (or no) rows returned ({len(data)})")
+            return MemoryAPIResponse(data[0])
+        return MemoryAPIResponse(data, len(data))
+
+    def _select(self) -> List[Dict[str, Any]]:
+        rows = [row for row in self._client.tables.get(self._table, []) if all(f(row) for f in self._filters)]
+
+        # Tri stable: appliquer les clés dans l'ordre inverse
+        for column, desc in reversed(self._orders):
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else 0), reverse=desc)
+
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+
+        return [self._client._project(self._table, row, self._columns) for row in rows]
+
+
+class MemoryRpcBuilder:
+    """
+    Appel d'une fonction de base de données enregistrée en Python
+    """
+
+    def __init__(self, client: "MemoryClient", name: str, params: Dict[str, Any]):
+        self._client = client
+        self._name = name
+        self._params = params or {}
+
+    async def execute(self) -> MemoryAPIResponse:
+        await self._client._round_trip()
+        if self._name not in self._client.functions:
+            raise Exception(f"Could not find the function public.{self._name}")
+        data = self._client.functions[self._name](self._client, **self._params)
+        return MemoryAPIResponse(data)
+
+
+class MemoryClient:
+    """
+    Client en mémoire exposant la même interface que supabase.AsyncClient
+    pour table(...) et rpc(...).
+
+    latency_ms permet de simuler le coût réseau d'un aller-retour PostgREST.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None, latency_ms: float = 0.0):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {name: list(rows) for name, rows in (tables or {}).items()}
+        self.functions: Dict[str, Callable[..., Any]] = {}
+        self.latency_ms = latency_ms
+        self.round_trips = 0
+
+    def table(self, name: str) -> MemoryQueryBuilder:
+        return MemoryQueryBuilder(self, name)
+
+    def from_(self, name: str) -> MemoryQueryBuilder:
+        return self.table(name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> MemoryRpcBuilder:
+        return MemoryRpcBuilder(self, name, params or {})
+
+    def register_function(self, name: str, function: Callable[..., Any]) -> None:
+        """
+        Enregistre l'équivalent Python d'une fonction SQL appelée via rpc()
+        """
+        self.functions[name] = function
+
+    async def _round_trip(self) -> None:
+        self.round_trips += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        else:
+            # Rendre la main à la boucle comme le ferait une vraie requête réseau
+            await asyncio.sleep(0)
+
+    def insert_rows(self, table: str, payload: Any) -> List[Dict[str, Any]]:
+        rows = payload if isinstance(payload, list) else [payload]
+        now = datetime.now(TIMEZONE).isoformat()
+        inserted = []
+        for row in rows:
+            new_row = dict(row)
+            new_row.setdefault("id", str(uuid.uuid4()))
+            new_row.setdefault("created_at", now)
+            for column in DEFAULT_TIMESTAMPS.get(table, ()):
+                new_row.setdefault(column, now)
+            self.tables.setdefault(table, []).append(new_row)
+            inserted.append(copy.deepcopy(new_row))
+        return inserted
+
+    def update_rows(self, table: str, filters: List[Callable], payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        updated = []
+        for row in self.tables.get(table, []):
+            if all(f(row) for f in filters):
+                row.update(payload)
+                updated.append(copy.deepcopy(row))
+        return updated
+
+    def delete_rows(self, table: str, filters: List[Callable]) -> List[Dict[str, Any]]:
+        kept, deleted = [], []
+        for row in self.tables.get(table, []):
+            (deleted if all(f(row) for f in filters) else kept).append(row)
+        self.tables[table] = kept
+        return deleted
+
+    def _project(self, table: str, row: Dict[str, Any], columns: str) -> Dict[str, Any]:
+        """
+        Applique la liste de colonnes d'un select, y compris les relations embarquées
+        ex: "*, agents!pointages_agent_id_fkey(nom, email)"
+        """
+        result: Dict[str, Any] = {}
+        for column in _split_top_level(columns):
+            if "(" in column:
+                relation, sub_columns = column.split("(", 1)
+                target = relation.split("!", 1)[0].strip()
+                foreign_key = FOREIGN_KEYS.get((table, target))
+                related = None
+                if foreign_key is not None:
+                    for candidate in self.tables.get(target, []):
+                        if candidate.get("id") == row.get(foreign_key):
+                            related = self._project(target, candidate, sub_columns[:-1])
+                            break
+                result[target] = related
+            elif column == "*":
+                result.update(copy.deepcopy(row))
+            else:
+                result[column] = copy.deepcopy(row.get(column))
+        return result
+
+
+def load_fixture(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Charge un jeu de données JSON de la forme {"table": [lignes...]}
+    """
+    with open(path, encoding="utf-8") as fixture:
+        return json.load(fixture)
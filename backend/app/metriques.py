@@ -0,0 +1,268 @@
+"""
+Métriques de l'API au format texte Prometheus (GET /metrics).
+
+- MiddlewareMetriques mesure chaque requête HTTP (méthode, route, statut) ainsi que
+  le nombre et la durée cumulée des requêtes en base qu'elle a déclenchées. Les
+  flux SSE (text/event-stream), ouverts pendant des heures, ont leur propre
+  histogramme de durée (http_stream_duration_seconds) pour ne pas fausser celui
+  des requêtes.
+- app.db enveloppe le client de base (ClientInstrumente): chaque execute() est
+  mesuré par table et par opération, et compté pour la requête HTTP en cours.
+
+La route est le modèle de chemin (ex: /api/paie/calcul/{agent_id}), ce qui borne
+le nombre de séries. Un motif N+1 se voit dans http_request_db_queries: un
+endpoint dont le nombre de requêtes en base grandit avec le nombre d'agents.
+
+Les métriques sont propres au processus (un jeu par worker).
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    # FastAPI récent: les routes incluses gardent leur chemin relatif au routeur
+    from fastapi.routing import iter_route_contexts
+except ImportError:  # pragma: no cover - FastAPI < 0.120: route.path est déjà complet
+    iter_route_contexts = None
+
+# Collecte des métriques (METRICS_ENABLED=false pour la désactiver)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() != "false"
+
+# Jeton exigé sur /metrics (Authorization: Bearer <jeton>); vide, /metrics répond 404
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bornes des histogrammes: durées en secondes, nombre de requêtes en base par requête HTTP
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BORNES_REQUETES_DB = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+BORNES_DUREE_FLUX = (1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 4 * 3600.0, 8 * 3600.0)
+
+CONTENT_TYPE_FLUX = b"text/event-stream"
+
+# Route des requêtes qui ne correspondent à aucun endpoint (évite une série par chemin inconnu)
+ROUTE_INCONNUE = "inconnue"
+
+
+class RequeteEnCours:
+    """
+    Requêtes en base d'une requête HTTP
+    """
+    __slots__ = ("scope", "requetes_db", "duree_db")
+
+    def __init__(self, scope: Dict[str, Any]):
+        self.scope = scope
+        self.requetes_db = 0
+        self.duree_db = 0.0
+
+    @property
+    def route(self) -> str:
+        # Renseignée par le routeur une fois l'endpoint trouvé
+        route = self.scope.get("route")
+        if route is None:
+            return ROUTE_INCONNUE
+        return chemin_complet(self.scope.get("app"), route)
+
+
+# id(route) -> chemin complet (préfixes d'include_router compris), par application
+_chemins_routes: Dict[int, Dict[int, str]] = {}
+
+
+def chemin_complet(app: Any, route: Any) -> str:
+    """
+    Modèle de chemin complet d'une route (ex: /api/paie/calcul/{agent_id})
+    """
+    chemins = _chemins_routes.get(id(app))
+    if chemins is None:
+        chemins = {}
+        if iter_route_contexts is not None and app is not None:
+            for contexte in iter_route_contexts(app.routes):
+                if contexte.path_format:
+                    chemins[id(contexte.original_route)] = contexte.path_format
+        _chemins_routes[id(app)] = chemins
+    return chemins.get(id(route)) or getattr(route, "path", None) or ROUTE_INCONNUE
+
+
+_requete_en_cours: ContextVar[Optional[RequeteEnCours]] = ContextVar("requete_en_cours", default=None)
+
+
+def _echapper(valeur: str) -> str:
+    return str(valeur).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquettes(noms: Sequence[str], valeurs: Sequence[str], supplementaire: str = "") -> str:
+    paires = [f'{nom}="{_echapper(valeur)}"' for nom, valeur in zip(noms, valeurs)]
+    if supplementaire:
+        paires.append(supplementaire)
+    return "{" + ",".join(paires) + "}" if paires else ""
+
+
+def _nombre(valeur: float) -> str:
+    if valeur == int(valeur):
+        return str(int(valeur))
+    return repr(valeur)
+
+
+class Compteur:
+    """
+    Compteur Prometheus avec étiquettes
+    """
+
+    def __init__(self, nom: str, aide: str, etiquettes: Sequence[str]):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self.valeurs: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valeurs: Tuple[str, ...], montant: float = 1.0) -> None:
+        self.valeurs[valeurs] = self.valeurs.get(valeurs, 0.0) + montant
+
+    def exposer(self) -> List[str]:
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} counter"]
+        for valeurs, total in sorted(self.valeurs.items()):
+            lignes.append(f"{self.nom}{_etiquettes(self.etiquettes, valeurs)} {_nombre(total)}")
+        return lignes
+
+
+class Histogramme:
+    """
+    Histogramme Prometheus avec étiquettes (bornes cumulées, somme et nombre)
+    """
+
+    def __init__(self, nom: str, aide: str, etiquettes: Sequence[str], bornes: Sequence[float]):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self.bornes = tuple(bornes)
+        # valeurs d'étiquettes -> [effectifs par borne (non cumulés) + infini, somme]
+        self.series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observer(self, valeurs: Tuple[str, ...], mesure: float) -> None:
+        serie = self.series.get(valeurs)
+        if serie is None:
+            serie = self.series[valeurs] = [[0] * (len(self.bornes) + 1), 0.0]
+        effectifs = serie[0]
+        for index, borne in enumerate(self.bornes):
+            if mesure <= borne:
+                effectifs[index] += 1
+                break
+        else:
+            effectifs[-1] += 1
+        serie[1] += mesure
+
+    def exposer(self) -> List[str]:
+        lignes = [f"# HELP {self.nom} {self.aide}", f"# TYPE {self.nom} histogram"]
+        for valeurs, (effectifs, somme) in sorted(self.series.items()):
+            cumul = 0
+            for borne, effectif in zip(self.bornes + (float("inf"),), effectifs):
+                cumul += effectif
+                le = 'le="%s"' % ("+Inf" if borne == float("inf") else _nombre(borne))
+                lignes.append(f"{self.nom}_bucket{_etiquettes(self.etiquettes, valeurs, le)} {cumul}")
+            lignes.append(f"{self.nom}_sum{_etiquettes(self.etiquettes, valeurs)} {_nombre(somme)}")
+            lignes.append(f"{self.nom}_count{_etiquettes(self.etiquettes, valeurs)} {cumul}")
+        return lignes
+
+
+class Metriques:
+    """
+    Métriques HTTP et base de données du processus
+    """
+
+    def __init__(self):
+        self.duree_http = Histogramme(
+            "http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "route", "status"), BORNES_DUREE
+        )
+        self.duree_flux = Histogramme(
+            "http_stream_duration_seconds", "Durée des connexions en flux SSE", ("method", "route", "status"), BORNES_DUREE_FLUX
+        )
+        self.requetes_db_par_http = Histogramme(
+            "http_request_db_queries", "Nombre de requêtes en base par requête HTTP", ("method", "route"), BORNES_REQUETES_DB
+        )
+        self.duree_db_par_http = Histogramme(
+            "http_request_db_duration_seconds", "Temps passé en base par requête HTTP", ("method", "route"), BORNES_DUREE
+        )
+        self.duree_db = Histogramme(
+            "db_query_duration_seconds", "Durée des requêtes en base", ("table", "operation"), BORNES_DUREE
+        )
+        self.requetes_db = Compteur(
+            "db_queries_total", "Requêtes en base par endpoint, table et opération", ("route", "table", "operation")
+        )
+        self.erreurs_db = Compteur(
+            "db_query_errors_total", "Requêtes en base en erreur", ("table", "operation")
+        )
+
+    def debut_requete(self, scope: Dict[str, Any]) -> Tuple[RequeteEnCours, Any]:
+        """
+        Ouvre le suivi des requêtes en base d'une requête HTTP (jeton à passer à fin_requete)
+        """
+        requete = RequeteEnCours(scope)
+        return requete, _requete_en_cours.set(requete)
+
+    def fin_requete(self, requete: RequeteEnCours, jeton: Any, methode: str, statut: int, duree: float, flux: bool = False) -> None:
+        _requete_en_cours.reset(jeton)
+        histogramme = self.duree_flux if flux else self.duree_http
+        histogramme.observer((methode, requete.route, str(statut)), duree)
+        self.requetes_db_par_http.observer((methode, requete.route), requete.requetes_db)
+        self.duree_db_par_http.observer((methode, requete.route), requete.duree_db)
+
+    def observer_requete_db(self, table: str, operation: str, duree: float, erreur: bool = False) -> None:
+        """
+        Enregistre un aller-retour en base (appelé par le client instrumenté de app.db)
+        """
+        self.duree_db.observer((table, operation), duree)
+        if erreur:
+            self.erreurs_db.inc((table, operation))
+        requete = _requete_en_cours.get()
+        if requete is not None:
+            requete.requetes_db += 1
+            requete.duree_db += duree
+        self.requetes_db.inc((requete.route if requete else "hors_requete", table, operation))
+
+    def exposer(self) -> str:
+        """
+        Toutes les métriques au format texte Prometheus
+        """
+        lignes: List[str] = []
+        for metrique in (self.duree_http, self.duree_flux, self.requetes_db_par_http, self.duree_db_par_http, self.duree_db, self.requetes_db, self.erreurs_db):
+            lignes.extend(metrique.exposer())
+        return "\n".join(lignes) + "\n"
+
+
+class MiddlewareMetriques:
+    """
+    Middleware ASGI: durée, statut et requêtes en base de chaque requête HTTP.
+    La durée couvre toute la réponse, y compris le corps des réponses en flux (exports);
+    celle des flux SSE va dans http_stream_duration_seconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        debut = time.perf_counter()
+        statut = 500
+        flux = False
+        requete, jeton = metriques.debut_requete(scope)
+
+        async def envoyer(message):
+            nonlocal statut, flux
+            if message["type"] == "http.response.start":
+                statut = message["status"]
+                flux = any(
+                    nom.lower() == b"content-type" and valeur.startswith(CONTENT_TYPE_FLUX)
+                    for nom, valeur in message.get("headers", ())
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, envoyer)
+        finally:
+            metriques.fin_requete(requete, jeton, scope.get("method", ""), statut, time.perf_counter() - debut, flux)
+
+
+metriques = Metriques()
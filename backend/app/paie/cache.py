@@ -0,0 +1,234 @@
+"""
+Instantanés des paies des mois clos (GET /api/paie/calcul/{agent_id}, /api/paie/calcul-tous).
+
+La paie d'un mois terminé ne change que si un pointage, une prime, un jour férié,
+une exception ou l'agent lui-même est modifié. Chaque CalculPaie d'un mois clos est
+gardé par (agent, mois) dans une table SQLite locale (PAIE_CACHE_PATH), partagée par
+les workers d'une même machine et conservée au redémarrage. Le mois en cours et les
+mois futurs ne sont jamais mis en cache.
+
+Les endpoints d'écriture (pointages admin, primes, jours fériés et exceptions,
+modification et suppression d'agents) appellent invalider_paie / invalider_paie_date:
+les instantanés concernés sont supprimés et l'invalidation est horodatée, si bien
+qu'un calcul commencé avant elle n'est pas enregistré. Une écriture faite hors de
+l'API (console Supabase, script) n'est pas vue: vider le cache dans ce cas.
+
+Les instantanés portent une empreinte des paramètres de paie: changer les
+paramètres d'un rôle ou VERSION_CALCUL rend les anciens instantanés invisibles.
+
+Les appels SQLite sont bloquants (verrou d'écriture partagé entre workers, jusqu'à
+5 s d'attente): depuis le code asynchrone, ils passent par asyncio.to_thread pour ne
+jamais bloquer la boucle d'événements. Une même instance sérialise ses accès à la
+connexion.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from app.db import DB_BACKEND
+from app.paie.models import CalculPaie
+from app.paie.regles import PARAMETRES_PAIE_PAR_ROLE
+
+logger = logging.getLogger(__name__)
+
+# Mise en cache des paies des mois clos (PAIE_CACHE_ENABLED=false pour la désactiver)
+PAIE_CACHE_ENABLED = os.environ.get("PAIE_CACHE_ENABLED", "true").lower() != "false"
+
+# Fichier SQLite des instantanés; par défaut en mémoire du processus avec la base en
+# mémoire, sinon paie_cache.sqlite3 dans le dossier courant (comme static/)
+PAIE_CACHE_PATH = os.environ.get("PAIE_CACHE_PATH") or (":memory:" if DB_BACKEND == "memory" else "paie_cache.sqlite3")
+
+# À incrémenter quand une règle de calcul change (invalide tous les instantanés)
+VERSION_CALCUL = 1
+
+# Durée de conservation des horodatages d'invalidation (secondes): bien plus long
+# qu'un calcul de paie
+DUREE_INVALIDATIONS = 3600
+
+# agent_id / mois d'une invalidation qui porte sur tous les agents / tous les mois
+TOUS = "*"
+
+
+def cle_mois(mois: int, annee: int) -> str:
+    """
+    Mois au format de CalculPaie.mois (YYYY-MM)
+    """
+    return f"{annee}-{mois:02d}"
+
+
+def mois_clos(mois: int, annee: int) -> bool:
+    """
+    Vrai pour un mois entièrement passé (le mois en cours est limité à aujourd'hui)
+    """
+    aujourd_hui = date.today()
+    return (annee, mois) < (aujourd_hui.year, aujourd_hui.month)
+
+
+def empreinte_parametres() -> str:
+    """
+    Empreinte des paramètres de paie et de la version du calcul
+    """
+    parametres = {role: params.model_dump() for role, params in PARAMETRES_PAIE_PAR_ROLE.items()}
+    contenu = json.dumps([VERSION_CALCUL, parametres], sort_keys=True)
+    return hashlib.sha256(contenu.encode()).hexdigest()[:16]
+
+
+class CachePaies:
+    """
+    Instantanés CalculPaie par (agent, mois) dans SQLite.
+    Toute erreur SQLite est journalisée et traitée comme une absence de cache.
+    Méthodes bloquantes: à appeler via asyncio.to_thread depuis le code asynchrone.
+    """
+
+    def __init__(self, chemin: str):
+        self.chemin = chemin
+        self.empreinte = empreinte_parametres()
+        self._connexion: Optional[sqlite3.Connection] = None
+        # Une connexion partagée entre les threads: une opération à la fois
+        self._verrou = threading.Lock()
+
+    def connexion(self) -> sqlite3.Connection:
+        if self._connexion is None:
+            connexion = sqlite3.connect(self.chemin, timeout=5.0, isolation_level=None, check_same_thread=False)
+            if self.chemin != ":memory:":
+                connexion.execute("PRAGMA journal_mode=WAL")
+            connexion.execute(
+                "CREATE TABLE IF NOT EXISTS paies ("
+                "agent_id TEXT NOT NULL, mois TEXT NOT NULL, empreinte TEXT NOT NULL, "
+                "donnees TEXT NOT NULL, calcule_a REAL NOT NULL, PRIMARY KEY (agent_id, mois))"
+            )
+            connexion.execute(
+                "CREATE TABLE IF NOT EXISTS invalidations ("
+                "agent_id TEXT NOT NULL, mois TEXT NOT NULL, invalide_a REAL NOT NULL, PRIMARY KEY (agent_id, mois))"
+            )
+            self._connexion = connexion
+        return self._connexion
+
+    def lire(self, agent_id: str, mois: str) -> Optional[CalculPaie]:
+        """
+        Instantané d'un agent pour un mois (YYYY-MM), None si absent
+        """
+        try:
+            with self._verrou:
+                ligne = self.connexion().execute(
+                    "SELECT donnees FROM paies WHERE agent_id = ? AND mois = ? AND empreinte = ?",
+                    (str(agent_id), mois, self.empreinte)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Cache des paies indisponible (lecture): %s", e)
+            return None
+        return CalculPaie.model_validate_json(ligne[0]) if ligne else None
+
+    def lire_agents(self, agent_ids: Iterable[str], mois: str) -> Dict[str, CalculPaie]:
+        """
+        Instantanés disponibles de plusieurs agents pour un mois: {agent_id: CalculPaie}
+        """
+        ids = {str(agent_id) for agent_id in agent_ids}
+        try:
+            with self._verrou:
+                lignes = self.connexion().execute(
+                    "SELECT agent_id, donnees FROM paies WHERE mois = ? AND empreinte = ?", (mois, self.empreinte)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Cache des paies indisponible (lecture): %s", e)
+            return {}
+        return {agent_id: CalculPaie.model_validate_json(donnees) for agent_id, donnees in lignes if agent_id in ids}
+
+    def enregistrer(self, paies: List[CalculPaie], debut: float) -> None:
+        """
+        Enregistre des paies calculées à partir de données lues après `debut`
+        (time.time()), sauf celles invalidées depuis
+        """
+        if not paies:
+            return
+        try:
+            with self._verrou:
+                connexion = self.connexion()
+                connexion.execute("BEGIN IMMEDIATE")
+                try:
+                    invalidees = set(connexion.execute(
+                        "SELECT agent_id, mois FROM invalidations WHERE invalide_a >= ?", (debut,)
+                    ).fetchall())
+                    lignes = []
+                    for paie in paies:
+                        agent_id = str(paie.agent_id)
+                        if {(agent_id, paie.mois), (agent_id, TOUS), (TOUS, paie.mois), (TOUS, TOUS)} & invalidees:
+                            continue
+                        lignes.append((agent_id, paie.mois, self.empreinte, paie.model_dump_json(), debut))
+                    connexion.executemany("INSERT OR REPLACE INTO paies VALUES (?, ?, ?, ?, ?)", lignes)
+                    connexion.execute("COMMIT")
+                except BaseException:
+                    connexion.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.warning("Cache des paies indisponible (écriture): %s", e)
+
+    def invalider(self, agent_id: Optional[str] = None, mois: Optional[str] = None) -> None:
+        """
+        Supprime les instantanés d'un agent et/ou d'un mois (tous si None)
+        """
+        agent_id = str(agent_id) if agent_id is not None else TOUS
+        mois = mois or TOUS
+        maintenant = time.time()
+        conditions = []
+        valeurs: List[Any] = []
+        if agent_id != TOUS:
+            conditions.append("agent_id = ?")
+            valeurs.append(agent_id)
+        if mois != TOUS:
+            conditions.append("mois = ?")
+            valeurs.append(mois)
+        try:
+            with self._verrou:
+                connexion = self.connexion()
+                connexion.execute("BEGIN IMMEDIATE")
+                try:
+                    connexion.execute(
+                        "DELETE FROM paies" + (" WHERE " + " AND ".join(conditions) if conditions else ""), valeurs
+                    )
+                    connexion.execute("INSERT OR REPLACE INTO invalidations VALUES (?, ?, ?)", (agent_id, mois, maintenant))
+                    connexion.execute("DELETE FROM invalidations WHERE invalide_a < ?", (maintenant - DUREE_INVALIDATIONS,))
+                    connexion.execute("COMMIT")
+                except BaseException:
+                    connexion.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.error("❌ Invalidation du cache des paies impossible (%s, %s): %s", agent_id, mois, e)
+
+    def vider(self) -> None:
+        """
+        Supprime tous les instantanés
+        """
+        self.invalider()
+
+
+cache_paies = CachePaies(PAIE_CACHE_PATH)
+
+
+async def invalider_paie(agent_id: Optional[str] = None, mois: Optional[int] = None, annee: Optional[int] = None) -> None:
+    """
+    Invalide la paie d'un agent (ou de tous) pour un mois (ou tous les mois), y
+    compris les cumuls du mois en cours
+    """
+    aujourd_hui = date.today()
+    if not (mois and annee) or (annee, mois) == (aujourd_hui.year, aujourd_hui.month):
+        from app.paie.mois_en_cours import paie_mois_en_cours
+        paie_mois_en_cours.invalider(agent_id)
+    if PAIE_CACHE_ENABLED:
+        await asyncio.to_thread(cache_paies.invalider, agent_id, cle_mois(mois, annee) if mois and annee else None)
+
+
+async def invalider_paie_date(agent_id: Optional[str], jour: Union[str, date]) -> None:
+    """
+    Invalide la paie d'un agent (ou de tous) pour le mois d'une date (YYYY-MM-DD)
+    """
+    if isinstance(jour, str):
+        jour = date.fromisoformat(jour[:10])
+    await invalider_paie(agent_id, jour.month, jour.year)
@@ -0,0 +1,264 @@
+"""
+Calcul de paie vectorisé (NumPy) pour tous les agents d'un mois.
+
+Le mois est représenté par une matrice agents × jours × 4 créneaux
+(matin arrivée, matin sortie, après-midi arrivée, après-midi sortie) contenant
+l'heure de pointage en secondes depuis minuit (-1 si pas de pointage), classée
+par les règles communes avec le suivi quotidien (app/paie/regles.py). Les
+demi-journées d'absence, jours fériés et montants sont calculés par opérations
+sur tableaux, avec exactement les mêmes règles (et les mêmes arrondis) que
+calculer_paie_depuis_donnees.
+"""
+from datetime import timedelta
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from app.paie.models import CalculPaie, ParametresPaie
+from app.paie.regles import (
+    MATIN_SORTIE, APRES_MIDI_SORTIE, classer_jours, parametres_role, remplir_secondes, seuils_periode
+)
+from app.paie.utils import get_bornes_mois
+
+# Type ajouté aux détails de retard pour les sorties anticipées
+TYPES_SORTIE_ANTICIPEE = {
+    MATIN_SORTIE: "sortie_anticipee_matin",
+    APRES_MIDI_SORTIE: "sortie_anticipee_apres_midi",
+}
+
+RETENUES_FIXES = 4244.80
+
+
+class CompteursPaie(NamedTuple):
+    """
+    Décompte des jours d'un agent sur la période calculée
+    """
+    jours_feries_payes: int
+    journees_completes: int
+    absences_partielles: int
+    absences_completes: int
+    jours_feries_travailles: int
+    heures_retard_total: float
+
+
+def construire_paie(
+    agent: Dict[str, Any],
+    role: str,
+    params: ParametresPaie,
+    mois: int,
+    annee: int,
+    compteurs: CompteursPaie,
+    details_absences: List[Dict[str, Any]],
+    details_retards: List[Dict[str, Any]],
+    details_jours_feries: List[Dict[str, Any]],
+    primes: List[Dict[str, Any]]
+) -> CalculPaie:
+    """
+    Montants et paie d'un agent à partir du décompte de ses jours (mêmes formules et
+    même ordre d'opérations que calculer_paie_depuis_donnees)
+    """
+    heures_par_jour = float(params.heures_par_jour)
+    taux_horaire = params.taux_horaire
+    jours_travailles = compteurs.jours_feries_payes + compteurs.journees_completes + 0.5 * compteurs.absences_partielles
+    jours_absence = compteurs.absences_completes + 0.5 * compteurs.absences_partielles
+    jours_presence = compteurs.journees_completes + compteurs.absences_partielles
+
+    heures_absence = jours_absence * heures_par_jour
+    heures_travaillees = (jours_travailles * heures_par_jour) - compteurs.heures_retard_total
+    salaire_base = taux_horaire * heures_travaillees
+    frais_panier_total = jours_presence * params.frais_panier
+    frais_transport_total = jours_presence * params.frais_transport
+    salaire_journee_complet = (taux_horaire * heures_par_jour) + params.frais_panier + params.frais_transport
+    bonus_jours_feries = compteurs.jours_feries_travailles * salaire_journee_complet
+    salaire_net = salaire_base + frais_panier_total + frais_transport_total + bonus_jours_feries
+    retenues_9_pourcent = salaire_base * 0.09
+    retenues_total = retenues_9_pourcent + RETENUES_FIXES
+
+    details_primes = []
+    primes_total = 0.0
+    for prime in primes:
+        primes_total += prime["montant"]
+        details_primes.append({
+            "montant": prime["montant"],
+            "motif": prime["motif"],
+            "id": prime["id"]
+        })
+
+    paie_finale = salaire_net + primes_total - retenues_total
+
+    return CalculPaie(
+        agent_id=agent["id"],
+        nom=agent["nom"],
+        email=agent["email"],
+        role=role,
+        mois=f"{annee}-{mois:02d}",
+        heures_travaillees=round(heures_travaillees, 2),
+        heures_theoriques=params.heures_par_mois,
+        heures_absence=heures_absence,
+        heures_retard=round(compteurs.heures_retard_total, 2),
+        jours_travailles=float(jours_travailles),
+        jours_absence=float(jours_absence),
+        jours_feries_payes=compteurs.jours_feries_payes,
+        jours_feries_travailles=compteurs.jours_feries_travailles,
+        salaire_base=round(salaire_base, 2),
+        deduction_absences=0,
+        deduction_retards=0,
+        frais_panier_total=round(frais_panier_total, 2),
+        frais_transport_total=round(frais_transport_total, 2),
+        bonus_jours_feries=round(bonus_jours_feries, 2),
+        salaire_net=round(salaire_net, 2),
+        primes_total=round(primes_total, 2),
+        retenues_9_pourcent=round(retenues_9_pourcent, 2),
+        retenues_fixes=round(RETENUES_FIXES, 2),
+        retenues_total=round(retenues_total, 2),
+        paie_finale=round(paie_finale, 2),
+        taux_horaire=taux_horaire,
+        details_absences=details_absences,
+        details_retards=details_retards,
+        details_primes=details_primes,
+        details_jours_feries=details_jours_feries
+    )
+
+
+def calculer_paies_vectorise(
+    agents: List[Dict[str, Any]],
+    mois: int,
+    annee: int,
+    jours_feries: List[Dict[str, Any]],
+    exceptions_par_agent: Dict[str, set],
+    pointages_par_agent: Dict[str, List[Dict[str, Any]]],
+    primes_par_agent: Dict[str, List[Dict[str, Any]]]
+) -> Tuple[List[CalculPaie], List[Tuple[Dict[str, Any], Exception]]]:
+    """
+    Calcule les paies de plusieurs agents pour un mois donné.
+
+    Retourne (paies, erreurs) où erreurs contient les couples (agent, exception)
+    des agents dont les données sont invalides (ils sont exclus des paies).
+    """
+    premier_jour, dernier_jour = get_bornes_mois(mois, annee)
+    nb_jours = (dernier_jour - premier_jour).days + 1
+    dates = [premier_jour + timedelta(days=i) for i in range(nb_jours)]
+    dates_str = [d.isoformat() for d in dates]
+    index_jours = {d: i for i, d in enumerate(dates_str)}
+
+    jours_feries_set = set(jf["date_ferie"] for jf in jours_feries)
+    jours_feries_noms = {jf["date_ferie"]: jf["nom"] for jf in jours_feries}
+
+    # Valider et remplir agent par agent (un agent invalide n'arrête pas le calcul)
+    valides = []
+    erreurs = []
+    lignes_secondes = []
+    lignes_exceptions = []
+    for agent in agents:
+        try:
+            if not agent.get("nom"):
+                raise ValueError(f"Agent {agent['id']}: champ 'nom' manquant")
+            if not agent.get("email"):
+                raise ValueError(f"Agent {agent['id']}: champ 'email' manquant")
+            secondes_agent, _ = remplir_secondes([agent["id"]], index_jours, pointages_par_agent)
+        except Exception as e:
+            erreurs.append((agent, e))
+            continue
+        exceptions = exceptions_par_agent.get(agent["id"], set())
+        valides.append(agent)
+        lignes_secondes.append(secondes_agent)
+        lignes_exceptions.append([d in exceptions for d in dates_str])
+
+    if not valides:
+        return [], erreurs
+
+    nb_agents = len(valides)
+    secondes = np.concatenate(lignes_secondes)  # agents × jours × 4
+    exception = np.array(lignes_exceptions, dtype=bool).reshape(nb_agents, nb_jours)
+
+    # Paramètres par agent selon le rôle
+    roles = [agent.get("role", "agent") for agent in valides]
+    params = [parametres_role(role) for role in roles]
+
+    # Calendrier: jours ouvrés (lundi-vendredi) et jours fériés
+    jours_semaine = np.array([d.weekday() for d in dates])
+    ouvre = (jours_semaine < 5)[None, :]
+    ferie = np.array([d in jours_feries_set for d in dates_str], dtype=bool)[None, :]
+
+    # Jour férié payé sans travail (pas d'exception), sinon jour à analyser
+    ferie_paye = ouvre & ferie & ~exception
+    a_analyser = ouvre & ~ferie_paye
+
+    # Présence par session et minutes de retard / sortie anticipée par créneau
+    classement = classer_jours(secondes, seuils_periode(roles, dates))
+    present_matin = classement.present_matin
+    present_aprem = classement.present_aprem
+    retards = np.where(a_analyser[:, :, None], classement.retards, 0)
+
+    absence_complete = a_analyser & ~present_matin & ~present_aprem
+    absence_partielle = a_analyser & (present_matin ^ present_aprem)
+    journee_complete = a_analyser & present_matin & present_aprem
+    ferie_travaille = a_analyser & ferie & exception & (present_matin | present_aprem)
+
+    # Somme cumulée dans l'ordre jour/créneau: mêmes additions flottantes
+    # que la boucle jour par jour (ajouter 0.0 ne change pas la somme)
+    heures_retard_total = np.cumsum((retards / 60.0).reshape(nb_agents, -1), axis=1)[:, -1]
+
+    jours_feries_payes = ferie_paye.sum(axis=1).tolist()
+    journees_completes = journee_complete.sum(axis=1).tolist()
+    absences_partielles = absence_partielle.sum(axis=1).tolist()
+    absences_completes = absence_complete.sum(axis=1).tolist()
+    jours_feries_travailles = ferie_travaille.sum(axis=1).tolist()
+    heures_retard = heures_retard_total.tolist()
+
+    # Détails (seules les cases non nulles sont parcourues)
+    details_absences: List[List[Dict[str, Any]]] = [[] for _ in range(nb_agents)]
+    for a, j in zip(*np.nonzero(absence_complete | absence_partielle)):
+        if absence_complete[a, j]:
+            details_absences[a].append({"date": dates_str[j], "type": "absence_complete"})
+        else:
+            details_absences[a].append({
+                "date": dates_str[j],
+                "type": "absence_partielle",
+                "session": "matin" if not present_matin[a, j] else "apres_midi"
+            })
+
+    details_retards: List[List[Dict[str, Any]]] = [[] for _ in range(nb_agents)]
+    for a, j, c in zip(*np.nonzero(retards)):
+        retard_minutes = int(retards[a, j, c])
+        detail = {
+            "date": dates_str[j],
+            "minutes": retard_minutes,
+            "heures": round(retard_minutes / 60.0, 2)
+        }
+        if c in TYPES_SORTIE_ANTICIPEE:
+            detail["type"] = TYPES_SORTIE_ANTICIPEE[c]
+        details_retards[a].append(detail)
+
+    details_jours_feries: List[List[Dict[str, Any]]] = [[] for _ in range(nb_agents)]
+    for a, j in zip(*np.nonzero(ferie_travaille)):
+        details_jours_feries[a].append({
+            "date": dates_str[j],
+            "nom": jours_feries_noms.get(dates_str[j], "Jour férié"),
+            "type": "travaille"
+        })
+
+    paies = [
+        construire_paie(
+            agent,
+            roles[a],
+            params[a],
+            mois,
+            annee,
+            CompteursPaie(
+                jours_feries_payes[a],
+                journees_completes[a],
+                absences_partielles[a],
+                absences_completes[a],
+                jours_feries_travailles[a],
+                heures_retard[a]
+            ),
+            details_absences[a],
+            details_retards[a],
+            details_jours_feries[a],
+            primes_par_agent.get(agent["id"], [])
+        )
+        for a, agent in enumerate(valides)
+    ]
+
+    return paies, erreurs
@@ -0,0 +1,406 @@
+"""
+Paie du mois en cours tenue à jour au fil des pointages (aperçu de GET /api/paie/calcul/{agent_id}).
+
+L'état est construit depuis la base au premier appel et à chaque changement de
+jour: agents, jours fériés, exceptions, primes et pointages du mois jusqu'à
+aujourd'hui. Chaque scan met ensuite à jour l'état sans requête: le jour pointé est
+reclassé (règles communes de app/paie/regles.py) et les cumuls de l'agent
+(journées complètes, demi-journées, jours pointés, jours fériés travaillés,
+minutes de retard) sont corrigés de l'ancien classement de ce jour vers le
+nouveau. Le coût d'un scan ne dépend pas du nombre de pointages du mois.
+
+L'aperçu d'un agent est construit à partir de ses cumuls et du calendrier du mois
+(construire_paie, mêmes formules que le calcul complet), puis gardé jusqu'au
+prochain changement de l'agent. Les détails (absences, retards, jours fériés)
+parcourent les jours ouvrés du mois, jamais les pointages.
+
+Les modifications faites par les administrateurs (pointages, primes, exceptions,
+agents) passent par app.paie.cache.invalider_paie: l'agent concerné est rechargé
+depuis la base au prochain aperçu; un jour férié modifié fait tout reconstruire.
+
+L'état est propre au processus: avec plusieurs workers,
+PAIE_MOIS_EN_COURS_RESYNC_SECONDS force une reconstruction périodique pour voir
+les scans reçus par les autres workers.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db import get_db, fetch_all_rows
+from app.paie.calcul_vectorise import TYPES_SORTIE_ANTICIPEE, CompteursPaie, construire_paie
+from app.paie.models import CalculPaie
+from app.paie.regles import creneau_pointage, heure_en_secondes, horaires_jour, parametres_role
+from app.paie.utils import extraire_dates_exceptions, get_bornes_mois
+
+logger = logging.getLogger(__name__)
+
+# Reconstruction périodique depuis la base (secondes, 0 = uniquement au démarrage et au changement de jour)
+PAIE_MOIS_EN_COURS_RESYNC_SECONDS = float(os.environ.get("PAIE_MOIS_EN_COURS_RESYNC_SECONDS", "0"))
+
+COLONNES_POINTAGES = "id, agent_id, date_pointage, heure_pointage, session, type_pointage"
+
+# Clé de tri d'un pointage sans heure (NULLS LAST de PostgreSQL)
+HEURE_VIDE_EN_DERNIER = 24 * 3600
+
+# Classement d'un jour pointé: (présent le matin, présent l'après-midi, minutes de
+# retard ou de sortie anticipée par créneau)
+JourClasse = Tuple[bool, bool, Tuple[int, int, int, int]]
+
+
+class CumulsAgent:
+    """
+    Pointages du mois d'un agent, classement de chaque jour pointé et cumuls du mois
+    """
+
+    def __init__(self, agent: Dict[str, Any], exceptions: set, primes: List[Dict[str, Any]]):
+        self.agent = agent
+        self.role = agent.get("role", "agent")
+        self.params = parametres_role(self.role)
+        self.exceptions = exceptions
+        self.primes = primes
+        # date -> 4 créneaux -> pointage_id -> (clé de tri, secondes; -1 pour une heure vide)
+        self.creneaux: Dict[str, List[Dict[str, Tuple[Tuple[int, str], int]]]] = {}
+        # pointage_id -> (date, créneau)
+        self.pointages: Dict[str, Tuple[str, int]] = {}
+        # Jours ouvrés analysés ayant au moins un pointage
+        self.jours: Dict[str, JourClasse] = {}
+        self.journees_completes = 0
+        self.absences_partielles = 0
+        self.jours_presents = 0
+        self.jours_feries_travailles = 0
+        self.minutes_retard = 0
+        # Aperçu gardé jusqu'au prochain changement
+        self.paie: Optional[CalculPaie] = None
+
+
+class PaieMoisEnCours:
+    """
+    Cumuls de paie du mois en cours de chaque agent, mis à jour à chaque scan
+    """
+
+    def __init__(self):
+        self.jour: Optional[date] = None
+        self.reconstruit_a = 0.0
+        # Jours fériés du mois jusqu'à aujourd'hui: date -> nom
+        self.jours_feries: Dict[str, str] = {}
+        # Jours ouvrés (lundi-vendredi) du mois jusqu'à aujourd'hui: (date, férié)
+        self.calendrier: List[Tuple[str, bool]] = []
+        self.agents: Dict[str, CumulsAgent] = {}
+        # Agents à recharger depuis la base au prochain aperçu
+        self.a_recharger: set = set()
+        self._verrou = asyncio.Lock()
+        # Écritures reçues pendant un chargement, rejouées ensuite
+        self._en_attente: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+
+    def invalider(self, agent_id: Optional[str] = None) -> None:
+        """
+        Recharge un agent (ou reconstruit tout l'état si None) au prochain aperçu
+        """
+        if agent_id is None:
+            self.jour = None
+        else:
+            self.a_recharger.add(str(agent_id))
+
+    def a_jour(self) -> bool:
+        """
+        Indique si l'état correspond au jour courant et n'est pas périmé
+        """
+        perime = PAIE_MOIS_EN_COURS_RESYNC_SECONDS > 0 and time.monotonic() - self.reconstruit_a > PAIE_MOIS_EN_COURS_RESYNC_SECONDS
+        return self.jour == date.today() and not perime
+
+    async def calculer(self, agent_id: str) -> CalculPaie:
+        """
+        Paie du mois en cours d'un agent (jusqu'à aujourd'hui)
+        """
+        if not self.a_jour():
+            await self.reconstruire(date.today())
+        agent_id = str(agent_id)
+        if agent_id in self.a_recharger or agent_id not in self.agents:
+            await self.recharger_agent(agent_id)
+        cumuls = self.agents.get(agent_id)
+        if cumuls is None:
+            raise ValueError(f"Agent {agent_id} non trouvé")
+        if cumuls.paie is None:
+            cumuls.paie = self._construire_paie(cumuls)
+        return cumuls.paie
+
+    async def reconstruire(self, jour: date) -> None:
+        """
+        Recharge l'état du mois depuis la base (agents, jours fériés, exceptions,
+        primes et pointages non annulés jusqu'à aujourd'hui)
+        """
+        async with self._verrou:
+            if self.a_jour():
+                return  # Déjà reconstruit par un appel concurrent
+
+            self._en_attente = []
+            try:
+                db = await get_db()
+                premier_jour, dernier_jour = get_bornes_mois(jour.month, jour.year)
+                agents_result = await db.table("agents").select("*").execute()
+                jours_feries_result = await db.table("jours_feries").select("id, date_ferie, nom").gte("date_ferie", premier_jour.isoformat()).lte("date_ferie", dernier_jour.isoformat()).execute()
+                exceptions_result = await db.table("jours_feries_exceptions").select("agent_id, jour_ferie_id, jours_feries(date_ferie)").execute()
+                primes_result = await db.table("primes").select("*").eq("mois", jour.month).eq("annee", jour.year).execute()
+                pointages = await fetch_all_rows(
+                    lambda: db.table("pointages").select(COLONNES_POINTAGES).gte("date_pointage", premier_jour.isoformat()).lte("date_pointage", dernier_jour.isoformat()).or_("annule.is.null,annule.eq.false").order("date_pointage").order("heure_pointage").order("id")
+                )
+
+                exceptions_par_agent: Dict[str, List[Dict[str, Any]]] = {}
+                for exc in (exceptions_result.data or []):
+                    exceptions_par_agent.setdefault(exc["agent_id"], []).append(exc)
+                primes_par_agent: Dict[str, List[Dict[str, Any]]] = {}
+                for prime in (primes_result.data or []):
+                    primes_par_agent.setdefault(prime["agent_id"], []).append(prime)
+
+                self.jours_feries = {jf["date_ferie"]: jf["nom"] for jf in (jours_feries_result.data or [])}
+                self.calendrier = [
+                    (jour_mois.isoformat(), jour_mois.isoformat() in self.jours_feries)
+                    for jour_mois in (premier_jour + timedelta(days=i) for i in range((dernier_jour - premier_jour).days + 1))
+                    if jour_mois.weekday() < 5
+                ]
+                self.agents = {
+                    str(agent["id"]): CumulsAgent(
+                        agent,
+                        extraire_dates_exceptions(exceptions_par_agent.get(agent["id"], [])),
+                        primes_par_agent.get(agent["id"], [])
+                    )
+                    for agent in (agents_result.data or [])
+                }
+                self.a_recharger = set()
+                self.jour = jour
+                self.reconstruit_a = time.monotonic()
+
+                for pointage in pointages:
+                    self._ajouter(pointage)
+
+                self._rejouer()
+                logger.info("📊 Paie du mois en cours reconstruite (%s): %s agents, %s pointages", jour, len(self.agents), len(pointages))
+            finally:
+                self._en_attente = None
+
+    async def recharger_agent(self, agent_id: str) -> None:
+        """
+        Recharge un agent depuis la base (agent, exceptions, primes et pointages du mois)
+        """
+        async with self._verrou:
+            jour = self.jour
+            self._en_attente = []
+            try:
+                db = await get_db()
+                premier_jour, dernier_jour = get_bornes_mois(jour.month, jour.year)
+                agent_result = await db.table("agents").select("*").eq("id", agent_id).execute()
+                self.a_recharger.discard(agent_id)
+                if not agent_result.data:
+                    self.agents.pop(agent_id, None)
+                    return
+                exceptions_result = await db.table("jours_feries_exceptions").select("jour_ferie_id, jours_feries(date_ferie)").eq("agent_id", agent_id).execute()
+                primes_result = await db.table("primes").select("*").eq("agent_id", agent_id).eq("mois", jour.month).eq("annee", jour.year).execute()
+                pointages_result = await db.table("pointages").select(COLONNES_POINTAGES).eq("agent_id", agent_id).gte("date_pointage", premier_jour.isoformat()).lte("date_pointage", dernier_jour.isoformat()).or_("annule.is.null,annule.eq.false").order("date_pointage").order("heure_pointage").order("id").execute()
+
+                self.agents[agent_id] = CumulsAgent(
+                    agent_result.data[0],
+                    extraire_dates_exceptions(exceptions_result.data or []),
+                    primes_result.data or []
+                )
+                for pointage in (pointages_result.data or []):
+                    self._ajouter(pointage)
+
+                self._rejouer()
+                logger.debug("Paie du mois en cours rechargée pour l'agent %s", agent_id)
+            finally:
+                self._en_attente = None
+
+    def enregistrer_pointage(self, pointage: Dict[str, Any]) -> None:
+        """
+        Ajoute ou met à jour un pointage du mois (scan, scan hors-ligne)
+        """
+        if self._en_attente is not None:
+            self._en_attente.append(("enregistrer", pointage))
+            return
+        if pointage.get("annule"):
+            self.retirer_pointage(pointage)
+            return
+        self._ajouter(pointage)
+
+    def retirer_pointage(self, pointage: Dict[str, Any]) -> None:
+        """
+        Retire un pointage annulé
+        """
+        if self._en_attente is not None:
+            self._en_attente.append(("retirer", pointage))
+            return
+        cumuls = self.agents.get(str(pointage["agent_id"]))
+        if cumuls is None:
+            return
+        place = cumuls.pointages.pop(pointage["id"], None)
+        if place is not None:
+            jour, creneau = place
+            cumuls.creneaux[jour][creneau].pop(pointage["id"], None)
+            self._reclasser(cumuls, jour)
+
+    def _rejouer(self) -> None:
+        """
+        Rejoue les écritures arrivées pendant un chargement (opérations idempotentes)
+        """
+        en_attente, self._en_attente = self._en_attente, None
+        for operation, pointage in en_attente:
+            if operation == "enregistrer":
+                self.enregistrer_pointage(pointage)
+            else:
+                self.retirer_pointage(pointage)
+
+    def _ajouter(self, pointage: Dict[str, Any]) -> None:
+        if self.jour is None:
+            return
+        cumuls = self.agents.get(str(pointage["agent_id"]))
+        jour = pointage.get("date_pointage")
+        if cumuls is None or not isinstance(jour, str) or not self.calendrier:
+            return
+        # Pointages du mois jusqu'à aujourd'hui seulement (comme le calcul complet)
+        if not (self.jour.replace(day=1).isoformat() <= jour <= self.jour.isoformat()):
+            return
+
+        place = cumuls.pointages.pop(pointage["id"], None)
+        if place is not None:
+            ancien_jour, ancien_creneau = place
+            cumuls.creneaux[ancien_jour][ancien_creneau].pop(pointage["id"])
+            if ancien_jour != jour:
+                self._reclasser(cumuls, ancien_jour)
+
+        creneau = creneau_pointage(pointage)
+        heure = pointage["heure_pointage"]
+        secondes = heure_en_secondes(heure) if heure else -1
+        # Même ordre que les requêtes du calcul complet (date, heure, id; heure vide en
+        # dernier): le dernier pointage d'un créneau dans cet ordre l'emporte
+        cle = (secondes if secondes >= 0 else HEURE_VIDE_EN_DERNIER, str(pointage["id"]))
+        creneaux = cumuls.creneaux.setdefault(jour, [{}, {}, {}, {}])
+        creneaux[creneau][pointage["id"]] = (cle, secondes)
+        cumuls.pointages[pointage["id"]] = (jour, creneau)
+        self._reclasser(cumuls, jour)
+
+    def _reclasser(self, cumuls: CumulsAgent, jour: str) -> None:
+        """
+        Remplace la contribution d'un jour aux cumuls de l'agent par son nouveau classement
+        """
+        ancien = cumuls.jours.pop(jour, None)
+        if ancien is not None:
+            self._cumuler(cumuls, jour, ancien, -1)
+        creneaux = cumuls.creneaux.get(jour)
+        jour_semaine = date.fromisoformat(jour).weekday()
+        analyse = jour_semaine < 5 and (jour not in self.jours_feries or jour in cumuls.exceptions)
+        if creneaux and any(creneaux) and analyse:
+            nouveau = self._classer(cumuls.role, jour_semaine, creneaux)
+            cumuls.jours[jour] = nouveau
+            self._cumuler(cumuls, jour, nouveau, 1)
+        cumuls.paie = None
+
+    @staticmethod
+    def _classer(role: str, jour_semaine: int, creneaux: List[Dict[str, Tuple[Tuple[int, str], int]]]) -> JourClasse:
+        """
+        Classement d'un jour (mêmes règles que app.paie.regles.classer_jours): le
+        dernier pointage d'un créneau dans l'ordre (heure, id) l'emporte
+        """
+        horaires = horaires_jour(role, jour_semaine)
+        matin_arrivee, matin_sortie, aprem_arrivee, aprem_sortie = (
+            max(pointages.values())[1] if pointages else -1 for pointages in creneaux
+        )
+        minutes = (
+            max(0, (matin_arrivee - horaires.debut_matin) // 60) if matin_arrivee >= 0 else 0,
+            max(0, (horaires.fin_matin - matin_sortie) // 60) if matin_sortie >= 0 else 0,
+            max(0, (aprem_arrivee - horaires.debut_aprem) // 60) if aprem_arrivee >= 0 else 0,
+            max(0, (horaires.fin_aprem - aprem_sortie) // 60) if aprem_sortie >= 0 else 0,
+        )
+        return (matin_arrivee >= 0 or matin_sortie >= 0, aprem_arrivee >= 0 or aprem_sortie >= 0, minutes)
+
+    def _cumuler(self, cumuls: CumulsAgent, jour: str, classe: JourClasse, signe: int) -> None:
+        present_matin, present_aprem, minutes = classe
+        cumuls.journees_completes += signe * (present_matin and present_aprem)
+        cumuls.absences_partielles += signe * (present_matin != present_aprem)
+        cumuls.jours_presents += signe * (present_matin or present_aprem)
+        cumuls.jours_feries_travailles += signe * (jour in self.jours_feries and (present_matin or present_aprem))
+        cumuls.minutes_retard += signe * sum(minutes)
+
+    def _construire_paie(self, cumuls: CumulsAgent) -> CalculPaie:
+        """
+        Paie de l'agent à partir de ses cumuls (retards compris) et du calendrier du
+        mois, parcouru pour les jours fériés payés, les absences complètes et les détails
+        """
+        agent = cumuls.agent
+        if not agent.get("nom"):
+            raise ValueError(f"Agent {agent['id']}: champ 'nom' manquant")
+        if not agent.get("email"):
+            raise ValueError(f"Agent {agent['id']}: champ 'email' manquant")
+
+        jours_feries_payes = 0
+        jours_analyses = 0
+        details_absences = []
+        details_retards = []
+        details_jours_feries = []
+        # Somme créneau par créneau dans l'ordre des jours: mêmes additions flottantes
+        # que le calcul complet (diviser le total une seule fois peut décaler un arrondi)
+        heures_retard_total = 0.0
+        # Agent sans retard ni sortie anticipée ce mois-ci: aucun créneau à parcourir
+        avec_retards = cumuls.minutes_retard > 0
+        for jour, ferie in self.calendrier:
+            if ferie and jour not in cumuls.exceptions:
+                jours_feries_payes += 1
+                continue
+            jours_analyses += 1
+            classe = cumuls.jours.get(jour)
+            if classe is None:
+                details_absences.append({"date": jour, "type": "absence_complete"})
+                continue
+            present_matin, present_aprem, minutes = classe
+            if not present_matin and not present_aprem:
+                details_absences.append({"date": jour, "type": "absence_complete"})
+            elif present_matin != present_aprem:
+                details_absences.append({
+                    "date": jour,
+                    "type": "absence_partielle",
+                    "session": "matin" if not present_matin else "apres_midi"
+                })
+            for creneau, retard_minutes in enumerate(minutes if avec_retards else ()):
+                if not retard_minutes:
+                    continue
+                heures_retard_total += retard_minutes / 60.0
+                detail = {
+                    "date": jour,
+                    "minutes": retard_minutes,
+                    "heures": round(retard_minutes / 60.0, 2)
+                }
+                if creneau in TYPES_SORTIE_ANTICIPEE:
+                    detail["type"] = TYPES_SORTIE_ANTICIPEE[creneau]
+                details_retards.append(detail)
+            if ferie and (present_matin or present_aprem):
+                details_jours_feries.append({
+                    "date": jour,
+                    "nom": self.jours_feries.get(jour, "Jour férié"),
+                    "type": "travaille"
+                })
+
+        compteurs = CompteursPaie(
+            jours_feries_payes=jours_feries_payes,
+            journees_completes=cumuls.journees_completes,
+            absences_partielles=cumuls.absences_partielles,
+            absences_completes=jours_analyses - cumuls.jours_presents,
+            jours_feries_travailles=cumuls.jours_feries_travailles,
+            heures_retard_total=heures_retard_total
+        )
+        return construire_paie(
+            agent,
+            cumuls.role,
+            cumuls.params,
+            self.jour.month,
+            self.jour.year,
+            compteurs,
+            details_absences,
+            details_retards,
+            details_jours_feries,
+            cumuls.primes
+        )
+
+
+paie_mois_en_cours = PaieMoisEnCours()
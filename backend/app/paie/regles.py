@@ -0,0 +1,240 @@
+"""
+Règles de pointage communes à la paie et au suivi quotidien.
+
+Les paramètres de chaque rôle sont compilés en seuils (secondes depuis minuit)
+pour chaque jour de la semaine, mémoïsés par (rôle, jour de la semaine): arrivée
+du matin, sortie du matin, arrivée de l'après-midi (13h15 le vendredi), sortie de
+l'après-midi. Pour une période, les pointages sont rangés dans une matrice
+agents × jours × 4 créneaux et chaque jour est classé une seule fois (présence
+par session, minutes de retard ou de sortie anticipée par créneau) par
+classer_jours, utilisé par le moteur de paie (calcul_vectorise) et par le suivi
+quotidien (pointage/suivi_utils).
+"""
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from app.paie.models import ParametresPaie
+
+# Index des créneaux dans la matrice
+MATIN_ARRIVEE, MATIN_SORTIE, APRES_MIDI_ARRIVEE, APRES_MIDI_SORTIE = range(4)
+
+# Début de l'après-midi le vendredi (13h15), quel que soit le rôle
+DEBUT_APREM_VENDREDI = 13 * 60 + 15
+
+# Paramètres de paie par rôle
+PARAMETRES_PAIE_PAR_ROLE = {
+    "agent": ParametresPaie(
+        role="agent",
+        taux_horaire=182.18,
+        heures_par_jour=8,
+        heures_par_mois=174,
+        jours_travail_mois=22,
+        frais_panier=500.0,
+        frais_transport=200.0
+    ),
+    "admin": ParametresPaie(
+        role="admin",
+        taux_horaire=182.18,
+        heures_par_jour=8,
+        heures_par_mois=174,
+        jours_travail_mois=22,
+        frais_panier=500.0,
+        frais_transport=200.0
+    ),
+    "informaticien": ParametresPaie(
+        role="informaticien",
+        taux_horaire=182.18,
+        heures_par_jour=8,
+        heures_par_mois=174,
+        jours_travail_mois=22,
+        frais_panier=500.0,
+        frais_transport=200.0
+    ),
+    "analyste_informaticienne": ParametresPaie(
+        role="analyste_informaticienne",
+        taux_horaire=182.18,
+        heures_par_jour=8,
+        heures_par_mois=174,
+        jours_travail_mois=22,
+        frais_panier=500.0,
+        frais_transport=200.0
+    ),
+    "superviseur": ParametresPaie(
+        role="superviseur",
+        taux_horaire=182.18,
+        heures_par_jour=8,
+        heures_par_mois=174,
+        jours_travail_mois=22,
+        frais_panier=500.0,
+        frais_transport=200.0
+    ),
+    "agent_administratif": ParametresPaie(
+        role="agent_administratif",
+        taux_horaire=182.18,
+        heures_par_jour=8,
+        heures_par_mois=174,
+        jours_travail_mois=22,
+        frais_panier=500.0,
+        frais_transport=200.0
+    ),
+    "charge_administration": ParametresPaie(
+        role="charge_administration",
+        taux_horaire=182.18,
+        heures_par_jour=6,  # 9h-12h + 13h-16h = 6h par jour
+        heures_par_mois=132,  # 6h * 22 jours
+        jours_travail_mois=22,
+        frais_panier=500.0,
+        frais_transport=200.0,
+        heure_debut_matin=9 * 60 + 5,  # 9h05 - retard à partir de 9h05
+        heure_fin_matin=11 * 60 + 55,  # 11h55 - déduction si sortie avant
+        heure_debut_aprem=13 * 60 + 5,  # 13h05 - retard à partir de 13h05
+        heure_fin_aprem=15 * 60 + 55  # 15h55 - déduction si sortie avant (fin à 16h)
+    ),
+    "agent_etudiant": ParametresPaie(
+        role="agent_etudiant",
+        taux_horaire=182.18,
+        heures_par_jour=8,  # À ajuster selon le temps partiel
+        heures_par_mois=174,  # À ajuster selon le temps partiel
+        jours_travail_mois=22,
+        frais_panier=500.0,
+        frais_transport=200.0
+    )
+}
+
+
+class Horaires(NamedTuple):
+    """
+    Seuils d'un rôle pour un jour de la semaine, en secondes depuis minuit
+    (5 minutes de tolérance comprises)
+    """
+    debut_matin: int
+    fin_matin: int
+    debut_aprem: int
+    fin_aprem: int
+
+
+class ClassementJours(NamedTuple):
+    """
+    Classement des jours d'une période (agents × jours, retards agents × jours × 4)
+    """
+    retards: np.ndarray
+    present_matin: np.ndarray
+    present_aprem: np.ndarray
+
+
+def parametres_role(role: str) -> ParametresPaie:
+    """
+    Paramètres de paie d'un rôle (ceux d'un agent pour un rôle inconnu)
+    """
+    return PARAMETRES_PAIE_PAR_ROLE.get(role, PARAMETRES_PAIE_PAR_ROLE["agent"])
+
+
+@lru_cache(maxsize=None)
+def horaires_jour(role: str, jour_semaine: int) -> Horaires:
+    """
+    Seuils d'un rôle pour un jour de la semaine (lundi=0), calculés une fois
+    """
+    params = parametres_role(role)
+    debut_aprem = DEBUT_APREM_VENDREDI if jour_semaine == 4 else params.heure_debut_aprem
+    return Horaires(
+        params.heure_debut_matin * 60,
+        params.heure_fin_matin * 60,
+        debut_aprem * 60,
+        params.heure_fin_aprem * 60
+    )
+
+
+@lru_cache(maxsize=None)
+def _seuils_semaine(role: str) -> np.ndarray:
+    """
+    Seuils d'un rôle pour chaque jour de la semaine (7 × 4)
+    """
+    return np.array([horaires_jour(role, jour) for jour in range(7)], dtype=np.int64)
+
+
+def seuils_periode(roles: Sequence[str], dates: Sequence[date]) -> np.ndarray:
+    """
+    Seuils de chaque agent pour chaque jour de la période (agents × jours × 4)
+    """
+    if not roles:
+        return np.zeros((0, len(dates), 4), dtype=np.int64)
+    jours_semaine = np.array([d.weekday() for d in dates], dtype=np.int64)
+    par_role = {role: _seuils_semaine(role)[jours_semaine] for role in set(roles)}
+    return np.stack([par_role[role] for role in roles])
+
+
+def heure_en_secondes(heure: Any) -> int:
+    """
+    Secondes depuis minuit d'une heure "HH:MM:SS" ou d'un objet time
+    """
+    if isinstance(heure, str):
+        if len(heure) == 8 and heure[2] == ":" and heure[5] == ":":
+            return int(heure[0:2]) * 3600 + int(heure[3:5]) * 60 + int(heure[6:8])
+        heure = datetime.strptime(heure, "%H:%M:%S").time()
+    return heure.hour * 3600 + heure.minute * 60 + heure.second
+
+
+def creneau_pointage(pointage: Dict[str, Any]) -> int:
+    """
+    Index du créneau d'un pointage (session matin ou non, arrivée ou non)
+    """
+    apres_midi = pointage["session"] != "matin"
+    sortie = pointage.get("type_pointage", "arrivee") != "arrivee"
+    return 2 * apres_midi + sortie
+
+
+def remplir_secondes(
+    agent_ids: Sequence[str],
+    index_jours: Dict[str, int],
+    pointages_par_agent: Dict[str, List[Dict[str, Any]]]
+) -> Tuple[np.ndarray, List[Any]]:
+    """
+    Matrice agents × jours × 4 des heures de pointage en secondes (-1 sans pointage)
+    et heures d'origine à plat (indice (agent * jours + jour) * 4 + créneau).
+    Le dernier pointage d'un créneau l'emporte; une heure vide le laisse sans pointage.
+    """
+    nb_agents, nb_jours = len(agent_ids), len(index_jours)
+    secondes_plat = [-1] * (nb_agents * nb_jours * 4)
+    heures_plat: List[Any] = [None] * (nb_agents * nb_jours * 4)
+    # Heures déjà converties (les mêmes heures reviennent d'un jour à l'autre)
+    secondes_par_heure: Dict[Any, int] = {}
+    for a, agent_id in enumerate(agent_ids):
+        base = a * nb_jours
+        for pointage in pointages_par_agent.get(agent_id, ()):
+            jour = index_jours.get(pointage["date_pointage"])
+            if jour is None:
+                continue
+            indice = (base + jour) * 4 + creneau_pointage(pointage)
+            heure = pointage["heure_pointage"]
+            heures_plat[indice] = heure
+            if not heure:
+                secondes_plat[indice] = -1
+                continue
+            valeur = secondes_par_heure.get(heure)
+            if valeur is None:
+                valeur = secondes_par_heure[heure] = heure_en_secondes(heure)
+            secondes_plat[indice] = valeur
+    secondes = np.array(secondes_plat, dtype=np.int64).reshape(nb_agents, nb_jours, 4)
+    return secondes, heures_plat
+
+
+def classer_jours(secondes: np.ndarray, seuils: np.ndarray) -> ClassementJours:
+    """
+    Présence par session et minutes de retard (arrivée après le seuil, secondes
+    ignorées) ou de sortie anticipée (sortie avant le seuil, minutes entamées non
+    comptées) par créneau, 0 pour un créneau sans pointage
+    """
+    present = secondes >= 0
+    retards = np.empty_like(secondes)
+    retards[:, :, MATIN_ARRIVEE] = (secondes[:, :, MATIN_ARRIVEE] - seuils[:, :, MATIN_ARRIVEE]) // 60
+    retards[:, :, MATIN_SORTIE] = (seuils[:, :, MATIN_SORTIE] - secondes[:, :, MATIN_SORTIE]) // 60
+    retards[:, :, APRES_MIDI_ARRIVEE] = (secondes[:, :, APRES_MIDI_ARRIVEE] - seuils[:, :, APRES_MIDI_ARRIVEE]) // 60
+    retards[:, :, APRES_MIDI_SORTIE] = (seuils[:, :, APRES_MIDI_SORTIE] - secondes[:, :, APRES_MIDI_SORTIE]) // 60
+    return ClassementJours(
+        retards=np.where(present, np.maximum(retards, 0), 0),
+        present_matin=present[:, :, MATIN_ARRIVEE] | present[:, :, MATIN_SORTIE],
+        present_aprem=present[:, :, APRES_MIDI_ARRIVEE] | present[:, :, APRES_MIDI_SORTIE]
+    )
@@ -24,14 +24,14 @@ async def get_paie_agent(
     Accessible uniquement aux administrateurs
     """
     try:
-        logger.info(f"Calcul de paie pour l'agent {agent_id} - {mois}/{annee}")
+        logger.info("Calcul de paie pour l'agent %s - %s/%s", agent_id, mois, annee)
         paie = await calculer_paie_agent(agent_id, mois, annee)
         return paie
     except ValueError as e:
-        logger.error(f"Erreur de validation: {str(e)}")
+        logger.error("Erreur de validation: %s", e)
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"Erreur lors du calcul de paie: {str(e)}")
+        logger.error("Erreur lors du calcul de paie: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur lors du calcul de paie: {str(e)}")
 
 
@@ -46,9 +46,9 @@ async def get_paies_tous_agents(
     Accessible uniquement aux administrateurs
     """
     try:
-        logger.info(f"Calcul des paies pour tous les agents - {mois}/{annee}")
+        logger.info("Calcul des paies pour tous les agents - %s/%s", mois, annee)
         paies = await calculer_paies_tous_agents(mois, annee)
         return paies
     except Exception as e:
-        logger.error(f"Erreur lors du calcul des paies: {str(e)}")
+        logger.error("Erreur lors du calcul des paies: %s", e)
         raise HTTPException(status_code=500, detail=f"Erreur lors du calcul des paies: {str(e)}")
@@ -1,96 +1,29 @@
 from datetime import datetime, date, time, timedelta, timezone
 from typing import Dict, Any, List
+import asyncio
 import calendar
 import logging
+import os
+import time as horloge
 
-from app.db import get_db
+from app.db import get_db, fetch_all_rows
+from app.paie.cache import PAIE_CACHE_ENABLED, cache_paies, cle_mois, mois_clos
 from app.paie.models import ParametresPaie, CalculPaie
+# PARAMETRES_PAIE_PAR_ROLE est défini avec les règles communes paie/suivi (app/paie/regles.py)
+from app.paie.regles import PARAMETRES_PAIE_PAR_ROLE, horaires_jour, parametres_role
 
 logger = logging.getLogger(__name__)
 
 # Fuseau horaire GMT+1
 TIMEZONE = timezone(timedelta(hours=1))
 
-# Paramètres de paie par rôle
-PARAMETRES_PAIE_PAR_ROLE = {
-    "agent": ParametresPaie(
-        role="agent",
-        taux_horaire=182.18,
-        heures_par_jour=8,
-        heures_par_mois=174,
-        jours_travail_mois=22,
-        frais_panier=500.0,
-        frais_transport=200.0
-    ),
-    "admin": ParametresPaie(
-        role="admin",
-        taux_horaire=182.18,
-        heures_par_jour=8,
-        heures_par_mois=174,
-        jours_travail_mois=22,
-        frais_panier=500.0,
-        frais_transport=200.0
-    ),
-    "informaticien": ParametresPaie(
-        role="informaticien",
-        taux_horaire=182.18,
-        heures_par_jour=8,
-        heures_par_mois=174,
-        jours_travail_mois=22,
-        frais_panier=500.0,
-        frais_transport=200.0
-    ),
-    "analyste_informaticienne": ParametresPaie(
-        role="analyste_informaticienne",
-        taux_horaire=182.18,
-        heures_par_jour=8,
-        heures_par_mois=174,
-        jours_travail_mois=22,
-        frais_panier=500.0,
-        frais_transport=200.0
-    ),
-    "superviseur": ParametresPaie(
-        role="superviseur",
-        taux_horaire=182.18,
-        heures_par_jour=8,
-        heures_par_mois=174,
-        jours_travail_mois=22,
-        frais_panier=500.0,
-        frais_transport=200.0
-    ),
-    "agent_administratif": ParametresPaie(
-        role="agent_administratif",
-        taux_horaire=182.18,
-        heures_par_jour=8,
-        heures_par_mois=174,
-        jours_travail_mois=22,
-        frais_panier=500.0,
-        frais_transport=200.0
-    ),
-    "charge_administration": ParametresPaie(
-        role="charge_administration",
-        taux_horaire=182.18,
-        heures_par_jour=6,  # 9h-12h + 13h-16h = 6h par jour
-        heures_par_mois=132,  # 6h * 22 jours
-        jours_travail_mois=22,
-        frais_panier=500.0,
-        frais_transport=200.0,
-        heure_debut_matin=9 * 60 + 5,  # 9h05 - retard à partir de 9h05
-        heure_fin_matin=11 * 60 + 55,  # 11h55 - déduction si sortie avant
-        heure_debut_aprem=13 * 60 + 5,  # 13h05 - retard à partir de 13h05
-        heure_fin_aprem=15 * 60 + 55  # 15h55 - déduction si sortie avant (fin à 16h)
-    ),
-    "agent_etudiant": ParametresPaie(
-        role="agent_etudiant",
-        taux_horaire=182.18,
-        heures_par_jour=8,  # À ajuster selon le temps partiel
-        heures_par_mois=174,  # À ajuster selon le temps partiel
-        jours_travail_mois=22,
-        frais_panier=500.0,
-        frais_transport=200.0
-    )
-}
+# Calcul de tous les agents par le moteur vectorisé (app/paie/calcul_vectorise.py)
+# plutôt que par la boucle jour par jour de calculer_paie_depuis_donnees
+PAIE_CALCUL_VECTORISE = os.environ.get("PAIE_CALCUL_VECTORISE", "true").lower() != "false"
 
+# Paie du mois en cours d'un agent servie par les cumuls tenus à jour au fil des
+# pointages (app/paie/mois_en_cours.py) plutôt que recalculée depuis la base
+PAIE_MOIS_EN_COURS_INCREMENTAL = os.environ.get("PAIE_MOIS_EN_COURS_INCREMENTAL", "true").lower() != "false"
 
 def get_heure_debut_aprem(date_jour: date, params: ParametresPaie) -> time:
     """
@@ -98,10 +31,8 @@ def get_heure_debut_aprem(date_jour: date, params: ParametresPaie) -> time:
     - Vendredi (weekday=4): 13h15
     - Autres jours: heure définie dans les paramètres (par défaut 13h05)
     """
-    if date_jour.weekday() == 4:  # Vendredi
-        return time(13, 15)
-    else:
-        return time(params.heure_debut_aprem // 60, params.heure_debut_aprem % 60)
+    debut_aprem = horaires_jour(params.role, date_jour.weekday()).debut_aprem
+    return time(debut_aprem // 3600, debut_aprem // 60 % 60)
 
 
 def calculer_retard_minutes(heure_arrivee: time, heure_debut_theorique: time = time(8, 5)) -> int:
@@ -120,19 +51,124 @@ def calculer_retard_minutes(heure_arrivee: time, heure_debut_theorique: time = t
     return max(0, retard)
 
 
+def get_bornes_mois(mois: int, annee: int) -> tuple[date, date]:
+    """
+    Retourne le premier et le dernier jour à calculer pour un mois
+    (limité à aujourd'hui pour le mois en cours)
+    """
+    premier_jour = date(annee, mois, 1)
+    dernier_jour_mois = date(annee, mois, calendar.monthrange(annee, mois)[1])
+    
+    # Limiter au jour actuel si on est dans le mois en cours
+    aujourd_hui = date.today()
+    if annee == aujourd_hui.year and mois == aujourd_hui.month:
+        return premier_jour, aujourd_hui
+    return premier_jour, dernier_jour_mois
+
+
+def extraire_dates_exceptions(exceptions: List[Dict[str, Any]]) -> set:
+    """
+    Extrait les dates des jours fériés travaillés à partir des lignes
+    jours_feries_exceptions jointes à jours_feries(date_ferie)
+    """
+    exceptions_dates = set()
+    for exc in exceptions:
+        if exc.get("jours_feries") and exc["jours_feries"].get("date_ferie"):
+            exceptions_dates.add(exc["jours_feries"]["date_ferie"])
+    return exceptions_dates
+
+
 async def calculer_paie_agent(agent_id: str, mois: int, annee: int) -> CalculPaie:
     """
-    Calcule la paie d'un agent pour un mois donné
+    Calcule la paie d'un agent pour un mois donné (instantané du cache pour un mois
+    clos, cumuls en mémoire pour le mois en cours)
     """
+    aujourd_hui = date.today()
+    if PAIE_MOIS_EN_COURS_INCREMENTAL and (annee, mois) == (aujourd_hui.year, aujourd_hui.month):
+        from app.paie.mois_en_cours import paie_mois_en_cours
+        return await paie_mois_en_cours.calculer(agent_id)
+
+    en_cache = PAIE_CACHE_ENABLED and mois_clos(mois, annee)
+    if en_cache:
+        paie = await asyncio.to_thread(cache_paies.lire, agent_id, cle_mois(mois, annee))
+        if paie is not None:
+            logger.debug("Paie de l'agent %s pour %s/%s servie depuis le cache", agent_id, mois, annee)
+            return paie
+        debut = horloge.time()
+    
     db = await get_db()
     
     # Récupérer les informations de l'agent
-    agent_response = db.table("agents").select("*").eq("id", agent_id).execute()
+    agent_response = await db.table("agents").select("*").eq("id", agent_id).execute()
     
     if not agent_response.data or len(agent_response.data) == 0:
         raise ValueError(f"Agent {agent_id} non trouvé")
     
     agent = agent_response.data[0]
+    premier_jour, dernier_jour = get_bornes_mois(mois, annee)
+    
+    # Récupérer les jours fériés du mois
+    jours_feries_response = await db.table("jours_feries").select("id, date_ferie, nom").gte("date_ferie", premier_jour.isoformat()).lte("date_ferie", dernier_jour.isoformat()).execute()
+    
+    # Récupérer les exceptions pour cet agent (jours fériés où il travaille)
+    exceptions_response = await db.table("jours_feries_exceptions").select("jour_ferie_id, jours_feries(date_ferie)").eq("agent_id", agent_id).execute()
+    exceptions_dates = extraire_dates_exceptions(exceptions_response.data or [])
+    
+    # Récupérer tous les pointages du mois (exclure les annulés)
+    pointages_response = await db.table("pointages").select("*").eq("agent_id", agent_id).gte("date_pointage", premier_jour.isoformat()).lte("date_pointage", dernier_jour.isoformat()).or_("annule.is.null,annule.eq.false").order("date_pointage").order("heure_pointage").order("id").execute()
+    
+    # Récupérer les primes pour ce mois
+    primes_response = await db.table("primes").select("*").eq("agent_id", agent_id).eq("mois", mois).eq("annee", annee).execute()
+    
+    if PAIE_CALCUL_VECTORISE:
+        # Même moteur que le calcul de tous les agents (import local: calcul_vectorise importe ce module)
+        from app.paie.calcul_vectorise import calculer_paies_vectorise
+        paies, erreurs = calculer_paies_vectorise(
+            [agent],
+            mois,
+            annee,
+            jours_feries_response.data or [],
+            {agent_id: exceptions_dates},
+            {agent_id: pointages_response.data or []},
+            {agent_id: primes_response.data or []}
+        )
+        if erreurs:
+            raise erreurs[0][1]
+        paie = paies[0]
+    else:
+        paie = calculer_paie_depuis_donnees(
+            agent,
+            mois,
+            annee,
+            jours_feries_response.data or [],
+            exceptions_dates,
+            pointages_response.data or [],
+            primes_response.data or []
+        )
+    
+    if en_cache:
+        await asyncio.to_thread(cache_paies.enregistrer, [paie], debut)
+    return paie
+
+
+def calculer_paie_depuis_donnees(
+    agent: Dict[str, Any],
+    mois: int,
+    annee: int,
+    jours_feries: List[Dict[str, Any]],
+    exceptions_dates: set,
+    pointages: List[Dict[str, Any]],
+    primes: List[Dict[str, Any]]
+) -> CalculPaie:
+    """
+    Calcule la paie d'un agent à partir de données déjà chargées (aucune requête)
+    
+    - jours_feries: lignes jours_feries (id, date_ferie, nom) du mois
+    - exceptions_dates: dates des jours fériés travaillés par l'agent
+    - pointages: pointages non annulés de l'agent sur le mois
+    - primes: primes de l'agent pour le mois
+    """
+    agent_id = agent["id"]
     
     # Vérifier les champs obligatoires
     if not agent.get("nom"):
@@ -143,40 +179,17 @@ async def calculer_paie_agent(agent_id: str, mois: int, annee: int) -> CalculPai
     role = agent.get("role", "agent")
     
     # Récupérer les paramètres de paie pour ce rôle
-    params = PARAMETRES_PAIE_PAR_ROLE.get(role, PARAMETRES_PAIE_PAR_ROLE["agent"])
-    
-    # Calculer les dates de début et fin du mois
-    premier_jour = date(annee, mois, 1)
-    dernier_jour_mois = date(annee, mois, calendar.monthrange(annee, mois)[1])
-    
-    # Limiter au jour actuel si on est dans le mois en cours
-    aujourd_hui = date.today()
-    if annee == aujourd_hui.year and mois == aujourd_hui.month:
-        dernier_jour = aujourd_hui
-    else:
-        dernier_jour = dernier_jour_mois
-    
-    logger.info(f"Calcul de paie pour {agent['nom']} ({role}) - {mois}/{annee} (jusqu'au {dernier_jour})")
+    params = parametres_role(role)
     
-    # Récupérer les jours fériés du mois
-    jours_feries_response = db.table("jours_feries").select("id, date_ferie, nom").gte("date_ferie", premier_jour.isoformat()).lte("date_ferie", dernier_jour.isoformat()).execute()
-    jours_feries_set = set(jf["date_ferie"] for jf in (jours_feries_response.data or []))
-    jours_feries_ids = {jf["date_ferie"]: jf["id"] for jf in (jours_feries_response.data or [])}
-    jours_feries_noms = {jf["date_ferie"]: jf["nom"] for jf in (jours_feries_response.data or [])}
-    logger.info(f"Jours fériés trouvés pour {mois}/{annee}: {len(jours_feries_set)}")
-    
-    # Récupérer les exceptions pour cet agent (jours fériés où il travaille)
-    exceptions_response = db.table("jours_feries_exceptions").select("jour_ferie_id, jours_feries(date_ferie)").eq("agent_id", agent_id).execute()
-    exceptions_dates = set()
-    for exc in (exceptions_response.data or []):
-        if exc.get("jours_feries") and exc["jours_feries"].get("date_ferie"):
-            exceptions_dates.add(exc["jours_feries"]["date_ferie"])
-    logger.info(f"Exceptions pour agent {agent_id}: {len(exceptions_dates)} jours fériés travaillés")
+    premier_jour, dernier_jour = get_bornes_mois(mois, annee)
     
-    # Récupérer tous les pointages du mois (exclure les annulés)
-    pointages_response = db.table("pointages").select("*").eq("agent_id", agent_id).gte("date_pointage", premier_jour.isoformat()).lte("date_pointage", dernier_jour.isoformat()).or_("annule.is.null,annule.eq.false").order("date_pointage").execute()
+    logger.info("Calcul de paie pour %s (%s) - %s/%s (jusqu'au %s)", agent['nom'], role, mois, annee, dernier_jour)
     
-    pointages = pointages_response.data if pointages_response.data else []
+    jours_feries_set = set(jf["date_ferie"] for jf in jours_feries)
+    jours_feries_ids = {jf["date_ferie"]: jf["id"] for jf in jours_feries}
+    jours_feries_noms = {jf["date_ferie"]: jf["nom"] for jf in jours_feries}
+    logger.info("Jours fériés trouvés pour %s/%s: %s", mois, annee, len(jours_feries_set))
+    logger.info("Exceptions pour agent %s: %s jours fériés travaillés", agent_id, len(exceptions_dates))
     
     # Organiser les pointages par date
     pointages_par_date = {}
@@ -218,7 +231,7 @@ async def calculer_paie_agent(agent_id: str, mois: int, annee: int) -> CalculPai
                 jours_feries_en_semaine += 1
         current_date += timedelta(days=1)
     
-    logger.info(f"Jours ouvrés: {jours_ouvres}, Jours fériés (en semaine, payés): {jours_feries_en_semaine}, Exceptions (travaillés): {len(exceptions_dates)}")
+    logger.info("Jours ouvrés: %s, Jours fériés (en semaine, payés): %s, Exceptions (travaillés): %s", jours_ouvres, jours_feries_en_semaine, len(exceptions_dates))
     
     # Analyser chaque jour
     jours_travailles = 0
@@ -265,10 +278,9 @@ async def calculer_paie_agent(agent_id: str, mois: int, annee: int) -> CalculPai
             # Absence complète = absent matin ET après-midi
             absence_complete = absent_matin and absent_apres_midi
             
-            print(f"📅 {date_str}: matin_arr={jour_data.get('matin_arrivee')}, matin_sort={jour_data.get('matin_sortie')}, "
-                  f"apm_arr={jour_data.get('apres_midi_arrivee')}, apm_sort={jour_data.get('apres_midi_sortie')}")
-            print(f"   → Absent matin: {absent_matin}, Absent après-midi: {absent_apres_midi}, Absence complète: {absence_complete}")
-            print(f"   → Jour férié travaillé: {est_jour_ferie_travaille}")
+            logger.debug("📅 %s: matin_arr=%s, matin_sort=%s, apm_arr=%s, apm_sort=%s", date_str, jour_data.get('matin_arrivee'), jour_data.get('matin_sortie'), jour_data.get('apres_midi_arrivee'), jour_data.get('apres_midi_sortie'))
+            logger.debug("   → Absent matin: %s, Absent après-midi: %s, Absence complète: %s", absent_matin, absent_apres_midi, absence_complete)
+            logger.debug("   → Jour férié travaillé: %s", est_jour_ferie_travaille)
             
             # Si jour férié travaillé et présent, compter comme double journée
             if est_jour_ferie_travaille and not absence_complete:
@@ -279,7 +291,7 @@ async def calculer_paie_agent(agent_id: str, mois: int, annee: int) -> CalculPai
                     "nom": nom_jour_ferie,
                     "type": "travaille"
                 })
-                print(f"   🎉 BONUS: Jour férié travaillé ({nom_jour_ferie}) - sera payé double!")
+                logger.debug("   🎉 BONUS: Jour férié travaillé (%s) - sera payé double!", nom_jour_ferie)
             
             if absence_complete:
                 # Absence complète
@@ -487,27 +499,23 @@ async def calculer_paie_agent(agent_id: str, mois: int, annee: int) -> CalculPai
     bonus_jours_feries = jours_feries_travailles * salaire_journee_complet
     
     if jours_feries_travailles > 0:
-        logger.info(f"   🎉 BONUS Jours fériés travaillés: {jours_feries_travailles} jour(s) × {salaire_journee_complet} DA = {bonus_jours_feries} DA")
+        logger.info("   🎉 BONUS Jours fériés travaillés: %s jour(s) × %s DA = %s DA", jours_feries_travailles, salaire_journee_complet, bonus_jours_feries)
     
     # Salaire net = Salaire de base + Frais + Bonus jours fériés
     salaire_net = salaire_base + frais_panier_total + frais_transport_total + bonus_jours_feries
     
-    # Récupérer les primes pour ce mois
-    primes_response = db.table("primes").select("*").eq("agent_id", agent_id).eq("mois", mois).eq("annee", annee).execute()
-    
     details_primes = []
     primes_total = 0.0
     
-    if primes_response.data:
-        for prime in primes_response.data:
-            primes_total += prime["montant"]
-            details_primes.append({
-                "montant": prime["montant"],
-                "motif": prime["motif"],
-                "id": prime["id"]
-            })
+    for prime in primes:
+        primes_total += prime["montant"]
+        details_primes.append({
+            "montant": prime["montant"],
+            "motif": prime["motif"],
+            "id": prime["id"]
+        })
     
-    logger.info(f"   Primes: {primes_total} DA ({len(details_primes)} prime(s))")
+    logger.info("   Primes: %s DA (%s prime(s))", primes_total, len(details_primes))
     
     # Retenues calculées sur le salaire de base (heures travaillées × taux horaire)
     retenues_9_pourcent = salaire_base * 0.09  # 9% du salaire de base
@@ -554,37 +562,101 @@ async def calculer_paie_agent(agent_id: str, mois: int, annee: int) -> CalculPai
 async def calculer_paies_tous_agents(mois: int, annee: int) -> List[CalculPaie]:
     """
     Calcule les paies de tous les agents pour un mois donné
+    
+    Les agents, jours fériés, exceptions, pointages et primes du mois sont chargés
+    une seule fois pour tous les agents (quelques requêtes au lieu de 5 par agent),
+    puis regroupés en mémoire par agent. Pour un mois clos, les paies sont servies
+    depuis le cache si tous les agents y sont, et y sont enregistrées sinon.
     """
+    en_cache = PAIE_CACHE_ENABLED and mois_clos(mois, annee)
+    debut = horloge.time()
     db = await get_db()
     
     # Récupérer tous les agents
-    agents_response = db.table("agents").select("*").execute()
+    agents_response = await db.table("agents").select("*").execute()
     
     if not agents_response.data:
         return []
     
     total_agents = len(agents_response.data)
-    logger.info(f"📊 Total d'agents dans la base: {total_agents}")
-    
-    paies = []
-    erreurs = 0
-    
-    for agent in agents_response.data:
-        try:
-            paie = await calculer_paie_agent(agent["id"], mois, annee)
-            paies.append(paie)
-        except Exception as e:
-            erreurs += 1
-            import traceback
-            error_details = ''.join(traceback.format_exception(type(e), e, e.__traceback__))
-            print(f"\n❌ ERREUR lors du calcul de paie pour {agent['nom']} ({agent['role']}, ID: {agent['id']})")
-            print(f"   Type d'erreur: {type(e).__name__}")
-            print(f"   Message: {str(e)}")
-            print(f"   Traceback complet:")
-            print(error_details)
-            print("="*80 + "\n")
-            continue
+    logger.info("📊 Total d'agents dans la base: %s", total_agents)
+    
+    if en_cache:
+        agent_ids = [agent["id"] for agent in agents_response.data]
+        instantanes = await asyncio.to_thread(cache_paies.lire_agents, agent_ids, cle_mois(mois, annee))
+        if len(instantanes) == total_agents:
+            logger.info("✅ Paies de %s/%s servies depuis le cache (%s agents)", mois, annee, total_agents)
+            return [instantanes[str(agent_id)] for agent_id in agent_ids]
+    
+    premier_jour, dernier_jour = get_bornes_mois(mois, annee)
+    
+    # Jours fériés du mois (communs à tous les agents)
+    jours_feries_response = await db.table("jours_feries").select("id, date_ferie, nom").gte("date_ferie", premier_jour.isoformat()).lte("date_ferie", dernier_jour.isoformat()).execute()
+    jours_feries = jours_feries_response.data or []
     
-    logger.info(f"✅ Paies calculées: {len(paies)}/{total_agents} agents (Erreurs: {erreurs})")
+    # Exceptions de tous les agents, regroupées par agent
+    exceptions_response = await db.table("jours_feries_exceptions").select("agent_id, jour_ferie_id, jours_feries(date_ferie)").execute()
+    exceptions_par_agent: Dict[str, List[Dict[str, Any]]] = {}
+    for exc in (exceptions_response.data or []):
+        exceptions_par_agent.setdefault(exc["agent_id"], []).append(exc)
     
+    # Pointages du mois de tous les agents (exclure les annulés), paginés
+    pointages = await fetch_all_rows(
+        lambda: db.table("pointages").select("*").gte("date_pointage", premier_jour.isoformat()).lte("date_pointage", dernier_jour.isoformat()).or_("annule.is.null,annule.eq.false").order("date_pointage").order("heure_pointage").order("id")
+    )
+    pointages_par_agent: Dict[str, List[Dict[str, Any]]] = {}
+    for pointage in pointages:
+        pointages_par_agent.setdefault(pointage["agent_id"], []).append(pointage)
+    
+    # Primes du mois de tous les agents
+    primes_response = await db.table("primes").select("*").eq("mois", mois).eq("annee", annee).execute()
+    primes_par_agent: Dict[str, List[Dict[str, Any]]] = {}
+    for prime in (primes_response.data or []):
+        primes_par_agent.setdefault(prime["agent_id"], []).append(prime)
+    
+    logger.info("📦 Données chargées: %s pointages, %s jours fériés, %s primes", len(pointages), len(jours_feries), len(primes_response.data or []))
+    
+    exceptions_dates_par_agent = {
+        agent_id: extraire_dates_exceptions(exceptions)
+        for agent_id, exceptions in exceptions_par_agent.items()
+    }
+    
+    if PAIE_CALCUL_VECTORISE:
+        # Import local: calcul_vectorise importe ce module
+        from app.paie.calcul_vectorise import calculer_paies_vectorise
+        paies, agents_en_erreur = calculer_paies_vectorise(
+            agents_response.data,
+            mois,
+            annee,
+            jours_feries,
+            exceptions_dates_par_agent,
+            pointages_par_agent,
+            primes_par_agent
+        )
+    else:
+        paies = []
+        agents_en_erreur = []
+        for agent in agents_response.data:
+            try:
+                paie = calculer_paie_depuis_donnees(
+                    agent,
+                    mois,
+                    annee,
+                    jours_feries,
+                    exceptions_dates_par_agent.get(agent["id"], set()),
+                    pointages_par_agent.get(agent["id"], []),
+                    primes_par_agent.get(agent["id"], [])
+                )
+                paies.append(paie)
+            except Exception as e:
+                agents_en_erreur.append((agent, e))
+    
+    erreurs = len(agents_en_erreur)
+    for agent, e in agents_en_erreur:
+        logger.error("❌ ERREUR lors du calcul de paie pour %s (%s, ID: %s): %s", agent['nom'], agent['role'], agent['id'], e, exc_info=e)
+    
+    logger.info("✅ Paies calculées: %s/%s agents (Erreurs: %s)", len(paies), total_agents, erreurs)
+    
+    if en_cache:
+        await asyncio.to_thread(cache_paies.enregistrer, paies, debut)
     return paies
@@ -0,0 +1,134 @@
+"""
+Clés d'idempotence des endpoints de scan.
+
+Le client envoie un en-tête Idempotency-Key (généré une fois par scan, réutilisé
+pour ses nouvelles tentatives). Le résultat de la première exécution est gardé
+POINTAGE_IDEMPOTENCE_TTL_SECONDS secondes. Une nouvelle tentative reçoit ce
+résultat tel quel, sans passer par determine_session_for_agent ni par la base.
+Une tentative qui arrive pendant la première exécution attend son résultat.
+
+Seules les réponses définitives sont conservées: succès et refus métier (4xx).
+Après une erreur serveur (5xx), une nouvelle tentative exécute à nouveau le scan.
+Le cache est propre à chaque processus.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+# Durée de conservation des résultats et nombre maximal de clés gardées
+POINTAGE_IDEMPOTENCE_TTL_SECONDS = float(os.environ.get("POINTAGE_IDEMPOTENCE_TTL_SECONDS", "600"))
+POINTAGE_IDEMPOTENCE_MAX_SIZE = int(os.environ.get("POINTAGE_IDEMPOTENCE_MAX_SIZE", "10000"))
+
+# Longueur maximale acceptée pour une clé fournie par le client
+LONGUEUR_MAX_CLE = 200
+
+
+def cle_idempotence(idempotency_key: Optional[str], agent_id: str, endpoint: str, corps: Dict[str, Any]) -> Optional[str]:
+    """
+    Clé de cache d'une requête: clé du client, agent, endpoint et empreinte du corps.
+    Une même clé réutilisée avec un autre corps (ex: force_confirmation) est une
+    nouvelle opération. None si le client n'a pas fourni de clé.
+    """
+    if not idempotency_key:
+        return None
+    if len(idempotency_key) > LONGUEUR_MAX_CLE:
+        raise ValueError(f"Idempotency-Key trop longue (maximum {LONGUEUR_MAX_CLE} caractères)")
+    empreinte = hashlib.sha256(json.dumps(corps, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"{agent_id}:{endpoint}:{idempotency_key}:{empreinte}"
+
+
+class CacheIdempotence:
+    """
+    Résultats des requêtes idempotentes (LRU borné avec expiration)
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # cle -> (expire_a, statut HTTP, résultat ou détail de l'erreur)
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._en_cours: Dict[str, asyncio.Future] = {}
+
+    def get(self, cle: str) -> Optional[Tuple[int, Any]]:
+        entry = self._entries.get(cle)
+        if entry is None:
+            return None
+        expire_a, statut, valeur = entry
+        if time.monotonic() >= expire_a:
+            del self._entries[cle]
+            return None
+        self._entries.move_to_end(cle)
+        return statut, valeur
+
+    def set(self, cle: str, statut: int, valeur: Any) -> None:
+        self._entries.pop(cle, None)
+        self._entries[cle] = (time.monotonic() + self.ttl_seconds, statut, valeur)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def executer(self, cle: Optional[str], fonction: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Exécute fonction une seule fois par clé. Retourne (résultat, rejoué).
+        Les refus (HTTPException) sont relevés à l'identique lors des nouvelles tentatives.
+        """
+        if cle is None:
+            return await fonction(), False
+
+        while True:
+            deja = self.get(cle)
+            if deja is None and cle in self._en_cours:
+                # Même requête en cours de traitement: attendre son issue
+                futur = self._en_cours[cle]
+                try:
+                    deja = await asyncio.shield(futur)
+                except asyncio.CancelledError:
+                    if futur.cancelled():
+                        # Requête d'origine interrompue (client déconnecté): prendre le relais
+                        continue
+                    raise
+            break
+
+        if deja is not None:
+            statut, valeur = deja
+            if statut >= 400:
+                raise HTTPException(status_code=statut, detail=valeur)
+            return valeur, True
+
+        futur = asyncio.get_running_loop().create_future()
+        self._en_cours[cle] = futur
+        try:
+            resultat = await fonction()
+        except HTTPException as e:
+            if e.status_code < 500:
+                self.set(cle, e.status_code, e.detail)
+                futur.set_result((e.status_code, e.detail))
+            else:
+                futur.set_exception(e)
+            raise
+        except Exception as e:
+            futur.set_exception(e)
+            raise
+        except BaseException:
+            futur.cancel()
+            raise
+        else:
+            self.set(cle, 200, resultat)
+            futur.set_result((200, resultat))
+            return resultat, False
+        finally:
+            self._en_cours.pop(cle, None)
+            # Erreur déjà relevée par la requête d'origine: la marquer comme récupérée
+            if not futur.cancelled():
+                futur.exception()
+
+
+cache_idempotence = CacheIdempotence(POINTAGE_IDEMPOTENCE_MAX_SIZE, POINTAGE_IDEMPOTENCE_TTL_SECONDS)
@@ -21,6 +21,16 @@ class PointageScanOffline(BaseModel):
     offline_timestamp: Optional[str] = None
 
 
+class PointageScanBatchItem(PointageScanOffline):
+    """Scan d'une file hors-ligne synchronisée en une fois"""
+    client_id: Optional[str] = None  # Identifiant local du scan, renvoyé dans le résultat
+
+
+class PointageScanBatch(BaseModel):
+    """File de scans hors-ligne (ordre de la file du téléphone)"""
+    scans: List[PointageScanBatchItem]
+
+
 class Pointage(PointageBase):
     id: UUID
     date_pointage: date
@@ -1,24 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
 from typing import List, Optional
 from datetime import date, timedelta, datetime
+import logging
 
 from app.auth.utils import get_current_active_user
 from app.auth.models import User
-from app.pointage.models import PointageCreate, PointageResponse, PointageJour, PointageScanOffline
-from app.pointage.utils import create_pointage, format_pointages_by_date, create_pointage_offline
-from app.pointage.suivi_utils import get_agent_daily_tracking
+from app.pointage.models import PointageCreate, PointageResponse, PointageJour, PointageScanOffline, PointageScanBatch
+from app.pointage.utils import create_pointage, format_pointages_by_date, create_pointage_offline, create_pointages_offline_batch
+from app.pointage.suivi_utils import get_agents_daily_tracking
+from app.pointage.idempotence import cache_idempotence, cle_idempotence
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-@router.post("/")
-async def enregistrer_pointage(pointage: PointageCreate, current_user: User = Depends(get_current_active_user)):
+async def _enregistrer_pointage(pointage: PointageCreate, current_user: User):
     """
-    Endpoint pour enregistrer un pointage
-    
-    Si l'agent rescanne dans les 5 minutes après son arrivée (matin ou après-midi),
-    le système retourne needs_confirmation=True avec un message de confirmation.
-    L'agent doit alors renvoyer la requête avec force_confirmation=True pour valider.
+    Traitement de /api/pointage/ (hors idempotence)
     """
     # Vérifier que l'agent pointe pour lui-même
     if str(current_user.id) != str(pointage.agent_id):
@@ -64,6 +63,37 @@ async def enregistrer_pointage(pointage: PointageCreate, current_user: User = De
         )
 
 
+@router.post("/")
+async def enregistrer_pointage(
+    pointage: PointageCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Endpoint pour enregistrer un pointage
+    
+    Si l'agent rescanne dans les 5 minutes après son arrivée (matin ou après-midi),
+    le système retourne needs_confirmation=True avec un message de confirmation.
+    L'agent doit alors renvoyer la requête avec force_confirmation=True pour valider.
+    
+    Un en-tête Idempotency-Key rend les nouvelles tentatives sans effet: le résultat
+    de la première exécution est renvoyé (en-tête Idempotent-Replayed: true).
+    """
+    try:
+        cle = cle_idempotence(idempotency_key, str(current_user.id), "/api/pointage/", pointage.model_dump())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    resultat, rejoue = await cache_idempotence.executer(cle, lambda: _enregistrer_pointage(pointage, current_user))
+    if rejoue:
+        response.headers["Idempotent-Replayed"] = "true"
+    return resultat
+
+
 @router.get("/me", response_model=List[PointageJour])
 async def mes_pointages(
     start_date: Optional[date] = Query(None),
@@ -102,15 +132,12 @@ async def mon_suivi_quotidien(
     avec les montants déduits pour chaque jour
     """
     try:
-        print(f"🔍 Suivi demandé pour {current_user.nom} ({current_user.id}) du {start_date} au {end_date}")
-        tracking = await get_agent_daily_tracking(str(current_user.id), start_date, end_date)
-        
-        # Calculer les totaux
-        total_retard_minutes = sum(day["retard_total_minutes"] for day in tracking)
-        total_absences = sum(1 for day in tracking if day["est_absent"])
-        total_montant_deduit = sum(day["montant_total_deduit"] for day in tracking)
+        logger.debug("🔍 Suivi demandé pour %s (%s) du %s au %s", current_user.nom, current_user.id, start_date, end_date)
+        agent_id = str(current_user.id)
+        suivi = (await get_agents_daily_tracking([agent_id], start_date, end_date, {agent_id: current_user.role}))[agent_id]
+        totaux = suivi["totaux"]
         
-        print(f"✅ Suivi calculé: {len(tracking)} jours, {total_absences} absences, {total_retard_minutes} min de retard")
+        logger.debug("✅ Suivi calculé: %s jours, %s absences, %s min de retard", len(suivi["details_quotidiens"]), totaux["nombre_absences"], totaux["retard_total_minutes"])
         
         return {
             "agent_id": str(current_user.id),
@@ -119,45 +146,39 @@ async def mon_suivi_quotidien(
                 "debut": start_date.isoformat(),
                 "fin": end_date.isoformat()
             },
-            "totaux": {
-                "retard_total_minutes": total_retard_minutes,
-                "retard_total_heures": round(total_retard_minutes / 60, 2),
-                "nombre_absences": total_absences,
-                "montant_total_deduit": round(total_montant_deduit, 2)
-            },
-            "details_quotidiens": tracking
+            "totaux": totaux,
+            "details_quotidiens": suivi["details_quotidiens"]
         }
     except Exception as e:
-        print(f"❌ Erreur dans mon_suivi_quotidien: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Erreur dans mon_suivi_quotidien: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de la récupération du suivi: {str(e)}"
         )
 
 
-@router.post("/scan")
-async def enregistrer_pointage_scan(
-    pointage_data: PointageScanOffline,
-    current_user: User = Depends(get_current_active_user)
-):
+def parser_timestamp_hors_ligne(offline_timestamp: Optional[str]) -> Optional[datetime]:
     """
-    Endpoint pour enregistrer un pointage depuis un scan QR (avec support hors-ligne)
-    
-    Ce endpoint est utilisé pour la synchronisation des pointages effectués hors-ligne.
-    Le qr_data contient les données du QR code scanné.
-    Le offline_timestamp contient l'heure à laquelle le scan a été effectué (si hors-ligne).
+    Timestamp ISO d'un scan hors-ligne (None s'il est absent ou invalide)
+    """
+    if not offline_timestamp:
+        return None
+    try:
+        offline_time = datetime.fromisoformat(offline_timestamp.replace('Z', '+00:00'))
+        logger.debug("📱 Pointage hors-ligne reçu, timestamp original: %s", offline_time)
+        return offline_time
+    except ValueError as e:
+        logger.warning("⚠️ Erreur parsing timestamp hors-ligne: %s", e)
+        return None
+
+
+async def _enregistrer_pointage_scan(pointage_data: PointageScanOffline, current_user: User):
+    """
+    Traitement de /api/pointage/scan (hors idempotence)
     """
     try:
         # Parser le timestamp hors-ligne si fourni
-        offline_time = None
-        if pointage_data.offline_timestamp:
-            try:
-                offline_time = datetime.fromisoformat(pointage_data.offline_timestamp.replace('Z', '+00:00'))
-                print(f"📱 Pointage hors-ligne reçu, timestamp original: {offline_time}")
-            except ValueError as e:
-                print(f"⚠️ Erreur parsing timestamp hors-ligne: {e}")
+        offline_time = parser_timestamp_hors_ligne(pointage_data.offline_timestamp)
         
         # Créer le pointage avec le timestamp hors-ligne si disponible
         pointage_result = await create_pointage_offline(
@@ -181,10 +202,118 @@ async def enregistrer_pointage_scan(
             detail=str(e)
         )
     except Exception as e:
-        print(f"❌ Erreur pointage scan: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Erreur pointage scan: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de l'enregistrement du pointage: {str(e)}"
         )
+
+
+@router.post("/scan")
+async def enregistrer_pointage_scan(
+    pointage_data: PointageScanOffline,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Endpoint pour enregistrer un pointage depuis un scan QR (avec support hors-ligne)
+    
+    Ce endpoint est utilisé pour la synchronisation des pointages effectués hors-ligne.
+    Le qr_data contient les données du QR code scanné.
+    Le offline_timestamp contient l'heure à laquelle le scan a été effectué (si hors-ligne).
+    
+    Un en-tête Idempotency-Key rend les nouvelles tentatives sans effet: le résultat
+    de la première exécution est renvoyé (en-tête Idempotent-Replayed: true).
+    """
+    try:
+        cle = cle_idempotence(idempotency_key, str(current_user.id), "/api/pointage/scan", pointage_data.model_dump())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    resultat, rejoue = await cache_idempotence.executer(cle, lambda: _enregistrer_pointage_scan(pointage_data, current_user))
+    if rejoue:
+        response.headers["Idempotent-Replayed"] = "true"
+    return resultat
+
+
+async def _enregistrer_pointages_scan_batch(batch: PointageScanBatch, current_user: User):
+    """
+    Traitement de /api/pointage/scan/batch (hors idempotence)
+    """
+    try:
+        resultats = await create_pointages_offline_batch(
+            str(current_user.id),
+            [(scan.qr_data, parser_timestamp_hors_ligne(scan.offline_timestamp)) for scan in batch.scans]
+        )
+        
+        reponses = []
+        for index, (scan, resultat) in enumerate(zip(batch.scans, resultats)):
+            reponse = {
+                "index": index,
+                "client_id": scan.client_id,
+                "success": resultat["success"],
+                "was_offline": scan.offline_timestamp is not None
+            }
+            if resultat["success"]:
+                pointage_result = resultat["pointage"]
+                type_fr = "Arrivée" if pointage_result.get("type_pointage") == "arrivee" else "Sortie"
+                session_fr = "du matin" if pointage_result.get("session") == "matin" else "de l'après-midi"
+                reponse["message"] = f"{type_fr} {session_fr} enregistrée avec succès"
+                reponse["pointage"] = pointage_result
+            else:
+                reponse["error"] = resultat["error"]
+            reponses.append(reponse)
+        
+        synced = sum(1 for reponse in reponses if reponse["success"])
+        return {
+            "success": synced == len(reponses),
+            "synced": synced,
+            "failed": len(reponses) - synced,
+            "results": reponses
+        }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error("❌ Erreur synchronisation groupée: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lors de l'enregistrement des pointages: {str(e)}"
+        )
+
+
+@router.post("/scan/batch")
+async def enregistrer_pointages_scan_batch(
+    batch: PointageScanBatch,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Endpoint pour synchroniser en une requête une file de pointages hors-ligne
+    
+    Chaque scan est traité comme par /scan (validation du QR code, session selon
+    l'heure du scan) et obtient son propre résultat, dans l'ordre reçu. Les
+    pointages acceptés sont enregistrés ensemble.
+    
+    Un en-tête Idempotency-Key rend les nouvelles tentatives sans effet: le résultat
+    de la première exécution est renvoyé (en-tête Idempotent-Replayed: true).
+    """
+    try:
+        cle = cle_idempotence(idempotency_key, str(current_user.id), "/api/pointage/scan/batch", batch.model_dump())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    resultat, rejoue = await cache_idempotence.executer(cle, lambda: _enregistrer_pointages_scan_batch(batch, current_user))
+    if rejoue:
+        response.headers["Idempotent-Replayed"] = "true"
+    return resultat
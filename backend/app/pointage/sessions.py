@@ -0,0 +1,164 @@
+"""
+Automate de décision de session d'un scan (session, type de pointage, confirmation).
+
+L'état du jour d'un agent se résume à l'état de chaque session (matin, après-midi):
+aucun pointage, une arrivée, un seul pointage qui n'est pas une arrivée, ou deux
+pointages et plus. Les règles sont décrites par la table TRANSITIONS (première règle
+applicable) et compilées au chargement du module en une table plate indexée par
+(état matin, état après-midi, minute du jour): une décision est une simple lecture.
+
+Seule la confirmation (rescan moins de DELAI_CONFIRMATION_MINUTES après l'arrivée)
+dépend de l'heure exacte de l'arrivée; elle est vérifiée après la lecture de la table.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Délai minimum entre arrivée et sortie (en minutes)
+DELAI_CONFIRMATION_MINUTES = 5
+
+# Début de l'arrivée de l'après-midi (12h30) en minutes depuis minuit
+MINUTE_DEBUT_APREM = 12 * 60 + 30
+
+MINUTES_PAR_JOUR = 24 * 60
+
+# État d'une session
+VIDE = 0       # aucun pointage
+ARRIVEE = 1    # une arrivée
+INCOMPLET = 2  # un seul pointage qui n'est pas une arrivée
+COMPLET = 3    # deux pointages ou plus
+NB_ETATS = 4
+
+MESSAGE_TOUT_FAIT = "Vous avez déjà effectué tous vos pointages pour aujourd'hui."
+MESSAGE_MATIN_TERMINE = "La session du matin est terminée. Vous pouvez pointer l'après-midi à partir de 12h30."
+MESSAGE_QUATRE_POINTAGES = "Vous avez déjà effectué tous vos pointages pour aujourd'hui (4 pointages: 2 matin + 2 après-midi)."
+MESSAGE_INDETERMINE = "Impossible de déterminer le type de pointage. Veuillez contacter l'administrateur."
+
+
+class Decision(NamedTuple):
+    """
+    Résultat de la table: session et type du pointage, session dont l'arrivée
+    doit être vérifiée pour la confirmation (None sinon), ou message de refus
+    """
+    session: Optional[str]
+    type_pointage: Optional[str]
+    session_a_confirmer: Optional[str]
+    erreur: Optional[str]
+
+
+def _pointage(session: str, type_pointage: str) -> Decision:
+    return Decision(session, type_pointage, None, None)
+
+
+def _sortie(session: str) -> Decision:
+    return Decision(session, "sortie", session, None)
+
+
+def _refus(message: str) -> Decision:
+    return Decision(None, None, None, message)
+
+
+# Règles: (état matin, état après-midi, première minute, minute de fin exclue, décision).
+# None = tout état. La première règle applicable l'emporte.
+TRANSITIONS: List[Tuple[Optional[int], Optional[int], int, int, Decision]] = [
+    # Pas de pointage matin avant 12h30 → arrivée matin
+    (VIDE, None, 0, MINUTE_DEBUT_APREM, _pointage("matin", "arrivee")),
+    # Pas de pointage matin à partir de 12h30 → absent le matin, pointage après-midi
+    (VIDE, VIDE, MINUTE_DEBUT_APREM, MINUTES_PAR_JOUR, _pointage("apres-midi", "arrivee")),
+    (VIDE, ARRIVEE, MINUTE_DEBUT_APREM, MINUTES_PAR_JOUR, _sortie("apres-midi")),
+    (VIDE, COMPLET, MINUTE_DEBUT_APREM, MINUTES_PAR_JOUR, _refus(MESSAGE_TOUT_FAIT)),
+    # Arrivée matin faite, sortie manquante → sortie matin (même pendant la pause)
+    (ARRIVEE, None, 0, MINUTES_PAR_JOUR, _sortie("matin")),
+    # Matin complet: arrivée après-midi à partir de 12h30
+    (COMPLET, VIDE, 0, MINUTE_DEBUT_APREM, _refus(MESSAGE_MATIN_TERMINE)),
+    (COMPLET, VIDE, MINUTE_DEBUT_APREM, MINUTES_PAR_JOUR, _pointage("apres-midi", "arrivee")),
+    (COMPLET, ARRIVEE, 0, MINUTES_PAR_JOUR, _sortie("apres-midi")),
+    (COMPLET, COMPLET, 0, MINUTES_PAR_JOUR, _refus(MESSAGE_QUATRE_POINTAGES)),
+]
+
+# États sans règle (ex: un seul pointage de sortie le matin)
+DECISION_PAR_DEFAUT = _refus(MESSAGE_INDETERMINE)
+
+
+def compiler_table(transitions: List[Tuple[Optional[int], Optional[int], int, int, Decision]]) -> Tuple[Decision, ...]:
+    """
+    Table plate des décisions, indexée par (état matin * NB_ETATS + état après-midi) * MINUTES_PAR_JOUR + minute
+    """
+    table: List[Optional[Decision]] = [None] * (NB_ETATS * NB_ETATS * MINUTES_PAR_JOUR)
+    for etat_matin in range(NB_ETATS):
+        for etat_aprem in range(NB_ETATS):
+            base = (etat_matin * NB_ETATS + etat_aprem) * MINUTES_PAR_JOUR
+            for regle_matin, regle_aprem, debut, fin, decision in transitions:
+                if regle_matin not in (None, etat_matin) or regle_aprem not in (None, etat_aprem):
+                    continue
+                for minute in range(debut, fin):
+                    if table[base + minute] is None:
+                        table[base + minute] = decision
+    return tuple(decision or DECISION_PAR_DEFAUT for decision in table)
+
+
+TABLE_DECISIONS = compiler_table(TRANSITIONS)
+
+
+def decider(etat_matin: int, etat_aprem: int, minute_du_jour: int) -> Decision:
+    """
+    Décision pour un état du jour et une minute du jour (0-1439)
+    """
+    return TABLE_DECISIONS[(etat_matin * NB_ETATS + etat_aprem) * MINUTES_PAR_JOUR + minute_du_jour]
+
+
+def etats_du_jour(pointages_today: List[Dict[str, Any]]) -> Tuple[int, int, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    États des sessions matin et après-midi à partir des pointages du jour (triés
+    par heure, les annulés sont ignorés) et premier pointage de chaque session
+    """
+    nombres = {"matin": 0, "apres-midi": 0}
+    premiers: Dict[str, Dict[str, Any]] = {}
+    for pointage in pointages_today:
+        session = pointage.get("session")
+        if session in nombres and not pointage.get("annule"):
+            if not nombres[session]:
+                premiers[session] = pointage
+            nombres[session] += 1
+
+    def etat(session: str) -> int:
+        if nombres[session] == 0:
+            return VIDE
+        if nombres[session] == 1:
+            return ARRIVEE if premiers[session].get("type_pointage") == "arrivee" else INCOMPLET
+        return COMPLET
+
+    return etat("matin"), etat("apres-midi"), premiers.get("matin"), premiers.get("apres-midi")
+
+
+def _secondes_du_jour(heure: str) -> Optional[int]:
+    """
+    Secondes depuis minuit d'une heure "HH:MM:SS" (None si le format n'est pas exactement celui-ci)
+    """
+    if len(heure) != 8 or heure[2] != ":" or heure[5] != ":":
+        return None
+    h, m, s = heure[0:2], heure[3:5], heure[6:8]
+    if not (h.isdigit() and m.isdigit() and s.isdigit() and h.isascii() and m.isascii() and s.isascii()):
+        return None
+    h, m, s = int(h), int(m), int(s)
+    if h > 23 or m > 59 or s > 59:
+        return None
+    return h * 3600 + m * 60 + s
+
+
+def minutes_depuis_arrivee(heure_arrivee: Optional[str], now_gmt1: datetime) -> Optional[float]:
+    """
+    Minutes écoulées entre l'heure d'arrivée (même jour) et now_gmt1, None si l'heure est illisible
+    """
+    if not heure_arrivee:
+        return None
+    secondes = _secondes_du_jour(heure_arrivee) if isinstance(heure_arrivee, str) else None
+    if secondes is None:
+        # Formats inhabituels: même lecture que strptime
+        try:
+            heure = datetime.strptime(heure_arrivee, "%H:%M:%S").time()
+        except Exception:
+            return None
+        secondes = heure.hour * 3600 + heure.minute * 60 + heure.second
+    ecart = now_gmt1.hour * 3600 + now_gmt1.minute * 60 + now_gmt1.second - secondes
+    # Même arrondi que timedelta.total_seconds()
+    return (ecart * 10**6 + now_gmt1.microsecond) / 10**6 / 60
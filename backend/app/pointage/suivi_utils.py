@@ -1,317 +1,411 @@
-from datetime import datetime, date, time, timezone, timedelta
-from typing import Dict, Any, List
-from app.db import get_db
+"""
+Suivi quotidien des retards et absences (GET /api/pointage/me/suivi).
+
+La période est représentée par une matrice agents × jours × 4 créneaux (matin
+arrivée, matin sortie, après-midi arrivée, après-midi sortie) contenant l'heure de
+pointage en secondes depuis minuit (-1 si pas de pointage), remplie en un seul
+passage sur les pointages. Retards et absences sont classés par les règles
+communes avec la paie (app/paie/regles.py: horaires du rôle, 13h15 le vendredi);
+les montants ne dépendent que du rôle, du retard total et des demi-journées
+d'absence et sont calculés une fois par combinaison. Les lignes quotidiennes et
+les totaux sont produits ensemble, en un passage par agent.
+"""
+import os
+from datetime import date, timezone, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from app.db import get_db, fetch_all_rows
+from app.paie.models import ParametresPaie
+from app.paie.regles import classer_jours, parametres_role, remplir_secondes, seuils_periode
+from app.paie.utils import extraire_dates_exceptions
+
+logger = logging.getLogger(__name__)
 
 # Fuseau horaire GMT+1
 TIMEZONE = timezone(timedelta(hours=1))
 
-# Paramètres de paie (identiques à ceux dans paie/utils.py)
-TAUX_HORAIRE = 182.18
-HEURES_PAR_JOUR = 8
+# Au-delà de ce nombre d'agents, les pointages sont filtrés en mémoire plutôt que
+# par agent_id=in.(...) (longueur d'URL)
+SUIVI_MAX_IDS_FILTRE = int(os.environ.get("SUIVI_MAX_IDS_FILTRE", "200"))
+
+CRENEAUX = ("matin_arrivee", "matin_sortie", "apres_midi_arrivee", "apres_midi_sortie")
+
+# Frais d'une absence complète (200 + 500 DA)
+FRAIS_ABSENCE_COMPLETE = 200 + 500
+
+# Statuts de la grille d'équipe (le code d'un jour est l'indice de son statut)
+STATUTS = ("Présent", "Retard", "Absence partielle", "Absent", "Jour férié")
+CODE_ABSENT = STATUTS.index("Absent")
+CODE_JOUR_FERIE = STATUTS.index("Jour férié")
+
+
+def totaux_vides() -> Dict[str, Any]:
+    return {"retard_total_minutes": 0, "retard_total_heures": 0.0, "nombre_absences": 0, "montant_total_deduit": 0}
+
+
+def ligne_jour_ferie(date_str: str, jour_semaine: str, nom: str) -> Dict[str, Any]:
+    return {
+        "date": date_str,
+        "jour_semaine": jour_semaine,
+        "statut": "Jour férié",
+        "jour_ferie_nom": nom,
+        "est_jour_ferie": True,
+        "retard_matin_minutes": 0,
+        "retard_apres_midi_minutes": 0,
+        "retard_total_minutes": 0,
+        "retard_total_heures": 0,
+        "est_absent": False,
+        "absent_matin": False,
+        "absent_apres_midi": False,
+        "montant_retard": 0,
+        "montant_absence": 0,
+        "montant_total_deduit": 0,
+        "pointages": dict.fromkeys(CRENEAUX)
+    }
 
 
-async def get_agent_daily_tracking(agent_id: str, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+def montant_absence_session(params: ParametresPaie) -> float:
     """
-    Récupère les détails quotidiens des retards et absences d'un agent
-    avec les montants déduits pour chaque jour
+    Montant d'une demi-journée d'absence (4h × 182,18 DA pour une journée de 8h)
     """
-    db = await get_db()
-    
-    try:
-        # Récupérer les jours fériés de la période
-        jours_feries_response = db.table("jours_feries").select("date_ferie, nom").gte("date_ferie", start_date.isoformat()).lte("date_ferie", end_date.isoformat()).execute()
-        jours_feries_dict = {jf["date_ferie"]: jf["nom"] for jf in (jours_feries_response.data or [])}
-        print(f"📅 Jours fériés trouvés: {len(jours_feries_dict)}")
-        
-        # Récupérer les exceptions pour cet agent (jours fériés où il travaille)
-        exceptions_response = db.table("jours_feries_exceptions").select("jour_ferie_id, jours_feries(date_ferie)").eq("agent_id", agent_id).execute()
-        exceptions_dates = set()
-        for exc in (exceptions_response.data or []):
-            if exc.get("jours_feries") and exc["jours_feries"].get("date_ferie"):
-                exceptions_dates.add(exc["jours_feries"]["date_ferie"])
-        print(f"📋 Exceptions agent: {len(exceptions_dates)} jours fériés travaillés")
-        
-        # Récupérer tous les pointages de l'agent pour la période (exclure les annulés)
-        print(f"📊 Récupération des pointages pour agent {agent_id} du {start_date} au {end_date}")
-        result = db.table("pointages").select("*").eq("agent_id", agent_id).gte("date_pointage", start_date.isoformat()).lte("date_pointage", end_date.isoformat()).or_("annule.is.null,annule.eq.false").execute()
-        
-        print(f"✅ {len(result.data) if result.data else 0} pointages récupérés")
-    except Exception as e:
-        print(f"❌ Erreur lors de la récupération des pointages: {str(e)}")
-        # Retourner une liste vide en cas d'erreur pour éviter de bloquer
-        result = type('obj', (object,), {'data': None})()
-        jours_feries_dict = {}
-        exceptions_dates = set()
-    
-    if not result.data:
-        print("ℹ️ Aucun pointage trouvé pour cette période")
-        # Retourner quand même les jours avec statut "Absent" (sauf jours fériés)
+    return round((params.heures_par_jour / 2) * params.taux_horaire, 2)
+
+
+def ligne_absence_sans_pointage(date_str: str, jour_semaine: str, params: ParametresPaie) -> Dict[str, Any]:
+    """
+    Jour d'absence d'un agent sans aucun pointage sur la période
+    """
+    # Absence complète : 8h × 182,18 DA + 200 DA + 500 DA
+    montant_total = round(params.heures_par_jour * params.taux_horaire, 2) + FRAIS_ABSENCE_COMPLETE
+    return {
+        "date": date_str,
+        "jour_semaine": jour_semaine,
+        "statut": "Absent",
+        "est_jour_ferie": False,
+        "retard_matin_minutes": 0,
+        "retard_apres_midi_minutes": 0,
+        "retard_total_minutes": 0,
+        "retard_total_heures": 0,
+        "est_absent": True,
+        "absent_matin": True,
+        "absent_apres_midi": True,
+        "montant_retard": 0,
+        "montant_absence": montant_total,
+        "montant_absence_matin": montant_absence_session(params),
+        "montant_absence_apres_midi": montant_absence_session(params),
+        "frais_absence_complete": FRAIS_ABSENCE_COMPLETE,
+        "montant_total_deduit": montant_total,
+        "pointages": dict.fromkeys(CRENEAUX)
+    }
+
+
+def montants_jour(params: ParametresPaie, retard_total_minutes: int, absent_matin: bool, absent_apres_midi: bool) -> Tuple:
+    """
+    Statut et montants déduits d'un jour analysé selon les paramètres du rôle:
+    (statut, est_absent, retard_total_heures, montant_retard, montant_absence_matin,
+    montant_absence_apres_midi, frais_absence_complete, montant_absence, montant_total_deduit)
+    """
+    retard_total_heures = round(retard_total_minutes / 60, 2)
+    # Pour les retards : seulement si l'agent est présent (a pointé)
+    montant_retard = round(retard_total_heures * params.taux_horaire, 2) if retard_total_minutes > 0 else 0
+    # Montant absence : 182,18 DA × 4h par session absente
+    montant_absence_matin = montant_absence_session(params) if absent_matin else 0
+    montant_absence_apres_midi = montant_absence_session(params) if absent_apres_midi else 0
+    est_absent = absent_matin and absent_apres_midi
+    frais_absence_complete = FRAIS_ABSENCE_COMPLETE if est_absent else 0
+    montant_absence = montant_absence_matin + montant_absence_apres_midi + frais_absence_complete
+    montant_total_deduit = montant_retard + montant_absence
+
+    if est_absent:
+        statut = "Absent"
+    elif absent_matin or absent_apres_midi:
+        statut = "Absence partielle"
+    elif retard_total_minutes > 0:
+        statut = "Retard"
+    else:
+        statut = "Présent"
+    return (statut, est_absent, retard_total_heures, montant_retard, montant_absence_matin,
+            montant_absence_apres_midi, frais_absence_complete, montant_absence, montant_total_deduit)
+
+
+def matrice_suivi(
+    agent_ids: List[str],
+    roles: List[str],
+    dates: List[date],
+    index_jours: Dict[str, int],
+    pointages_par_agent: Dict[str, List[Dict[str, Any]]]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Any]]:
+    """
+    Retards et sorties anticipées par créneau en minutes (agents × jours × 4),
+    absences du matin et de l'après-midi (agents × jours) et heures d'origine à plat
+    (indice (agent * jours + jour) * 4 + créneau)
+    """
+    secondes, heures_plat = remplir_secondes(agent_ids, index_jours, pointages_par_agent)
+    classement = classer_jours(secondes, seuils_periode(roles, dates))
+    return classement.retards, ~classement.present_matin, ~classement.present_aprem, heures_plat
+
+
+def calculer_suivis(
+    agent_ids: List[str],
+    start_date: date,
+    end_date: date,
+    jours_feries: List[Dict[str, Any]],
+    exceptions_par_agent: Dict[str, set],
+    pointages_par_agent: Dict[str, List[Dict[str, Any]]],
+    roles: Optional[Dict[str, str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Suivi quotidien de plusieurs agents sur une période.
+
+    Retourne {agent_id: {"details_quotidiens": [...], "totaux": {...}}}. Les
+    horaires et montants sont ceux du rôle de chaque agent (roles, "agent" par
+    défaut). Les jours fériés (sauf exception de l'agent) ne sont pas analysés; un
+    jour sans pointage est une absence, week-ends compris.
+    """
+    nb_jours = max((end_date - start_date).days + 1, 0)
+    if not agent_ids or not nb_jours:
+        return {agent_id: {"details_quotidiens": [], "totaux": totaux_vides()} for agent_id in agent_ids}
+
+    dates = [start_date + timedelta(days=i) for i in range(nb_jours)]
+    dates_str = [d.isoformat() for d in dates]
+    index_jours = {d: i for i, d in enumerate(dates_str)}
+    # Nom du jour (locale courante) calculé une fois par jour de la semaine
+    noms_jours = {d.weekday(): d.strftime("%A") for d in dates[:7]}
+    jours_semaine = [noms_jours[d.weekday()] for d in dates]
+    feries_noms = {jf["date_ferie"]: jf["nom"] for jf in jours_feries}
+
+    roles_agents = [(roles or {}).get(agent_id) or "agent" for agent_id in agent_ids]
+
+    retards, absent_matin, absent_apres_midi, heures_plat = matrice_suivi(agent_ids, roles_agents, dates, index_jours, pointages_par_agent)
+
+    montants_cache: Dict[Tuple[str, int, bool, bool], Tuple] = {}
+    suivis: Dict[str, Dict[str, Any]] = {}
+    for a, agent_id in enumerate(agent_ids):
+        role = roles_agents[a]
+        params = parametres_role(role)
+        exceptions = exceptions_par_agent.get(agent_id, set())
+        sans_pointage = not pointages_par_agent.get(agent_id)
+        retards_agent = retards[a].tolist()
+        absent_matin_agent = absent_matin[a].tolist()
+        absent_apres_midi_agent = absent_apres_midi[a].tolist()
+
         tracking_data = []
-        current_date = start_date
-        
-        while current_date <= end_date:
-            date_str = current_date.isoformat()
-            
-            # Vérifier si c'est un jour férié (sauf si l'agent a une exception)
-            if date_str in jours_feries_dict and date_str not in exceptions_dates:
-                tracking_data.append({
-                    "date": date_str,
-                    "jour_semaine": current_date.strftime("%A"),
-                    "statut": "Jour férié",
-                    "jour_ferie_nom": jours_feries_dict[date_str],
-                    "est_jour_ferie": True,
-                    "retard_matin_minutes": 0,
-                    "retard_apres_midi_minutes": 0,
-                    "retard_total_minutes": 0,
-                    "retard_total_heures": 0,
-                    "est_absent": False,
-                    "absent_matin": False,
-                    "absent_apres_midi": False,
-                    "montant_retard": 0,
-                    "montant_absence": 0,
-                    "montant_total_deduit": 0,
-                    "pointages": {
-                        "matin_arrivee": None,
-                        "matin_sortie": None,
-                        "apres_midi_arrivee": None,
-                        "apres_midi_sortie": None
-                    }
-                })
-                current_date += timedelta(days=1)
+        total_retard_minutes = 0
+        total_absences = 0
+        total_montant_deduit = 0
+        for j, date_str in enumerate(dates_str):
+            # Jour férié (sauf si l'agent a une exception)
+            if date_str in feries_noms and date_str not in exceptions:
+                tracking_data.append(ligne_jour_ferie(date_str, jours_semaine[j], feries_noms[date_str]))
                 continue
-            
-            # Absence complète : 8h × 182,18 DA + 200 DA + 500 DA
-            montant_absence_base = round(HEURES_PAR_JOUR * TAUX_HORAIRE, 2)
-            frais_supplementaires = 700  # 200 + 500
-            montant_total = montant_absence_base + frais_supplementaires
-            
-            tracking_data.append({
-                "date": date_str,
-                "jour_semaine": current_date.strftime("%A"),
-                "statut": "Absent",
-                "est_jour_ferie": False,
-                "retard_matin_minutes": 0,
-                "retard_apres_midi_minutes": 0,
-                "retard_total_minutes": 0,
-                "retard_total_heures": 0,
-                "est_absent": True,
-                "absent_matin": True,
-                "absent_apres_midi": True,
-                "montant_retard": 0,
-                "montant_absence": montant_total,
-                "montant_absence_matin": round((HEURES_PAR_JOUR / 2) * TAUX_HORAIRE, 2),
-                "montant_absence_apres_midi": round((HEURES_PAR_JOUR / 2) * TAUX_HORAIRE, 2),
-                "frais_absence_complete": frais_supplementaires,
-                "montant_total_deduit": montant_total,
-                "pointages": {
-                    "matin_arrivee": None,
-                    "matin_sortie": None,
-                    "apres_midi_arrivee": None,
-                    "apres_midi_sortie": None
-                }
-            })
-            current_date += timedelta(days=1)
-        
-        return tracking_data
-    
-    # Organiser les pointages par date
-    pointages_par_date = {}
-    for pointage in result.data:
-        date_pointage = pointage["date_pointage"]
-        if date_pointage not in pointages_par_date:
-            pointages_par_date[date_pointage] = {
-                "matin_arrivee": None,
-                "matin_sortie": None,
-                "apres_midi_arrivee": None,
-                "apres_midi_sortie": None
-            }
-        
-        session = pointage["session"]
-        type_pointage = pointage.get("type_pointage", "arrivee")
-        heure = pointage["heure_pointage"]
-        
-        if session == "matin":
-            if type_pointage == "arrivee":
-                pointages_par_date[date_pointage]["matin_arrivee"] = heure
-            else:
-                pointages_par_date[date_pointage]["matin_sortie"] = heure
-        else:
-            if type_pointage == "arrivee":
-                pointages_par_date[date_pointage]["apres_midi_arrivee"] = heure
-            else:
-                pointages_par_date[date_pointage]["apres_midi_sortie"] = heure
-    
-    # Analyser chaque jour
-    tracking_data = []
-    current_date = start_date
-    
-    while current_date <= end_date:
-        date_str = current_date.isoformat()
-        
-        # Vérifier si c'est un jour férié (sauf si l'agent a une exception)
-        if date_str in jours_feries_dict and date_str not in exceptions_dates:
+
+            if sans_pointage:
+                ligne = ligne_absence_sans_pointage(date_str, jours_semaine[j], params)
+                tracking_data.append(ligne)
+                total_absences += 1
+                total_montant_deduit += ligne["montant_total_deduit"]
+                continue
+
+            retard_matin, sortie_matin, retard_apres_midi, sortie_apres_midi = retards_agent[j]
+            retard_total_minutes = retard_matin + sortie_matin + retard_apres_midi + sortie_apres_midi
+            cle = (role, retard_total_minutes, absent_matin_agent[j], absent_apres_midi_agent[j])
+            montants = montants_cache.get(cle)
+            if montants is None:
+                montants = montants_cache[cle] = montants_jour(params, *cle[1:])
+            (statut, est_absent, retard_total_heures, montant_retard, montant_absence_matin,
+             montant_absence_apres_midi, frais_absence_complete, montant_absence, montant_total_deduit) = montants
+            indice = (a * nb_jours + j) * 4
+
             tracking_data.append({
                 "date": date_str,
-                "jour_semaine": current_date.strftime("%A"),
-                "statut": "Jour férié",
-                "jour_ferie_nom": jours_feries_dict[date_str],
-                "est_jour_ferie": True,
-                "retard_matin_minutes": 0,
-                "retard_apres_midi_minutes": 0,
-                "retard_total_minutes": 0,
-                "retard_total_heures": 0,
-                "est_absent": False,
-                "absent_matin": False,
-                "absent_apres_midi": False,
-                "montant_retard": 0,
-                "montant_absence": 0,
-                "montant_total_deduit": 0,
+                "jour_semaine": jours_semaine[j],
+                "statut": statut,
+                "retard_matin_minutes": retard_matin,
+                "retard_apres_midi_minutes": retard_apres_midi,
+                "sortie_anticipee_matin_minutes": sortie_matin,
+                "sortie_anticipee_apres_midi_minutes": sortie_apres_midi,
+                "retard_total_minutes": retard_total_minutes,
+                "retard_total_heures": retard_total_heures,
+                "est_absent": est_absent,
+                "absent_matin": cle[2],
+                "absent_apres_midi": cle[3],
+                "montant_retard": montant_retard,
+                "montant_absence": montant_absence,
+                "montant_absence_matin": montant_absence_matin,
+                "montant_absence_apres_midi": montant_absence_apres_midi,
+                "frais_absence_complete": frais_absence_complete,
+                "montant_total_deduit": montant_total_deduit,
                 "pointages": {
-                    "matin_arrivee": None,
-                    "matin_sortie": None,
-                    "apres_midi_arrivee": None,
-                    "apres_midi_sortie": None
+                    "matin_arrivee": heures_plat[indice],
+                    "matin_sortie": heures_plat[indice + 1],
+                    "apres_midi_arrivee": heures_plat[indice + 2],
+                    "apres_midi_sortie": heures_plat[indice + 3]
                 }
             })
-            current_date += timedelta(days=1)
-            continue
-        
-        jour_data = pointages_par_date.get(date_str, {
-            "matin_arrivee": None,
-            "matin_sortie": None,
-            "apres_midi_arrivee": None,
-            "apres_midi_sortie": None
-        })
-        
-        # Calculer les retards (arrivées tardives + sorties anticipées)
-        retard_matin_minutes = 0
-        retard_apres_midi_minutes = 0
-        sortie_anticipee_matin_minutes = 0
-        sortie_anticipee_apres_midi_minutes = 0
-        
-        # Retard à l'arrivée du matin (à partir de 08h05)
-        if jour_data.get("matin_arrivee"):
-            heure_str = jour_data["matin_arrivee"]
-            if isinstance(heure_str, str):
-                heure_arrivee = datetime.strptime(heure_str, "%H:%M:%S").time()
-            else:
-                heure_arrivee = heure_str
-            heure_debut_matin = time(8, 5)  # 08h05 - 5 minutes de tolérance
-            
-            if heure_arrivee > heure_debut_matin:
-                delta = datetime.combine(date.min, heure_arrivee) - datetime.combine(date.min, heure_debut_matin)
-                retard_matin_minutes = int(delta.total_seconds() / 60)
-        
-        # Sortie anticipée du matin (avant 11:55)
-        # Déduction si sortie avant 11h55 (5 minutes de tolérance)
-        if jour_data.get("matin_sortie"):
-            heure_str = jour_data["matin_sortie"]
-            if isinstance(heure_str, str):
-                heure_sortie = datetime.strptime(heure_str, "%H:%M:%S").time()
-            else:
-                heure_sortie = heure_str
-            heure_fin_matin = time(11, 55)  # 11h55 - 5 minutes de tolérance
-            
-            if heure_sortie < heure_fin_matin:
-                delta = datetime.combine(date.min, heure_fin_matin) - datetime.combine(date.min, heure_sortie)
-                sortie_anticipee_matin_minutes = int(delta.total_seconds() / 60)
-        
-        # Retard à l'arrivée de l'après-midi (à partir de 13h05)
-        if jour_data.get("apres_midi_arrivee"):
-            heure_str = jour_data["apres_midi_arrivee"]
-            if isinstance(heure_str, str):
-                heure_arrivee = datetime.strptime(heure_str, "%H:%M:%S").time()
-            else:
-                heure_arrivee = heure_str
-            heure_debut_apres_midi = time(13, 5)  # 13h05 - 5 minutes de tolérance
-            
-            if heure_arrivee > heure_debut_apres_midi:
-                delta = datetime.combine(date.min, heure_arrivee) - datetime.combine(date.min, heure_debut_apres_midi)
-                retard_apres_midi_minutes = int(delta.total_seconds() / 60)
-        
-        # Sortie anticipée de l'après-midi (avant 16:55)
-        # Déduction si sortie avant 16h55 (5 minutes de tolérance)
-        if jour_data.get("apres_midi_sortie"):
-            heure_str = jour_data["apres_midi_sortie"]
-            if isinstance(heure_str, str):
-                heure_sortie = datetime.strptime(heure_str, "%H:%M:%S").time()
-            else:
-                heure_sortie = heure_str
-            heure_fin_apres_midi = time(16, 55)  # 16h55 - 5 minutes de tolérance
-            
-            if heure_sortie < heure_fin_apres_midi:
-                delta = datetime.combine(date.min, heure_fin_apres_midi) - datetime.combine(date.min, heure_sortie)
-                sortie_anticipee_apres_midi_minutes = int(delta.total_seconds() / 60)
-        
-        # Total des retards (arrivées tardives + sorties anticipées)
-        retard_total_minutes = retard_matin_minutes + retard_apres_midi_minutes + sortie_anticipee_matin_minutes + sortie_anticipee_apres_midi_minutes
-        retard_total_heures = round(retard_total_minutes / 60, 2)
-        
-        # Calculer les absences par demi-journée (4h par session)
-        heures_par_session = HEURES_PAR_JOUR / 2  # 4 heures
-        
-        # Absence matin : AUCUN pointage matin (ni arrivée ni sortie)
-        absent_matin = not (jour_data.get("matin_arrivee") or jour_data.get("matin_sortie"))
-        
-        # Absence après-midi : AUCUN pointage après-midi (ni arrivée ni sortie)
-        absent_apres_midi = not (jour_data.get("apres_midi_arrivee") or jour_data.get("apres_midi_sortie"))
-        
-        # Calculer les montants déduits
-        # Pour les retards : seulement si l'agent est présent (a pointé)
-        montant_retard = round(retard_total_heures * TAUX_HORAIRE, 2) if retard_total_minutes > 0 else 0
-        
-        # Montant absence : 182,18 DA × 4h par session absente
-        montant_absence_matin = round(heures_par_session * TAUX_HORAIRE, 2) if absent_matin else 0
-        montant_absence_apres_midi = round(heures_par_session * TAUX_HORAIRE, 2) if absent_apres_midi else 0
-        
-        # Déterminer le statut global
-        est_absent = absent_matin and absent_apres_midi
-        
-        # Frais supplémentaires pour absence complète journée
-        frais_absence_complete = 0
-        if est_absent:
-            frais_absence_complete = 200 + 500  # 700 DA de frais supplémentaires
-        
-        montant_absence = montant_absence_matin + montant_absence_apres_midi + frais_absence_complete
-        
-        montant_total_deduit = montant_retard + montant_absence
-        
-        if est_absent:
-            statut = "Absent"
-        elif absent_matin or absent_apres_midi:
-            statut = "Absence partielle"
-        elif retard_total_minutes > 0:
-            statut = "Retard"
-        else:
-            statut = "Présent"
-        
-        tracking_data.append({
-            "date": date_str,
-            "jour_semaine": current_date.strftime("%A"),
-            "statut": statut,
-            "retard_matin_minutes": retard_matin_minutes,
-            "retard_apres_midi_minutes": retard_apres_midi_minutes,
-            "sortie_anticipee_matin_minutes": sortie_anticipee_matin_minutes,
-            "sortie_anticipee_apres_midi_minutes": sortie_anticipee_apres_midi_minutes,
-            "retard_total_minutes": retard_total_minutes,
-            "retard_total_heures": retard_total_heures,
-            "est_absent": est_absent,
-            "absent_matin": absent_matin,
-            "absent_apres_midi": absent_apres_midi,
-            "montant_retard": montant_retard,
-            "montant_absence": montant_absence,
-            "montant_absence_matin": montant_absence_matin,
-            "montant_absence_apres_midi": montant_absence_apres_midi,
-            "frais_absence_complete": frais_absence_complete,
-            "montant_total_deduit": montant_total_deduit,
-            "pointages": {
-                "matin_arrivee": jour_data.get("matin_arrivee"),
-                "matin_sortie": jour_data.get("matin_sortie"),
-                "apres_midi_arrivee": jour_data.get("apres_midi_arrivee"),
-                "apres_midi_sortie": jour_data.get("apres_midi_sortie")
+            total_retard_minutes += retard_total_minutes
+            total_absences += est_absent
+            total_montant_deduit += montant_total_deduit
+
+        suivis[agent_id] = {
+            "details_quotidiens": tracking_data,
+            "totaux": {
+                "retard_total_minutes": total_retard_minutes,
+                "retard_total_heures": round(total_retard_minutes / 60, 2),
+                "nombre_absences": total_absences,
+                "montant_total_deduit": round(total_montant_deduit, 2)
             }
-        })
-        
-        current_date += timedelta(days=1)
-    
-    return tracking_data
+        }
+    return suivis
+
+
+def calculer_grille_suivi(
+    agents: List[Dict[str, Any]],
+    start_date: date,
+    end_date: date,
+    jours_feries: List[Dict[str, Any]],
+    exceptions_par_agent: Dict[str, set],
+    pointages_par_agent: Dict[str, List[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    Grille d'équipe agents × jours en colonnes (mêmes règles que calculer_suivis):
+    code de statut (indice dans "statuts"), minutes de retard et montant déduit de
+    chaque jour, totaux par agent. Aucune ligne par jour n'est construite.
+    """
+    agent_ids = [agent["id"] for agent in agents]
+    nb_agents = len(agent_ids)
+    nb_jours = max((end_date - start_date).days + 1, 0)
+    dates = [start_date + timedelta(days=i) for i in range(nb_jours)]
+    dates_str = [d.isoformat() for d in dates]
+    index_jours = {d: i for i, d in enumerate(dates_str)}
+    roles = [agent.get("role") or "agent" for agent in agents]
+    roles_distincts = sorted(set(roles))
+    index_roles = np.array([roles_distincts.index(role) for role in roles], dtype=np.int64).reshape(nb_agents, 1)
+
+    retards, absent_matin, absent_apres_midi, _ = matrice_suivi(agent_ids, roles, dates, index_jours, pointages_par_agent)
+    retard_total = retards.sum(axis=2)
+
+    # Statut et montant calculés une fois par combinaison (rôle, retard, absence
+    # matin, absence après-midi)
+    cles = ((retard_total * 4 + absent_matin * 2 + absent_apres_midi) * len(roles_distincts) + index_roles).ravel()
+    uniques, inverse = np.unique(cles, return_inverse=True)
+    montants = []
+    for cle in uniques.tolist():
+        combinaison, index_role = divmod(cle, len(roles_distincts))
+        params = parametres_role(roles_distincts[index_role])
+        montants.append(montants_jour(params, combinaison // 4, bool(combinaison & 2), bool(combinaison & 1)))
+    codes = np.array([STATUTS.index(m[0]) for m in montants], dtype=np.int64)
+    codes = codes[inverse.ravel()].reshape(nb_agents, nb_jours)
+    montant = np.array([m[8] for m in montants], dtype=np.float64)
+    montant = montant[inverse.ravel()].reshape(nb_agents, nb_jours)
+
+    # Jours fériés non travaillés (sauf exception de l'agent): ni retard ni déduction
+    dates_feries = {jf["date_ferie"] for jf in jours_feries}
+    ferie = np.tile(np.array([d in dates_feries for d in dates_str], dtype=bool), (nb_agents, 1))
+    for a, agent_id in enumerate(agent_ids):
+        for date_exception in exceptions_par_agent.get(agent_id, ()):
+            jour = index_jours.get(date_exception)
+            if jour is not None:
+                ferie[a, jour] = False
+    codes = np.where(ferie, CODE_JOUR_FERIE, codes)
+    retard_total = np.where(ferie, 0, retard_total)
+    montant = np.where(ferie, 0.0, montant)
+
+    # Somme cumulée dans l'ordre des jours: mêmes additions flottantes que le suivi par agent
+    total_retard = retard_total.sum(axis=1).tolist()
+    total_montant = np.cumsum(montant, axis=1)[:, -1].tolist() if nb_jours else [0.0] * nb_agents
+
+    return {
+        "periode": {
+            "debut": start_date.isoformat(),
+            "fin": end_date.isoformat()
+        },
+        "dates": dates_str,
+        "statuts": list(STATUTS),
+        "agents": {
+            "id": agent_ids,
+            "nom": [agent.get("nom") for agent in agents],
+            "email": [agent.get("email") for agent in agents],
+            "role": [agent.get("role") for agent in agents]
+        },
+        "statut": codes.tolist(),
+        "retard_minutes": retard_total.tolist(),
+        "montant_deduit": montant.tolist(),
+        "totaux": {
+            "retard_total_minutes": total_retard,
+            "retard_total_heures": [round(minutes / 60, 2) for minutes in total_retard],
+            "nombre_absences": (codes == CODE_ABSENT).sum(axis=1).tolist(),
+            "montant_total_deduit": [round(total, 2) for total in total_montant]
+        }
+    }
+
+
+async def charger_donnees_suivi(agent_ids: List[str], start_date: date, end_date: date) -> Tuple[List[Dict[str, Any]], Dict[str, set], Dict[str, List[Dict[str, Any]]]]:
+    """
+    Jours fériés, dates d'exception par agent et pointages par agent de la période,
+    en trois requêtes quel que soit le nombre d'agents (pointages paginés pour les
+    longues périodes). Données vides en cas d'erreur pour éviter de bloquer.
+    """
+    db = await get_db()
+
+    try:
+        # Jours fériés de la période
+        jours_feries_response = await db.table("jours_feries").select("date_ferie, nom").gte("date_ferie", start_date.isoformat()).lte("date_ferie", end_date.isoformat()).execute()
+        jours_feries = jours_feries_response.data or []
+        logger.debug("📅 Jours fériés trouvés: %s", len(jours_feries))
+
+        def filtrer_agents(query):
+            if len(agent_ids) == 1:
+                return query.eq("agent_id", agent_ids[0])
+            if len(agent_ids) <= SUIVI_MAX_IDS_FILTRE:
+                return query.in_("agent_id", agent_ids)
+            return query
+
+        # Exceptions des agents (jours fériés où ils travaillent)
+        exceptions_response = await filtrer_agents(db.table("jours_feries_exceptions").select("agent_id, jour_ferie_id, jours_feries(date_ferie)")).execute()
+        exceptions_lignes: Dict[str, List[Dict[str, Any]]] = {}
+        for exc in (exceptions_response.data or []):
+            exceptions_lignes.setdefault(exc["agent_id"], []).append(exc)
+        exceptions_par_agent = {agent_id: extraire_dates_exceptions(lignes) for agent_id, lignes in exceptions_lignes.items()}
+
+        # Pointages des agents pour la période (hors annulés)
+        logger.debug("📊 Récupération des pointages de %s agent(s) du %s au %s", len(agent_ids), start_date, end_date)
+
+        def construire_requete():
+            query = db.table("pointages").select("agent_id, date_pointage, heure_pointage, session, type_pointage").gte("date_pointage", start_date.isoformat()).lte("date_pointage", end_date.isoformat()).or_("annule.is.null,annule.eq.false")
+            return filtrer_agents(query).order("date_pointage").order("heure_pointage").order("id")
+
+        pointages = await fetch_all_rows(construire_requete)
+        logger.debug("✅ %s pointages récupérés", len(pointages))
+    except Exception as e:
+        logger.error("❌ Erreur lors de la récupération des pointages: %s", e)
+        return [], {}, {}
+
+    pointages_par_agent: Dict[str, List[Dict[str, Any]]] = {}
+    for pointage in pointages:
+        pointages_par_agent.setdefault(pointage["agent_id"], []).append(pointage)
+    return jours_feries, exceptions_par_agent, pointages_par_agent
+
+
+async def get_agents_daily_tracking(
+    agent_ids: List[str],
+    start_date: date,
+    end_date: date,
+    roles: Optional[Dict[str, str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Suivi quotidien de plusieurs agents sur une période (voir calculer_suivis)
+    """
+    jours_feries, exceptions_par_agent, pointages_par_agent = await charger_donnees_suivi(agent_ids, start_date, end_date)
+    return calculer_suivis(agent_ids, start_date, end_date, jours_feries, exceptions_par_agent, pointages_par_agent, roles)
+
+
+async def get_agent_daily_tracking(agent_id: str, start_date: date, end_date: date, role: str = "agent") -> List[Dict[str, Any]]:
+    """
+    Récupère les détails quotidiens des retards et absences d'un agent
+    avec les montants déduits pour chaque jour
+    """
+    suivis = await get_agents_daily_tracking([agent_id], start_date, end_date, {agent_id: role})
+    return suivis[agent_id]["details_quotidiens"]
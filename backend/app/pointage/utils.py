@@ -1,13 +1,41 @@
 from datetime import datetime, date, time, timezone, timedelta
 from typing import Dict, Any, List, Optional
+import logging
+import os
 import uuid
 
 from app.db import get_db
+from app.pointage import sessions
 from app.qrcode.utils import validate_qrcode
+from app.qrcode.signature import QRCODE_MODE_SIGNE
+from app.admin.presence import presence_du_jour
+from app.paie.cache import invalider_paie_date, mois_clos
+from app.paie.mois_en_cours import paie_mois_en_cours
+
+logger = logging.getLogger(__name__)
 
 # Fuseau horaire GMT+1
 TIMEZONE = timezone(timedelta(hours=1))
 
+# Scan en un seul aller-retour via la fonction SQL enregistrer_pointage_scan
+# (migration_add_scan_function.sql). Désactivable avec POINTAGE_SCAN_RPC=false;
+# repli automatique sur le chemin classique si la fonction n'est pas installée.
+SCAN_RPC_ACTIVE = os.environ.get("POINTAGE_SCAN_RPC", "true").lower() != "false"
+_scan_rpc_disponible = SCAN_RPC_ACTIVE
+
+# Scan en un aller-retour: pointages du jour de l'agent lus dans l'état en mémoire
+# (presence_du_jour) plutôt qu'en base, la fonction SQL vérifiant sous verrou qu'ils
+# sont à jour. Les chemins classique et hors-ligne, sans cette vérification, relisent
+# toujours la base. Désactivable avec POINTAGE_ETAT_CACHE=false.
+ETAT_JOUR_CACHE_ACTIF = os.environ.get("POINTAGE_ETAT_CACHE", "true").lower() != "false"
+
+# Nombre maximal de scans par synchronisation groupée (/api/pointage/scan/batch)
+POINTAGE_BATCH_MAX_SCANS = int(os.environ.get("POINTAGE_BATCH_MAX_SCANS", "200"))
+
+
+class FonctionScanIndisponible(Exception):
+    """La fonction SQL enregistrer_pointage_scan n'existe pas dans la base"""
+
 
 async def determine_session_simple() -> str:
     """
@@ -26,10 +54,39 @@ async def determine_session_simple() -> str:
     else:
         session = "apres-midi"
     
-    print(f"🕒 Heure actuelle (GMT+1): {now_gmt1.strftime('%H:%M:%S')} - Session simple: {session}")
+    logger.debug("🕒 Heure actuelle (GMT+1): %s - Session simple: %s", now_gmt1, session)
     return session
 
 
+def decider_session(pointages_today: List[Dict[str, Any]], now_gmt1: datetime, force_confirmation: bool = False) -> tuple[str, str, bool, str]:
+    """
+    Détermine la session et le type de pointage à partir des pointages du jour
+    (non annulés, triés par heure) et de l'heure du scan.
+    
+    Fonction pure partagée par le chemin classique (determine_session_for_agent)
+    et par le chemin en un aller-retour (create_pointage_rpc), qui transmet la
+    décision à la fonction SQL enregistrer_pointage_scan.
+    Les règles sont dans la table de app.pointage.sessions.
+    
+    Retourne: (session, type_pointage, needs_confirmation, confirmation_message)
+    Lève ValueError si aucun pointage n'est possible.
+    """
+    etat_matin, etat_aprem, premier_matin, premier_aprem = sessions.etats_du_jour(pointages_today)
+    decision = sessions.decider(etat_matin, etat_aprem, now_gmt1.hour * 60 + now_gmt1.minute)
+    if decision.erreur:
+        raise ValueError(decision.erreur)
+    
+    # Rescan moins de DELAI_CONFIRMATION_MINUTES après l'arrivée: confirmation de la sortie
+    if decision.session_a_confirmer and not force_confirmation:
+        arrivee = premier_matin if decision.session_a_confirmer == "matin" else premier_aprem
+        minutes = sessions.minutes_depuis_arrivee(arrivee.get("heure_pointage"), now_gmt1)
+        if minutes is not None and minutes < sessions.DELAI_CONFIRMATION_MINUTES:
+            msg = f"Attention : Vous avez pointé votre arrivée il y a seulement {int(minutes)} minute(s). Ce pointage sera enregistré comme une SORTIE. Voulez-vous confirmer ?"
+            return (decision.session, decision.type_pointage, True, msg)
+    
+    return (decision.session, decision.type_pointage, False, "")
+
+
 async def determine_session_for_agent(agent_id: str, force_confirmation: bool = False) -> tuple[str, str, bool, str]:
     """
     Détermine la session et le type de pointage pour un agent en fonction:
@@ -46,135 +103,32 @@ async def determine_session_for_agent(agent_id: str, force_confirmation: bool =
     Si l'agent rescanne dans les 5 minutes après son arrivée (matin ou après-midi),
     on demande une confirmation avant d'enregistrer la sortie.
     """
-    from app.db import get_db
-    db = await get_db()
-    
     now_gmt1 = datetime.now(TIMEZONE)
-    current_hour = now_gmt1.hour
-    current_minute = now_gmt1.minute
     today = now_gmt1.date().isoformat()
     
-    # Délai minimum entre arrivée et sortie (en minutes)
-    DELAI_CONFIRMATION_MINUTES = 5
-    
-    print(f"🕒 Heure actuelle (GMT+1): {now_gmt1.strftime('%H:%M:%S')}")
-    
-    # Récupérer tous les pointages de l'agent pour aujourd'hui (exclure les annulés)
-    existing_pointages = db.table("pointages").select("*").eq("agent_id", agent_id).eq("date_pointage", today).or_("annule.is.null,annule.eq.false").order("heure_pointage").execute()
-    pointages_today = existing_pointages.data if existing_pointages.data else []
-    
-    # Séparer les pointages par session (uniquement les non-annulés)
-    pointages_matin = [p for p in pointages_today if p.get("session") == "matin" and not p.get("annule")]
-    pointages_aprem = [p for p in pointages_today if p.get("session") == "apres-midi" and not p.get("annule")]
+    logger.debug("🕒 Heure actuelle (GMT+1): %s", now_gmt1)
     
-    nb_matin = len(pointages_matin)
-    nb_aprem = len(pointages_aprem)
+    # Pointages de l'agent pour aujourd'hui (hors annulés), relus en base: l'insertion
+    # qui suit n'est pas vérifiée sous verrou, l'état en mémoire peut ignorer les
+    # écritures d'un autre worker
+    pointages_today = await get_pointages_today(agent_id, today, depuis_base=True)
     
-    print(f"📊 Pointages aujourd'hui - Matin: {nb_matin}, Après-midi: {nb_aprem}")
-    
-    def check_time_since_arrival(pointage_arrivee) -> tuple[bool, int]:
-        """
-        Vérifie si le pointage d'arrivée date de moins de DELAI_CONFIRMATION_MINUTES minutes.
-        Retourne (needs_confirmation, minutes_depuis_arrivee)
-        """
-        heure_arrivee_str = pointage_arrivee.get("heure_pointage")
-        if not heure_arrivee_str:
-            return (False, 0)
-        
-        # Parser l'heure d'arrivée
-        try:
-            heure_arrivee = datetime.strptime(heure_arrivee_str, "%H:%M:%S").time()
-            # Créer un datetime complet pour aujourd'hui
-            arrivee_datetime = datetime.combine(now_gmt1.date(), heure_arrivee)
-            arrivee_datetime = arrivee_datetime.replace(tzinfo=TIMEZONE)
-            
-            # Calculer la différence en minutes
-            diff = now_gmt1 - arrivee_datetime
-            minutes_depuis = diff.total_seconds() / 60
-            
-            print(f"⏱️ Minutes depuis l'arrivée: {minutes_depuis:.1f}")
-            
-            if minutes_depuis < DELAI_CONFIRMATION_MINUTES:
-                return (True, int(minutes_depuis))
-            return (False, int(minutes_depuis))
-        except Exception as e:
-            print(f"⚠️ Erreur parsing heure: {e}")
-            return (False, 0)
-    
-    # Logique de détermination:
-    # 1. Si on a 1 pointage matin (arrivée) et pas encore de sortie matin → sortie matin
-    #    (même si l'heure est >= 12h, tant qu'on est avant 13h ou qu'il manque la sortie)
-    # 2. Si on a 0 pointage matin et l'heure < 13h → arrivée matin
-    # 3. Si on a 2 pointages matin (complet) et l'heure >= 13h → session après-midi
-    # 4. Si on a 1 pointage après-midi (arrivée) → sortie après-midi
-    
-    # Cas 1: Arrivée matin manquante
-    # Si l'agent n'a pas pointé le matin et qu'il est entre 12h30 et 13h, 
-    # on considère qu'il est absent le matin et on l'enregistre directement en après-midi
-    if nb_matin == 0:
-        if current_hour < 12 or (current_hour == 12 and current_minute < 30):
-            # Avant 12h30 → pointage matin
-            print(f"✅ Pas de pointage matin, heure < 12h30 → Arrivée matin")
-            return ("matin", "arrivee", False, "")
-        else:
-            # À partir de 12h30 sans pointage matin → considéré absent le matin, pointage après-midi
-            if nb_aprem == 0:
-                print(f"✅ Pas de pointage matin, heure >= 12h30 → Arrivée après-midi (absent matin)")
-                return ("apres-midi", "arrivee", False, "")
-            elif nb_aprem == 1:
-                premier_pointage_aprem = pointages_aprem[0]
-                if premier_pointage_aprem.get("type_pointage") == "arrivee":
-                    needs_confirm, minutes = check_time_since_arrival(premier_pointage_aprem)
-                    if needs_confirm and not force_confirmation:
-                        msg = f"Attention : Vous avez pointé votre arrivée il y a seulement {minutes} minute(s). Ce pointage sera enregistré comme une SORTIE. Voulez-vous confirmer ?"
-                        print(f"⚠️ Confirmation requise: {msg}")
-                        return ("apres-midi", "sortie", True, msg)
-                    print(f"✅ Arrivée après-midi faite → Sortie après-midi")
-                    return ("apres-midi", "sortie", False, "")
-            else:
-                raise ValueError("Vous avez déjà effectué tous vos pointages pour aujourd'hui.")
-    
-    # Cas 2: Arrivée matin faite, sortie matin manquante
-    if nb_matin == 1:
-        premier_pointage_matin = pointages_matin[0]
-        if premier_pointage_matin.get("type_pointage") == "arrivee":
-            # Vérifier si moins de 5 minutes depuis l'arrivée
-            needs_confirm, minutes = check_time_since_arrival(premier_pointage_matin)
-            if needs_confirm and not force_confirmation:
-                msg = f"Attention : Vous avez pointé votre arrivée il y a seulement {minutes} minute(s). Ce pointage sera enregistré comme une SORTIE. Voulez-vous confirmer ?"
-                print(f"⚠️ Confirmation requise: {msg}")
-                return ("matin", "sortie", True, msg)
-            print(f"✅ Arrivée matin faite, sortie manquante → Sortie matin")
-            return ("matin", "sortie", False, "")
-    
-    # Cas 3: Session matin complète (2 pointages)
-    if nb_matin >= 2:
-        # Vérifier la session après-midi
-        if nb_aprem == 0:
-            # Permettre le pointage après-midi à partir de 12h30 si matin complet
-            if current_hour >= 13 or (current_hour == 12 and current_minute >= 30):
-                print(f"✅ Matin complet, heure >= 12h30, pas de pointage après-midi → Arrivée après-midi")
-                return ("apres-midi", "arrivee", False, "")
-            else:
-                # Avant 12h30 avec matin complet → attendre 12h30
-                raise ValueError("La session du matin est terminée. Vous pouvez pointer l'après-midi à partir de 12h30.")
-        elif nb_aprem == 1:
-            premier_pointage_aprem = pointages_aprem[0]
-            if premier_pointage_aprem.get("type_pointage") == "arrivee":
-                # Vérifier si moins de 5 minutes depuis l'arrivée après-midi
-                needs_confirm, minutes = check_time_since_arrival(premier_pointage_aprem)
-                if needs_confirm and not force_confirmation:
-                    msg = f"Attention : Vous avez pointé votre arrivée il y a seulement {minutes} minute(s). Ce pointage sera enregistré comme une SORTIE. Voulez-vous confirmer ?"
-                    print(f"⚠️ Confirmation requise: {msg}")
-                    return ("apres-midi", "sortie", True, msg)
-                print(f"✅ Arrivée après-midi faite, sortie manquante → Sortie après-midi")
-                return ("apres-midi", "sortie", False, "")
-        else:
-            # 2 pointages après-midi = journée complète
-            raise ValueError("Vous avez déjà effectué tous vos pointages pour aujourd'hui (4 pointages: 2 matin + 2 après-midi).")
+    return decider_session(pointages_today, now_gmt1, force_confirmation)
+
+
+async def get_pointages_today(agent_id: str, today: str, depuis_base: bool = False) -> List[Dict[str, Any]]:
+    """
+    Pointages non annulés de l'agent pour le jour donné, triés par heure:
+    depuis l'état du jour en mémoire si possible, sinon (ou si depuis_base) depuis la base
+    """
+    if ETAT_JOUR_CACHE_ACTIF and not depuis_base:
+        pointages_today = await presence_du_jour.pointages_agent(agent_id, today)
+        if pointages_today is not None:
+            return pointages_today
     
-    # Cas par défaut (ne devrait pas arriver)
-    raise ValueError("Impossible de déterminer le type de pointage. Veuillez contacter l'administrateur.")
+    db = await get_db()
+    existing_pointages = await db.table("pointages").select("*").eq("agent_id", agent_id).eq("date_pointage", today).or_("annule.is.null,annule.eq.false").order("heure_pointage").execute()
+    return existing_pointages.data if existing_pointages.data else []
 
 
 async def create_pointage(agent_id: str, qrcode: str, force_confirmation: bool = False) -> Dict[str, Any]:
@@ -192,6 +146,14 @@ async def create_pointage(agent_id: str, qrcode: str, force_confirmation: bool =
     Si l'agent rescanne dans les 5 minutes après son arrivée, une confirmation est demandée.
     Le paramètre force_confirmation permet de bypasser cette confirmation.
     """
+    global _scan_rpc_disponible
+    if _scan_rpc_disponible:
+        try:
+            return await create_pointage_rpc(agent_id, qrcode, force_confirmation)
+        except FonctionScanIndisponible:
+            logger.warning("⚠️ Fonction SQL enregistrer_pointage_scan absente, repli sur le scan en plusieurs requêtes")
+            _scan_rpc_disponible = False
+    
     db = await get_db()
     
     # Vérifier si le QR code est valide
@@ -207,7 +169,7 @@ async def create_pointage(agent_id: str, qrcode: str, force_confirmation: bool =
     # en fonction des pointages déjà effectués
     try:
         session, type_pointage, needs_confirmation, confirmation_message = await determine_session_for_agent(agent_id, force_confirmation)
-        print(f"🔍 Session déterminée: {session}, Type: {type_pointage}, Confirmation: {needs_confirmation}")
+        logger.debug("🔍 Session déterminée: %s, Type: %s, Confirmation: %s", session, type_pointage, needs_confirmation)
         
         # Si une confirmation est requise et pas forcée, retourner sans créer le pointage
         if needs_confirmation:
@@ -218,10 +180,10 @@ async def create_pointage(agent_id: str, qrcode: str, force_confirmation: bool =
                 "type_pointage": type_pointage
             }
     except ValueError as ve:
-        print(f"🔴 ValueError: {str(ve)}")
+        logger.debug("🔴 ValueError: %s", ve)
         raise ve
     except Exception as e:
-        print(f"⚠️ Erreur lors de la détermination de la session: {str(e)}")
+        logger.warning("⚠️ Erreur lors de la détermination de la session: %s", e)
         raise Exception(f"Erreur lors de la vérification des pointages: {str(e)}")
     
     # Créer le pointage avec l'heure GMT+1
@@ -235,20 +197,22 @@ async def create_pointage(agent_id: str, qrcode: str, force_confirmation: bool =
         "type_pointage": type_pointage
     }
     type_fr = "Arrivée" if type_pointage == "arrivee" else "Sortie"
-    print(f"📌 Pointage créé - Date: {today}, Heure (GMT+1): {now_gmt1.strftime('%H:%M:%S')}, Session: {session}, Type: {type_fr}")
+    logger.debug("📌 Pointage créé - Date: %s, Heure (GMT+1): %s, Session: %s, Type: %s", today, now_gmt1, session, type_fr)
     
     try:
-        print(f"Insertion d'un nouveau pointage: {new_pointage}")
-        result = db.table("pointages").insert(new_pointage).execute()
-        print(f"Résultat de l'insertion: {result}")
+        logger.debug("Insertion d'un nouveau pointage: %s", new_pointage)
+        result = await db.table("pointages").insert(new_pointage).execute()
+        logger.debug("Résultat de l'insertion: %s", result)
     except Exception as e:
-        print(f"Erreur lors de l'insertion du pointage: {str(e)}")
+        logger.error("Erreur lors de l'insertion du pointage: %s", e)
         raise Exception(f"Erreur lors de l'enregistrement du pointage: {str(e)}")
     
     if not result.data or len(result.data) == 0:
         raise Exception("Erreur lors de l'enregistrement du pointage")
     
     pointage_db = result.data[0]
+    presence_du_jour.enregistrer_pointage(pointage_db)
+    paie_mois_en_cours.enregistrer_pointage(pointage_db)
     
     return {
         "id": pointage_db["id"],
@@ -262,6 +226,124 @@ async def create_pointage(agent_id: str, qrcode: str, force_confirmation: bool =
     }
 
 
+async def create_pointage_rpc(agent_id: str, qrcode: str, force_confirmation: bool = False) -> Dict[str, Any]:
+    """
+    Crée un pointage en un seul aller-retour: la session et le type sont décidés ici
+    (decider_session) à partir des pointages du jour en mémoire, puis la fonction SQL
+    enregistrer_pointage_scan valide le QR code, vérifie sous verrou que les pointages
+    du jour sont toujours ceux de la décision et insère le pointage.
+    Si la journée a changé entre-temps (autre worker, modification admin), les
+    pointages du jour sont relus en base et la décision est refaite une fois.
+    
+    Même contrat que create_pointage (ValueError pour les refus métier).
+    """
+    db = await get_db()
+    
+    # Heure locale GMT+1 sans fuseau, comme attendu par la fonction SQL
+    now_gmt1 = datetime.now(TIMEZONE)
+    today = now_gmt1.date().isoformat()
+    
+    # QR code vérifié avant de proposer une confirmation (sans requête une fois le code actif en cache)
+    if not await validate_qrcode(qrcode, now_gmt1):
+        raise ValueError("QR code invalide ou expiré")
+    
+    pointages_today = await get_pointages_today(agent_id, today)
+    for tentative in range(2):
+        session, type_pointage, needs_confirmation, confirmation_message = decider_session(pointages_today, now_gmt1, force_confirmation)
+        if needs_confirmation:
+            return {
+                "needs_confirmation": True,
+                "confirmation_message": confirmation_message,
+                "session": session,
+                "type_pointage": type_pointage
+            }
+        
+        params = {
+            "p_agent_id": agent_id,
+            "p_code_unique": qrcode,
+            "p_maintenant": now_gmt1.replace(tzinfo=None).isoformat(),
+            "p_session": session,
+            "p_type_pointage": type_pointage,
+            "p_pointages_lus": [p["id"] for p in pointages_today],
+            # Jeton signé vérifié ici: la fonction SQL ne consulte pas la table qrcodes
+            "p_code_verifie": QRCODE_MODE_SIGNE
+        }
+        try:
+            result = await db.rpc("enregistrer_pointage_scan", params).execute()
+        except Exception as e:
+            if getattr(e, "code", None) == "PGRST202" or "Could not find the function" in str(e):
+                raise FonctionScanIndisponible(str(e))
+            logger.error("Erreur lors de l'appel de enregistrer_pointage_scan: %s", e)
+            raise Exception(f"Erreur lors de l'enregistrement du pointage: {str(e)}")
+        
+        reponse = result.data or {}
+        if reponse.get("statut") != "conflit":
+            break
+        # État du jour de l'agent périmé: le relire en base, le corriger en mémoire
+        # (cet agent seulement) et décider à nouveau
+        logger.info("🔄 Pointages du jour de l'agent %s modifiés depuis la décision, nouvelle lecture", agent_id)
+        pointages_today = await get_pointages_today(agent_id, today, depuis_base=True)
+        presence_du_jour.resynchroniser_agent(agent_id, today, pointages_today)
+        paie_mois_en_cours.invalider(agent_id)
+    
+    statut = reponse.get("statut")
+    
+    if statut == "conflit":
+        # Pointages modifiés deux fois pendant le scan (scans simultanés): refus métier
+        raise ValueError("Un autre pointage est en cours d'enregistrement pour vous. Veuillez réessayer.")
+    
+    if statut == "erreur":
+        logger.debug("🔴 Scan refusé: %s", reponse.get('message'))
+        raise ValueError(reponse.get("message"))
+    
+    if statut != "ok" or not reponse.get("pointage"):
+        raise Exception("Erreur lors de l'enregistrement du pointage")
+    
+    pointage_db = reponse["pointage"]
+    presence_du_jour.enregistrer_pointage(pointage_db)
+    paie_mois_en_cours.enregistrer_pointage(pointage_db)
+    logger.debug("📌 Pointage créé (rpc) - Date: %s, Heure (GMT+1): %s, Session: %s, Type: %s", pointage_db['date_pointage'], pointage_db['heure_pointage'], pointage_db['session'], pointage_db['type_pointage'])
+    
+    return {
+        "id": pointage_db["id"],
+        "agent_id": pointage_db["agent_id"],
+        "date_pointage": pointage_db["date_pointage"],
+        "heure_pointage": pointage_db["heure_pointage"],
+        "session": pointage_db["session"],
+        "type_pointage": pointage_db["type_pointage"],
+        "created_at": pointage_db["created_at"],
+        "needs_confirmation": False
+    }
+
+
+def enregistrer_pointage_scan_memoire(client, p_agent_id: str, p_code_unique: str, p_maintenant: str, p_session: str, p_type_pointage: str, p_pointages_lus: List[str], p_code_verifie: bool = False) -> Dict[str, Any]:
+    """
+    Équivalent Python de la fonction SQL enregistrer_pointage_scan pour la base en mémoire
+    """
+    qrcodes = client.tables.get("qrcodes", [])
+    if not p_code_verifie and not any(q.get("code_unique") == p_code_unique and q.get("actif") for q in qrcodes):
+        return {"statut": "erreur", "message": "QR code invalide ou expiré"}
+    
+    now_gmt1 = datetime.fromisoformat(p_maintenant)
+    today = now_gmt1.date().isoformat()
+    
+    pointages_jour = sorted(
+        str(p["id"]) for p in client.tables.get("pointages", [])
+        if p.get("agent_id") == p_agent_id and p.get("date_pointage") == today and not p.get("annule")
+    )
+    if pointages_jour != sorted(str(pointage_id) for pointage_id in p_pointages_lus):
+        return {"statut": "conflit"}
+    
+    pointage = client.insert_rows("pointages", {
+        "agent_id": p_agent_id,
+        "date_pointage": today,
+        "heure_pointage": now_gmt1.strftime("%H:%M:%S"),
+        "session": p_session,
+        "type_pointage": p_type_pointage
+    })[0]
+    return {"statut": "ok", "pointage": pointage}
+
+
 async def get_pointages_by_agent(agent_id: str, start_date: Optional[date] = None, end_date: Optional[date] = None) -> List[Dict[str, Any]]:
     """
     Récupère les pointages d'un agent sur une période donnée
@@ -269,7 +351,7 @@ async def get_pointages_by_agent(agent_id: str, start_date: Optional[date] = Non
     db = await get_db()
     
     try:
-        print(f"Récupération des pointages pour l'agent {agent_id} du {start_date} au {end_date}")
+        logger.debug("Récupération des pointages pour l'agent %s du %s au %s", agent_id, start_date, end_date)
         query = db.table("pointages").select("*").eq("agent_id", agent_id)
         
         # Exclure les pointages annulés
@@ -281,10 +363,10 @@ async def get_pointages_by_agent(agent_id: str, start_date: Optional[date] = Non
         if end_date:
             query = query.lte("date_pointage", end_date.isoformat())
         
-        result = query.order("date_pointage", desc=False).execute()
-        print(f"Nombre de pointages récupérés: {len(result.data) if result.data else 0}")
+        result = await query.order("date_pointage", desc=False).execute()
+        logger.debug("Nombre de pointages récupérés: %s", len(result.data) if result.data else 0)
     except Exception as e:
-        print(f"Erreur lors de la récupération des pointages: {str(e)}")
+        logger.error("Erreur lors de la récupération des pointages: %s", e)
         return []
     
     return result.data if result.data else []
@@ -297,11 +379,11 @@ async def get_pointages_by_date(date_pointage: date) -> List[Dict[str, Any]]:
     db = await get_db()
     
     try:
-        print(f"Récupération des pointages pour la date {date_pointage}")
-        result = db.table("pointages").select("*").eq("date_pointage", date_pointage.isoformat()).or_("annule.is.null,annule.eq.false").execute()
-        print(f"Nombre de pointages récupérés: {len(result.data) if result.data else 0}")
+        logger.debug("Récupération des pointages pour la date %s", date_pointage)
+        result = await db.table("pointages").select("*").eq("date_pointage", date_pointage.isoformat()).or_("annule.is.null,annule.eq.false").execute()
+        logger.debug("Nombre de pointages récupérés: %s", len(result.data) if result.data else 0)
     except Exception as e:
-        print(f"Erreur lors de la récupération des pointages par date: {str(e)}")
+        logger.error("Erreur lors de la récupération des pointages par date: %s", e)
         return []
     
     return result.data if result.data else []
@@ -312,12 +394,19 @@ async def format_pointages_by_date(agent_id: str, start_date: Optional[date] = N
     Formate les pointages d'un agent par jour avec matin et après-midi
     """
     try:
-        print(f"Formatage des pointages pour l'agent {agent_id} du {start_date} au {end_date}")
+        logger.debug("Formatage des pointages pour l'agent %s du %s au %s", agent_id, start_date, end_date)
         pointages = await get_pointages_by_agent(agent_id, start_date, end_date)
     except Exception as e:
-        print(f"Erreur lors du formatage des pointages: {str(e)}")
+        logger.error("Erreur lors du formatage des pointages: %s", e)
         return []
     
+    return grouper_pointages_par_date(pointages)
+
+
+def grouper_pointages_par_date(pointages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Regroupe les pointages d'un agent (triés par date) par jour avec matin et après-midi
+    """
     # Organiser les pointages par date avec arrivée et sortie
     pointages_by_date = {}
     
@@ -351,23 +440,10 @@ async def format_pointages_by_date(agent_id: str, start_date: Optional[date] = N
     return list(pointages_by_date.values())
 
 
-async def create_pointage_offline(agent_id: str, qrcode: str, offline_timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+def heure_scan_gmt1(offline_timestamp: Optional[datetime] = None) -> datetime:
     """
-    Crée un pointage avec support pour les timestamps hors-ligne.
-    
-    Si offline_timestamp est fourni, utilise cette heure pour le pointage.
-    Sinon, utilise l'heure actuelle.
-    
-    Cette fonction est utilisée pour synchroniser les pointages effectués hors-ligne.
+    Heure GMT+1 d'un scan: le timestamp hors-ligne s'il est fourni, sinon l'heure actuelle
     """
-    db = await get_db()
-    
-    # Valider le QR code
-    is_valid = await validate_qrcode(qrcode)
-    if not is_valid:
-        raise ValueError("QR code invalide ou expiré")
-    
-    # Déterminer l'heure à utiliser
     if offline_timestamp:
         # Utiliser le timestamp hors-ligne et s'assurer qu'il est en GMT+1
         if offline_timestamp.tzinfo is None:
@@ -376,25 +452,26 @@ async def create_pointage_offline(agent_id: str, qrcode: str, offline_timestamp:
         else:
             # Convertir en GMT+1 si timezone différente
             now_gmt1 = offline_timestamp.astimezone(TIMEZONE)
-        print(f"📱 Timestamp hors-ligne original: {offline_timestamp}")
-        print(f"📱 Timestamp converti en GMT+1: {now_gmt1}")
-    else:
-        # Utiliser l'heure actuelle
-        now_gmt1 = datetime.now(TIMEZONE)
-    
-    today = now_gmt1.date().isoformat()
-    current_hour = now_gmt1.hour
+        logger.debug("📱 Timestamp hors-ligne original: %s", offline_timestamp)
+        logger.debug("📱 Timestamp converti en GMT+1: %s", now_gmt1)
+        return now_gmt1
     
+    # Utiliser l'heure actuelle
+    return datetime.now(TIMEZONE)
+
+
+def decider_pointage_hors_ligne(pointages_today: List[Dict[str, Any]], now_gmt1: datetime) -> tuple[str, str]:
+    """
+    Session et type d'un pointage hors-ligne: la session dépend de l'heure du scan,
+    le type du nombre de pointages déjà enregistrés dans cette session.
+    Lève ValueError si la session est déjà complète.
+    """
     # Déterminer la session basée sur l'heure du pointage
-    if current_hour < 13:
+    if now_gmt1.hour < 13:
         session = "matin"
     else:
         session = "apres-midi"
     
-    # Récupérer les pointages existants pour aujourd'hui
-    existing_pointages = db.table("pointages").select("*").eq("agent_id", agent_id).eq("date_pointage", today).or_("annule.is.null,annule.eq.false").order("heure_pointage").execute()
-    pointages_today = existing_pointages.data if existing_pointages.data else []
-    
     # Filtrer par session
     pointages_session = [p for p in pointages_today if p.get("session") == session and not p.get("annule")]
     nb_pointages = len(pointages_session)
@@ -407,7 +484,36 @@ async def create_pointage_offline(agent_id: str, qrcode: str, offline_timestamp:
     else:
         raise ValueError(f"Session {session} déjà complète pour aujourd'hui (arrivée et sortie enregistrées)")
     
-    print(f"📱 Pointage hors-ligne - Session: {session}, Type: {type_pointage}, Heure: {now_gmt1.strftime('%H:%M:%S')}")
+    return session, type_pointage
+
+
+async def create_pointage_offline(agent_id: str, qrcode: str, offline_timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Crée un pointage avec support pour les timestamps hors-ligne.
+    
+    Si offline_timestamp est fourni, utilise cette heure pour le pointage.
+    Sinon, utilise l'heure actuelle.
+    
+    Cette fonction est utilisée pour synchroniser les pointages effectués hors-ligne.
+    """
+    db = await get_db()
+    
+    # Déterminer l'heure à utiliser
+    now_gmt1 = heure_scan_gmt1(offline_timestamp)
+    
+    # Valider le QR code (en mode signé, par rapport à l'heure du scan hors-ligne)
+    is_valid = await validate_qrcode(qrcode, now_gmt1)
+    if not is_valid:
+        raise ValueError("QR code invalide ou expiré")
+    
+    today = now_gmt1.date().isoformat()
+    
+    # Récupérer les pointages existants du jour du scan en base, comme /scan/batch
+    pointages_today = await get_pointages_today(agent_id, today, depuis_base=True)
+    
+    session, type_pointage = decider_pointage_hors_ligne(pointages_today, now_gmt1)
+    
+    logger.debug("📱 Pointage hors-ligne - Session: %s, Type: %s, Heure: %s", session, type_pointage, now_gmt1)
     
     # Créer le pointage (sans offline_sync car la colonne n'existe pas dans Supabase)
     new_pointage = {
@@ -420,15 +526,20 @@ async def create_pointage_offline(agent_id: str, qrcode: str, offline_timestamp:
     }
     
     try:
-        result = db.table("pointages").insert(new_pointage).execute()
+        result = await db.table("pointages").insert(new_pointage).execute()
     except Exception as e:
-        print(f"❌ Erreur insertion pointage hors-ligne: {str(e)}")
+        logger.error("❌ Erreur insertion pointage hors-ligne: %s", e)
         raise Exception(f"Erreur lors de l'enregistrement du pointage: {str(e)}")
     
     if not result.data or len(result.data) == 0:
         raise Exception("Erreur lors de l'enregistrement du pointage")
     
     pointage_db = result.data[0]
+    presence_du_jour.enregistrer_pointage(pointage_db)
+    paie_mois_en_cours.enregistrer_pointage(pointage_db)
+    # Scan de la fin d'un mois synchronisé après sa clôture: l'instantané de paie est périmé
+    if mois_clos(now_gmt1.month, now_gmt1.year):
+        await invalider_paie_date(agent_id, pointage_db["date_pointage"])
     
     return {
         "id": pointage_db["id"],
@@ -440,3 +551,107 @@ async def create_pointage_offline(agent_id: str, qrcode: str, offline_timestamp:
         "created_at": pointage_db["created_at"],
         "was_offline": offline_timestamp is not None
     }
+
+
+async def create_pointages_offline_batch(agent_id: str, scans: List[tuple]) -> List[Dict[str, Any]]:
+    """
+    Synchronise en une fois la file de scans hors-ligne d'un agent.
+    
+    scans: liste de (qrcode, offline_timestamp). Les QR codes sont validés (une fois
+    par code distinct), les pointages existants des jours concernés sont lus en une
+    requête, les scans sont rejoués dans l'ordre chronologique avec la même règle que
+    create_pointage_offline, puis tous les pointages acceptés sont insérés en une
+    seule requête.
+    
+    Retourne un résultat par scan, dans l'ordre reçu:
+    {"success": True, "pointage": {...}} ou {"success": False, "error": "..."}
+    """
+    if len(scans) > POINTAGE_BATCH_MAX_SCANS:
+        raise ValueError(f"Trop de pointages à synchroniser en une fois (maximum {POINTAGE_BATCH_MAX_SCANS})")
+    
+    db = await get_db()
+    resultats: List[Optional[Dict[str, Any]]] = [None] * len(scans)
+    heures = [heure_scan_gmt1(offline_timestamp) for _, offline_timestamp in scans]
+    
+    # Validation des QR codes: en mode signé la validité dépend aussi de l'heure du scan
+    validite: Dict[Any, bool] = {}
+    valides = []
+    for index, (qrcode, _) in enumerate(scans):
+        cle = (qrcode, heures[index]) if QRCODE_MODE_SIGNE else qrcode
+        if cle not in validite:
+            validite[cle] = await validate_qrcode(qrcode, heures[index])
+        if validite[cle]:
+            valides.append(index)
+        else:
+            resultats[index] = {"success": False, "error": "QR code invalide ou expiré"}
+    
+    # Pointages existants de tous les jours concernés en une requête
+    jours = sorted({heures[index].date().isoformat() for index in valides})
+    pointages_par_jour: Dict[str, List[Dict[str, Any]]] = {jour: [] for jour in jours}
+    if jours:
+        existants = await db.table("pointages").select("*").eq("agent_id", agent_id).in_("date_pointage", jours).or_("annule.is.null,annule.eq.false").order("heure_pointage").execute()
+        for pointage in existants.data or []:
+            pointages_par_jour[pointage["date_pointage"]].append(pointage)
+    
+    # Rejouer les scans dans l'ordre chronologique, comme la file du téléphone
+    nouveaux = []
+    for index in sorted(valides, key=lambda i: heures[i]):
+        now_gmt1 = heures[index]
+        today = now_gmt1.date().isoformat()
+        try:
+            session, type_pointage = decider_pointage_hors_ligne(pointages_par_jour[today], now_gmt1)
+        except ValueError as e:
+            resultats[index] = {"success": False, "error": str(e)}
+            continue
+        
+        new_pointage = {
+            "id": str(uuid.uuid4()),
+            "agent_id": agent_id,
+            "date_pointage": today,
+            "heure_pointage": now_gmt1.strftime("%H:%M:%S"),
+            "session": session,
+            "type_pointage": type_pointage
+        }
+        pointages_par_jour[today].append(new_pointage)
+        nouveaux.append((index, new_pointage))
+    
+    logger.debug("📱 Synchronisation groupée - %s scan(s), %s pointage(s) à enregistrer", len(scans), len(nouveaux))
+    if not nouveaux:
+        return resultats
+    
+    try:
+        result = await db.table("pointages").insert([pointage for _, pointage in nouveaux]).execute()
+    except Exception as e:
+        logger.error("❌ Erreur insertion groupée des pointages hors-ligne: %s", e)
+        raise Exception(f"Erreur lors de l'enregistrement des pointages: {str(e)}")
+    
+    inseres = {pointage["id"]: pointage for pointage in result.data or []}
+    # Scans de mois clos (fin de mois synchronisée après sa clôture): instantanés de paie périmés
+    mois_inseres = {(heures[index].year, heures[index].month) for index, new_pointage in nouveaux if new_pointage["id"] in inseres}
+    for annee, mois in sorted(mois_inseres):
+        if mois_clos(mois, annee):
+            await invalider_paie_date(agent_id, date(annee, mois, 1))
+    
+    for index, new_pointage in nouveaux:
+        pointage_db = inseres.get(new_pointage["id"])
+        if pointage_db is None:
+            resultats[index] = {"success": False, "error": "Erreur lors de l'enregistrement du pointage"}
+            continue
+        
+        presence_du_jour.enregistrer_pointage(pointage_db)
+        paie_mois_en_cours.enregistrer_pointage(pointage_db)
+        resultats[index] = {
+            "success": True,
+            "pointage": {
+                "id": pointage_db["id"],
+                "agent_id": pointage_db["agent_id"],
+                "date_pointage": pointage_db["date_pointage"],
+                "heure_pointage": pointage_db["heure_pointage"],
+                "session": pointage_db["session"],
+                "type_pointage": pointage_db["type_pointage"],
+                "created_at": pointage_db["created_at"],
+                "was_offline": scans[index][1] is not None
+            }
+        }
+    
+    return resultats
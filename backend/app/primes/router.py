@@ -5,6 +5,7 @@ import logging
 
 from app.db import get_db
 from app.auth.utils import get_current_active_user, get_admin_user
+from app.paie.cache import invalider_paie
 from app.primes.models import Prime, PrimeCreate, PrimeUpdate, PrimesSummary
 
 router = APIRouter(prefix="/api/primes", tags=["primes"])
@@ -20,7 +21,7 @@ async def create_prime(prime_data: PrimeCreate, current_user = Depends(get_curre
     
     try:
         # Vérifier que l'agent existe
-        agent_response = db.table("agents").select("id, nom").eq("id", str(prime_data.agent_id)).execute()
+        agent_response = await db.table("agents").select("id, nom").eq("id", str(prime_data.agent_id)).execute()
         if not agent_response.data:
             raise HTTPException(status_code=404, detail="Agent non trouvé")
         
@@ -34,19 +35,20 @@ async def create_prime(prime_data: PrimeCreate, current_user = Depends(get_curre
             "created_by": str(current_user.id)
         }
         
-        result = db.table("primes").insert(prime_insert).execute()
+        result = await db.table("primes").insert(prime_insert).execute()
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Erreur lors de la création de la prime")
+        await invalider_paie(str(prime_data.agent_id), prime_data.mois, prime_data.annee)
         
-        logger.info(f"Prime créée: {prime_data.montant} DA pour agent {prime_data.agent_id} - {prime_data.motif}")
+        logger.info("Prime créée: %s DA pour agent %s - %s", prime_data.montant, prime_data.agent_id, prime_data.motif)
         
         return result.data[0]
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur lors de la création de la prime: {str(e)}")
+        logger.error("Erreur lors de la création de la prime: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -73,7 +75,7 @@ async def get_primes(
         if agent_id:
             query = query.eq("agent_id", agent_id)
         
-        result = query.order("created_at", desc=True).execute()
+        result = await query.order("created_at", desc=True).execute()
         
         # Aplatir les données de l'agent
         primes = []
@@ -87,7 +89,7 @@ async def get_primes(
         return primes
     
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des primes: {str(e)}")
+        logger.error("Erreur lors de la récupération des primes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -118,7 +120,7 @@ async def get_agent_primes(
         if annee:
             query = query.eq("annee", annee)
         
-        result = query.order("created_at", desc=True).execute()
+        result = await query.order("created_at", desc=True).execute()
         
         # Aplatir les données de l'agent
         primes = []
@@ -132,7 +134,7 @@ async def get_agent_primes(
         return primes
     
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération des primes de l'agent: {str(e)}")
+        logger.error("Erreur lors de la récupération des primes de l'agent: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -154,12 +156,12 @@ async def get_primes_summary(
     
     try:
         # Récupérer l'agent
-        agent_response = db.table("agents").select("nom").eq("id", agent_id).execute()
+        agent_response = await db.table("agents").select("nom").eq("id", agent_id).execute()
         if not agent_response.data:
             raise HTTPException(status_code=404, detail="Agent non trouvé")
         
         # Récupérer les primes
-        result = db.table("primes").select("*").eq("agent_id", agent_id).eq("mois", mois).eq("annee", annee).execute()
+        result = await db.table("primes").select("*").eq("agent_id", agent_id).eq("mois", mois).eq("annee", annee).execute()
         
         total_primes = sum(prime["montant"] for prime in result.data)
         
@@ -176,7 +178,7 @@ async def get_primes_summary(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur lors de la récupération du résumé des primes: {str(e)}")
+        logger.error("Erreur lors de la récupération du résumé des primes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -193,19 +195,21 @@ async def update_prime(prime_id: str, prime_data: PrimeUpdate):
         if not update_data:
             raise HTTPException(status_code=400, detail="Aucune donnée à mettre à jour")
         
-        result = db.table("primes").update(update_data).eq("id", prime_id).execute()
+        result = await db.table("primes").update(update_data).eq("id", prime_id).execute()
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Prime non trouvée")
+        prime = result.data[0]
+        await invalider_paie(prime["agent_id"], prime["mois"], prime["annee"])
         
-        logger.info(f"Prime {prime_id} mise à jour")
+        logger.info("Prime %s mise à jour", prime_id)
         
         return result.data[0]
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur lors de la mise à jour de la prime: {str(e)}")
+        logger.error("Erreur lors de la mise à jour de la prime: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -217,17 +221,19 @@ async def delete_prime(prime_id: str):
     db = await get_db()
     
     try:
-        result = db.table("primes").delete().eq("id", prime_id).execute()
+        result = await db.table("primes").delete().eq("id", prime_id).execute()
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Prime non trouvée")
+        prime = result.data[0]
+        await invalider_paie(prime["agent_id"], prime["mois"], prime["annee"])
         
-        logger.info(f"Prime {prime_id} supprimée")
+        logger.info("Prime %s supprimée", prime_id)
         
         return {"message": "Prime supprimée avec succès"}
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Erreur lors de la suppression de la prime: {str(e)}")
+        logger.error("Erreur lors de la suppression de la prime: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -22,3 +22,4 @@ class QRCodeResponse(BaseModel):
     qrcode_id: UUID
     qrcode_data: str
     qrcode_image_url: str
+    expire_a: Optional[datetime] = None  # Mode signé: fin de validité du jeton affiché
@@ -0,0 +1,142 @@
+"""
+Rotation automatique du QR code actif.
+
+Le service tourne dans le processus de l'API. Toutes les QRCODE_ROTATION_MINUTES
+minutes, il active un nouveau code dont l'image a été rendue à l'avance, puis
+désactive l'ancien après QRCODE_ROTATION_GRACE_SECONDS secondes. Pendant ce délai,
+les deux codes sont actifs. Un agent qui scanne l'écran juste avant son
+rafraîchissement n'est donc pas refusé.
+
+L'échéance est calculée à partir de la date de génération du code actif en base.
+Avec plusieurs workers, un worker ne fait donc pas tourner un code qu'un autre
+worker vient de créer.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+from app.qrcode.signature import QRCODE_MODE_SIGNE
+from app.qrcode.utils import (
+    TIMEZONE,
+    date_generation,
+    desactiver_anciens_qrcodes,
+    get_cached_active_qrcode,
+    get_qrcode_image,
+    inserer_qrcode_actif,
+)
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de rotation du QR code actif (minutes, 0 = rotation automatique désactivée)
+QRCODE_ROTATION_MINUTES = float(os.environ.get("QRCODE_ROTATION_MINUTES", "0"))
+
+# Durée pendant laquelle l'ancien code reste valide après une rotation (secondes)
+QRCODE_ROTATION_GRACE_SECONDS = float(os.environ.get("QRCODE_ROTATION_GRACE_SECONDS", "60"))
+
+# Attente avant de réessayer après une erreur (secondes)
+QRCODE_ROTATION_ATTENTE_ERREUR_SECONDS = 30.0
+
+
+class RotationQRCodes:
+    """
+    Planificateur de rotation du QR code actif
+    """
+
+    def __init__(self, intervalle_secondes: float, grace_secondes: float):
+        self.intervalle_secondes = intervalle_secondes
+        self.grace_secondes = grace_secondes
+        self._prochain_code: Optional[str] = None
+        # (id du nouveau code, time.monotonic() de désactivation des anciens)
+        self._desactivation: Optional[Tuple[str, float]] = None
+        self._tache: Optional[asyncio.Task] = None
+
+    def preparer_prochain_code(self) -> str:
+        """
+        Choisit le prochain code et rend son image à l'avance (cache d'images)
+        """
+        if self._prochain_code is None:
+            code_unique = str(uuid.uuid4())
+            get_qrcode_image(code_unique)
+            self._prochain_code = code_unique
+        return self._prochain_code
+
+    async def tourner(self) -> dict:
+        """
+        Active le code préparé; les anciens codes sont désactivés après le délai de grâce
+        """
+        code_unique = self.preparer_prochain_code()
+        qrcode_db = await inserer_qrcode_actif(code_unique)
+        self._prochain_code = None
+        logger.info("🔄 Rotation du QR code: nouveau code actif %s", qrcode_db['id'])
+
+        if self.grace_secondes > 0:
+            self._desactivation = (qrcode_db["id"], time.monotonic() + self.grace_secondes)
+        else:
+            await desactiver_anciens_qrcodes(qrcode_db["id"])
+
+        # Image du code suivant rendue dès maintenant, hors du chemin de la rotation
+        self.preparer_prochain_code()
+        return qrcode_db
+
+    async def executer_echeances(self) -> float:
+        """
+        Désactive les anciens codes et fait tourner le code actif si c'est l'heure.
+        Retourne le délai avant la prochaine échéance (secondes).
+        """
+        if self._desactivation and time.monotonic() >= self._desactivation[1]:
+            await desactiver_anciens_qrcodes(self._desactivation[0])
+            self._desactivation = None
+
+        # Relire la base: un autre worker ou un admin a pu générer un code entre-temps
+        qrcode_actif = await get_cached_active_qrcode(force_refresh=True)
+        age = (datetime.now(TIMEZONE) - date_generation(qrcode_actif)).total_seconds() if qrcode_actif else None
+        if age is None or age >= self.intervalle_secondes:
+            await self.tourner()
+            age = 0.0
+
+        echeances = [self.intervalle_secondes - age]
+        if self._desactivation:
+            echeances.append(self._desactivation[1] - time.monotonic())
+        return max(1.0, min(echeances))
+
+    async def _boucle(self) -> None:
+        self.preparer_prochain_code()
+        while True:
+            try:
+                attente = await self.executer_echeances()
+            except Exception as e:
+                logger.error("Erreur lors de la rotation du QR code: %s", e)
+                attente = QRCODE_ROTATION_ATTENTE_ERREUR_SECONDS
+            await asyncio.sleep(attente)
+
+    def demarrer(self) -> None:
+        """
+        Démarre la rotation en arrière-plan (si un intervalle est configuré)
+        """
+        if self.intervalle_secondes <= 0:
+            return
+        if QRCODE_MODE_SIGNE:
+            logger.warning("⚠️ Rotation automatique ignorée: en mode signé le jeton change à chaque fenêtre")
+            return
+        if self._tache is None or self._tache.done():
+            logger.info("🔄 Rotation automatique du QR code toutes les %g minute(s)", self.intervalle_secondes / 60)
+            self._tache = asyncio.create_task(self._boucle())
+
+    async def arreter(self) -> None:
+        """
+        Arrête la rotation en arrière-plan
+        """
+        if self._tache is not None:
+            self._tache.cancel()
+            try:
+                await self._tache
+            except asyncio.CancelledError:
+                pass
+            self._tache = None
+
+
+rotation_qrcodes = RotationQRCodes(QRCODE_ROTATION_MINUTES * 60, QRCODE_ROTATION_GRACE_SECONDS)
@@ -1,21 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.responses import JSONResponse, FileResponse
 
 from app.auth.utils import get_current_active_user, get_admin_user
 from app.auth.models import User
 from app.qrcode.models import QRCodeResponse
-from app.qrcode.utils import create_new_qrcode, get_active_qrcode
+from app.qrcode.utils import create_new_qrcode, get_active_qrcode, get_qrcode_by_id, get_qrcode_image
 
 router = APIRouter()
 
 
 @router.get("/active", response_model=QRCodeResponse)
-async def get_active_qr_code(current_user: User = Depends(get_admin_user)):
+async def get_active_qr_code(request: Request, response: Response, current_user: User = Depends(get_admin_user)):
     """
     Endpoint pour récupérer le QR code actif (admin uniquement)
+    L'écran qui interroge ce endpoint revalide avec If-None-Match: 304 tant que le code n'a pas changé.
     """
     try:
         qrcode_data = await get_active_qrcode()
+        etag = qrcode_data.pop("etag", None)
+        if etag:
+            # Le code actif peut changer à tout moment: revalidation à chaque appel
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            response.headers.update(headers)
         return qrcode_data
     except Exception as e:
         raise HTTPException(
@@ -72,16 +80,29 @@ async def generate_new_qr_code(current_user: User = Depends(get_admin_user)):
 
 
 @router.get("/image/{qrcode_id}")
-async def get_qr_code_image(qrcode_id: str, current_user: User = Depends(get_current_active_user)):
+async def get_qr_code_image(qrcode_id: str, request: Request, current_user: User = Depends(get_current_active_user)):
     """
     Endpoint pour récupérer l'image d'un QR code spécifique
     """
+    # Cette route retourne directement l'image du QR code
+    # Elle est utilisée pour l'impression ou l'affichage direct
     try:
-        # Cette route retourne directement l'image du QR code
-        # Elle est utilisée pour l'impression ou l'affichage direct
-        return FileResponse(f"static/qrcodes/qrcode_{qrcode_id}.png", media_type="image/png")
+        qrcode_db = await get_qrcode_by_id(qrcode_id)
     except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lors de la récupération du QR code: {str(e)}"
+        )
+    
+    if not qrcode_db:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"QR code non trouvé: {str(e)}"
+            detail="QR code non trouvé"
         )
+    
+    image = get_qrcode_image(qrcode_db["code_unique"])
+    # L'image d'un code ne change jamais
+    headers = {"ETag": image["etag"], "Cache-Control": "private, max-age=86400, immutable"}
+    if request.headers.get("if-none-match") == image["etag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=image["png"], media_type="image/png", headers=headers)
@@ -0,0 +1,83 @@
+"""
+QR codes signés à fenêtre de temps (mode QRCODE_MODE=signe).
+
+Le QR code affiché contient un jeton "v1.<fenêtre>.<signature>": la fenêtre est le
+numéro de la période de QRCODE_FENETRE_SECONDS secondes en cours et la signature un
+HMAC-SHA256 tronqué calculé avec QRCODE_SECRET. La validation d'un scan est un
+simple calcul (aucune requête): le jeton doit être correctement signé et sa fenêtre
+proche de l'heure du scan (QRCODE_FENETRES_TOLERANCE fenêtres d'écart au plus).
+
+Tous les workers doivent partager le même secret, obligatoire dans ce mode: le
+démarrage échoue si QRCODE_SECRET n'est pas défini. La table qrcodes ne sert plus
+qu'à l'historique des jetons affichés.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+# Mode des QR codes: "base" (code_unique vérifié dans la table qrcodes) ou "signe"
+QRCODE_MODE = os.environ.get("QRCODE_MODE", "base").lower()
+QRCODE_MODE_SIGNE = QRCODE_MODE == "signe"
+
+# Secret de signature, propre aux QR codes (jamais la clé des jetons JWT)
+QRCODE_SECRET = os.environ.get("QRCODE_SECRET", "").encode()
+if QRCODE_MODE_SIGNE and not QRCODE_SECRET:
+    raise RuntimeError("La variable d'environnement QRCODE_SECRET doit être définie avec QRCODE_MODE=signe")
+
+# Durée de validité d'un jeton affiché et tolérance (en fenêtres) autour de l'heure du scan
+QRCODE_FENETRE_SECONDS = int(os.environ.get("QRCODE_FENETRE_SECONDS", "60"))
+QRCODE_FENETRES_TOLERANCE = int(os.environ.get("QRCODE_FENETRES_TOLERANCE", "1"))
+
+VERSION_JETON = "v1"
+
+
+def fenetre_courante(instant: Optional[datetime] = None) -> int:
+    """
+    Numéro de la fenêtre de temps contenant instant (maintenant par défaut)
+    """
+    horodatage = instant.timestamp() if instant else time.time()
+    return int(horodatage // QRCODE_FENETRE_SECONDS)
+
+
+def fin_fenetre(fenetre: int) -> datetime:
+    """
+    Instant (UTC) où la fenêtre se termine
+    """
+    return datetime.fromtimestamp((fenetre + 1) * QRCODE_FENETRE_SECONDS, tz=timezone.utc)
+
+
+def _signature(fenetre: int) -> str:
+    message = f"{VERSION_JETON}.{fenetre}".encode()
+    empreinte = hmac.new(QRCODE_SECRET, message, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(empreinte).decode().rstrip("=")
+
+
+def generer_jeton_qrcode(fenetre: Optional[int] = None) -> str:
+    """
+    Jeton signé de la fenêtre donnée (fenêtre courante par défaut)
+    """
+    if fenetre is None:
+        fenetre = fenetre_courante()
+    return f"{VERSION_JETON}.{fenetre}.{_signature(fenetre)}"
+
+
+def valider_jeton_qrcode(jeton: str, instant: Optional[datetime] = None) -> bool:
+    """
+    Vérifie la signature du jeton et que sa fenêtre correspond à l'heure du scan
+    (maintenant, ou l'heure d'un scan hors-ligne)
+    """
+    morceaux = jeton.split(".") if jeton else []
+    if len(morceaux) != 3 or morceaux[0] != VERSION_JETON:
+        return False
+    try:
+        fenetre = int(morceaux[1])
+    except ValueError:
+        return False
+
+    if abs(fenetre_courante(instant) - fenetre) > QRCODE_FENETRES_TOLERANCE:
+        return False
+    return hmac.compare_digest(morceaux[2], _signature(fenetre))
@@ -0,0 +1,121 @@
+"""
+Stockage borné des images de QR codes dans static/qrcodes.
+
+Les fichiers sont nommés d'après le contenu du PNG (qrcode_<sha256>.png): une même
+image n'est écrite qu'une fois, quel que soit le nombre d'appels ou de workers.
+Le balayage supprime les images des codes inactifs au-delà d'un âge maximal et
+garde le dossier sous un nombre maximal de fichiers.
+"""
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import List, Set
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de fichiers conservés dans le dossier des QR codes
+QRCODE_FICHIERS_MAX = int(os.environ.get("QRCODE_FICHIERS_MAX", "50"))
+
+# Âge au-delà duquel l'image d'un code qui n'est plus actif est supprimée (secondes).
+# Laisse le temps aux écrans d'afficher l'ancien code juste après une rotation.
+QRCODE_FICHIERS_AGE_MAX_SECONDS = float(os.environ.get("QRCODE_FICHIERS_AGE_MAX_SECONDS", "600"))
+
+PREFIXE_FICHIER = "qrcode_"
+PREFIXE_TEMPORAIRE = ".tmp_"
+
+
+class StockageQRCodes:
+    """
+    Fichiers PNG des QR codes, adressés par leur contenu
+    """
+
+    def __init__(self, dossier: str, max_fichiers: int, age_max_secondes: float):
+        self.dossier = dossier
+        self.max_fichiers = max_fichiers
+        self.age_max_secondes = age_max_secondes
+
+    @staticmethod
+    def nom_fichier(png: bytes) -> str:
+        """
+        Nom de fichier dérivé du contenu du PNG
+        """
+        return f"{PREFIXE_FICHIER}{hashlib.sha256(png).hexdigest()[:32]}.png"
+
+    def enregistrer(self, png: bytes) -> str:
+        """
+        Écrit le PNG s'il n'existe pas encore et retourne son nom de fichier
+        """
+        filename = self.nom_fichier(png)
+        filepath = os.path.join(self.dossier, filename)
+        try:
+            # Même contenu déjà écrit (autre worker, redémarrage): l'âge repart de maintenant
+            os.utime(filepath)
+            return filename
+        except FileNotFoundError:
+            pass  # Pas encore écrit, ou supprimé par un balayage entre-temps
+
+        os.makedirs(self.dossier, exist_ok=True)
+        logger.debug("Sauvegarde du QR code dans: %s", filepath)
+        # Écriture atomique: un autre worker peut lire le fichier en même temps.
+        # Le nom temporaire ne commence pas par PREFIXE_FICHIER: le balayage l'ignore.
+        fichier_temporaire = os.path.join(self.dossier, f"{PREFIXE_TEMPORAIRE}{uuid.uuid4().hex}_{filename}")
+        with open(fichier_temporaire, "wb") as fichier:
+            fichier.write(png)
+        os.replace(fichier_temporaire, filepath)
+        return filename
+
+    def balayer(self, proteges: Set[str]) -> List[str]:
+        """
+        Supprime les fichiers non protégés plus vieux que l'âge maximal, puis les plus
+        anciens tant que le dossier dépasse le nombre maximal de fichiers.
+        Les fichiers temporaires d'une écriture en cours sont ignorés (ceux laissés par
+        une écriture interrompue sont supprimés après l'âge maximal).
+        Retourne les noms des fichiers supprimés.
+        """
+        maintenant = time.time()
+        fichiers = []
+        temporaires_abandonnes = []
+        try:
+            for entree in os.scandir(self.dossier):
+                temporaire = entree.name.startswith(PREFIXE_TEMPORAIRE)
+                if not temporaire and not (entree.name.startswith(PREFIXE_FICHIER) and entree.name.endswith(".png")):
+                    continue
+                try:
+                    if not entree.is_file():
+                        continue
+                    mtime = entree.stat().st_mtime
+                except FileNotFoundError:
+                    # Supprimé ou renommé par un autre worker entre scandir et stat
+                    continue
+                if not temporaire:
+                    fichiers.append((mtime, entree.name))
+                elif maintenant - mtime > self.age_max_secondes:
+                    temporaires_abandonnes.append(entree.name)
+        except FileNotFoundError:
+            return []
+
+        fichiers.sort(reverse=True)
+        a_supprimer = []
+        conserves = 0
+        for mtime, nom in fichiers:
+            if nom in proteges:
+                conserves += 1
+            elif maintenant - mtime > self.age_max_secondes or conserves >= self.max_fichiers:
+                a_supprimer.append(nom)
+            else:
+                conserves += 1
+
+        supprimes = []
+        for nom in temporaires_abandonnes + a_supprimer:
+            try:
+                os.remove(os.path.join(self.dossier, nom))
+                supprimes.append(nom)
+            except FileNotFoundError:
+                # Déjà supprimé par un autre worker
+                pass
+        return supprimes
+
+
+stockage_qrcodes = StockageQRCodes("static/qrcodes", QRCODE_FICHIERS_MAX, QRCODE_FICHIERS_AGE_MAX_SECONDS)
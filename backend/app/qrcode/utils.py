@@ -1,16 +1,139 @@
 import qrcode
+import asyncio
 import base64
+import hashlib
+import logging
 import uuid
 import os
+import time
+from collections import OrderedDict
 from io import BytesIO
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional
 from datetime import datetime, timezone, timedelta
 
 from app.db import get_db
+from app.qrcode.stockage import stockage_qrcodes
+from app.qrcode import signature
+
+logger = logging.getLogger(__name__)
 
 # Fuseau horaire GMT+1
 TIMEZONE = timezone(timedelta(hours=1))
 
+# Cache en mémoire du QR code actif
+# Invalidé explicitement par create_new_qrcode; le TTL couvre les déploiements
+# multi-workers où un autre processus a pu générer un nouveau code.
+QRCODE_CACHE_TTL_SECONDS = float(os.environ.get("QRCODE_CACHE_TTL_SECONDS", "30"))
+
+_cache_qrcode_actif: Dict[str, Any] = {
+    "qrcode": None,  # Ligne qrcodes active (ou None si aucun code actif)
+    "expire_a": 0.0  # time.monotonic() au-delà duquel il faut relire la base
+}
+
+
+# Images rendues par code_unique (LRU): le code actif est servi sans rendu ni écriture disque
+QRCODE_IMAGE_CACHE_SIZE = int(os.environ.get("QRCODE_IMAGE_CACHE_SIZE", "16"))
+
+# Intervalle du balayage des fichiers d'images de QR codes (secondes)
+QRCODE_BALAYAGE_INTERVALLE_SECONDS = float(os.environ.get("QRCODE_BALAYAGE_INTERVALLE_SECONDS", "300"))
+
+_cache_images: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+_tache_balayage: Optional[asyncio.Task] = None
+
+# Mode signé: fenêtre du dernier jeton enregistré dans l'historique (table qrcodes)
+_jeton_journalise: Dict[str, Any] = {"fenetre": None, "qrcode": None}
+
+
+def date_generation(qrcode_db: Dict[str, Any]) -> datetime:
+    """
+    Date de génération d'un QR code (avec fuseau horaire)
+    """
+    valeur = datetime.fromisoformat(str(qrcode_db["date_generation"]).replace("Z", "+00:00"))
+    return valeur if valeur.tzinfo else valeur.replace(tzinfo=TIMEZONE)
+
+
+def set_cached_active_qrcode(qrcode_db: Optional[Dict[str, Any]]) -> None:
+    """
+    Enregistre le QR code actif dans le cache (None = aucun code actif)
+    """
+    _cache_qrcode_actif["qrcode"] = qrcode_db
+    _cache_qrcode_actif["expire_a"] = time.monotonic() + QRCODE_CACHE_TTL_SECONDS
+
+
+def invalidate_active_qrcode_cache() -> None:
+    """
+    Vide le cache: la prochaine lecture du QR code actif interrogera la base
+    """
+    _cache_qrcode_actif["qrcode"] = None
+    _cache_qrcode_actif["expire_a"] = 0.0
+
+
+async def get_cached_active_qrcode(force_refresh: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Retourne le QR code actif depuis le cache, en relisant la base si le TTL est dépassé
+    """
+    if not force_refresh and time.monotonic() < _cache_qrcode_actif["expire_a"]:
+        return _cache_qrcode_actif["qrcode"]
+    
+    db = await get_db()
+    result = await db.table("qrcodes").select("*").eq("actif", True).order("date_generation", desc=True).limit(1).execute()
+    qrcode_db = result.data[0] if result.data else None
+    set_cached_active_qrcode(qrcode_db)
+    return qrcode_db
+
+
+def _rendre_png_qrcode(data: str) -> bytes:
+    """
+    Rend le QR code des données fournies en PNG
+    """
+    # Création du QR code
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    # Création de l'image
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def get_qrcode_image(data: str) -> Dict[str, Any]:
+    """
+    Retourne l'image du QR code pour les données fournies: URL du fichier static,
+    data URI base64, ETag et PNG. L'image est rendue et écrite sur disque une seule
+    fois par code (fichier adressé par son contenu), puis servie depuis le cache.
+    """
+    image = _cache_images.get(data)
+    if image is not None:
+        _cache_images.move_to_end(data)
+        return image
+    
+    logger.debug("Génération d'un QR code avec les données: %s", data)
+    png = _rendre_png_qrcode(data)
+    
+    # Fichier static nommé d'après le contenu de l'image
+    filename = stockage_qrcodes.enregistrer(png)
+    
+    image = {
+        # URL relative pour accéder à l'image
+        "image_url": f"/static/qrcodes/{filename}",
+        "filename": filename,
+        "qrcode_data": f"data:image/png;base64,{base64.b64encode(png).decode()}",
+        "etag": f'"{hashlib.sha256(png).hexdigest()[:32]}"',
+        "png": png
+    }
+    _cache_images[data] = image
+    while len(_cache_images) > QRCODE_IMAGE_CACHE_SIZE:
+        _cache_images.popitem(last=False)
+    return image
+
 
 async def generate_qrcode(data: str) -> Tuple[str, str]:
     """
@@ -18,96 +141,142 @@ async def generate_qrcode(data: str) -> Tuple[str, str]:
     Retourne l'URL de l'image et les données encodées en base64
     """
     try:
-        print(f"Génération d'un QR code avec les données: {data}")
-        
-        # Création du QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-
-        # Création de l'image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Conversion en base64 pour l'affichage
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        
-        # Sauvegarde du fichier dans le dossier static
-        static_dir = "static/qrcodes"
-        os.makedirs(static_dir, exist_ok=True)
-        
-        filename = f"qrcode_{uuid.uuid4()}.png"
-        filepath = os.path.join(static_dir, filename)
-        
-        # Vérifier que le chemin est valide
-        print(f"Sauvegarde du QR code dans: {filepath}")
-        
-        # Sauvegarder l'image
-        img.save(filepath)
-        
-        # URL relative pour accéder à l'image
-        image_url = f"/static/qrcodes/{filename}"
-        
-        print(f"QR code généré avec succès: {image_url}")
-        return image_url, f"data:image/png;base64,{img_str}"
+        image = get_qrcode_image(data)
+        return image["image_url"], image["qrcode_data"]
     except Exception as e:
-        print(f"Erreur lors de la génération du QR code: {str(e)}")
+        logger.error("Erreur lors de la génération du QR code: %s", e)
         # Retourner une image par défaut en cas d'erreur
         return "/static/default-qr.png", "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNk+A8AAQUBAScY42YAAAAASUVORK5CYII="
 
 
+async def balayer_fichiers_qrcodes() -> int:
+    """
+    Supprime les fichiers d'images des codes inactifs (voir app/qrcode/stockage.py),
+    en protégeant l'image du code actif. Retourne le nombre de fichiers supprimés.
+    """
+    proteges = set()
+    qrcode_actif = await get_cached_active_qrcode()
+    if qrcode_actif:
+        proteges.add(get_qrcode_image(qrcode_actif["code_unique"])["filename"])
+    
+    supprimes = set(await asyncio.to_thread(stockage_qrcodes.balayer, proteges))
+    if supprimes:
+        # Une image en cache dont le fichier a disparu sera réécrite au prochain rendu
+        for data in [data for data, image in _cache_images.items() if image["filename"] in supprimes]:
+            del _cache_images[data]
+        logger.info("🧹 %s fichier(s) de QR codes inactifs supprimé(s)", len(supprimes))
+    return len(supprimes)
+
+
+async def _boucle_balayage_qrcodes() -> None:
+    """
+    Balayage périodique du dossier des QR codes
+    """
+    while True:
+        try:
+            await balayer_fichiers_qrcodes()
+        except Exception as e:
+            logger.error("Erreur lors du balayage des fichiers de QR codes: %s", e)
+        await asyncio.sleep(QRCODE_BALAYAGE_INTERVALLE_SECONDS)
+
+
+def demarrer_balayage_qrcodes() -> None:
+    """
+    Démarre le balayage en arrière-plan (au démarrage de l'application)
+    """
+    global _tache_balayage
+    if _tache_balayage is None or _tache_balayage.done():
+        _tache_balayage = asyncio.create_task(_boucle_balayage_qrcodes())
+
+
+async def arreter_balayage_qrcodes() -> None:
+    """
+    Arrête le balayage en arrière-plan (à l'arrêt de l'application)
+    """
+    global _tache_balayage
+    if _tache_balayage is not None:
+        _tache_balayage.cancel()
+        try:
+            await _tache_balayage
+        except asyncio.CancelledError:
+            pass
+        _tache_balayage = None
+
+
+async def inserer_qrcode_actif(code_unique: str) -> Dict[str, Any]:
+    """
+    Enregistre un nouveau code actif et le place dans le cache: les scans du
+    nouveau code sont valides immédiatement, sans fenêtre sans code actif
+    """
+    db = await get_db()
+    
+    # Enregistrer dans la base de données avec l'heure GMT+1
+    now_gmt1 = datetime.now(TIMEZONE)
+    new_qrcode = {
+        "code_unique": code_unique,
+        "date_generation": now_gmt1.isoformat(),
+        "actif": True
+    }
+    logger.debug("🕒 Date de génération (GMT+1): %s", now_gmt1)
+    
+    logger.debug("Insertion du QR code dans la base de données: %s", new_qrcode)
+    result = await db.table("qrcodes").insert(new_qrcode).execute()
+    
+    if not result.data or len(result.data) == 0:
+        logger.debug("Aucune donnée retournée lors de l'insertion du QR code")
+        raise Exception("Erreur lors de la création du QR code")
+    
+    # Le nouveau code est immédiatement valide pour les scans de ce processus
+    set_cached_active_qrcode(result.data[0])
+    return result.data[0]
+
+
+async def desactiver_anciens_qrcodes(qrcode_id: str) -> int:
+    """
+    Désactive tous les QR codes actifs autres que qrcode_id
+    Retourne le nombre de codes désactivés
+    """
+    db = await get_db()
+    result = await db.table("qrcodes").update({"actif": False}).eq("actif", True).neq("id", qrcode_id).execute()
+    anciens = result.data or []
+    if anciens:
+        logger.info("🔒 SÉCURITÉ: Désactivation de %s ancien(s) QR code(s)", len(anciens))
+        for old_qr in anciens:
+            logger.debug("   - QR code %s (créé le %s) désactivé", old_qr['id'], old_qr['date_generation'])
+    return len(anciens)
+
+
 async def create_new_qrcode() -> Dict[str, Any]:
     """
     Crée un nouveau QR code unique et l'enregistre dans la base de données
     """
+    if signature.QRCODE_MODE_SIGNE:
+        # Le jeton change de lui-même à chaque fenêtre: rien à générer
+        return await get_active_qrcode()
+    
     try:
-        print("Création d'un nouveau QR code")
-        db = await get_db()
-        
-        # Désactiver tous les QR codes existants pour des raisons de sécurité
-        try:
-            old_qrcodes = db.table("qrcodes").select("*").eq("actif", True).execute()
-            if old_qrcodes.data:
-                print(f"🔒 SÉCURITÉ: Désactivation de {len(old_qrcodes.data)} ancien(s) QR code(s)")
-                for old_qr in old_qrcodes.data:
-                    print(f"   - QR code {old_qr['id']} (créé le {old_qr['date_generation']}) désactivé")
-            
-            db.table("qrcodes").update({"actif": False}).eq("actif", True).execute()
-            print("✅ Tous les anciens QR codes ont été désactivés avec succès")
-        except Exception as e:
-            print(f"⚠️ Erreur lors de la désactivation des QR codes existants: {str(e)}")
+        logger.debug("Création d'un nouveau QR code")
         
         # Générer un nouveau code unique
         code_unique = str(uuid.uuid4())
-        print(f"Code unique généré: {code_unique}")
+        logger.debug("Code unique généré: %s", code_unique)
         
         # Créer le QR code
         image_url, qrcode_data = await generate_qrcode(code_unique)
         
-        # Enregistrer dans la base de données avec l'heure GMT+1
-        now_gmt1 = datetime.now(TIMEZONE)
-        new_qrcode = {
-            "code_unique": code_unique,
-            "date_generation": now_gmt1.isoformat(),
-            "actif": True
-        }
-        print(f"🕒 Date de génération (GMT+1): {now_gmt1.strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        print(f"Insertion du QR code dans la base de données: {new_qrcode}")
-        result = db.table("qrcodes").insert(new_qrcode).execute()
+        # Le nouveau code est enregistré avant la désactivation des anciens:
+        # il y a toujours un code actif pour les scans
+        qrcode_db = await inserer_qrcode_actif(code_unique)
         
-        if not result.data or len(result.data) == 0:
-            print("Aucune donnée retournée lors de l'insertion du QR code")
-            raise Exception("Erreur lors de la création du QR code")
+        # Désactiver tous les autres QR codes pour des raisons de sécurité
+        try:
+            await desactiver_anciens_qrcodes(qrcode_db["id"])
+            logger.debug("✅ Tous les anciens QR codes ont été désactivés avec succès")
+        except Exception as e:
+            logger.warning("⚠️ Erreur lors de la désactivation des QR codes existants: %s", e)
         
-        qrcode_id = result.data[0]["id"]
-        print(f"QR code créé avec l'ID: {qrcode_id}")
+        qrcode_id = qrcode_db["id"]
+        logger.info("QR code créé avec l'ID: %s", qrcode_id)
         
         return {
             "qrcode_id": qrcode_id,
@@ -115,7 +284,7 @@ async def create_new_qrcode() -> Dict[str, Any]:
             "qrcode_image_url": image_url
         }
     except Exception as e:
-        print(f"Erreur lors de la création du QR code: {str(e)}")
+        logger.error("Erreur lors de la création du QR code: %s", e)
         # Générer un QR code par défaut en cas d'erreur
         default_code = "error-" + str(uuid.uuid4())
         image_url, qrcode_data = await generate_qrcode(default_code)
@@ -130,36 +299,86 @@ async def create_new_qrcode() -> Dict[str, Any]:
         }
 
 
+async def journaliser_jeton_qrcode(jeton: str, fenetre: int) -> Dict[str, Any]:
+    """
+    Mode signé: enregistre le jeton affiché dans l'historique (une fois par fenêtre
+    et par processus) et retourne sa ligne qrcodes
+    """
+    if _jeton_journalise["fenetre"] == fenetre:
+        return _jeton_journalise["qrcode"]
+    
+    db = await get_db()
+    result = await db.table("qrcodes").select("*").eq("code_unique", jeton).limit(1).execute()
+    if result.data:
+        # Déjà enregistré par un autre worker
+        qrcode_db = result.data[0]
+        set_cached_active_qrcode(qrcode_db)
+    else:
+        qrcode_db = await inserer_qrcode_actif(jeton)
+        await desactiver_anciens_qrcodes(qrcode_db["id"])
+    
+    _jeton_journalise["fenetre"] = fenetre
+    _jeton_journalise["qrcode"] = qrcode_db
+    return qrcode_db
+
+
+async def get_active_qrcode_signe() -> Dict[str, Any]:
+    """
+    Mode signé: jeton de la fenêtre en cours, avec son heure d'expiration pour que
+    l'écran se rafraîchisse
+    """
+    fenetre = signature.fenetre_courante()
+    jeton = signature.generer_jeton_qrcode(fenetre)
+    image = get_qrcode_image(jeton)
+    
+    try:
+        qrcode_id = (await journaliser_jeton_qrcode(jeton, fenetre))["id"]
+    except Exception as e:
+        # L'historique ne doit pas empêcher l'affichage: le jeton se valide sans la base
+        logger.warning("⚠️ Erreur lors de l'enregistrement du jeton dans l'historique: %s", e)
+        qrcode_id = uuid.uuid5(uuid.NAMESPACE_URL, jeton)
+    
+    return {
+        "qrcode_id": qrcode_id,
+        "qrcode_data": image["qrcode_data"],
+        "qrcode_image_url": image["image_url"],
+        "expire_a": signature.fin_fenetre(fenetre),
+        "etag": image["etag"]
+    }
+
+
 async def get_active_qrcode() -> Dict[str, Any]:
     """
     Récupère le QR code actif, ou en crée un nouveau s'il n'existe pas
     """
+    if signature.QRCODE_MODE_SIGNE:
+        return await get_active_qrcode_signe()
+    
     try:
-        print("Récupération du QR code actif")
-        db = await get_db()
+        logger.debug("Récupération du QR code actif")
         
-        # Récupérer le QR code actif
-        result = db.table("qrcodes").select("*").eq("actif", True).execute()
+        # Récupérer le QR code actif (cache en mémoire)
+        qrcode_db = await get_cached_active_qrcode()
         
-        if not result.data or len(result.data) == 0:
-            print("Aucun QR code actif trouvé, création d'un nouveau")
+        if qrcode_db is None:
+            logger.debug("Aucun QR code actif trouvé, création d'un nouveau")
             # Aucun QR code actif, en créer un nouveau
             return await create_new_qrcode()
         
-        qrcode_db = result.data[0]
         code_unique = qrcode_db["code_unique"]
-        print(f"QR code actif trouvé avec le code: {code_unique}")
+        logger.debug("QR code actif trouvé avec le code: %s", code_unique)
         
-        # Générer l'image du QR code
-        image_url, qrcode_data = await generate_qrcode(code_unique)
+        # Image du QR code (rendue une seule fois par code)
+        image = get_qrcode_image(code_unique)
         
         return {
             "qrcode_id": qrcode_db["id"],
-            "qrcode_data": qrcode_data,
-            "qrcode_image_url": image_url
+            "qrcode_data": image["qrcode_data"],
+            "qrcode_image_url": image["image_url"],
+            "etag": image["etag"]
         }
     except Exception as e:
-        print(f"Erreur lors de la récupération du QR code actif: {str(e)}")
+        logger.error("Erreur lors de la récupération du QR code actif: %s", e)
         # Générer un QR code par défaut en cas d'erreur
         default_code = "error-" + str(uuid.uuid4())
         image_url, qrcode_data = await generate_qrcode(default_code)
@@ -174,27 +393,58 @@ async def get_active_qrcode() -> Dict[str, Any]:
         }
 
 
-async def validate_qrcode(code_unique: str) -> bool:
+async def get_qrcode_by_id(qrcode_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Récupère un QR code par son ID (le code actif est lu depuis le cache)
+    """
+    qrcode_actif = await get_cached_active_qrcode()
+    if qrcode_actif and str(qrcode_actif["id"]) == qrcode_id:
+        return qrcode_actif
+    
+    db = await get_db()
+    result = await db.table("qrcodes").select("*").eq("id", qrcode_id).execute()
+    return result.data[0] if result.data else None
+
+
+async def validate_qrcode(code_unique: str, instant: Optional[datetime] = None) -> bool:
     """
     Vérifie si un QR code est valide et actif
+    Le cas courant (code actif) est résolu depuis le cache sans requête réseau.
+    En mode signé, seul le jeton est vérifié (par rapport à instant, l'heure du scan).
     """
+    if signature.QRCODE_MODE_SIGNE:
+        if signature.valider_jeton_qrcode(code_unique, instant):
+            return True
+        logger.warning("🚫 SÉCURITÉ: Jeton de QR code invalide ou expiré: %s...", (code_unique or '')[:16])
+        return False
+    
+    qrcode_actif = await get_cached_active_qrcode()
+    if qrcode_actif and qrcode_actif["code_unique"] == code_unique:
+        return True
+    
+    # Code différent du code actif en cache: il a pu être généré par un autre worker
+    # depuis la dernière lecture, on vérifie donc dans la base
     db = await get_db()
     
     # Vérifier si le QR code existe et est actif
-    result = db.table("qrcodes").select("*").eq("code_unique", code_unique).eq("actif", True).execute()
+    result = await db.table("qrcodes").select("*").eq("code_unique", code_unique).eq("actif", True).execute()
     
     if result.data and len(result.data) > 0:
         qrcode_info = result.data[0]
-        print(f"✅ QR code valide: {qrcode_info['id']} (créé le {qrcode_info['date_generation']})")
+        logger.debug("✅ QR code valide: %s (créé le %s)", qrcode_info['id'], qrcode_info['date_generation'])
+        # Pendant le délai de grâce d'une rotation, l'ancien code est encore actif:
+        # il ne doit pas remplacer le code plus récent en cache
+        if not qrcode_actif or date_generation(qrcode_info) > date_generation(qrcode_actif):
+            set_cached_active_qrcode(qrcode_info)
         return True
     else:
         # Vérifier si le QR code existe mais est désactivé
-        old_result = db.table("qrcodes").select("*").eq("code_unique", code_unique).execute()
+        old_result = await db.table("qrcodes").select("*").eq("code_unique", code_unique).execute()
         if old_result.data and len(old_result.data) > 0:
             old_qr = old_result.data[0]
-            print(f"🚫 SÉCURITÉ: Tentative d'utilisation d'un QR code désactivé: {old_qr['id']} (créé le {old_qr['date_generation']}, actif: {old_qr['actif']})")
+            logger.warning("🚫 SÉCURITÉ: Tentative d'utilisation d'un QR code désactivé: %s (créé le %s, actif: %s)", old_qr['id'], old_qr['date_generation'], old_qr['actif'])
         else:
-            print(f"🚫 SÉCURITÉ: Tentative d'utilisation d'un QR code inexistant: {code_unique[:8]}...")
+            logger.warning("🚫 SÉCURITÉ: Tentative d'utilisation d'un QR code inexistant: %s...", code_unique[:8])
         return False
 
 
@@ -203,11 +453,11 @@ async def get_qr_codes_history() -> Dict[str, Any]:
     Récupère l'historique de tous les QR codes générés
     """
     try:
-        print("Récupération de l'historique des QR codes")
+        logger.debug("Récupération de l'historique des QR codes")
         db = await get_db()
         
         # Récupérer tous les QR codes par ordre décroissant de création
-        result = db.table("qrcodes").select("*").order("date_generation", desc=True).execute()
+        result = await db.table("qrcodes").select("*").order("date_generation", desc=True).execute()
         
         if not result.data:
             return {
@@ -221,7 +471,7 @@ async def get_qr_codes_history() -> Dict[str, Any]:
         active_count = sum(1 for qr in result.data if qr.get("actif", False))
         inactive_count = len(result.data) - active_count
         
-        print(f"📊 Historique: {len(result.data)} QR codes au total ({active_count} actifs, {inactive_count} inactifs)")
+        logger.debug("📊 Historique: %s QR codes au total (%s actifs, %s inactifs)", len(result.data), active_count, inactive_count)
         
         # Formater les données pour l'affichage
         formatted_qrcodes = []
@@ -242,7 +492,7 @@ async def get_qr_codes_history() -> Dict[str, Any]:
         }
         
     except Exception as e:
-        print(f"Erreur lors de la récupération de l'historique des QR codes: {str(e)}")
+        logger.error("Erreur lors de la récupération de l'historique des QR codes: %s", e)
         return {
             "total_qrcodes": 0,
             "active_qrcodes": 0,
@@ -256,11 +506,11 @@ async def cleanup_inactive_qrcodes() -> Dict[str, Any]:
     Supprime tous les QR codes inactifs de la base de données
     """
     try:
-        print("🧹 Nettoyage des QR codes inactifs")
+        logger.info("🧹 Nettoyage des QR codes inactifs")
         db = await get_db()
         
         # Récupérer les QR codes inactifs avant suppression
-        inactive_qrcodes = db.table("qrcodes").select("*").eq("actif", False).execute()
+        inactive_qrcodes = await db.table("qrcodes").select("*").eq("actif", False).execute()
         
         if not inactive_qrcodes.data:
             return {
@@ -269,18 +519,22 @@ async def cleanup_inactive_qrcodes() -> Dict[str, Any]:
             }
         
         # Supprimer les QR codes inactifs
-        delete_result = db.table("qrcodes").delete().eq("actif", False).execute()
+        delete_result = await db.table("qrcodes").delete().eq("actif", False).execute()
         deleted_count = len(delete_result.data) if delete_result.data else 0
         
-        print(f"🗑️ {deleted_count} QR codes inactifs supprimés avec succès")
+        logger.info("🗑️ %s QR codes inactifs supprimés avec succès", deleted_count)
+        
+        # Supprimer aussi les images des codes inactifs
+        deleted_files = await balayer_fichiers_qrcodes()
         
         return {
             "deleted_count": deleted_count,
+            "deleted_files": deleted_files,
             "message": f"{deleted_count} QR codes inactifs ont été supprimés"
         }
         
     except Exception as e:
-        print(f"Erreur lors du nettoyage des QR codes inactifs: {str(e)}")
+        logger.error("Erreur lors du nettoyage des QR codes inactifs: %s", e)
         return {
             "deleted_count": 0,
             "message": f"Erreur lors du nettoyage: {str(e)}"
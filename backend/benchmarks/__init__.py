@@ -0,0 +1 @@
+# Benchmarks exécutables sur la base en mémoire: python -m benchmarks.<nom> (depuis backend/)
@@ -0,0 +1,91 @@
+"""
+Benchmark de GET /api/admin/agents-pointages (get_agents_with_pointages).
+
+Compare l'ancien chemin N+1 (une requête de pointages par agent via
+format_pointages_by_date) à la requête unique sur la période regroupée en
+mémoire, et vérifie que les réponses sont identiques.
+
+La base en mémoire parcourt toutes les lignes à chaque requête: l'ancien chemin
+devient quadratique, il n'est mesuré que jusqu'à --max-ancien agents; seuls les
+pointages du 1er au 12 mars sont chargés (la semaine mesurée et ses voisins).
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_agents_pointages --agents 50 500 5000 --latence 5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+from datetime import date
+
+from benchmarks.common import installer_base_memoire, generer_agents, generer_pointages_mois
+from app.admin import utils as admin_utils
+from app.pointage.utils import format_pointages_by_date
+
+MOIS, ANNEE = 3, 2025
+DEBUT, FIN = date(2025, 3, 3), date(2025, 3, 9)
+
+
+async def ancien_chemin(start_date: date, end_date: date) -> list:
+    """
+    Ancienne implémentation: liste des agents puis une requête par agent
+    """
+    agents = await admin_utils.get_all_agents()
+    result = []
+    for agent in agents:
+        result.append({
+            "agent_id": agent["id"],
+            "nom": agent["nom"],
+            "email": agent["email"],
+            "role": agent["role"],
+            "pointages": await format_pointages_by_date(agent["id"], start_date, end_date)
+        })
+    return result
+
+
+async def mesurer(nb_agents: int, latence_ms: float, max_ancien: int) -> bool:
+    agents = generer_agents(nb_agents)
+    client = installer_base_memoire({
+        "agents": agents,
+        "pointages": [p for p in generer_pointages_mois(agents, MOIS, ANNEE) if p["date_pointage"] <= "2025-03-12"],
+    }, latency_ms=latence_ms)
+
+    resultats = {}
+    chemins = [("requête unique", lambda: admin_utils.get_agents_with_pointages(DEBUT, FIN))]
+    if nb_agents <= max_ancien:
+        chemins.insert(0, ("N+1 (ancien)", lambda: ancien_chemin(DEBUT, FIN)))
+
+    # Les traces print des deux chemins ne doivent pas fausser la mesure
+    with contextlib.redirect_stdout(io.StringIO()):
+        for nom, chemin in chemins:
+            client.round_trips = 0
+            debut = time.perf_counter()
+            resultats[nom] = await chemin()
+            duree = (time.perf_counter() - debut) * 1000
+            print(f"  {nb_agents:>5} agents  {nom:<16} {duree:10.1f} ms  requêtes={client.round_trips}", file=sys.__stdout__)
+
+    if len(resultats) < 2:
+        print(f"  {nb_agents:>5} agents  N+1 (ancien)     ignoré (> --max-ancien {max_ancien})")
+        return True
+    identiques = resultats["N+1 (ancien)"] == resultats["requête unique"]
+    print(f"  {nb_agents:>5} agents  réponses identiques: {'oui' if identiques else 'NON'}")
+    return identiques
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--latence", type=float, default=5.0, help="Latence simulée par requête (ms)")
+    parser.add_argument("--max-ancien", type=int, default=500, help="Nombre d'agents maximal pour mesurer l'ancien chemin")
+    args = parser.parse_args()
+
+    print(f"Agents avec pointages du {DEBUT} au {FIN}, latence simulée {args.latence} ms par aller-retour")
+    identiques = all(asyncio.run(mesurer(nb, args.latence, args.max_ancien)) for nb in args.agents)
+    if not identiques:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark et vérification du cache des paies des mois clos (app.paie.cache).
+
+1. Durée de calculer_paie_agent pour chaque agent d'un mois clos, sans cache
+   (calcul depuis la base, latence simulée) puis depuis le cache; même chose pour
+   calculer_paies_tous_agents.
+2. Vérifications: les paies servies par le cache sont identiques au calcul; après
+   modification d'un pointage et invalidation, la paie est recalculée; un calcul
+   commencé avant une invalidation n'est pas enregistré; un scan hors-ligne du mois
+   clos synchronisé après coup (seul ou groupé) invalide l'instantané; les instantanés d'un
+   fichier SQLite sont relus par une nouvelle instance (redémarrage, autre worker);
+   une invalidation qui attend le verrou d'écriture d'un autre worker ne bloque
+   pas la boucle d'événements.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_cache_paie --agents 100 --latence 1
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+from benchmarks.common import installer_base_memoire, generer_agents, generer_pointages_mois, resume
+from app.paie import cache as cache_module
+from app.paie import utils as paie_utils
+from app.paie.cache import CachePaies, cache_paies, cle_mois, invalider_paie_date
+from app.paie.utils import calculer_paie_agent, calculer_paies_tous_agents
+from app.pointage.utils import create_pointage_offline, create_pointages_offline_batch
+
+MOIS, ANNEE = 3, 2025
+CODE = str(uuid.uuid4())
+
+
+async def mesurer_agents(agents) -> list:
+    durees = []
+    for agent in agents:
+        debut = time.perf_counter()
+        await calculer_paie_agent(agent["id"], MOIS, ANNEE)
+        durees.append((time.perf_counter() - debut) * 1000)
+    return durees
+
+
+async def attente_boucle_pendant_verrou(chemin: str, agent_id: str) -> float:
+    """
+    Un autre worker garde le verrou d'écriture 0,3 s pendant une invalidation:
+    plus long intervalle observé entre deux tours de la boucle (ms)
+    """
+    autre_worker = sqlite3.connect(chemin, isolation_level=None)
+    autre_worker.execute("BEGIN IMMEDIATE")
+    asyncio.get_running_loop().call_later(0.3, autre_worker.execute, "COMMIT")
+    cache_module.cache_paies = CachePaies(chemin)
+    intervalles = []
+
+    async def battement():
+        dernier = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.005)
+            maintenant = time.perf_counter()
+            intervalles.append((maintenant - dernier) * 1000)
+            dernier = maintenant
+
+    tache = asyncio.create_task(battement())
+    try:
+        await invalider_paie_date(agent_id, f"{ANNEE}-{MOIS:02d}-01")
+    finally:
+        tache.cancel()
+        cache_module.cache_paies = cache_paies
+        autre_worker.close()
+    return max(intervalles, default=0.0)
+
+
+async def mesurer(nombre: int, latence: float) -> None:
+    agents = generer_agents(nombre)
+    client = installer_base_memoire({
+        "agents": agents,
+        "pointages": generer_pointages_mois(agents, MOIS, ANNEE),
+        "jours_feries": [],
+        "jours_feries_exceptions": [],
+        "primes": [],
+        "qrcodes": [{"id": str(uuid.uuid4()), "code_unique": CODE, "actif": True, "date_generation": datetime.now().isoformat()}],
+    }, latency_ms=latence)
+
+    avant = client.round_trips
+    froid = await mesurer_agents(agents)
+    requetes_froid = client.round_trips - avant
+    avant = client.round_trips
+    chaud = await mesurer_agents(agents)
+    requetes_chaud = client.round_trips - avant
+    print(resume("par agent, calcul", froid) + f"  requêtes={requetes_froid}")
+    print(resume("par agent, cache", chaud) + f"  requêtes={requetes_chaud}")
+
+    cache_paies.vider()
+    debut = time.perf_counter()
+    calculees = await calculer_paies_tous_agents(MOIS, ANNEE)
+    duree_calcul = (time.perf_counter() - debut) * 1000
+    avant = client.round_trips
+    debut = time.perf_counter()
+    servies = await calculer_paies_tous_agents(MOIS, ANNEE)
+    duree_cache = (time.perf_counter() - debut) * 1000
+    print(f"tous les agents: calcul {duree_calcul:.1f} ms, cache {duree_cache:.1f} ms ({client.round_trips - avant} requête(s))")
+
+    # Vérifications sans latence
+    client.latency_ms = 0.0
+    erreurs = 0
+    if [p.model_dump() for p in servies] != [p.model_dump() for p in calculees]:
+        print("  calcul-tous: paies du cache différentes du calcul")
+        erreurs += 1
+    paie_utils.PAIE_CACHE_ENABLED = False
+    references = [await calculer_paie_agent(agent["id"], MOIS, ANNEE) for agent in agents]
+    paie_utils.PAIE_CACHE_ENABLED = True
+    if [p.model_dump() for p in references] != [p.model_dump() for p in servies]:
+        print("  paies du cache différentes du calcul par agent")
+        erreurs += 1
+
+    # Invalidation après modification d'un pointage (comme PUT /api/admin/pointages/{id})
+    agent_id = agents[0]["id"]
+    pointage = next(p for p in client.tables["pointages"] if p["agent_id"] == agent_id and p["type_pointage"] == "arrivee")
+    pointage["heure_pointage"] = "10:30:00"
+    await invalider_paie_date(agent_id, pointage["date_pointage"])
+    recalculee = await calculer_paie_agent(agent_id, MOIS, ANNEE)
+    if recalculee.heures_retard <= references[0].heures_retard:
+        print("  paie non recalculée après invalidation")
+        erreurs += 1
+
+    # Scans hors-ligne du mois clos (week-end du 29-30) synchronisés après coup (seul puis groupé)
+    cle = cle_mois(MOIS, ANNEE)
+    for nom, synchroniser in [
+        ("seul", lambda agent: create_pointage_offline(agent, CODE, datetime(ANNEE, MOIS, 29, 7, 0, tzinfo=timezone.utc))),
+        ("groupé", lambda agent: create_pointages_offline_batch(agent, [(CODE, datetime(ANNEE, MOIS, 30, 7, 0, tzinfo=timezone.utc))])),
+    ]:
+        agent_hors_ligne = agents[1]["id"]
+        await calculer_paie_agent(agent_hors_ligne, MOIS, ANNEE)
+        if cache_paies.lire(agent_hors_ligne, cle) is None:
+            print(f"  hors-ligne {nom}: instantané absent avant la synchronisation")
+            erreurs += 1
+        await synchroniser(agent_hors_ligne)
+        if cache_paies.lire(agent_hors_ligne, cle) is not None:
+            print(f"  hors-ligne {nom}: instantané conservé après un scan du mois clos")
+            erreurs += 1
+
+    # Calcul commencé avant une invalidation: pas d'enregistrement
+    debut_calcul = time.time()
+    cache_paies.invalider(agent_id, cle_mois(MOIS, ANNEE))
+    cache_paies.enregistrer([recalculee], debut_calcul)
+    if cache_paies.lire(agent_id, cle_mois(MOIS, ANNEE)) is not None:
+        print("  instantané enregistré malgré une invalidation postérieure au début du calcul")
+        erreurs += 1
+
+    # Persistance: un fichier relu par une nouvelle instance
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "paie_cache.sqlite3")
+        CachePaies(chemin).enregistrer(servies, time.time())
+        relues = CachePaies(chemin).lire_agents([agent["id"] for agent in agents], cle_mois(MOIS, ANNEE))
+        if len(relues) != len(servies):
+            print(f"  fichier: {len(relues)}/{len(servies)} instantanés relus")
+            erreurs += 1
+        attente = await attente_boucle_pendant_verrou(chemin, agent_id)
+        print(f"boucle d'événements pendant une invalidation en attente du verrou: {attente:.1f} ms max entre deux tours")
+        if attente > 100:
+            erreurs += 1
+
+    print(f"Vérifications: {erreurs} erreur(s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--latence", type=float, default=1.0, help="Latence simulée par aller-retour (ms)")
+    args = parser.parse_args()
+
+    print(f"Cache des paies: {args.agents} agents, {MOIS:02d}/{ANNEE}, latence simulée {args.latence} ms par aller-retour")
+    asyncio.run(mesurer(args.agents, args.latence))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark de GET /api/admin/dashboard (get_dashboard_stats).
+
+Mesure la reconstruction à froid de l'état de présence depuis la base, puis les
+appels servis depuis la mémoire pendant que des scans mettent l'état à jour.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_dashboard --agents 500 --appels 2000 --latence 5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+import uuid
+from datetime import datetime
+
+from benchmarks.common import installer_base_memoire, generer_agents, resume
+from app.admin.presence import presence_du_jour, TIMEZONE
+from app.admin.utils import get_dashboard_stats
+
+
+async def mesurer(nb_agents: int, appels: int, latence_ms: float) -> None:
+    agents = generer_agents(nb_agents)
+    today = datetime.now(TIMEZONE).date().isoformat()
+    client = installer_base_memoire({
+        "agents": agents,
+        "pointages": [
+            {"id": str(uuid.uuid4()), "agent_id": agent["id"], "date_pointage": today, "heure_pointage": "08:00:00",
+             "session": "matin", "type_pointage": "arrivee", "annule": False}
+            for agent in agents
+        ],
+    }, latency_ms=latence_ms)
+    presence_du_jour.invalider()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        debut = time.perf_counter()
+        await get_dashboard_stats()
+        froid = (time.perf_counter() - debut) * 1000
+    print(f"{'reconstruction à froid':<40} {froid:8.3f} ms  requêtes={client.round_trips}")
+
+    client.round_trips = 0
+    durees = []
+    for i in range(appels):
+        # Un scan de sortie sur deux appels du tableau de bord
+        if i % 2 == 0:
+            agent = agents[(i // 2) % nb_agents]
+            presence_du_jour.enregistrer_pointage({
+                "id": str(uuid.uuid4()), "agent_id": agent["id"], "date_pointage": today,
+                "heure_pointage": "12:00:00", "session": "matin", "type_pointage": "sortie"
+            })
+        debut = time.perf_counter()
+        await get_dashboard_stats()
+        durees.append((time.perf_counter() - debut) * 1000)
+    print(resume("depuis la mémoire", durees) + f"  requêtes={client.round_trips}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=500)
+    parser.add_argument("--appels", type=int, default=2000)
+    parser.add_argument("--latence", type=float, default=5.0, help="Latence simulée par requête (ms)")
+    args = parser.parse_args()
+
+    print(f"Tableau de bord: {args.agents} agents, latence simulée {args.latence} ms par aller-retour")
+    asyncio.run(mesurer(args.agents, args.appels, args.latence))
+
+
+if __name__ == "__main__":
+    main()
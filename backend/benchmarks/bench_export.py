@@ -0,0 +1,118 @@
+"""
+Benchmark de l'export des pointages (POST /api/admin/export).
+
+Compare l'ancien export en mémoire (liste, DataFrame pandas puis BytesIO) à
+l'export en flux (pages de pointages, lignes CSV envoyées au fil de l'eau,
+classeur openpyxl en écriture seule): pic mémoire Python (tracemalloc), délai
+avant le premier bloc et durée totale. Vérifie que le CSV et le classeur Excel
+contiennent les mêmes lignes que l'export de référence.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_export --agents 100 --mois 2
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import time
+import tracemalloc
+from datetime import date
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from benchmarks.common import installer_base_memoire, generer_agents, generer_pointages_mois
+from app.admin import utils as admin_utils
+
+ANNEE = 2025
+
+
+async def export_en_memoire(start_date: date, end_date: date) -> bytes:
+    """
+    Ancienne construction de l'export CSV (colonnes de l'export en flux)
+    """
+    agents_with_pointages = await admin_utils.get_agents_with_pointages(start_date, end_date)
+    data = []
+    for agent in agents_with_pointages:
+        for pointage in agent["pointages"]:
+            data.append(dict(zip(admin_utils.COLONNES_EXPORT, [
+                agent["agent_id"], agent["nom"], agent["email"], pointage["date"],
+                pointage["matin_arrivee"] or "", pointage["matin_sortie"] or "",
+                pointage["apres_midi_arrivee"] or "", pointage["apres_midi_sortie"] or "",
+            ])))
+    buffer = io.BytesIO()
+    pd.DataFrame(data).to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+async def export_en_flux(start_date: date, end_date: date, format: str) -> tuple:
+    """
+    Consomme le flux de l'export; retourne le contenu et le délai du premier bloc (ms)
+    """
+    debut = time.perf_counter()
+    contenu, _, _ = await admin_utils.export_pointages(start_date, end_date, format)
+    blocs, premier = [], None
+    async for bloc in contenu:
+        if premier is None:
+            premier = (time.perf_counter() - debut) * 1000
+        blocs.append(bloc)
+    return b"".join(blocs), premier
+
+
+def lignes_csv(contenu: bytes) -> list:
+    lignes = list(csv.reader(io.StringIO(contenu.decode("utf-8"))))
+    return [lignes[0]] + sorted(lignes[1:])
+
+
+def lignes_excel(contenu: bytes) -> list:
+    feuille = load_workbook(io.BytesIO(contenu), read_only=True).active
+    lignes = [["" if v is None else str(v) for v in ligne] for ligne in feuille.iter_rows(values_only=True)]
+    return [lignes[0]] + sorted(lignes[1:])
+
+
+async def mesurer(nom: str, coroutine) -> tuple:
+    tracemalloc.start()
+    debut = time.perf_counter()
+    # Les traces print de l'export ne doivent pas fausser la mesure
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultat = await coroutine
+    duree = (time.perf_counter() - debut) * 1000
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    contenu, premier = resultat if isinstance(resultat, tuple) else (resultat, duree)
+    print(f"{nom:<22} {duree:10.1f} ms  premier bloc={premier:9.1f} ms  pic mémoire={pic / 1e6:7.1f} Mo  taille={len(contenu) / 1e6:6.2f} Mo")
+    return contenu
+
+
+async def executer(nb_agents: int, nb_mois: int) -> bool:
+    agents = generer_agents(nb_agents)
+    pointages = []
+    for mois in range(1, nb_mois + 1):
+        pointages += generer_pointages_mois(agents, mois, ANNEE, graine=mois)
+    installer_base_memoire({"agents": agents, "pointages": pointages})
+    debut, fin = date(ANNEE, 1, 1), date(ANNEE, nb_mois, 28)
+    print(f"Export du {debut} au {fin}: {nb_agents} agents, {len(pointages)} pointages")
+
+    reference = await mesurer("en mémoire (pandas)", export_en_memoire(debut, fin))
+    csv_flux = await mesurer("flux CSV", export_en_flux(debut, fin, "csv"))
+    excel_flux = await mesurer("flux Excel", export_en_flux(debut, fin, "excel"))
+
+    attendu = lignes_csv(reference)
+    identiques = lignes_csv(csv_flux) == attendu and lignes_excel(excel_flux) == attendu
+    print(f"Lignes identiques (CSV et Excel): {'oui' if identiques else 'NON'}")
+    return identiques
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--mois", type=int, default=2, help="Nombre de mois exportés (à partir de janvier)")
+    args = parser.parse_args()
+
+    if not asyncio.run(executer(args.agents, args.mois)):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
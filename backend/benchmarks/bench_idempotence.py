@@ -0,0 +1,95 @@
+"""
+Benchmark des nouvelles tentatives sur POST /api/pointage/scan avec Idempotency-Key.
+
+Pour chaque agent: un premier envoi, puis une nouvelle tentative avec la même clé
+(réponse perdue côté téléphone) et enfin trois envois simultanés avec une autre clé
+(double tap). Vérifie que les nouvelles tentatives renvoient le résultat d'origine
+sans requête en base et qu'un seul pointage est enregistré par clé.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_idempotence --agents 200 --latence 5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+import uuid
+from datetime import datetime
+
+from fastapi import Response
+
+from benchmarks.common import installer_base_memoire, generer_agents, resume
+from app.auth.models import User
+from app.pointage import router as pointage_router
+from app.pointage.idempotence import cache_idempotence
+from app.pointage.models import PointageScanOffline
+
+
+async def envoyer(user: User, code: str, cle: str) -> tuple:
+    response = Response()
+    resultat = await pointage_router.enregistrer_pointage_scan(
+        PointageScanOffline(qr_data=code), response, idempotency_key=cle, current_user=user
+    )
+    return resultat, response.headers.get("Idempotent-Replayed") == "true"
+
+
+async def mesurer(nombre: int, latence_ms: float) -> None:
+    agents = generer_agents(nombre)
+    code = str(uuid.uuid4())
+    client = installer_base_memoire({
+        "agents": agents,
+        "qrcodes": [{"id": str(uuid.uuid4()), "code_unique": code, "actif": True, "date_generation": datetime.now().isoformat()}],
+        "pointages": [],
+    }, latency_ms=latence_ms)
+    cache_idempotence.clear()
+
+    premiers, tentatives = [], []
+    requetes_premiers = requetes_tentatives = 0
+    identiques = True
+    # Les traces print du chemin de scan ne doivent pas fausser la mesure
+    with contextlib.redirect_stdout(io.StringIO()):
+        for agent in agents:
+            user = User(**agent)
+            cle = str(uuid.uuid4())
+
+            avant = client.round_trips
+            debut = time.perf_counter()
+            premier, _ = await envoyer(user, code, cle)
+            premiers.append((time.perf_counter() - debut) * 1000)
+            requetes_premiers += client.round_trips - avant
+
+            avant = client.round_trips
+            debut = time.perf_counter()
+            rejoue, marque = await envoyer(user, code, cle)
+            tentatives.append((time.perf_counter() - debut) * 1000)
+            requetes_tentatives += client.round_trips - avant
+            identiques = identiques and marque and rejoue == premier
+
+            # Double tap: trois envois simultanés de la même clé
+            cle_simultanee = str(uuid.uuid4())
+            envois = await asyncio.gather(*(envoyer(user, code, cle_simultanee) for _ in range(3)))
+            identiques = identiques and all(r == envois[0][0] for r, _ in envois)
+            identiques = identiques and sum(not marque for _, marque in envois) == 1
+
+    print(resume("premier envoi", premiers) + f"  requêtes/envoi={requetes_premiers / nombre:.1f}")
+    print(resume("nouvelle tentative", tentatives) + f"  requêtes/envoi={requetes_tentatives / nombre:.1f}")
+    enregistres = len(client.tables["pointages"])
+    print(f"Pointages enregistrés: {enregistres} (attendu {2 * nombre})")
+    print(f"Résultats rejoués identiques: {'oui' if identiques else 'NON'}")
+    if not identiques or enregistres != 2 * nombre or requetes_tentatives:
+        raise SystemExit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--latence", type=float, default=5.0, help="Latence simulée par requête (ms)")
+    args = parser.parse_args()
+
+    print(f"Idempotence: {args.agents} agents, latence simulée {args.latence} ms par aller-retour")
+    asyncio.run(mesurer(args.agents, args.latence))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark du coût des logs par requête.
+
+Rejoue des scans (chemin classique: validate_qrcode + determine_session_for_agent +
+insert) et des suivis quotidiens (get_agent_daily_tracking) sur la base en mémoire
+sans latence, avec les logs au niveau DEBUG (chaque message formaté et écrit, comme
+les print d'origine) puis au niveau WARNING (production). L'écart est le coût des
+traces par requête.
+
+Le suivi quotidien calculé en lot (app/pointage/suivi_utils.py) n'écrit plus que
+quelques lignes par requête, quel que soit le nombre de jours: sa durée ne dépend
+plus du niveau de log et sert de témoin. Le gain porte sur le chemin de scan.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_journalisation --scans 2000
+"""
+import argparse
+import asyncio
+import io
+import logging
+import time
+import uuid
+from datetime import date, datetime
+
+from benchmarks.common import installer_base_memoire, generer_agents, generer_pointages_mois, resume
+from app.admin.presence import presence_du_jour
+from app.pointage import utils as pointage_utils
+from app.pointage.suivi_utils import get_agent_daily_tracking
+
+
+def configurer(niveau: int) -> io.StringIO:
+    """
+    Logs vers un tampon en mémoire au niveau donné; retourne le tampon
+    """
+    sortie = io.StringIO()
+    handler = logging.StreamHandler(sortie)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    racine = logging.getLogger()
+    racine.handlers[:] = [handler]
+    racine.setLevel(niveau)
+    return sortie
+
+
+async def mesurer(niveau: int, scans: int) -> None:
+    agents = generer_agents(scans)
+    code = str(uuid.uuid4())
+    aujourd_hui = date.today()
+    installer_base_memoire({
+        "agents": agents,
+        "qrcodes": [{"id": str(uuid.uuid4()), "code_unique": code, "actif": True, "date_generation": datetime.now().isoformat()}],
+        "pointages": generer_pointages_mois(agents[:20], aujourd_hui.month, aujourd_hui.year),
+        "jours_feries": [],
+        "exceptions_jours_feries": [],
+    })
+    pointage_utils._scan_rpc_disponible = False
+    presence_du_jour.invalider()
+    sortie = configurer(niveau)
+
+    durees_scan = []
+    for agent in agents:
+        debut = time.perf_counter()
+        await pointage_utils.create_pointage(agent["id"], code)
+        durees_scan.append((time.perf_counter() - debut) * 1000)
+    lignes_scan = sortie.getvalue().count("\n")
+
+    durees_suivi = []
+    for agent in agents[:20]:
+        debut = time.perf_counter()
+        await get_agent_daily_tracking(agent["id"], aujourd_hui.replace(day=1), aujourd_hui)
+        durees_suivi.append((time.perf_counter() - debut) * 1000)
+    lignes_suivi = sortie.getvalue().count("\n") - lignes_scan
+
+    nom = logging.getLevelName(niveau)
+    print(resume(f"scan, logs {nom}", durees_scan) + f"  lignes/requête={lignes_scan / len(durees_scan):.1f}")
+    print(resume(f"suivi quotidien, logs {nom}", durees_suivi) + f"  lignes/requête={lignes_suivi / len(durees_suivi):.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scans", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"Logs: {args.scans} scans et 20 suivis mensuels, sans latence simulée")
+    asyncio.run(mesurer(logging.DEBUG, args.scans))
+    asyncio.run(mesurer(logging.WARNING, args.scans))
+
+
+if __name__ == "__main__":
+    main()
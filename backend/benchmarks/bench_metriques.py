@@ -0,0 +1,73 @@
+"""
+Benchmark du coût de l'instrumentation des requêtes en base (app.db.ClientInstrumente).
+
+Calcule la paie de tous les agents à travers le client instrumenté et affiche les
+séries /metrics correspondantes (nombre de requêtes par table et opération), puis
+rejoue la même requête (lecture d'un agent par id) sur la base en
+mémoire sans latence, directement puis à travers le client instrumenté, et affiche
+le surcoût par requête.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_metriques --requetes 5000 --agents 200
+"""
+import argparse
+import asyncio
+import time
+from datetime import date
+
+from benchmarks.common import installer_base_memoire, generer_agents, generer_pointages_mois, resume
+from app import db as db_module
+from app.metriques import metriques
+from app.paie.utils import calculer_paies_tous_agents
+
+
+async def mesurer_requetes(client, nombre: int, agent_id: str) -> list:
+    durees = []
+    for _ in range(nombre):
+        debut = time.perf_counter()
+        await client.table("agents").select("id, nom").eq("id", agent_id).execute()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return durees
+
+
+async def mesurer(nombre: int, nombre_agents: int) -> None:
+    agents = generer_agents(nombre_agents)
+    aujourd_hui = date.today()
+    brut = installer_base_memoire({
+        "agents": agents,
+        "pointages": generer_pointages_mois(agents, aujourd_hui.month, aujourd_hui.year),
+        "jours_feries": [],
+        "exceptions_jours_feries": [],
+        "primes": [],
+    })
+    instrumente = db_module.ClientInstrumente(brut)
+
+    db_module.supabase = instrumente
+    avant = brut.round_trips
+    await calculer_paies_tous_agents(aujourd_hui.month, aujourd_hui.year)
+    print(f"Paie de {nombre_agents} agents: {brut.round_trips - avant} allers-retours")
+    for ligne in metriques.exposer().splitlines():
+        if ligne.startswith("db_queries_total"):
+            print(ligne)
+
+    directes = await mesurer_requetes(brut, nombre, agents[0]["id"])
+    mesurees = await mesurer_requetes(instrumente, nombre, agents[0]["id"])
+    print()
+    print(resume("requête directe", directes))
+    print(resume("requête instrumentée", mesurees))
+    surcout_us = (sum(mesurees) - sum(directes)) / nombre * 1000
+    print(f"Surcoût moyen: {surcout_us:.1f} µs par requête")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requetes", type=int, default=5000)
+    parser.add_argument("--agents", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"Métriques: {args.requetes} requêtes, paie de {args.agents} agents, sans latence simulée")
+    asyncio.run(mesurer(args.requetes, args.agents))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Benchmark et vérification de la paie du mois en cours tenue à jour au fil des
+pointages (app.paie.mois_en_cours).
+
+1. Durée de l'aperçu de paie du mois en cours de chaque agent: calcul complet
+   depuis la base (latence simulée) puis cumuls en mémoire, juste après un scan
+   de l'agent (l'aperçu est reconstruit à partir des cumuls).
+2. Vérifications: les aperçus sont identiques au calcul complet, après la
+   construction puis après des scans (arrivée en retard, sortie anticipée,
+   demi-journée), une annulation et une modification de pointage par un
+   administrateur (rechargement de l'agent), un créneau en double reçu dans le
+   désordre (aussi comparé à calcul-tous), et pour des retards dont la somme
+   créneau par créneau et le total divisé une fois s'arrondissent différemment.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_mois_en_cours --agents 100 --latence 1
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date, timedelta
+
+from benchmarks.common import installer_base_memoire, generer_agents, generer_pointages_mois, resume
+from app.paie import utils as paie_utils
+from app.paie.cache import invalider_paie_date
+from app.paie.mois_en_cours import paie_mois_en_cours
+from app.paie.regles import horaires_jour
+from app.paie.utils import calculer_paie_agent, calculer_paies_tous_agents
+
+
+async def comparer(agents, mois: int, annee: int, etape: str) -> int:
+    """
+    Compare les aperçus au calcul complet pour chaque agent, retourne le nombre d'écarts
+    """
+    erreurs = 0
+    for agent in agents:
+        paie_utils.PAIE_MOIS_EN_COURS_INCREMENTAL = False
+        attendue = await calculer_paie_agent(agent["id"], mois, annee)
+        paie_utils.PAIE_MOIS_EN_COURS_INCREMENTAL = True
+        obtenue = await calculer_paie_agent(agent["id"], mois, annee)
+        if obtenue.model_dump() != attendue.model_dump():
+            erreurs += 1
+            if erreurs <= 3:
+                print(f"  {etape}: agent {agent['id']} différent du calcul complet")
+    return erreurs
+
+
+# Minutes de retard à l'arrivée sur 6 jours travaillés, dans l'ordre jour/créneau
+# (la dernière l'après-midi du sixième jour): 6.333333333333332 h en sommant créneau
+# par créneau, 6.333333333333333 h en divisant le total, soit 0,01 DA d'écart sur
+# les retenues de 9 %
+RETARDS_ARRONDI = [60, 42, 83, 24, 45, 45, 81]
+
+
+def secondes_en_heure(secondes: int) -> str:
+    return f"{secondes // 3600:02d}:{secondes % 3600 // 60:02d}:{secondes % 60:02d}"
+
+
+async def verifier_arrondi(mois: int, annee: int, jour_scan: date) -> int:
+    """
+    Agent dont les retards s'additionnent différemment selon l'ordre: l'aperçu doit
+    rester identique au calcul complet
+    """
+    jours = [
+        d for d in (jour_scan.replace(day=1) + timedelta(days=i) for i in range(jour_scan.day - 1))
+        if d.weekday() < 5
+    ][:6]
+    if len(jours) < 6:
+        print("  arrondi: moins de 6 jours ouvrés écoulés ce mois-ci, vérification ignorée")
+        return 0
+    agents = generer_agents(1)
+    pointages = []
+    for index, jour in enumerate(jours):
+        horaires = horaires_jour("agent", jour.weekday())
+        arrivees = {
+            "matin": horaires.debut_matin + RETARDS_ARRONDI[index] * 60,
+            "apres-midi": horaires.debut_aprem + (RETARDS_ARRONDI[6] * 60 if index == 5 else 0),
+        }
+        sorties = {"matin": horaires.fin_matin, "apres-midi": horaires.fin_aprem}
+        for session in ("matin", "apres-midi"):
+            for type_pointage, secondes in (("arrivee", arrivees[session]), ("sortie", sorties[session])):
+                pointages.append({
+                    "id": str(uuid.uuid4()),
+                    "agent_id": agents[0]["id"],
+                    "date_pointage": jour.isoformat(),
+                    "heure_pointage": secondes_en_heure(secondes),
+                    "session": session,
+                    "type_pointage": type_pointage,
+                    "annule": False,
+                })
+    installer_base_memoire({
+        "agents": agents,
+        "pointages": pointages,
+        "jours_feries": [],
+        "jours_feries_exceptions": [],
+        "primes": [],
+    })
+    return await comparer(agents, mois, annee, "arrondi des retards")
+
+
+def scanner(client, agent_id: str, jour: str, session: str, type_pointage: str, heure: str) -> dict:
+    """
+    Enregistre un pointage comme un scan (base puis état en mémoire)
+    """
+    pointage = {
+        "id": str(uuid.uuid4()),
+        "agent_id": agent_id,
+        "date_pointage": jour,
+        "heure_pointage": heure,
+        "session": session,
+        "type_pointage": type_pointage,
+        "annule": False,
+    }
+    client.tables["pointages"].append(pointage)
+    paie_mois_en_cours.enregistrer_pointage(pointage)
+    return pointage
+
+
+async def mesurer(nombre: int, latence: float) -> None:
+    aujourd_hui = date.today()
+    mois, annee = aujourd_hui.month, aujourd_hui.year
+    # Scans sur le dernier jour ouvré du mois (aujourd'hui en semaine)
+    jour_scan = aujourd_hui
+    while jour_scan.weekday() >= 5 and jour_scan.day > 1:
+        jour_scan -= timedelta(days=1)
+    jour = jour_scan.isoformat()
+    agents = generer_agents(nombre)
+    pointages = [p for p in generer_pointages_mois(agents, mois, annee) if p["date_pointage"] < jour]
+    client = installer_base_memoire({
+        "agents": agents,
+        "pointages": pointages,
+        "jours_feries": [{"id": str(uuid.uuid4()), "date_ferie": aujourd_hui.replace(day=1).isoformat(), "nom": "Férié"}],
+        "jours_feries_exceptions": [],
+        "primes": [{"id": str(uuid.uuid4()), "agent_id": agents[0]["id"], "mois": mois, "annee": annee, "montant": 1500.0, "motif": "Prime"}],
+    }, latency_ms=latence)
+
+    paie_utils.PAIE_MOIS_EN_COURS_INCREMENTAL = False
+    complet = []
+    for agent in agents:
+        debut = time.perf_counter()
+        await calculer_paie_agent(agent["id"], mois, annee)
+        complet.append((time.perf_counter() - debut) * 1000)
+    paie_utils.PAIE_MOIS_EN_COURS_INCREMENTAL = True
+
+    debut = time.perf_counter()
+    await calculer_paie_agent(agents[0]["id"], mois, annee)
+    duree_construction = (time.perf_counter() - debut) * 1000
+    avant = client.round_trips
+    scans, apercus = [], []
+    for agent in agents:
+        debut = time.perf_counter()
+        scanner(client, agent["id"], jour, "matin", "arrivee", "08:17:00")
+        scans.append((time.perf_counter() - debut) * 1000)
+        debut = time.perf_counter()
+        await calculer_paie_agent(agent["id"], mois, annee)
+        apercus.append((time.perf_counter() - debut) * 1000)
+    requetes = client.round_trips - avant
+    print(resume("aperçu, calcul complet", complet))
+    print(f"construction de l'état: {duree_construction:.1f} ms ({len(pointages)} pointages)")
+    print(resume("scan (mise à jour des cumuls)", scans))
+    print(resume("aperçu après scan, cumuls", apercus) + f"  requêtes={requetes}")
+
+    # Vérifications sans latence
+    client.latency_ms = 0.0
+    erreurs = await comparer(agents, mois, annee, "après scans")
+
+    # Sortie anticipée, demi-journée, pointage remplacé dans un créneau
+    scanner(client, agents[1]["id"], jour, "matin", "sortie", "11:40:00")
+    scanner(client, agents[2]["id"], jour, "apres-midi", "arrivee", "13:30:00")
+    scanner(client, agents[3]["id"], jour, "matin", "arrivee", "09:02:00")
+    erreurs += await comparer(agents[:5], mois, annee, "sortie, demi-journée, remplacement")
+
+    # Annulation (comme DELETE /api/admin/pointages/{id})
+    annule = next(p for p in client.tables["pointages"] if p["agent_id"] == agents[4]["id"])
+    annule["annule"] = True
+    paie_mois_en_cours.retirer_pointage(annule)
+    erreurs += await comparer(agents[4:5], mois, annee, "annulation")
+
+    # Modification par un administrateur: rechargement de l'agent
+    modifie = next(p for p in client.tables["pointages"] if p["agent_id"] == agents[5]["id"] and p["type_pointage"] == "arrivee")
+    modifie["heure_pointage"] = "10:30:00"
+    await invalider_paie_date(agents[5]["id"], modifie["date_pointage"])
+    erreurs += await comparer(agents[5:6], mois, annee, "modification admin")
+
+    # Créneau en double reçu dans le désordre (scan hors-ligne plus ancien): le dernier
+    # dans l'ordre (heure, id) l'emporte, comme pour le calcul complet et calcul-tous
+    scanner(client, agents[6]["id"], jour, "matin", "arrivee", "07:00:00")
+    erreurs += await comparer(agents[6:7], mois, annee, "créneau en double")
+    paie_utils.PAIE_MOIS_EN_COURS_INCREMENTAL = False
+    par_agent = [(await calculer_paie_agent(agent["id"], mois, annee)).model_dump() for agent in agents]
+    paie_utils.PAIE_MOIS_EN_COURS_INCREMENTAL = True
+    tous = {str(paie.agent_id): paie.model_dump() for paie in await calculer_paies_tous_agents(mois, annee)}
+    differents = sum(tous.get(str(paie["agent_id"])) != paie for paie in par_agent)
+    if differents:
+        print(f"  calcul-tous: {differents} agent(s) différent(s) du calcul par agent")
+        erreurs += differents
+
+    erreurs += await verifier_arrondi(mois, annee, jour_scan)
+
+    print(f"Vérifications: {erreurs} erreur(s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--latence", type=float, default=1.0, help="Latence simulée par aller-retour (ms)")
+    args = parser.parse_args()
+
+    print(f"Paie du mois en cours: {args.agents} agents, latence simulée {args.latence} ms par aller-retour")
+    asyncio.run(mesurer(args.agents, args.latence))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Benchmark du calcul de paie de tous les agents (GET /api/paie/calcul-tous).
+
+Compare trois chemins et vérifie qu'ils produisent exactement les mêmes CalculPaie:
+- calculer_paie_agent pour chaque agent (5 requêtes par agent)
+- calculer_paies_tous_agents avec la boucle jour par jour (chargement groupé)
+- calculer_paies_tous_agents avec le moteur vectorisé (app/paie/calcul_vectorise.py)
+
+Avant la mesure, un jeu de référence de cas limites (heures aux bornes à la
+seconde près, vendredis, jours fériés avec/sans exception, créneaux en double,
+heures vides, agents invalides, mois en cours) est comparé entre la boucle
+jour par jour et le moteur vectorisé.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_paie --agents 200 --latence 5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import sys
+import time
+import uuid
+from datetime import date
+
+from benchmarks.common import installer_base_memoire, generer_agents, generer_pointages_mois
+from app.paie import utils as paie_utils
+from app.paie.calcul_vectorise import calculer_paies_vectorise
+
+MOIS, ANNEE = 3, 2025
+
+
+def pointage(agent_id: str, date_pointage: str, heure: str, session: str, type_pointage: str = "arrivee") -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "agent_id": agent_id,
+        "date_pointage": date_pointage,
+        "heure_pointage": heure,
+        "session": session,
+        "type_pointage": type_pointage,
+    }
+
+
+def jeu_de_reference() -> dict:
+    """
+    Cas limites pour mars 2025 (vendredis 7/14/21/28, fériés le mardi 18,
+    le dimanche 30 et le lundi 31) plus un mois aléatoire tous rôles confondus
+    """
+    roles = list(paie_utils.PARAMETRES_PAIE_PAR_ROLE)
+    agents = generer_agents(40)
+    for i, agent in enumerate(agents):
+        agent["role"] = roles[i % len(roles)]
+    agents[3]["email"] = ""  # Agent invalide: exclu dans les deux moteurs
+    agents[4]["role"] = "role_inconnu"  # Paramètres par défaut
+    pointages = generer_pointages_mois(agents, MOIS, ANNEE, graine=7)
+
+    a, b, c = agents[0]["id"], agents[1]["id"], agents[2]["id"]
+    agents[0]["role"] = "charge_administration"
+    pointages += [
+        # Bornes à la seconde près (charge_administration: 9h05, 11h55, 13h05, 15h55)
+        pointage(a, "2025-03-03", "09:05:00", "matin"),
+        pointage(a, "2025-03-03", "11:54:59", "matin", "sortie"),
+        pointage(a, "2025-03-03", "13:05:59", "apres-midi"),
+        pointage(a, "2025-03-03", "15:54:01", "apres-midi", "sortie"),
+        pointage(a, "2025-03-04", "09:06:00", "matin"),
+        pointage(a, "2025-03-04", "11:55:00", "matin", "sortie"),
+        # Vendredi: après-midi à partir de 13h15
+        pointage(a, "2025-03-07", "13:14:59", "apres-midi"),
+        pointage(a, "2025-03-14", "13:16:00", "apres-midi"),
+        # Créneau en double (le dernier l'emporte) et heure vide
+        pointage(b, "2025-03-05", "08:30:00", "matin"),
+        pointage(b, "2025-03-05", "08:01:00", "matin"),
+        pointage(b, "2025-03-06", "13:00:00", "apres-midi"),
+        pointage(b, "2025-03-06", "", "apres-midi"),
+        # Type absent (arrivée par défaut) et type None (sortie)
+        {k: v for k, v in pointage(b, "2025-03-10", "08:20:00", "matin").items() if k != "type_pointage"},
+        pointage(b, "2025-03-10", "11:00:00", "matin", None),
+        # Jour férié travaillé (exception) en demi-journée, férié du week-end ignoré
+        pointage(c, "2025-03-18", "13:30:00", "apres-midi"),
+        pointage(c, "2025-03-30", "08:00:00", "matin"),
+    ]
+
+    feries = [
+        {"id": str(uuid.uuid4()), "date_ferie": "2025-03-18", "nom": "Férié mardi"},
+        {"id": str(uuid.uuid4()), "date_ferie": "2025-03-30", "nom": "Férié dimanche"},
+        {"id": str(uuid.uuid4()), "date_ferie": "2025-03-31", "nom": "Aïd"},
+    ]
+    exceptions = {
+        c: {"2025-03-18", "2025-03-31"},
+        agents[5]["id"]: {"2025-03-18"},
+        agents[6]["id"]: {"2025-03-31"},
+    }
+    primes = {
+        a: [{"id": str(uuid.uuid4()), "montant": 1000.1, "motif": "A"}, {"id": str(uuid.uuid4()), "montant": 0.2, "motif": "B"}],
+        c: [{"id": str(uuid.uuid4()), "montant": 2500.0, "motif": "C"}],
+    }
+    return {"agents": agents, "pointages": pointages, "feries": feries, "exceptions": exceptions, "primes": primes}
+
+
+def comparer_moteurs(jeu: dict, mois: int, annee: int) -> int:
+    """
+    Compare boucle jour par jour et moteur vectorisé; retourne le nombre d'écarts
+    """
+    pointages_par_agent = {}
+    for p in jeu["pointages"]:
+        pointages_par_agent.setdefault(p["agent_id"], []).append(p)
+
+    attendu, erreurs_attendues = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for agent in jeu["agents"]:
+            try:
+                attendu.append(paie_utils.calculer_paie_depuis_donnees(
+                    agent, mois, annee, jeu["feries"],
+                    jeu["exceptions"].get(agent["id"], set()),
+                    pointages_par_agent.get(agent["id"], []),
+                    jeu["primes"].get(agent["id"], [])
+                ))
+            except Exception:
+                erreurs_attendues.append(agent["id"])
+
+    obtenu, erreurs = calculer_paies_vectorise(
+        jeu["agents"], mois, annee, jeu["feries"], jeu["exceptions"], pointages_par_agent, jeu["primes"]
+    )
+
+    ecarts = 0
+    if [agent["id"] for agent, _ in erreurs] != erreurs_attendues:
+        print(f"  agents en erreur différents: {erreurs_attendues} / {[agent['id'] for agent, _ in erreurs]}")
+        ecarts += 1
+    for ref, vec in zip(attendu, obtenu):
+        ref_dict, vec_dict = ref.model_dump(), vec.model_dump()
+        for champ in ref_dict:
+            if ref_dict[champ] != vec_dict[champ]:
+                print(f"  {ref.nom} ({ref.role}) {champ}: {ref_dict[champ]!r} != {vec_dict[champ]!r}")
+                ecarts += 1
+    if len(attendu) != len(obtenu):
+        ecarts += 1
+    return ecarts
+
+
+async def mesurer(nb_agents: int, latence_ms: float) -> None:
+    roles = list(paie_utils.PARAMETRES_PAIE_PAR_ROLE)
+    agents = generer_agents(nb_agents)
+    for i, agent in enumerate(agents):
+        agent["role"] = roles[i % len(roles)]
+    jour_ferie_id = str(uuid.uuid4())
+    client = installer_base_memoire({
+        "agents": agents,
+        "pointages": generer_pointages_mois(agents, MOIS, ANNEE),
+        "jours_feries": [{"id": jour_ferie_id, "date_ferie": f"{ANNEE}-{MOIS:02d}-18", "nom": "Jour férié"}],
+        "jours_feries_exceptions": [
+            {"id": str(uuid.uuid4()), "jour_ferie_id": jour_ferie_id, "agent_id": agent["id"]}
+            for agent in agents[::5]
+        ],
+        "primes": [
+            {"id": str(uuid.uuid4()), "agent_id": agent["id"], "mois": MOIS, "annee": ANNEE, "montant": 1500.0, "motif": "Prime"}
+            for agent in agents[::3]
+        ],
+    }, latency_ms=latence_ms)
+
+    resultats = {}
+    # Les traces print du calcul jour par jour ne doivent pas fausser la mesure
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.round_trips = 0
+        debut = time.perf_counter()
+        resultats["par agent"] = [await paie_utils.calculer_paie_agent(agent["id"], MOIS, ANNEE) for agent in agents]
+        duree = (time.perf_counter() - debut) * 1000
+        print(f"{'par agent':<22} {duree:10.1f} ms  requêtes={client.round_trips}", file=sys.__stdout__)
+
+        for nom, vectorise in (("groupé, boucle", False), ("groupé, vectorisé", True)):
+            paie_utils.PAIE_CALCUL_VECTORISE = vectorise
+            client.round_trips = 0
+            debut = time.perf_counter()
+            resultats[nom] = await paie_utils.calculer_paies_tous_agents(MOIS, ANNEE)
+            duree = (time.perf_counter() - debut) * 1000
+            print(f"{nom:<22} {duree:10.1f} ms  requêtes={client.round_trips}", file=sys.__stdout__)
+
+    reference = [p.model_dump() for p in resultats["par agent"]]
+    identiques = all([p.model_dump() for p in paies] == reference for paies in resultats.values())
+    print(f"Résultats identiques: {'oui' if identiques else 'NON'}")
+    if not identiques:
+        raise SystemExit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--latence", type=float, default=5.0, help="Latence simulée par requête (ms)")
+    args = parser.parse_args()
+
+    # Le calcul journalise chaque jour de chaque agent: couper pour mesurer
+    logging.getLogger(paie_utils.__name__).setLevel(logging.WARNING)
+    # Mesure du calcul lui-même: pas d'instantanés des mois clos (app.paie.cache)
+    paie_utils.PAIE_CACHE_ENABLED = False
+
+    jeu = jeu_de_reference()
+    aujourd_hui = date.today()
+    ecarts = comparer_moteurs(jeu, MOIS, ANNEE) + comparer_moteurs(jeu, aujourd_hui.month, aujourd_hui.year)
+    print(f"Jeu de référence ({len(jeu['agents'])} agents, cas limites): {'identique' if not ecarts else f'{ecarts} ÉCART(S)'}")
+    if ecarts:
+        raise SystemExit(1)
+
+    print(f"Paie {MOIS:02d}/{ANNEE}: {args.agents} agents, latence simulée {args.latence} ms par aller-retour")
+    asyncio.run(mesurer(args.agents, args.latence))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Cohérence des règles de pointage entre la paie et le suivi quotidien (app.paie.regles).
+
+Pour un mois de pointages d'agents de plusieurs rôles (horaires différents pour
+charge_administration, 13h15 le vendredi), compare jour par jour la paie
+(calculer_paies_vectorise) et le suivi (calculer_suivis) sur les jours ouvrés
+analysés: minutes de retard et de sortie anticipée, absences complètes et
+partielles. Affiche ensuite la durée des deux calculs pour tous les agents.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_regles --agents 100
+"""
+import argparse
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from benchmarks.common import generer_agents, generer_pointages_mois
+from app.paie.calcul_vectorise import calculer_paies_vectorise
+from app.paie.utils import get_bornes_mois
+from app.pointage.suivi_utils import calculer_suivis
+
+ROLES = ("agent", "charge_administration", "superviseur", "agent_etudiant")
+
+
+def jours_paie(paie) -> Dict[str, Dict[str, Any]]:
+    """
+    Minutes de retard et type d'absence par date d'après les détails de la paie
+    """
+    jours: Dict[str, Dict[str, Any]] = {}
+    for detail in paie.details_retards:
+        jour = jours.setdefault(detail["date"], {"minutes": 0, "absence": None})
+        jour["minutes"] += detail["minutes"]
+    for detail in paie.details_absences:
+        jour = jours.setdefault(detail["date"], {"minutes": 0, "absence": None})
+        jour["absence"] = detail["type"] if detail["type"] == "absence_complete" else detail["session"]
+    return jours
+
+
+def jours_suivi(details: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Mêmes informations d'après les lignes du suivi (jours ouvrés analysés seulement)
+    """
+    jours: Dict[str, Dict[str, Any]] = {}
+    for ligne in details:
+        if ligne.get("est_jour_ferie") or date.fromisoformat(ligne["date"]).weekday() >= 5:
+            continue
+        absence = None
+        if ligne["est_absent"]:
+            absence = "absence_complete"
+        elif ligne["absent_matin"]:
+            absence = "matin"
+        elif ligne["absent_apres_midi"]:
+            absence = "apres_midi"
+        if ligne["retard_total_minutes"] or absence:
+            jours[ligne["date"]] = {"minutes": ligne["retard_total_minutes"], "absence": absence}
+    return jours
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--mois", type=int, default=3)
+    parser.add_argument("--annee", type=int, default=2025)
+    args = parser.parse_args()
+
+    agents = []
+    for role in ROLES:
+        agents.extend(generer_agents(args.agents // len(ROLES), role))
+    for index, agent in enumerate(agents):
+        agent["email"] = f"agent{index:05d}@collable.fr"
+    pointages_par_agent: Dict[str, List[Dict[str, Any]]] = {}
+    for pointage in generer_pointages_mois(agents, args.mois, args.annee):
+        pointages_par_agent.setdefault(pointage["agent_id"], []).append(pointage)
+    premier_jour, dernier_jour = get_bornes_mois(args.mois, args.annee)
+    jours_feries = [{"date_ferie": (premier_jour + timedelta(days=2)).isoformat(), "nom": "Férié"}]
+    ids = [agent["id"] for agent in agents]
+    roles = {agent["id"]: agent["role"] for agent in agents}
+
+    debut = time.perf_counter()
+    paies, erreurs = calculer_paies_vectorise(agents, args.mois, args.annee, jours_feries, {}, pointages_par_agent, {})
+    duree_paie = (time.perf_counter() - debut) * 1000
+    debut = time.perf_counter()
+    suivis = calculer_suivis(ids, premier_jour, dernier_jour, jours_feries, {}, pointages_par_agent, roles)
+    duree_suivi = (time.perf_counter() - debut) * 1000
+
+    differences = len(erreurs)
+    for paie in paies:
+        attendu = jours_paie(paie)
+        obtenu = jours_suivi(suivis[str(paie.agent_id)]["details_quotidiens"])
+        if attendu != obtenu:
+            differences += 1
+            print(f"  {paie.role} {paie.agent_id}: paie={attendu} suivi={obtenu}")
+
+    print(f"Règles: {len(agents)} agents ({', '.join(ROLES)}), {args.mois:02d}/{args.annee}")
+    print(f"Cohérence paie / suivi: {len(paies)} agents comparés, {differences} différence(s)")
+    print(f"paie vectorisée: {duree_paie:.1f} ms, suivi: {duree_suivi:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark du chemin de scan POST /api/pointage/ (create_pointage).
+
+Compare le chemin classique (validate_qrcode + determine_session_for_agent + insert,
+pointages du jour relus en base) au chemin en un aller-retour (décision en Python
+avec les pointages du jour relus en base ou lus dans l'état du jour en mémoire,
+fonction enregistrer_pointage_scan pour la vérification sous verrou et l'insertion)
+sur la base en mémoire avec une latence réseau simulée. Chaque agent pointe
+--passages fois (arrivée puis sortie confirmée). Vérifie aussi qu'un pointage inséré
+par un autre worker (absent de l'état du jour en mémoire) est pris en compte par le
+chemin en un aller-retour, et que /scan et /scan/batch classent de la même façon un
+scan hors-ligne dans ce cas.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_scan --scans 500 --passages 2 --latence 5
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+from benchmarks.common import installer_base_memoire, generer_agents, resume
+from app.admin.presence import presence_du_jour
+from app.pointage import utils as pointage_utils
+
+
+async def mesurer(mode_rpc: bool, etat_jour: bool, scans: int, passages: int, latence_ms: float) -> list:
+    agents = generer_agents(scans)
+    code = str(uuid.uuid4())
+    client = installer_base_memoire({
+        "agents": agents,
+        "qrcodes": [{"id": str(uuid.uuid4()), "code_unique": code, "actif": True, "date_generation": datetime.now().isoformat()}],
+        "pointages": [],
+    }, latency_ms=latence_ms)
+    pointage_utils._scan_rpc_disponible = mode_rpc
+    pointage_utils.ETAT_JOUR_CACHE_ACTIF = etat_jour
+    presence_du_jour.invalider()
+
+    durees = []
+    for passage in range(passages):
+        for agent in agents:
+            debut = time.perf_counter()
+            await pointage_utils.create_pointage(agent["id"], code, force_confirmation=passage > 0)
+            durees.append((time.perf_counter() - debut) * 1000)
+
+    if mode_rpc:
+        nom = "rpc, état du jour en mémoire" if etat_jour else "rpc, état du jour en base"
+    else:
+        nom = "classique"
+    print(resume(nom, durees) + f"  requêtes/scan={client.round_trips / len(durees):.2f}")
+    rangs = {agent["id"]: rang for rang, agent in enumerate(agents)}
+    return sorted((rangs[p["agent_id"]], p["session"], p["type_pointage"]) for p in client.tables["pointages"])
+
+
+async def verifier_conflit() -> bool:
+    """
+    Un autre worker a enregistré l'arrivée du matin: l'état en mémoire ne la connaît
+    pas, la fonction SQL signale le conflit et la décision est refaite sur la base.
+    Seuls les pointages de cet agent sont corrigés en mémoire (pas de reconstruction)
+    """
+    agents = generer_agents(1)
+    agent_id = agents[0]["id"]
+    code = str(uuid.uuid4())
+    client = installer_base_memoire({
+        "agents": agents,
+        "qrcodes": [{"id": str(uuid.uuid4()), "code_unique": code, "actif": True, "date_generation": datetime.now().isoformat()}],
+        "pointages": [],
+    })
+    pointage_utils._scan_rpc_disponible = True
+    pointage_utils.ETAT_JOUR_CACHE_ACTIF = True
+    presence_du_jour.invalider()
+    today = datetime.now(pointage_utils.TIMEZONE).date().isoformat()
+    await presence_du_jour.pointages_agent(agent_id, today)
+
+    client.insert_rows("pointages", {
+        "agent_id": agent_id,
+        "date_pointage": today,
+        "heure_pointage": "00:00:00",
+        "session": "matin",
+        "type_pointage": "arrivee"
+    })
+    resultat = await pointage_utils.create_pointage(agent_id, code, force_confirmation=True)
+    avant = client.round_trips
+    en_memoire = await presence_du_jour.pointages_agent(agent_id, today)
+    return (
+        (resultat["session"], resultat["type_pointage"]) == ("matin", "sortie")
+        and len(client.tables["pointages"]) == 2
+        and len(en_memoire) == 2
+        and client.round_trips == avant
+    )
+
+
+async def verifier_hors_ligne() -> bool:
+    """
+    Un autre worker a enregistré l'arrivée du matin de deux agents: le même scan
+    hors-ligne est classé en sortie du matin par /scan (create_pointage_offline) et
+    par /scan/batch (create_pointages_offline_batch)
+    """
+    agents = generer_agents(2)
+    code = str(uuid.uuid4())
+    client = installer_base_memoire({
+        "agents": agents,
+        "qrcodes": [{"id": str(uuid.uuid4()), "code_unique": code, "actif": True, "date_generation": datetime.now().isoformat()}],
+        "pointages": [],
+    })
+    pointage_utils.ETAT_JOUR_CACHE_ACTIF = True
+    presence_du_jour.invalider()
+    maintenant = datetime.now(pointage_utils.TIMEZONE)
+    today = maintenant.date().isoformat()
+    await presence_du_jour.pointages_agent(agents[0]["id"], today)
+
+    for agent in agents:
+        client.insert_rows("pointages", {
+            "agent_id": agent["id"],
+            "date_pointage": today,
+            "heure_pointage": "00:00:00",
+            "session": "matin",
+            "type_pointage": "arrivee"
+        })
+    scan = maintenant.replace(hour=10, minute=0, second=0, microsecond=0)
+    unitaire = await pointage_utils.create_pointage_offline(agents[0]["id"], code, scan)
+    groupe = await pointage_utils.create_pointages_offline_batch(agents[1]["id"], [(code, scan)])
+    return (
+        (unitaire["session"], unitaire["type_pointage"])
+        == (groupe[0]["pointage"]["session"], groupe[0]["pointage"]["type_pointage"])
+        == ("matin", "sortie")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scans", type=int, default=300)
+    parser.add_argument("--passages", type=int, default=2, help="Scans par agent")
+    parser.add_argument("--latence", type=float, default=5.0, help="Latence simulée par requête (ms)")
+    args = parser.parse_args()
+
+    print(f"Scan: {args.scans} agents x {args.passages} passage(s), latence simulée {args.latence} ms par aller-retour")
+    resultats = [
+        asyncio.run(mesurer(False, False, args.scans, args.passages, args.latence)),
+        asyncio.run(mesurer(True, False, args.scans, args.passages, args.latence)),
+        asyncio.run(mesurer(True, True, args.scans, args.passages, args.latence)),
+    ]
+    identiques = all(r == resultats[0] for r in resultats)
+    print(f"Pointages identiques: {'oui' if identiques else 'NON'}")
+    conflit = asyncio.run(verifier_conflit())
+    print(f"Conflit avec un autre worker résolu: {'oui' if conflit else 'NON'}")
+    hors_ligne = asyncio.run(verifier_hors_ligne())
+    print(f"Scan hors-ligne classé comme par /scan/batch: {'oui' if hors_ligne else 'NON'}")
+    if not identiques or not conflit or not hors_ligne:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
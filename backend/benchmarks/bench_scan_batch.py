@@ -0,0 +1,92 @@
+"""
+Benchmark de la synchronisation d'une file de scans hors-ligne.
+
+Compare la synchronisation scan par scan (POST /api/pointage/scan, chemin
+create_pointage_offline, dans l'ordre chronologique comme le téléphone) à la
+synchronisation groupée (POST /api/pointage/scan/batch) et vérifie que les
+résultats et les pointages enregistrés sont identiques.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_scan_batch --scans 40 --latence 5
+"""
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+
+from benchmarks.common import installer_base_memoire, generer_agents
+from app.pointage import utils as pointage_utils
+
+
+def generer_file(agent_id: str, nombre: int, graine: int = 1) -> tuple:
+    """
+    Base (QR codes actif/désactivé, un pointage existant) et file de scans sur une semaine,
+    avec des codes désactivés ou inconnus et des sessions déjà complètes
+    """
+    rng = random.Random(graine)
+    base = {
+        "qrcodes": [
+            {"id": str(uuid.uuid4()), "code_unique": "ACTIF", "actif": True, "date_generation": "2025-01-01T00:00:00+01:00"},
+            {"id": str(uuid.uuid4()), "code_unique": "ANCIEN", "actif": False, "date_generation": "2024-01-01T00:00:00+01:00"},
+        ],
+        "pointages": [
+            {"id": str(uuid.uuid4()), "agent_id": agent_id, "date_pointage": "2025-03-04", "heure_pointage": "08:00:00", "session": "matin", "type_pointage": "arrivee"},
+        ],
+    }
+    scans = []
+    for _ in range(nombre):
+        instant = datetime(2025, 3, rng.randint(3, 7), rng.randint(6, 18), rng.randint(0, 59), rng.randint(0, 59), tzinfo=timezone.utc)
+        scans.append((rng.choice(["ACTIF", "ACTIF", "ACTIF", "ANCIEN", "inconnu"]), instant))
+    return base, scans
+
+
+async def synchroniser(groupe: bool, agents: list, base: dict, scans: list, latence_ms: float) -> tuple:
+    client = installer_base_memoire({"agents": agents, **copy.deepcopy(base)}, latency_ms=latence_ms)
+    agent_id = agents[0]["id"]
+    debut = time.perf_counter()
+    # Les traces print du chemin de scan ne doivent pas fausser la mesure
+    with contextlib.redirect_stdout(io.StringIO()):
+        if groupe:
+            resultats = [
+                (r["success"], r.get("error"), r.get("pointage", {}).get("session"), r.get("pointage", {}).get("type_pointage"))
+                for r in await pointage_utils.create_pointages_offline_batch(agent_id, scans)
+            ]
+        else:
+            resultats = [None] * len(scans)
+            for index in sorted(range(len(scans)), key=lambda i: scans[i][1]):
+                try:
+                    r = await pointage_utils.create_pointage_offline(agent_id, *scans[index])
+                    resultats[index] = (True, None, r["session"], r["type_pointage"])
+                except ValueError as e:
+                    resultats[index] = (False, str(e), None, None)
+    duree = (time.perf_counter() - debut) * 1000
+    lignes = sorted((p["date_pointage"], p["heure_pointage"], p["session"], p["type_pointage"]) for p in client.tables["pointages"])
+    nom = "groupée (/scan/batch)" if groupe else "scan par scan (/scan)"
+    print(f"{nom:<24} {duree:10.1f} ms  requêtes={client.round_trips}  acceptés={sum(r[0] for r in resultats)}/{len(scans)}")
+    return resultats, lignes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scans", type=int, default=40)
+    parser.add_argument("--latence", type=float, default=5.0, help="Latence simulée par requête (ms)")
+    args = parser.parse_args()
+
+    agents = generer_agents(1)
+    base, scans = generer_file(agents[0]["id"], args.scans)
+    print(f"File hors-ligne: {args.scans} scans, latence simulée {args.latence} ms par aller-retour")
+    reference = asyncio.run(synchroniser(False, agents, base, scans, args.latence))
+    groupe = asyncio.run(synchroniser(True, agents, base, scans, args.latence))
+    identiques = reference == groupe
+    print(f"Résultats identiques: {'oui' if identiques else 'NON'}")
+    if not identiques:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
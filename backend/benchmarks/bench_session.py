@@ -0,0 +1,248 @@
+"""
+Benchmark et vérification exhaustive de l'automate de session (app.pointage.sessions).
+
+1. Équivalence: decider_session (table compilée) est comparée à la copie de la
+   cascade de if d'origine pour tous les états du jour (0 à 3 pointages par
+   session, types, pointages annulés), chaque minute de la journée, des arrivées
+   de part et d'autre du délai de confirmation (y compris la veille et des heures
+   illisibles), avec et sans force_confirmation.
+2. Débit: décisions par seconde de la table seule (sessions.decider) et de
+   decider_session complète face à la référence.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_session --decisions 2000000
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from app.pointage import sessions
+from app.pointage.utils import TIMEZONE, decider_session
+
+# Décalages de l'heure d'arrivée par rapport au scan (secondes) autour du délai de confirmation
+DECALAGES_ARRIVEE = [0, -1, -59, -60, -299, -300, -301, -3600, -43200, 30, 400]
+
+# Heures d'arrivée illisibles ou inhabituelles
+HEURES_SPECIALES = [None, "", "8:00", "8:5:3", "25:00:00", "08:00:00.5", "12:60:00", "23:59:60", "ab:cd:ef"]
+
+
+def decider_session_reference(pointages_today: List[Dict[str, Any]], now_gmt1: datetime, force_confirmation: bool = False) -> tuple[str, str, bool, str]:
+    """
+    Copie de la décision en cascade de if d'origine (référence de l'équivalence)
+    """
+    current_hour = now_gmt1.hour
+    current_minute = now_gmt1.minute
+    
+    # Délai minimum entre arrivée et sortie (en minutes)
+    DELAI_CONFIRMATION_MINUTES = 5
+    
+    # Séparer les pointages par session (uniquement les non-annulés)
+    pointages_matin = [p for p in pointages_today if p.get("session") == "matin" and not p.get("annule")]
+    pointages_aprem = [p for p in pointages_today if p.get("session") == "apres-midi" and not p.get("annule")]
+    
+    nb_matin = len(pointages_matin)
+    nb_aprem = len(pointages_aprem)
+    
+    print(f"📊 Pointages aujourd'hui - Matin: {nb_matin}, Après-midi: {nb_aprem}")
+    
+    def check_time_since_arrival(pointage_arrivee) -> tuple[bool, int]:
+        """
+        Vérifie si le pointage d'arrivée date de moins de DELAI_CONFIRMATION_MINUTES minutes.
+        Retourne (needs_confirmation, minutes_depuis_arrivee)
+        """
+        heure_arrivee_str = pointage_arrivee.get("heure_pointage")
+        if not heure_arrivee_str:
+            return (False, 0)
+        
+        # Parser l'heure d'arrivée
+        try:
+            heure_arrivee = datetime.strptime(heure_arrivee_str, "%H:%M:%S").time()
+            # Créer un datetime complet pour aujourd'hui
+            arrivee_datetime = datetime.combine(now_gmt1.date(), heure_arrivee)
+            arrivee_datetime = arrivee_datetime.replace(tzinfo=TIMEZONE)
+            
+            # Calculer la différence en minutes
+            diff = now_gmt1 - arrivee_datetime
+            minutes_depuis = diff.total_seconds() / 60
+            
+            print(f"⏱️ Minutes depuis l'arrivée: {minutes_depuis:.1f}")
+            
+            if minutes_depuis < DELAI_CONFIRMATION_MINUTES:
+                return (True, int(minutes_depuis))
+            return (False, int(minutes_depuis))
+        except Exception as e:
+            print(f"⚠️ Erreur parsing heure: {e}")
+            return (False, 0)
+    
+    # Logique de détermination:
+    # 1. Si on a 1 pointage matin (arrivée) et pas encore de sortie matin → sortie matin
+    #    (même si l'heure est >= 12h, tant qu'on est avant 13h ou qu'il manque la sortie)
+    # 2. Si on a 0 pointage matin et l'heure < 13h → arrivée matin
+    # 3. Si on a 2 pointages matin (complet) et l'heure >= 13h → session après-midi
+    # 4. Si on a 1 pointage après-midi (arrivée) → sortie après-midi
+    
+    # Cas 1: Arrivée matin manquante
+    # Si l'agent n'a pas pointé le matin et qu'il est entre 12h30 et 13h, 
+    # on considère qu'il est absent le matin et on l'enregistre directement en après-midi
+    if nb_matin == 0:
+        if current_hour < 12 or (current_hour == 12 and current_minute < 30):
+            # Avant 12h30 → pointage matin
+            print(f"✅ Pas de pointage matin, heure < 12h30 → Arrivée matin")
+            return ("matin", "arrivee", False, "")
+        else:
+            # À partir de 12h30 sans pointage matin → considéré absent le matin, pointage après-midi
+            if nb_aprem == 0:
+                print(f"✅ Pas de pointage matin, heure >= 12h30 → Arrivée après-midi (absent matin)")
+                return ("apres-midi", "arrivee", False, "")
+            elif nb_aprem == 1:
+                premier_pointage_aprem = pointages_aprem[0]
+                if premier_pointage_aprem.get("type_pointage") == "arrivee":
+                    needs_confirm, minutes = check_time_since_arrival(premier_pointage_aprem)
+                    if needs_confirm and not force_confirmation:
+                        msg = f"Attention : Vous avez pointé votre arrivée il y a seulement {minutes} minute(s). Ce pointage sera enregistré comme une SORTIE. Voulez-vous confirmer ?"
+                        print(f"⚠️ Confirmation requise: {msg}")
+                        return ("apres-midi", "sortie", True, msg)
+                    print(f"✅ Arrivée après-midi faite → Sortie après-midi")
+                    return ("apres-midi", "sortie", False, "")
+            else:
+                raise ValueError("Vous avez déjà effectué tous vos pointages pour aujourd'hui.")
+    
+    # Cas 2: Arrivée matin faite, sortie matin manquante
+    if nb_matin == 1:
+        premier_pointage_matin = pointages_matin[0]
+        if premier_pointage_matin.get("type_pointage") == "arrivee":
+            # Vérifier si moins de 5 minutes depuis l'arrivée
+            needs_confirm, minutes = check_time_since_arrival(premier_pointage_matin)
+            if needs_confirm and not force_confirmation:
+                msg = f"Attention : Vous avez pointé votre arrivée il y a seulement {minutes} minute(s). Ce pointage sera enregistré comme une SORTIE. Voulez-vous confirmer ?"
+                print(f"⚠️ Confirmation requise: {msg}")
+                return ("matin", "sortie", True, msg)
+            print(f"✅ Arrivée matin faite, sortie manquante → Sortie matin")
+            return ("matin", "sortie", False, "")
+    
+    # Cas 3: Session matin complète (2 pointages)
+    if nb_matin >= 2:
+        # Vérifier la session après-midi
+        if nb_aprem == 0:
+            # Permettre le pointage après-midi à partir de 12h30 si matin complet
+            if current_hour >= 13 or (current_hour == 12 and current_minute >= 30):
+                print(f"✅ Matin complet, heure >= 12h30, pas de pointage après-midi → Arrivée après-midi")
+                return ("apres-midi", "arrivee", False, "")
+            else:
+                # Avant 12h30 avec matin complet → attendre 12h30
+                raise ValueError("La session du matin est terminée. Vous pouvez pointer l'après-midi à partir de 12h30.")
+        elif nb_aprem == 1:
+            premier_pointage_aprem = pointages_aprem[0]
+            if premier_pointage_aprem.get("type_pointage") == "arrivee":
+                # Vérifier si moins de 5 minutes depuis l'arrivée après-midi
+                needs_confirm, minutes = check_time_since_arrival(premier_pointage_aprem)
+                if needs_confirm and not force_confirmation:
+                    msg = f"Attention : Vous avez pointé votre arrivée il y a seulement {minutes} minute(s). Ce pointage sera enregistré comme une SORTIE. Voulez-vous confirmer ?"
+                    print(f"⚠️ Confirmation requise: {msg}")
+                    return ("apres-midi", "sortie", True, msg)
+                print(f"✅ Arrivée après-midi faite, sortie manquante → Sortie après-midi")
+                return ("apres-midi", "sortie", False, "")
+        else:
+            # 2 pointages après-midi = journée complète
+            raise ValueError("Vous avez déjà effectué tous vos pointages pour aujourd'hui (4 pointages: 2 matin + 2 après-midi).")
+    
+    # Cas par défaut (ne devrait pas arriver)
+    raise ValueError("Impossible de déterminer le type de pointage. Veuillez contacter l'administrateur.")
+
+
+def variantes_session(session: str, heure: Any) -> List[List[Dict[str, Any]]]:
+    """
+    Pointages possibles d'une session: aucun, une arrivée, une sortie seule, un type
+    inconnu, arrivée + sortie, trois pointages, et une arrivée suivie d'un pointage annulé
+    """
+    def p(type_pointage, annule=False):
+        return {"session": session, "type_pointage": type_pointage, "heure_pointage": heure, "annule": annule}
+    return [
+        [],
+        [p("arrivee")],
+        [p("sortie")],
+        [p(None)],
+        [p("arrivee"), p("sortie")],
+        [p("arrivee"), p("sortie"), p("arrivee")],
+        [p("arrivee"), p("sortie", annule=True)],
+    ]
+
+
+def appeler(fonction, pointages, now_gmt1, force):
+    try:
+        return fonction(pointages, now_gmt1, force)
+    except ValueError as e:
+        return ("erreur", str(e))
+
+
+def verifier_equivalence() -> int:
+    """
+    Compare la table à la référence; retourne le nombre de cas vérifiés
+    """
+    debut_jour = datetime(2025, 3, 4, tzinfo=TIMEZONE)
+    cas = 0
+    # Les traces print de la référence ne doivent pas s'afficher
+    with contextlib.redirect_stdout(io.StringIO()):
+        for minute in range(sessions.MINUTES_PAR_JOUR):
+            for seconde, microseconde in ((0, 0), (59, 999999)):
+                now_gmt1 = debut_jour + timedelta(minutes=minute, seconds=seconde, microseconds=microseconde)
+                heures = [(now_gmt1 + timedelta(seconds=d)).strftime("%H:%M:%S") for d in DECALAGES_ARRIVEE]
+                # Heures spéciales une fois par heure pour garder la vérification rapide
+                if minute % 60 == 0 and seconde == 0:
+                    heures += HEURES_SPECIALES
+                for heure in heures:
+                    for matin, aprem in itertools.product(variantes_session("matin", heure), variantes_session("apres-midi", heure)):
+                        # Pointages hors session (ignorés par les deux versions)
+                        pointages = matin + aprem + [{"session": "autre", "type_pointage": "arrivee", "heure_pointage": heure}]
+                        for force in (False, True):
+                            attendu = appeler(decider_session_reference, pointages, now_gmt1, force)
+                            obtenu = appeler(decider_session, pointages, now_gmt1, force)
+                            if attendu != obtenu:
+                                raise AssertionError(f"Écart à {now_gmt1.time()} (arrivée {heure!r}, force={force}): {attendu} != {obtenu}")
+                            cas += 1
+    return cas
+
+
+def debit(fonction, arguments: list) -> float:
+    debut = time.perf_counter()
+    for args in arguments:
+        fonction(*args)
+    return len(arguments) / (time.perf_counter() - debut)
+
+
+def mesurer_debit(nombre: int) -> None:
+    rng = random.Random(1)
+    etats = [(rng.randrange(sessions.NB_ETATS), rng.randrange(sessions.NB_ETATS), rng.randrange(sessions.MINUTES_PAR_JOUR)) for _ in range(nombre)]
+    print(f"{'table seule (sessions.decider)':<40} {debit(sessions.decider, etats) / 1e6:8.2f} M décisions/s")
+
+    # Scans réalistes: 0 à 3 pointages déjà faits dans la journée, heure du scan aléatoire
+    journee = [("matin", "arrivee", "08:02:11"), ("matin", "sortie", "12:01:40"), ("apres-midi", "arrivee", "13:00:05")]
+    scans = []
+    for _ in range(max(1, nombre // 10)):
+        deja = [{"session": s, "type_pointage": t, "heure_pointage": h} for s, t, h in journee[:rng.randint(0, 3)]]
+        now_gmt1 = datetime(2025, 3, 4, tzinfo=TIMEZONE) + timedelta(seconds=rng.randrange(7 * 3600, 18 * 3600))
+        scans.append((deja, now_gmt1, False))
+    print(f"{'decider_session (table)':<40} {debit(lambda *a: appeler(decider_session, *a), scans) / 1e6:8.2f} M décisions/s")
+    with contextlib.redirect_stdout(io.StringIO()):
+        reference = debit(lambda *a: appeler(decider_session_reference, *a), scans)
+    print(f"{'référence (cascade de if)':<40} {reference / 1e6:8.2f} M décisions/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--decisions", type=int, default=2000000, help="Décisions mesurées pour la table seule")
+    args = parser.parse_args()
+
+    debut = time.perf_counter()
+    cas = verifier_equivalence()
+    print(f"Équivalence: {cas} cas identiques à la référence ({time.perf_counter() - debut:.1f} s)")
+    mesurer_debit(args.decisions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+"""
+Benchmark et vérification du suivi quotidien (app.pointage.suivi_utils).
+
+1. Équivalence: pour chaque agent (pointages sur plusieurs mois, demi-journées,
+   jours fériés avec et sans exception, agents sans aucun pointage), les lignes
+   de get_agents_daily_tracking sont comparées (valeurs et types) à la copie du
+   calcul jour par jour d'origine (avec le début d'après-midi à 13h15 le vendredi,
+   règle désormais commune avec la paie), et les totaux aux sommes que faisait
+   le routeur.
+2. Durée: suivi de chaque agent sur la période avec la référence et avec le
+   nouveau moteur (requêtes comprises), puis calcul seul du moteur par agent et
+   pour tous les agents en un appel, et grille d'équipe (/api/admin/suivi)
+   comparée au suivi par agent. Sur la base en mémoire, chaque page de
+   pointages refiltre et retrie toute la table: le de bout en bout du moteur
+   (requêtes triées et paginées) y est pénalisé, pas sur PostgREST (index).
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_suivi --agents 50 --mois 12
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, date, time as dtime, timedelta
+from typing import Any, Dict, List
+
+from benchmarks.common import installer_base_memoire, generer_agents, generer_pointages_mois, resume
+from app.db import get_db
+from app.pointage.suivi_utils import (
+    STATUTS, calculer_grille_suivi, calculer_suivis, charger_donnees_suivi, get_agents_daily_tracking
+)
+
+logger = logging.getLogger(__name__)
+
+# Paramètres de paie d'un agent utilisés par la référence
+TAUX_HORAIRE = 182.18
+HEURES_PAR_JOUR = 8
+
+
+async def get_agent_daily_tracking_reference(agent_id: str, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+    """
+    Copie du suivi quotidien d'origine (référence de l'équivalence)
+    """
+    db = await get_db()
+    
+    try:
+        # Récupérer les jours fériés de la période
+        jours_feries_response = await db.table("jours_feries").select("date_ferie, nom").gte("date_ferie", start_date.isoformat()).lte("date_ferie", end_date.isoformat()).execute()
+        jours_feries_dict = {jf["date_ferie"]: jf["nom"] for jf in (jours_feries_response.data or [])}
+        logger.debug("📅 Jours fériés trouvés: %s", len(jours_feries_dict))
+        
+        # Récupérer les exceptions pour cet agent (jours fériés où il travaille)
+        exceptions_response = await db.table("jours_feries_exceptions").select("jour_ferie_id, jours_feries(date_ferie)").eq("agent_id", agent_id).execute()
+        exceptions_dates = set()
+        for exc in (exceptions_response.data or []):
+            if exc.get("jours_feries") and exc["jours_feries"].get("date_ferie"):
+                exceptions_dates.add(exc["jours_feries"]["date_ferie"])
+        logger.debug("📋 Exceptions agent: %s jours fériés travaillés", len(exceptions_dates))
+        
+        # Récupérer tous les pointages de l'agent pour la période (exclure les annulés)
+        logger.debug("📊 Récupération des pointages pour agent %s du %s au %s", agent_id, start_date, end_date)
+        result = await db.table("pointages").select("*").eq("agent_id", agent_id).gte("date_pointage", start_date.isoformat()).lte("date_pointage", end_date.isoformat()).or_("annule.is.null,annule.eq.false").execute()
+        
+        logger.debug("✅ %s pointages récupérés", len(result.data) if result.data else 0)
+    except Exception as e:
+        logger.error("❌ Erreur lors de la récupération des pointages: %s", e)
+        # Retourner une liste vide en cas d'erreur pour éviter de bloquer
+        result = type('obj', (object,), {'data': None})()
+        jours_feries_dict = {}
+        exceptions_dates = set()
+    
+    if not result.data:
+        logger.debug("ℹ️ Aucun pointage trouvé pour cette période")
+        # Retourner quand même les jours avec statut "Absent" (sauf jours fériés)
+        tracking_data = []
+        current_date = start_date
+        
+        while current_date <= end_date:
+            date_str = current_date.isoformat()
+            
+            # Vérifier si c'est un jour férié (sauf si l'agent a une exception)
+            if date_str in jours_feries_dict and date_str not in exceptions_dates:
+                tracking_data.append({
+                    "date": date_str,
+                    "jour_semaine": current_date.strftime("%A"),
+                    "statut": "Jour férié",
+                    "jour_ferie_nom": jours_feries_dict[date_str],
+                    "est_jour_ferie": True,
+                    "retard_matin_minutes": 0,
+                    "retard_apres_midi_minutes": 0,
+                    "retard_total_minutes": 0,
+                    "retard_total_heures": 0,
+                    "est_absent": False,
+                    "absent_matin": False,
+                    "absent_apres_midi": False,
+                    "montant_retard": 0,
+                    "montant_absence": 0,
+                    "montant_total_deduit": 0,
+                    "pointages": {
+                        "matin_arrivee": None,
+                        "matin_sortie": None,
+                        "apres_midi_arrivee": None,
+                        "apres_midi_sortie": None
+                    }
+                })
+                current_date += timedelta(days=1)
+                continue
+            
+            # Absence complète : 8h × 182,18 DA + 200 DA + 500 DA
+            montant_absence_base = round(HEURES_PAR_JOUR * TAUX_HORAIRE, 2)
+            frais_supplementaires = 700  # 200 + 500
+            montant_total = montant_absence_base + frais_supplementaires
+            
+            tracking_data.append({
+                "date": date_str,
+                "jour_semaine": current_date.strftime("%A"),
+                "statut": "Absent",
+                "est_jour_ferie": False,
+                "retard_matin_minutes": 0,
+                "retard_apres_midi_minutes": 0,
+                "retard_total_minutes": 0,
+                "retard_total_heures": 0,
+                "est_absent": True,
+                "absent_matin": True,
+                "absent_apres_midi": True,
+                "montant_retard": 0,
+                "montant_absence": montant_total,
+                "montant_absence_matin": round((HEURES_PAR_JOUR / 2) * TAUX_HORAIRE, 2),
+                "montant_absence_apres_midi": round((HEURES_PAR_JOUR / 2) * TAUX_HORAIRE, 2),
+                "frais_absence_complete": frais_supplementaires,
+                "montant_total_deduit": montant_total,
+                "pointages": {
+                    "matin_arrivee": None,
+                    "matin_sortie": None,
+                    "apres_midi_arrivee": None,
+                    "apres_midi_sortie": None
+                }
+            })
+            current_date += timedelta(days=1)
+        
+        return tracking_data
+    
+    # Organiser les pointages par date
+    pointages_par_date = {}
+    for pointage in result.data:
+        date_pointage = pointage["date_pointage"]
+        if date_pointage not in pointages_par_date:
+            pointages_par_date[date_pointage] = {
+                "matin_arrivee": None,
+                "matin_sortie": None,
+                "apres_midi_arrivee": None,
+                "apres_midi_sortie": None
+            }
+        
+        session = pointage["session"]
+        type_pointage = pointage.get("type_pointage", "arrivee")
+        heure = pointage["heure_pointage"]
+        
+        if session == "matin":
+            if type_pointage == "arrivee":
+                pointages_par_date[date_pointage]["matin_arrivee"] = heure
+            else:
+                pointages_par_date[date_pointage]["matin_sortie"] = heure
+        else:
+            if type_pointage == "arrivee":
+                pointages_par_date[date_pointage]["apres_midi_arrivee"] = heure
+            else:
+                pointages_par_date[date_pointage]["apres_midi_sortie"] = heure
+    
+    # Analyser chaque jour
+    tracking_data = []
+    current_date = start_date
+    
+    while current_date <= end_date:
+        date_str = current_date.isoformat()
+        
+        # Vérifier si c'est un jour férié (sauf si l'agent a une exception)
+        if date_str in jours_feries_dict and date_str not in exceptions_dates:
+            tracking_data.append({
+                "date": date_str,
+                "jour_semaine": current_date.strftime("%A"),
+                "statut": "Jour férié",
+                "jour_ferie_nom": jours_feries_dict[date_str],
+                "est_jour_ferie": True,
+                "retard_matin_minutes": 0,
+                "retard_apres_midi_minutes": 0,
+                "retard_total_minutes": 0,
+                "retard_total_heures": 0,
+                "est_absent": False,
+                "absent_matin": False,
+                "absent_apres_midi": False,
+                "montant_retard": 0,
+                "montant_absence": 0,
+                "montant_total_deduit": 0,
+                "pointages": {
+                    "matin_arrivee": None,
+                    "matin_sortie": None,
+                    "apres_midi_arrivee": None,
+                    "apres_midi_sortie": None
+                }
+            })
+            current_date += timedelta(days=1)
+            continue
+        
+        jour_data = pointages_par_date.get(date_str, {
+            "matin_arrivee": None,
+            "matin_sortie": None,
+            "apres_midi_arrivee": None,
+            "apres_midi_sortie": None
+        })
+        
+        # Calculer les retards (arrivées tardives + sorties anticipées)
+        retard_matin_minutes = 0
+        retard_apres_midi_minutes = 0
+        sortie_anticipee_matin_minutes = 0
+        sortie_anticipee_apres_midi_minutes = 0
+        
+        # Retard à l'arrivée du matin (à partir de 08h05)
+        if jour_data.get("matin_arrivee"):
+            heure_str = jour_data["matin_arrivee"]
+            if isinstance(heure_str, str):
+                heure_arrivee = datetime.strptime(heure_str, "%H:%M:%S").time()
+            else:
+                heure_arrivee = heure_str
+            heure_debut_matin = dtime(8, 5)  # 08h05 - 5 minutes de tolérance
+            
+            if heure_arrivee > heure_debut_matin:
+                delta = datetime.combine(date.min, heure_arrivee) - datetime.combine(date.min, heure_debut_matin)
+                retard_matin_minutes = int(delta.total_seconds() / 60)
+        
+        # Sortie anticipée du matin (avant 11:55)
+        # Déduction si sortie avant 11h55 (5 minutes de tolérance)
+        if jour_data.get("matin_sortie"):
+            heure_str = jour_data["matin_sortie"]
+            if isinstance(heure_str, str):
+                heure_sortie = datetime.strptime(heure_str, "%H:%M:%S").time()
+            else:
+                heure_sortie = heure_str
+            heure_fin_matin = dtime(11, 55)  # 11h55 - 5 minutes de tolérance
+            
+            if heure_sortie < heure_fin_matin:
+                delta = datetime.combine(date.min, heure_fin_matin) - datetime.combine(date.min, heure_sortie)
+                sortie_anticipee_matin_minutes = int(delta.total_seconds() / 60)
+        
+        # Retard à l'arrivée de l'après-midi (à partir de 13h05)
+        if jour_data.get("apres_midi_arrivee"):
+            heure_str = jour_data["apres_midi_arrivee"]
+            if isinstance(heure_str, str):
+                heure_arrivee = datetime.strptime(heure_str, "%H:%M:%S").time()
+            else:
+                heure_arrivee = heure_str
+            heure_debut_apres_midi = dtime(13, 5)  # 13h05 - 5 minutes de tolérance
+            # Règle commune avec la paie (app/paie/regles.py): 13h15 le vendredi
+            if current_date.weekday() == 4:
+                heure_debut_apres_midi = dtime(13, 15)
+            
+            if heure_arrivee > heure_debut_apres_midi:
+                delta = datetime.combine(date.min, heure_arrivee) - datetime.combine(date.min, heure_debut_apres_midi)
+                retard_apres_midi_minutes = int(delta.total_seconds() / 60)
+        
+        # Sortie anticipée de l'après-midi (avant 16:55)
+        # Déduction si sortie avant 16h55 (5 minutes de tolérance)
+        if jour_data.get("apres_midi_sortie"):
+            heure_str = jour_data["apres_midi_sortie"]
+            if isinstance(heure_str, str):
+                heure_sortie = datetime.strptime(heure_str, "%H:%M:%S").time()
+            else:
+                heure_sortie = heure_str
+            heure_fin_apres_midi = dtime(16, 55)  # 16h55 - 5 minutes de tolérance
+            
+            if heure_sortie < heure_fin_apres_midi:
+                delta = datetime.combine(date.min, heure_fin_apres_midi) - datetime.combine(date.min, heure_sortie)
+                sortie_anticipee_apres_midi_minutes = int(delta.total_seconds() / 60)
+        
+        # Total des retards (arrivées tardives + sorties anticipées)
+        retard_total_minutes = retard_matin_minutes + retard_apres_midi_minutes + sortie_anticipee_matin_minutes + sortie_anticipee_apres_midi_minutes
+        retard_total_heures = round(retard_total_minutes / 60, 2)
+        
+        # Calculer les absences par demi-journée (4h par session)
+        heures_par_session = HEURES_PAR_JOUR / 2  # 4 heures
+        
+        # Absence matin : AUCUN pointage matin (ni arrivée ni sortie)
+        absent_matin = not (jour_data.get("matin_arrivee") or jour_data.get("matin_sortie"))
+        
+        # Absence après-midi : AUCUN pointage après-midi (ni arrivée ni sortie)
+        absent_apres_midi = not (jour_data.get("apres_midi_arrivee") or jour_data.get("apres_midi_sortie"))
+        
+        # Calculer les montants déduits
+        # Pour les retards : seulement si l'agent est présent (a pointé)
+        montant_retard = round(retard_total_heures * TAUX_HORAIRE, 2) if retard_total_minutes > 0 else 0
+        
+        # Montant absence : 182,18 DA × 4h par session absente
+        montant_absence_matin = round(heures_par_session * TAUX_HORAIRE, 2) if absent_matin else 0
+        montant_absence_apres_midi = round(heures_par_session * TAUX_HORAIRE, 2) if absent_apres_midi else 0
+        
+        # Déterminer le statut global
+        est_absent = absent_matin and absent_apres_midi
+        
+        # Frais supplémentaires pour absence complète journée
+        frais_absence_complete = 0
+        if est_absent:
+            frais_absence_complete = 200 + 500  # 700 DA de frais supplémentaires
+        
+        montant_absence = montant_absence_matin + montant_absence_apres_midi + frais_absence_complete
+        
+        montant_total_deduit = montant_retard + montant_absence
+        
+        if est_absent:
+            statut = "Absent"
+        elif absent_matin or absent_apres_midi:
+            statut = "Absence partielle"
+        elif retard_total_minutes > 0:
+            statut = "Retard"
+        else:
+            statut = "Présent"
+        
+        tracking_data.append({
+            "date": date_str,
+            "jour_semaine": current_date.strftime("%A"),
+            "statut": statut,
+            "retard_matin_minutes": retard_matin_minutes,
+            "retard_apres_midi_minutes": retard_apres_midi_minutes,
+            "sortie_anticipee_matin_minutes": sortie_anticipee_matin_minutes,
+            "sortie_anticipee_apres_midi_minutes": sortie_anticipee_apres_midi_minutes,
+            "retard_total_minutes": retard_total_minutes,
+            "retard_total_heures": retard_total_heures,
+            "est_absent": est_absent,
+            "absent_matin": absent_matin,
+            "absent_apres_midi": absent_apres_midi,
+            "montant_retard": montant_retard,
+            "montant_absence": montant_absence,
+            "montant_absence_matin": montant_absence_matin,
+            "montant_absence_apres_midi": montant_absence_apres_midi,
+            "frais_absence_complete": frais_absence_complete,
+            "montant_total_deduit": montant_total_deduit,
+            "pointages": {
+                "matin_arrivee": jour_data.get("matin_arrivee"),
+                "matin_sortie": jour_data.get("matin_sortie"),
+                "apres_midi_arrivee": jour_data.get("apres_midi_arrivee"),
+                "apres_midi_sortie": jour_data.get("apres_midi_sortie")
+            }
+        })
+        
+        current_date += timedelta(days=1)
+    
+    return tracking_data
+
+
+def totaux_reference(tracking: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Totaux tels que calculés par le routeur d'origine
+    """
+    total_retard_minutes = sum(day["retard_total_minutes"] for day in tracking)
+    return {
+        "retard_total_minutes": total_retard_minutes,
+        "retard_total_heures": round(total_retard_minutes / 60, 2),
+        "nombre_absences": sum(1 for day in tracking if day["est_absent"]),
+        "montant_total_deduit": round(sum(day["montant_total_deduit"] for day in tracking), 2)
+    }
+
+
+def signature(valeur: Any) -> Any:
+    """
+    Valeur comparable avec ses types (0 et 0.0, True et 1 sont distingués)
+    """
+    if isinstance(valeur, dict):
+        return tuple((cle, signature(v)) for cle, v in valeur.items())
+    if isinstance(valeur, list):
+        return tuple(signature(v) for v in valeur)
+    return (type(valeur).__name__, valeur)
+
+
+def installer_donnees(nombre: int, mois: int) -> tuple:
+    """
+    Base en mémoire: pointages de nombre agents sur mois mois (le dernier quart
+    des agents sans aucun pointage), jours fériés et exceptions
+    """
+    agents = generer_agents(nombre)
+    debut = date(2025, 1, 1)
+    pointages = []
+    actifs = agents[:max(1, nombre - nombre // 4)]
+    for m in range(mois):
+        annee, mois_courant = 2025 + m // 12, m % 12 + 1
+        pointages.extend(generer_pointages_mois(actifs, mois_courant, annee, graine=m))
+    # Quelques doublons de créneau plus tardifs (le dernier pointage l'emporte)
+    for i in range(0, len(pointages), 97):
+        doublon = dict(pointages[i], id=str(uuid.uuid4()))
+        doublon["heure_pointage"] = doublon["heure_pointage"][:6] + "59"
+        pointages.append(doublon)
+    fin = date(2025 + (mois - 1) // 12, (mois - 1) % 12 + 1, 28)
+    jours_feries = []
+    jour = debut + timedelta(days=10)
+    while jour <= fin:
+        jours_feries.append({"id": str(uuid.uuid4()), "date_ferie": jour.isoformat(), "nom": f"Férié {jour.isoformat()}"})
+        jour += timedelta(days=37)
+    exceptions = [
+        {"id": str(uuid.uuid4()), "agent_id": agents[i]["id"], "jour_ferie_id": jf["id"]}
+        for i in range(0, nombre, 3) for jf in jours_feries[::2]
+    ]
+    installer_base_memoire({
+        "agents": agents,
+        "pointages": pointages,
+        "jours_feries": jours_feries,
+        "jours_feries_exceptions": exceptions,
+    })
+    return agents, debut, fin
+
+
+async def verifier_equivalence(agents: List[Dict[str, Any]], debut: date, fin: date) -> int:
+    ids = [agent["id"] for agent in agents]
+    suivis = await get_agents_daily_tracking(ids, debut, fin)
+    differences = 0
+    for agent_id in ids:
+        # Période complète, un mois et une période vide
+        for d, f in ((debut, fin), (debut + timedelta(days=31), debut + timedelta(days=61)), (fin, debut)):
+            reference = await get_agent_daily_tracking_reference(agent_id, d, f)
+            suivi = suivis[agent_id] if (d, f) == (debut, fin) else (await get_agents_daily_tracking([agent_id], d, f))[agent_id]
+            if signature(suivi["details_quotidiens"]) != signature(reference) or signature(suivi["totaux"]) != signature(totaux_reference(reference)):
+                differences += 1
+    return differences
+
+
+def verifier_grille(agents: List[Dict[str, Any]], debut: date, fin: date, donnees: tuple) -> int:
+    """
+    Compare la grille d'équipe aux lignes du suivi par agent (statut, retard, montant, totaux)
+    """
+    ids = [agent["id"] for agent in agents]
+    suivis = calculer_suivis(ids, debut, fin, *donnees)
+    grille = calculer_grille_suivi(agents, debut, fin, *donnees)
+    differences = 0
+    for a, agent_id in enumerate(ids):
+        lignes = suivis[agent_id]["details_quotidiens"]
+        attendu = (
+            [STATUTS.index(ligne["statut"]) for ligne in lignes],
+            [ligne["retard_total_minutes"] for ligne in lignes],
+            [float(ligne["montant_total_deduit"]) for ligne in lignes],
+        )
+        obtenu = (grille["statut"][a], grille["retard_minutes"][a], grille["montant_deduit"][a])
+        totaux = {nom: valeurs[a] for nom, valeurs in grille["totaux"].items()}
+        if attendu != obtenu or totaux != suivis[agent_id]["totaux"]:
+            differences += 1
+    return differences
+
+
+async def mesurer(nombre: int, mois: int) -> None:
+    agents, debut, fin = installer_donnees(nombre, mois)
+    ids = [agent["id"] for agent in agents]
+
+    differences = await verifier_equivalence(agents, debut, fin)
+    print(f"Équivalence: {3 * nombre} suivis comparés, {differences} différence(s)")
+
+    # De bout en bout (requêtes sur la base en mémoire comprises), un agent à la fois
+    reference, par_agent = [], []
+    for agent_id in ids:
+        debut_mesure = time.perf_counter()
+        totaux_reference(await get_agent_daily_tracking_reference(agent_id, debut, fin))
+        reference.append((time.perf_counter() - debut_mesure) * 1000)
+        debut_mesure = time.perf_counter()
+        await get_agents_daily_tracking([agent_id], debut, fin)
+        par_agent.append((time.perf_counter() - debut_mesure) * 1000)
+    print(resume("référence, par agent", reference))
+    print(resume("moteur, par agent", par_agent))
+
+    # Calcul seul, données déjà chargées
+    donnees = await charger_donnees_suivi(ids, debut, fin)
+    calcul_par_agent = []
+    for agent_id in ids:
+        debut_mesure = time.perf_counter()
+        calculer_suivis([agent_id], debut, fin, *donnees)
+        calcul_par_agent.append((time.perf_counter() - debut_mesure) * 1000)
+    debut_mesure = time.perf_counter()
+    calculer_suivis(ids, debut, fin, *donnees)
+    tous = (time.perf_counter() - debut_mesure) * 1000
+    print(resume("moteur, calcul seul par agent", calcul_par_agent))
+    print(f"moteur, calcul seul des {nombre} agents en un appel: {tous:.1f} ms")
+
+    differences_grille = verifier_grille(agents, debut, fin, donnees)
+    debut_mesure = time.perf_counter()
+    calculer_grille_suivi(agents, debut, fin, *donnees)
+    grille = (time.perf_counter() - debut_mesure) * 1000
+    print(f"grille d'équipe ({nombre} agents): {grille:.1f} ms, {differences_grille} différence(s) avec le suivi par agent")
+    differences += differences_grille
+    if differences:
+        raise SystemExit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--mois", type=int, default=12)
+    args = parser.parse_args()
+
+    print(f"Suivi quotidien: {args.agents} agents sur {args.mois} mois, sans latence simulée")
+    asyncio.run(mesurer(args.agents, args.mois))
+
+
+if __name__ == "__main__":
+    main()
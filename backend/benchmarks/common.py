@@ -0,0 +1,106 @@
+"""
+Outils communs aux benchmarks: installation d'une base en mémoire et percentiles.
+"""
+import os
+import statistics
+import uuid
+from typing import Any, Dict, List
+
+# Les benchmarks tournent toujours sur la base en mémoire
+os.environ.setdefault("DB_BACKEND", "memory")
+
+from app import db as db_module
+from app.memory_db import MemoryClient
+
+
+def installer_base_memoire(tables: Dict[str, List[Dict[str, Any]]], latency_ms: float = 0.0) -> MemoryClient:
+    """
+    Remplace le client global de app.db par une base en mémoire pré-remplie
+    """
+    client = db_module.create_memory_client()
+    client.tables = {name: list(rows) for name, rows in tables.items()}
+    client.latency_ms = latency_ms
+    db_module.supabase = client
+    # Nouvelle base: les paies mises en cache ne correspondent plus
+    from app.paie.cache import cache_paies
+    from app.paie.mois_en_cours import paie_mois_en_cours
+    cache_paies.vider()
+    paie_mois_en_cours.invalider()
+    return client
+
+
+def generer_agents(nombre: int, role: str = "agent") -> List[Dict[str, Any]]:
+    """
+    Génère des agents fictifs
+    """
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "nom": f"Agent {i:05d}",
+            "email": f"agent{i:05d}@collable.fr",
+            "password_hash": "x",
+            "role": role,
+            "created_at": "2025-01-01T00:00:00+00:00",
+            "updated_at": "2025-01-01T00:00:00+00:00",
+        }
+        for i in range(nombre)
+    ]
+
+
+def percentile(valeurs: List[float], p: float) -> float:
+    """
+    Percentile p (0-100) par interpolation linéaire
+    """
+    if not valeurs:
+        return 0.0
+    if len(valeurs) == 1:
+        return valeurs[0]
+    return statistics.quantiles(valeurs, n=100, method="inclusive")[max(0, min(98, int(p) - 1))]
+
+
+def resume(nom: str, durees_ms: List[float]) -> str:
+    """
+    Ligne de résumé p50/p99/moyenne
+    """
+    return (
+        f"{nom:<40} n={len(durees_ms):<6} p50={percentile(durees_ms, 50):8.3f} ms  "
+        f"p99={percentile(durees_ms, 99):8.3f} ms  moy={statistics.fmean(durees_ms):8.3f} ms"
+    )
+
+
+def generer_pointages_mois(agents: List[Dict[str, Any]], mois: int, annee: int, graine: int = 42) -> List[Dict[str, Any]]:
+    """
+    Génère les pointages d'un mois pour chaque agent: 4 pointages par jour
+    ouvré avec des retards, absences et demi-journées aléatoires (reproductibles)
+    """
+    import calendar
+    import random
+    from datetime import date
+
+    rng = random.Random(graine)
+    pointages = []
+    nb_jours = calendar.monthrange(annee, mois)[1]
+    for agent in agents:
+        for jour in range(1, nb_jours + 1):
+            date_jour = date(annee, mois, jour)
+            if date_jour.weekday() >= 5 or rng.random() < 0.08:
+                continue  # Week-end, ou absence
+            creneaux = [
+                ("matin", "arrivee", 7 * 60 + 50 + rng.randint(0, 30)),
+                ("matin", "sortie", 12 * 60 + rng.randint(0, 15)),
+                ("apres-midi", "arrivee", 12 * 60 + 55 + rng.randint(0, 25)),
+                ("apres-midi", "sortie", 17 * 60 + rng.randint(0, 20)),
+            ]
+            if rng.random() < 0.1:
+                creneaux = creneaux[rng.choice([0, 2]):][:2]  # Demi-journée
+            for session, type_pointage, minutes in creneaux:
+                pointages.append({
+                    "id": str(uuid.uuid4()),
+                    "agent_id": agent["id"],
+                    "date_pointage": date_jour.isoformat(),
+                    "heure_pointage": f"{minutes // 60:02d}:{minutes % 60:02d}:{rng.randint(0, 59):02d}",
+                    "session": session,
+                    "type_pointage": type_pointage,
+                    "annule": False,
+                })
+    return pointages
@@ -1,17 +1,17 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
 from datetime import datetime, timedelta
+import hmac
 import os
 import logging
 
-# Configuration des logs
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from app.journalisation import configurer_journalisation
+
+# Configuration des logs (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT), avant l'import des modules
+configurer_journalisation()
 logger = logging.getLogger(__name__)
 
 # Import des modules personnalisés
@@ -23,7 +23,10 @@ from app.paie import router as paie_router
 from app.primes import router as primes_router
 from app.jours_feries import router as jours_feries_router
 from app.version import router as version_router
-from app.db import init_db
+from app.db import init_db, close_db
+from app.qrcode.utils import demarrer_balayage_qrcodes, arreter_balayage_qrcodes
+from app.qrcode.rotation import rotation_qrcodes
+from app.metriques import METRICS_ENABLED, METRICS_TOKEN, CONTENT_TYPE_PROMETHEUS, MiddlewareMetriques, metriques
 
 # Les variables d'environnement sont définies directement dans app/db.py
 
@@ -54,13 +57,28 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Durée des requêtes et requêtes en base par endpoint (exposées sur /metrics)
+if METRICS_ENABLED:
+    app.add_middleware(MiddlewareMetriques)
+
 # Initialisation de la base de données au démarrage
 @app.on_event("startup")
 async def startup_db_client():
     logger.info("🚀 Démarrage de l'application...")
     await init_db()
+    # Nettoyage périodique des images de QR codes inactifs
+    demarrer_balayage_qrcodes()
+    # Rotation automatique du QR code actif (QRCODE_ROTATION_MINUTES)
+    rotation_qrcodes.demarrer()
     logger.info("✅ Application démarrée avec succès")
 
+# Fermeture du pool de connexions à l'arrêt
+@app.on_event("shutdown")
+async def shutdown_db_client():
+    await rotation_qrcodes.arreter()
+    await arreter_balayage_qrcodes()
+    await close_db()
+
 # Inclusion des routers
 app.include_router(auth_router.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(qrcode_router.router, prefix="/api/qrcode", tags=["QR Code"])
@@ -82,6 +100,16 @@ async def read_root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+# Métriques au format Prometheus, uniquement avec le jeton METRICS_TOKEN
+# (route absente tant qu'aucun jeton n'est configuré)
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def exposer_metriques(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton de métriques invalide")
+    return Response(content=metriques.exposer(), media_type=CONTENT_TYPE_PROMETHEUS)
+
 # Montage des fichiers statiques (si nécessaire)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
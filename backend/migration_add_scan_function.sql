@@ -0,0 +1,67 @@
+-- Migration pour ajouter la fonction de scan en un seul aller-retour
+-- À exécuter dans l'interface Supabase SQL Editor
+--
+-- La session et le type du pointage sont décidés par l'API (decider_session dans
+-- app/pointage/utils.py, table de app/pointage/sessions.py) à partir des pointages
+-- du jour qu'elle connaît. La fonction valide le QR code, sérialise les scans de
+-- l'agent, vérifie que les pointages du jour sont toujours ceux sur lesquels
+-- l'API a décidé et insère le pointage, le tout dans une seule transaction appelée
+-- via POST /rest/v1/rpc/enregistrer_pointage_scan. Aucune règle de session n'est
+-- dupliquée ici.
+--
+-- Retour JSON:
+--   {"statut": "ok", "pointage": {...}}
+--   {"statut": "conflit"}  -- pointages du jour modifiés depuis la décision: l'API relit et recommence
+--   {"statut": "erreur", "message": "..."}
+
+-- Anciennes signatures (décision de session en PL/pgSQL)
+DROP FUNCTION IF EXISTS enregistrer_pointage_scan(UUID, TEXT, TIMESTAMP, BOOLEAN);
+DROP FUNCTION IF EXISTS enregistrer_pointage_scan(UUID, TEXT, TIMESTAMP, BOOLEAN, BOOLEAN);
+
+CREATE OR REPLACE FUNCTION enregistrer_pointage_scan(
+    p_agent_id UUID,
+    p_code_unique TEXT,
+    p_maintenant TIMESTAMP,  -- Heure locale GMT+1 du scan (sans fuseau)
+    p_session TEXT,  -- Session décidée par l'API
+    p_type_pointage TEXT,  -- Type décidé par l'API
+    p_pointages_lus UUID[],  -- Pointages du jour (non annulés) sur lesquels l'API a décidé
+    p_code_verifie BOOLEAN DEFAULT FALSE  -- Jeton signé déjà vérifié par l'API (QRCODE_MODE=signe)
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_date DATE := p_maintenant::DATE;
+    v_pointages_jour UUID[];
+    v_pointage pointages%ROWTYPE;
+BEGIN
+    -- 1. Validation du QR code
+    IF NOT p_code_verifie AND NOT EXISTS (SELECT 1 FROM qrcodes WHERE code_unique = p_code_unique AND actif = TRUE) THEN
+        RETURN jsonb_build_object('statut', 'erreur', 'message', 'QR code invalide ou expiré');
+    END IF;
+
+    -- 2. Sérialiser les scans simultanés d'un même agent
+    PERFORM pg_advisory_xact_lock(hashtext(p_agent_id::TEXT));
+
+    -- 3. La décision de l'API porte-t-elle sur l'état actuel de la journée ?
+    SELECT COALESCE(array_agg(id ORDER BY id), ARRAY[]::UUID[]) INTO v_pointages_jour
+    FROM pointages
+    WHERE agent_id = p_agent_id
+      AND date_pointage = v_date
+      AND (annule IS NULL OR annule = FALSE);
+
+    IF v_pointages_jour IS DISTINCT FROM
+       (SELECT COALESCE(array_agg(id ORDER BY id), ARRAY[]::UUID[]) FROM unnest(p_pointages_lus) AS id) THEN
+        RETURN jsonb_build_object('statut', 'conflit');
+    END IF;
+
+    -- 4. Insertion du pointage
+    INSERT INTO pointages (agent_id, date_pointage, heure_pointage, session, type_pointage)
+    VALUES (p_agent_id, v_date, date_trunc('second', p_maintenant)::TIME, p_session, p_type_pointage)
+    RETURNING * INTO v_pointage;
+
+    RETURN jsonb_build_object('statut', 'ok', 'pointage', to_jsonb(v_pointage));
+END;
+$$;
+
+COMMENT ON FUNCTION enregistrer_pointage_scan IS 'Scan QR en un aller-retour: validation du code, vérification de l''état du jour décidé par l''API et insertion';
@@ -32,6 +32,9 @@ const AdminDashboard = () => {
   const isAfternoon = currentHour >= 13
   
   useEffect(() => {
+    let eventSource = null
+    let interval = null
+    
     const fetchDashboardStats = async () => {
       try {
         const response = await api.get('/api/admin/dashboard')
@@ -45,16 +48,80 @@ const AdminDashboard = () => {
       }
     }
     
-    // Charger les stats au démarrage
-    fetchDashboardStats()
-    
-    // Rafraîchir automatiquement toutes les 30 secondes
-    const interval = setInterval(() => {
+    // Repli: rafraîchir automatiquement toutes les 30 secondes
+    const startPolling = () => {
       fetchDashboardStats()
-    }, 30000) // 30 secondes
+      if (!interval) {
+        interval = setInterval(() => {
+          fetchDashboardStats()
+        }, 30000) // 30 secondes
+      }
+    }
+    
+    // Appliquer un changement de présence reçu en direct
+    const appliquerEvenement = (prev, evenement) => {
+      const cle = evenement.session === 'matin' ? 'liste_presents_matin' : 'liste_presents_aprem'
+      let liste = prev[cle].filter((nom) => nom !== evenement.nom)
+      if (evenement.present) {
+        liste = [...liste, evenement.nom].sort()
+      }
+      return { ...prev, ...evenement.compteurs, [cle]: liste }
+    }
+    
+    // Mises à jour en direct via SSE. EventSource n'envoie pas d'en-tête: un ticket
+    // de courte durée est demandé puis passé en paramètre (jamais le token principal)
+    let ferme = false
+    const ouvrirFlux = async (tentatives) => {
+      let ticket
+      try {
+        const response = await api.post('/api/admin/dashboard/stream/ticket')
+        ticket = response.data.ticket
+      } catch (error) {
+        console.error('Erreur lors de la demande du ticket de flux:', error)
+        startPolling()
+        return
+      }
+      if (ferme) return
+      const source = new EventSource(`${api.defaults.baseURL}/api/admin/dashboard/stream?ticket=${encodeURIComponent(ticket)}`)
+      eventSource = source
+      
+      source.addEventListener('snapshot', (event) => {
+        tentatives = 0
+        setStats(JSON.parse(event.data))
+        setIsLoading(false)
+      })
+      
+      source.addEventListener('presence', (event) => {
+        const evenement = JSON.parse(event.data)
+        setStats((prev) => appliquerEvenement(prev, evenement))
+      })
+      
+      source.onerror = () => {
+        // EventSource se reconnecte seul, sauf si le serveur a refusé le flux
+        // (ticket expiré): nouveau ticket, puis repli sur le rafraîchissement périodique
+        if (source.readyState === EventSource.CLOSED) {
+          if (tentatives < 3) {
+            ouvrirFlux(tentatives + 1)
+          } else {
+            console.log('⚠️ Flux du tableau de bord fermé, repli sur le rafraîchissement périodique')
+            startPolling()
+          }
+        }
+      }
+    }
     
-    // Nettoyer l'intervalle au démontage du composant
-    return () => clearInterval(interval)
+    if (window.EventSource && localStorage.getItem('token')) {
+      ouvrirFlux(0)
+    } else {
+      startPolling()
+    }
+    
+    // Fermer le flux et l'intervalle au démontage du composant
+    return () => {
+      ferme = true
+      if (eventSource) eventSource.close()
+      if (interval) clearInterval(interval)
+    }
   }, [])
   
   return (
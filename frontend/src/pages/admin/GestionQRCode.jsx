@@ -26,7 +26,23 @@ const GestionQRCode = () => {
   useEffect(() => {
     fetchActiveQRCode()
   }, [])
-  
+
+  // QR code signé (expire_a renseigné): récupérer le jeton suivant à l'expiration
+  useEffect(() => {
+    if (!qrCode?.expire_a) return
+    const delai = Math.max(new Date(qrCode.expire_a).getTime() - Date.now(), 1000)
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.get('/api/qrcode/active')
+        setQrCode(response.data)
+      } catch (error) {
+        console.error('Erreur lors du rafraîchissement du QR code:', error)
+        setQrCode({ ...qrCode, expire_a: new Date(Date.now() + 5000).toISOString() })
+      }
+    }, delai)
+    return () => clearTimeout(timer)
+  }, [qrCode])
+
   // Générer un nouveau QR code
   const handleGenerateQRCode = async () => {
     setIsGenerating(true)
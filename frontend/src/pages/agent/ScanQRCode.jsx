@@ -3,7 +3,7 @@ import { useNavigate } from 'react-router-dom'
 import { useAuth } from '../../contexts/AuthContext'
 import { useOffline } from '../../contexts/OfflineContext'
 import { Html5Qrcode } from 'html5-qrcode'
-import api from '../../services/api'
+import api, { nouvelleCleIdempotence } from '../../services/api'
 import { toast } from 'react-toastify'
 import './ScanQRCode.css'
 
@@ -28,6 +28,7 @@ const ScanQRCode = () => {
   const html5QrCodeRef = useRef(null)
   const scannerInitialized = useRef(false)
   const scannerStopping = useRef(false)
+  const cleIdempotenceRef = useRef(null)
   
   // Vérifier les permissions et détecter les caméras disponibles
   useEffect(() => {
@@ -178,6 +179,11 @@ const ScanQRCode = () => {
     
     setIsSubmitting(true)
     
+    // Une clé par scan: les nouvelles tentatives de la même requête ne créent pas de doublon
+    if (!forceConfirmation || !cleIdempotenceRef.current) {
+      cleIdempotenceRef.current = nouvelleCleIdempotence()
+    }
+    
     // Mode hors-ligne : stocker le pointage localement
     if (!isOnline) {
       try {
@@ -211,6 +217,8 @@ const ScanQRCode = () => {
         qrcode: qrcode,
         session: session,
         force_confirmation: forceConfirmation
+      }, {
+        headers: { 'Idempotency-Key': cleIdempotenceRef.current }
       })
       
       // Vérifier si une confirmation est requise
@@ -8,6 +8,14 @@ const api = axios.create({
   timeout: 60000, // 60 secondes timeout pour le cold start de Render (serveur gratuit)
 })
 
+// Clé d'idempotence d'une écriture (en-tête Idempotency-Key): générée une fois par
+// pointage et réutilisée pour ses nouvelles tentatives, qui ne créent pas de doublon
+export const nouvelleCleIdempotence = () => (
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`
+)
+
 // Variable pour éviter les boucles de refresh
 let isRefreshing = false
 
@@ -1,6 +1,8 @@
 // Service de stockage local pour le mode hors-ligne
 // Utilise IndexedDB pour stocker les pointages en attente de synchronisation
 
+import { nouvelleCleIdempotence } from './api';
+
 const DB_NAME = 'pointage_offline_db';
 const DB_VERSION = 1;
 const STORES = {
@@ -72,6 +74,7 @@ export const addPendingPointage = async (pointageData) => {
     
     const pointage = {
       ...pointageData,
+      idempotency_key: pointageData.idempotency_key || nouvelleCleIdempotence(),
       timestamp: new Date().toISOString(),
       synced: false,
       retryCount: 0
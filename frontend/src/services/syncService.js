@@ -31,6 +31,9 @@ const notifySyncListeners = (event, data) => {
   });
 };
 
+// Clé d'idempotence d'un pointage en attente (pointages stockés avant l'ajout de la clé: id local)
+const cleIdempotence = (pointage) => pointage.idempotency_key || `pointage-${pointage.id}-${pointage.timestamp}`;
+
 // Synchroniser un pointage individuel
 const syncSinglePointage = async (pointage) => {
   try {
@@ -42,6 +45,8 @@ const syncSinglePointage = async (pointage) => {
     const response = await api.post('/api/pointage/scan', {
       qr_data: pointage.qr_data,
       offline_timestamp: pointage.timestamp
+    }, {
+      headers: { 'Idempotency-Key': cleIdempotence(pointage) }
     });
     
     console.log('✅ Pointage synchronisé:', response.data);
@@ -66,6 +71,63 @@ const syncSinglePointage = async (pointage) => {
   }
 };
 
+// Nombre maximal de pointages envoyés par requête de synchronisation groupée
+const TAILLE_LOT_SYNC = 100;
+
+// Erreur "session déjà complète": le pointage en attente est un doublon
+const estSessionComplete = (error) => Boolean(error && (
+  error.includes('déjà complète') ||
+  error.includes('already complete') ||
+  error.includes('Session') ||
+  error.includes('arrivée et sortie')
+));
+
+// Synchroniser un lot de pointages en une requête (/api/pointage/scan/batch)
+// Retourne un résultat par pointage, dans l'ordre du lot
+const syncBatchPointages = async (lot) => {
+  try {
+    const response = await api.post('/api/pointage/scan/batch', {
+      scans: lot.map(pointage => ({
+        client_id: String(pointage.id),
+        qr_data: pointage.qr_data,
+        offline_timestamp: pointage.timestamp
+      }))
+    }, {
+      // Même lot renvoyé après une coupure: le serveur rejoue le résultat du premier envoi
+      headers: { 'Idempotency-Key': `lot-${cleIdempotence(lot[0])}-${lot.length}` }
+    });
+
+    console.log('✅ Lot synchronisé:', response.data);
+    return response.data.results.map(result => (
+      result.success
+        ? { success: true, data: result }
+        : { success: false, error: result.error }
+    ));
+  } catch (error) {
+    // Serveur sans synchronisation groupée: envoi pointage par pointage
+    if (error.response?.status === 404 || error.response?.status === 405) {
+      const resultats = [];
+      for (const pointage of lot) {
+        const result = await syncSinglePointage(pointage);
+        resultats.push(result);
+        if (result.isAuthError) break;
+      }
+      while (resultats.length < lot.length) {
+        resultats.push({ success: false, error: 'Token expiré - Veuillez vous reconnecter', isAuthError: true });
+      }
+      return resultats;
+    }
+
+    console.error('❌ Erreur sync lot de pointages:', error);
+    console.error('Détails erreur:', error.response?.data);
+
+    const erreur = error.response?.status === 401
+      ? { success: false, error: 'Token expiré - Veuillez vous reconnecter', isAuthError: true }
+      : { success: false, error: error.response?.data?.detail || error.message };
+    return lot.map(() => erreur);
+  }
+};
+
 // Synchroniser tous les pointages en attente
 export const syncPendingPointages = async () => {
   if (syncInProgress) {
@@ -111,38 +173,44 @@ export const syncPendingPointages = async () => {
     const pendingPointages = await getPendingPointages();
     console.log(`${pendingPointages.length} pointage(s) en attente de synchronisation`);
 
-    for (const pointage of pendingPointages) {
-      const result = await syncSinglePointage(pointage);
-      
-      if (result.success) {
-        await deletePendingPointage(pointage.id);
-        synced++;
-        notifySyncListeners('pointage_synced', { pointage, result: result.data });
-      } else {
-        lastError = result.error;
-        notifySyncListeners('pointage_failed', { pointage, error: result.error });
-        
-        // Si erreur d'authentification, arrêter la sync et demander reconnexion
-        if (result.isAuthError) {
-          console.log('🔐 Erreur d\'authentification, arrêt de la synchronisation');
-          failed++;
-          break; // Arrêter la boucle, pas la peine de continuer
-        }
-        
-        // Si l'erreur est "session déjà complète", supprimer le pointage bloqué automatiquement
-        if (result.error && (
-          result.error.includes('déjà complète') || 
-          result.error.includes('already complete') ||
-          result.error.includes('Session') ||
-          result.error.includes('arrivée et sortie')
-        )) {
-          console.log('🗑️ Suppression du pointage bloqué (session complète):', pointage.id);
+    // Envoi par lots: un seul aller-retour pour toute la file
+    for (let debut = 0; debut < pendingPointages.length; debut += TAILLE_LOT_SYNC) {
+      const lot = pendingPointages.slice(debut, debut + TAILLE_LOT_SYNC);
+      const resultats = await syncBatchPointages(lot);
+      let authError = false;
+
+      for (let i = 0; i < lot.length; i++) {
+        const pointage = lot[i];
+        const result = resultats[i];
+
+        if (result.success) {
           await deletePendingPointage(pointage.id);
-          // Ne pas compter comme échec car c'est un doublon
+          synced++;
+          notifySyncListeners('pointage_synced', { pointage, result: result.data });
         } else {
-          failed++;
+          lastError = result.error;
+          notifySyncListeners('pointage_failed', { pointage, error: result.error });
+
+          // Si erreur d'authentification, arrêter la sync et demander reconnexion
+          if (result.isAuthError) {
+            console.log('🔐 Erreur d\'authentification, arrêt de la synchronisation');
+            failed++;
+            authError = true;
+            break; // Arrêter la boucle, pas la peine de continuer
+          }
+
+          // Si l'erreur est "session déjà complète", supprimer le pointage bloqué automatiquement
+          if (estSessionComplete(result.error)) {
+            console.log('🗑️ Suppression du pointage bloqué (session complète):', pointage.id);
+            await deletePendingPointage(pointage.id);
+            // Ne pas compter comme échec car c'est un doublon
+          } else {
+            failed++;
+          }
         }
       }
+
+      if (authError) break;
     }
 
     const pending = await countPendingPointages();